@@ -34,25 +34,34 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    user = get_user_from_token(db, token)
+    if user is None:
+        raise credentials_exception
+    
+    return user
+
+
+def get_user_from_token(db: Session, token: str, token_type: str = "access_token") -> Optional[User]:
+    """Resolve a token of the given type to its user, or None if the token is invalid"""
     try:
         # Decode the token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-            
         user_id = payload.get("user_id")
-        if user_id is None:
-            raise credentials_exception
+        if username is None or user_id is None:
+            return None
+        # A stream ticket must not work as a bearer token, nor the other way round
+        if payload.get("type", "access_token") != token_type:
+            return None
             
     except (JWTError, ValidationError):
-        raise credentials_exception
+        return None
     
     # Find the user in the database
     user = db.query(User).filter(User.id == user_id).first()
     
     if user is None or user.username != username:
-        raise credentials_exception
+        return None
     
     return user
 
@@ -18,9 +18,9 @@ from app.models.user_models import User
 from app.core.license_tools import (
     generate_online_license,
     generate_offline_license,
-    verify_offline_license,
-    log_activation_change
+    verify_offline_license
 )
+from app.services.activation_event_service import ActivationEventService
 from app.schemas.license_schemas import (
     LicenseActivationRequest,
     LicenseActivationResponse,
@@ -48,8 +48,8 @@ def get_license_activation_info(
     if not license_obj:
         raise HTTPException(status_code=404, detail="许可证不存在")
     
-    # 转换为响应模型
-    activation_history = license_obj.activation_history or {}
+    # 转换为响应模型，只附带最近的变更记录
+    activation_history = ActivationEventService.recent_history(db, license_id)
     return {
         "license_id": license_obj.license_id,
         "activation_mode": license_obj.activation_mode,
@@ -98,6 +98,8 @@ def change_license_activation(
             "cluster_id": license_obj.cluster_id
         }
     
+    from_mode = license_obj.activation_mode or "ONLINE"
+    
     # 激活模式变更逻辑
     # 从在线到离线
     if (license_obj.activation_mode == "ONLINE" and 
@@ -152,15 +154,16 @@ def change_license_activation(
         # 保留cluster_id以便查看历史记录，但它不再有效
         
     # 记录激活方式变更历史
-    activation_history = log_activation_change(
-        license_data=license_obj.activation_history or {},
-        from_mode=license_obj.activation_mode,
+    ActivationEventService.record(
+        db,
+        license_id=license_id,
+        from_mode=from_mode,
         to_mode=license_activation.activation_mode,
-        cluster_id=license_activation.cluster_id if license_activation.activation_mode == "OFFLINE" else None
+        cluster_id=license_activation.cluster_id,
+        changed_by=current_user.username
     )
     
-    # 更新激活历史和变更时间
-    license_obj.activation_history = activation_history
+    # 更新变更时间
     license_obj.last_activation_change = datetime.now()
     license_obj.updated_at = datetime.now()
     
@@ -241,15 +244,16 @@ def regenerate_offline_code(
     license_obj.offline_code = offline_code
     
     # 记录激活码重新生成历史
-    activation_history = log_activation_change(
-        license_data=license_obj.activation_history or {},
+    ActivationEventService.record(
+        db,
+        license_id=license_id,
         from_mode="OFFLINE",
         to_mode="OFFLINE",
-        cluster_id=offline_request.cluster_id
+        cluster_id=offline_request.cluster_id,
+        changed_by=current_user.username
     )
     
-    # 更新激活历史和变更时间
-    license_obj.activation_history = activation_history
+    # 更新变更时间
     license_obj.last_activation_change = datetime.now()
     license_obj.updated_at = datetime.now()
     
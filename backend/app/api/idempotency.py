@@ -0,0 +1,124 @@
+"""
+Idempotency-Key support for partner-facing write APIs.
+
+Routers created with `route_class=IdempotentRoute` (or IdempotentUnitOfWorkRoute) accept an
+`Idempotency-Key` header on POST/PUT/PATCH/DELETE. The first request with a key runs normally and
+its successful response is stored (see app/services/idempotency_service.py); a retry with the same
+key and the same request gets that response back without the endpoint running again, marked with
+`Idempotent-Replayed: true`. A retry arriving while the first request is still running waits for
+its result (up to IDEMPOTENCY_WAIT_SECONDS, then 409). Reusing a key for a different request is
+rejected with 422. Failed requests (errors, 4xx/5xx) store nothing, so they can be retried. A
+successful response larger than IDEMPOTENCY_MAX_RESPONSE_BYTES is not stored, but the key still
+records that the request succeeded: retries get 409 instead of executing it again.
+
+Keys are scoped to the caller's credential (X-Partner-UUID, else Authorization); requests without
+either, or without the header, are not affected.
+"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+from app.db.unit_of_work import UnitOfWorkRoute
+from app.services.idempotency_service import (
+    idempotency_store, request_fingerprint, credential_scope, IdempotencyConflict, StoredResponse, REPLAY, IN_PROGRESS
+)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+CREDENTIAL_HEADERS = ("x-partner-uuid", "authorization")
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.1
+HEARTBEATS_PER_TIMEOUT = 4
+
+
+def request_scope(request: Request) -> Optional[str]:
+    for name in CREDENTIAL_HEADERS:
+        value = request.headers.get(name)
+        if value:
+            return credential_scope(name, value)
+    return None
+
+
+def replay(stored: StoredResponse) -> Response:
+    if stored.body is None:
+        raise HTTPException(
+            status_code=409,
+            detail="The request with this Idempotency-Key was already processed; its response is too large to replay"
+        )
+    response = Response(content=stored.body, status_code=stored.status_code, media_type=stored.media_type)
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+async def keep_alive(scope: str, key: str) -> None:
+    """Refresh the claim's heartbeat while the endpoint runs, well within IDEMPOTENCY_LOCK_TIMEOUT"""
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_LOCK_TIMEOUT / HEARTBEATS_PER_TIMEOUT)
+        await run_in_threadpool(idempotency_store.heartbeat, scope, key)
+
+
+class IdempotentRoute(APIRoute):
+    """APIRoute that executes a write at most once per Idempotency-Key and replays its response to retries"""
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            scope = request_scope(request)
+            if key is None or scope is None or request.method not in WRITE_METHODS:
+                return await original_handler(request)
+            if not key.strip() or len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+
+            # The body is cached on the request, so the endpoint reads the same bytes afterwards
+            fingerprint = request_fingerprint(request.method, request.url.path, request.url.query, await request.body())
+            deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+            while True:
+                try:
+                    outcome, stored = await run_in_threadpool(idempotency_store.claim, scope, key, fingerprint)
+                except IdempotencyConflict as e:
+                    raise HTTPException(status_code=422, detail=str(e))
+                if outcome == REPLAY:
+                    return replay(stored)
+                if outcome != IN_PROGRESS:
+                    break
+                if time.monotonic() >= deadline:
+                    raise HTTPException(
+                        status_code=409, detail="A request with this Idempotency-Key is still being processed",
+                        headers={"Retry-After": "1"}
+                    )
+                await asyncio.sleep(POLL_SECONDS)
+
+            heartbeat = asyncio.create_task(keep_alive(scope, key))
+            try:
+                response = await original_handler(request)
+            except BaseException:
+                await run_in_threadpool(idempotency_store.release, scope, key)
+                raise
+            finally:
+                heartbeat.cancel()
+            if response.status_code >= 400:
+                await run_in_threadpool(idempotency_store.release, scope, key)
+                return response
+            body = getattr(response, "body", None)
+            if body is not None and len(body) > settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                body = None
+            await run_in_threadpool(
+                idempotency_store.complete, scope, key, fingerprint,
+                response.status_code, response.headers.get("content-type"), body
+            )
+            return response
+
+        return handler
+
+
+class IdempotentUnitOfWorkRoute(IdempotentRoute, UnitOfWorkRoute):
+    """Idempotency around a unit of work: the response is stored once the request's transaction has committed"""
@@ -1,10 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import licenses, customers, sales_reps, resellers, purchases, deployments, engineers, admin_partners, partners, auth, users, partner_create, admin_orders, leads, activation, orders, partner_identity
+from app.api.v1.endpoints import licenses, customers, sales_reps, resellers, purchases, deployments, engineers, admin_partners, partners, auth, users, partner_create, admin_orders, leads, activation, orders, partner_identity, sync, events, change_history, metrics, reference_data, forecast, fx_rates, imports
 
 api_router = APIRouter()
 
 api_router.include_router(licenses.router, prefix="/licenses", tags=["licenses"])
+# 批量续费按批次提交，不走工作单元路由
+api_router.include_router(licenses.batch_router, prefix="/licenses", tags=["licenses"])
 api_router.include_router(customers.router, prefix="/customers", tags=["customers"])
 api_router.include_router(sales_reps.router, prefix="/sales-reps", tags=["sales_reps"])
 api_router.include_router(resellers.router, prefix="/resellers", tags=["resellers"])
@@ -26,3 +28,27 @@ api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 
 # 注册合作商身份识别与邮箱映射API路由
 api_router.include_router(partner_identity.router, prefix="/partner-identity", tags=["partner-identity"])
+
+# 注册增量同步API路由
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+
+# 注册变更事件推送API路由（SSE/WebSocket）
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+
+# 注册变更历史查询API路由（覆盖在线表与已归档月份）
+api_router.include_router(change_history.router, prefix="/change-history", tags=["change-history"])
+
+# 注册请求级工作单元提交统计API路由
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+
+# 注册参考数据API路由（商机状态/来源、销售、经销商、工程师及枚举，带ETag）
+api_router.include_router(reference_data.router, prefix="/reference-data", tags=["reference-data"])
+
+# 注册收入预测API路由（商机管道、续费预测、历史趋势）
+api_router.include_router(forecast.router, prefix="/forecast", tags=["forecast"])
+
+# 注册汇率API路由（每日汇率维护，更新后重算本位币金额）
+api_router.include_router(fx_rates.router, prefix="/fx-rates", tags=["fx-rates"])
+
+# 注册批量导入API路由（客户、许可证、购买记录的CSV/XLSX导入）
+api_router.include_router(imports.router, prefix="/imports", tags=["imports"])
@@ -18,18 +18,43 @@ from app.models.user_models import User
 from app.core.license_tools import (
     generate_online_license,
     generate_offline_license,
+    generate_offline_licenses,
     verify_offline_license,
-    log_activation_change
+    verify_offline_licenses
 )
 from app.schemas.license_schemas import (
     LicenseActivationRequest,
     LicenseActivationResponse,
     LicenseInfo,
-    OfflineActivationRequest
+    ActivationEventPage,
+    OfflineActivationRequest,
+    OfflineCodeBatchRequest,
+    OfflineCodeBatchResponse,
+    OfflineCodeVerifyRequest,
+    OfflineCodeVerifyResponse
 )
+from app.services.table_version_service import TableVersionService
+from app.services.activation_event_service import ActivationEventService
 
 router = APIRouter()
 
+# 单次批量请求的上限
+MAX_BATCH_GENERATE = 1000
+MAX_BATCH_VERIFY = 10000
+
+def _offline_license_data(license_obj: License) -> Dict[str, Any]:
+    """离线激活码包含的许可证字段"""
+    return {
+        "license_id": license_obj.license_id,
+        "customer_id": license_obj.customer_id,
+        "product_name": license_obj.product_name,
+        "license_type": license_obj.license_type,
+        "start_date": license_obj.start_date,
+        "expiry_date": license_obj.expiry_date,
+        "authorized_workspaces": license_obj.authorized_workspaces,
+        "authorized_users": license_obj.authorized_users
+    }
+
 @router.get("/test")
 def test_endpoint():
     """测试端点，无需认证"""
@@ -52,8 +77,8 @@ def get_license_activation_info(
     if not license_obj:
         raise HTTPException(status_code=404, detail="许可证不存在")
     
-    # 转换为响应模型
-    activation_history = license_obj.activation_history or {}
+    # 转换为响应模型，只附带最近的变更记录，完整记录见 activation-events 分页接口
+    activation_history = ActivationEventService.recent_history(db, license_id)
     return {
         "license_id": license_obj.license_id,
         "activation_mode": license_obj.activation_mode,
@@ -69,7 +94,8 @@ def get_license_activation_info(
 def change_license_activation(
     license_activation: LicenseActivationRequest,
     license_id: str = Path(..., description="许可证ID"),
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     变更许可证激活模式（在线/离线）
@@ -79,7 +105,7 @@ def change_license_activation(
     - 销售代表：不可更改（需要管理员审批）
     - 工程师：不可更改（需要管理员审批）
     """
-    # 根据放宽的权限设置，所有用户都可以访问
+    # 根据放宽的权限设置，所有登录用户都可以访问（记录操作人）
     # 与许可证、客户等API保持一致
     
     # 获取许可证
@@ -97,6 +123,8 @@ def change_license_activation(
             "cluster_id": license_obj.cluster_id
         }
     
+    from_mode = license_obj.activation_mode or "ONLINE"
+    
     # 激活模式变更逻辑
     # 从在线到离线
     if (license_obj.activation_mode == "ONLINE" and 
@@ -110,16 +138,7 @@ def change_license_activation(
             )
         
         # 获取许可证数据
-        license_data = {
-            "license_id": license_obj.license_id,
-            "customer_id": license_obj.customer_id,
-            "product_name": license_obj.product_name,
-            "license_type": license_obj.license_type,
-            "start_date": license_obj.start_date,
-            "expiry_date": license_obj.expiry_date,
-            "authorized_workspaces": license_obj.authorized_workspaces,
-            "authorized_users": license_obj.authorized_users
-        }
+        license_data = _offline_license_data(license_obj)
         
         # 生成离线激活码
         offline_code = generate_offline_license(
@@ -151,18 +170,20 @@ def change_license_activation(
         # 保留cluster_id以便查看历史记录，但它不再有效
         
     # 记录激活方式变更历史
-    activation_history = log_activation_change(
-        license_data=license_obj.activation_history or {},
-        from_mode=license_obj.activation_mode,
+    ActivationEventService.record(
+        db,
+        license_id=license_id,
+        from_mode=from_mode,
         to_mode=license_activation.activation_mode,
-        cluster_id=license_activation.cluster_id if license_activation.activation_mode == "OFFLINE" else None
+        cluster_id=license_activation.cluster_id,
+        changed_by=current_user.username
     )
     
-    # 更新激活历史和变更时间
-    license_obj.activation_history = activation_history
+    # 更新变更时间
     license_obj.last_activation_change = datetime.now()
     license_obj.updated_at = datetime.now()
     
+    TableVersionService.bump(db, "licenses")
     db.commit()
     
     return {
@@ -177,7 +198,8 @@ def change_license_activation(
 def regenerate_offline_code(
     offline_request: OfflineActivationRequest,
     license_id: str = Path(..., description="许可证ID"),
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     重新生成离线激活码（当Cluster ID改变时）
@@ -187,7 +209,7 @@ def regenerate_offline_code(
     - 销售代表：不可重新生成（需要管理员审批）
     - 工程师：不可重新生成（需要管理员审批）
     """
-    # 根据放宽的权限设置，所有用户都可以访问
+    # 根据放宽的权限设置，所有登录用户都可以访问（记录操作人）
     # 与许可证、客户等API保持一致
     
     # 获取许可证
@@ -210,16 +232,7 @@ def regenerate_offline_code(
         )
     
     # 准备许可证数据
-    license_data = {
-        "license_id": license_obj.license_id,
-        "customer_id": license_obj.customer_id,
-        "product_name": license_obj.product_name,
-        "license_type": license_obj.license_type,
-        "start_date": license_obj.start_date,
-        "expiry_date": license_obj.expiry_date,
-        "authorized_workspaces": license_obj.authorized_workspaces,
-        "authorized_users": license_obj.authorized_users
-    }
+    license_data = _offline_license_data(license_obj)
     
     # 保存旧集群ID
     old_cluster_id = license_obj.cluster_id
@@ -235,18 +248,20 @@ def regenerate_offline_code(
     license_obj.offline_code = offline_code
     
     # 记录激活码重新生成历史
-    activation_history = log_activation_change(
-        license_data=license_obj.activation_history or {},
+    ActivationEventService.record(
+        db,
+        license_id=license_id,
         from_mode="OFFLINE",
         to_mode="OFFLINE",
-        cluster_id=offline_request.cluster_id
+        cluster_id=offline_request.cluster_id,
+        changed_by=current_user.username
     )
     
-    # 更新激活历史和变更时间
-    license_obj.activation_history = activation_history
+    # 更新变更时间
     license_obj.last_activation_change = datetime.now()
     license_obj.updated_at = datetime.now()
     
+    TableVersionService.bump(db, "licenses")
     db.commit()
     
     return {
@@ -256,3 +271,147 @@ def regenerate_offline_code(
         "offline_code": license_obj.offline_code,
         "cluster_id": license_obj.cluster_id
     }
+
+@router.get("/licenses/{license_id}/activation-events", response_model=ActivationEventPage)
+def get_license_activation_events(
+    license_id: str = Path(..., description="许可证ID"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(deps.get_db)
+):
+    """
+    分页获取单个许可证的激活方式变更记录（按时间倒序）
+    """
+    if not db.query(License.license_id).filter(License.license_id == license_id).first():
+        raise HTTPException(status_code=404, detail="许可证不存在")
+    
+    try:
+        return ActivationEventService.list_events(db, license_id=license_id, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/activation-events", response_model=ActivationEventPage)
+def list_activation_events(
+    license_id: Optional[str] = Query(None, description="按许可证筛选"),
+    since: Optional[datetime] = Query(None, description="起始时间（含）"),
+    until: Optional[datetime] = Query(None, description="结束时间（不含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    分页获取所有许可证的激活方式变更记录（按时间倒序）
+    
+    权限：仅管理员
+    """
+    try:
+        return ActivationEventService.list_events(
+            db, license_id=license_id, since=since, until=until, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/offline-codes/batch", response_model=OfflineCodeBatchResponse)
+def batch_generate_offline_codes(
+    batch_request: OfflineCodeBatchRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    批量生成/重新生成离线激活码
+    
+    在线模式的许可证切换为离线模式，离线模式的许可证按新的集群ID重新生成激活码；
+    所有变更在一个事务中提交，单个许可证不存在时仅该项失败
+    
+    权限：仅管理员
+    """
+    if len(batch_request.items) > MAX_BATCH_GENERATE:
+        raise HTTPException(status_code=400, detail=f"单次最多处理{MAX_BATCH_GENERATE}个许可证")
+    
+    license_ids = {item.license_id for item in batch_request.items}
+    licenses = {
+        license_obj.license_id: license_obj
+        for license_obj in db.query(License).filter(License.license_id.in_(license_ids)).all()
+    }
+    
+    found_items = [item for item in batch_request.items if item.license_id in licenses and item.cluster_id]
+    offline_codes = generate_offline_licenses(
+        [(_offline_license_data(licenses[item.license_id]), item.cluster_id) for item in found_items]
+    )
+    codes_by_item = {id(item): code for item, code in zip(found_items, offline_codes)}
+    
+    now = datetime.now()
+    results = []
+    events = []
+    for item in batch_request.items:
+        license_obj = licenses.get(item.license_id)
+        if license_obj is None:
+            results.append({"license_id": item.license_id, "success": False, "message": "许可证不存在"})
+            continue
+        if not item.cluster_id:
+            results.append({"license_id": item.license_id, "success": False, "message": "需要提供有效的集群ID(cluster_id)"})
+            continue
+        
+        from_mode = license_obj.activation_mode or "ONLINE"
+        license_obj.activation_mode = "OFFLINE"
+        license_obj.cluster_id = item.cluster_id
+        license_obj.offline_code = codes_by_item[id(item)]
+        events.append({
+            "license_id": item.license_id,
+            "from_mode": from_mode,
+            "to_mode": "OFFLINE",
+            "cluster_id": item.cluster_id,
+            "changed_by": current_user.username,
+            "created_at": now
+        })
+        license_obj.last_activation_change = now
+        license_obj.updated_at = now
+        results.append({
+            "license_id": item.license_id,
+            "success": True,
+            "offline_code": license_obj.offline_code,
+            "cluster_id": item.cluster_id
+        })
+    
+    succeeded = sum(1 for result in results if result["success"])
+    if succeeded:
+        ActivationEventService.record_many(db, events)
+        TableVersionService.bump(db, "licenses")
+        db.commit()
+    
+    return {"total": len(results), "succeeded": succeeded, "results": results}
+
+@router.post("/offline-codes/verify", response_model=OfflineCodeVerifyResponse)
+def batch_verify_offline_codes(
+    verify_request: OfflineCodeVerifyRequest,
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    批量验证离线激活码（兼容v1和v2格式），无需访问数据库
+    """
+    if len(verify_request.items) > MAX_BATCH_VERIFY:
+        raise HTTPException(status_code=400, detail=f"单次最多验证{MAX_BATCH_VERIFY}个激活码")
+    
+    verified = verify_offline_licenses([(item.offline_code, item.cluster_id) for item in verify_request.items])
+    
+    results = []
+    for valid, payload in verified:
+        if not valid:
+            results.append({"valid": False, "error": payload.get("error")})
+            continue
+        results.append({
+            "valid": True,
+            "version": payload.get("version", 1),
+            "key_id": payload.get("key_id", 0),
+            "license_id": payload.get("license_id"),
+            "expiry_date": str(payload.get("expiry_date"))[:10],
+            "authorized_workspaces": payload.get("authorized_workspaces"),
+            "authorized_users": payload.get("authorized_users")
+        })
+    
+    return {
+        "total": len(results),
+        "valid": sum(1 for result in results if result["valid"]),
+        "results": results
+    }
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
 from app.api import deps
+from app.core.pagination import set_total_count
 from app.schemas import partner_schemas
 from app.services.partner_service import OrderService
 
@@ -12,13 +13,17 @@ router = APIRouter()
 
 @router.get("/", response_model=List[partner_schemas.OrderInfo])
 def get_all_orders(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    partner_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_admin: deps.TokenData = Depends(deps.get_current_admin_user)
 ):
     """Get all orders (admin only)"""
-    return OrderService.get_all_orders(db, skip, limit)
+    set_total_count(response, OrderService.count_orders(db, status=status, partner_id=partner_id))
+    return OrderService.get_all_orders(db, skip, limit, status=status, partner_id=partner_id)
 
 
 @router.get("/{order_id}", response_model=partner_schemas.OrderInfo)
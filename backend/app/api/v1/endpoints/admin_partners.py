@@ -6,45 +6,39 @@ from datetime import datetime
 from app.services.partner_service import PartnerService, OrderService
 from app.schemas import partner_schemas as schemas
 from app.db.database import get_db
+from app.db.unit_of_work import UnitOfWorkRoute
+from app.core.pagination import set_total_count
 from app.api import deps
 from app.models.partner_models import Partner, Order
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 @router.get("/partners", response_model=List[schemas.PartnerInfo])
 def get_all_partners(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[str] = None,
     region: Optional[str] = None,
     db: Session = Depends(get_db),
     current_admin: deps.TokenData = Depends(deps.get_current_admin_user)
 ):
     """Get all partners with filtering options (admin only)"""
-    partners = db.query(Partner)
-    if status:
-        partners = partners.filter(Partner.status == status)
-    if region:
-        partners = partners.filter(Partner.region == region)
+    partners = PartnerService.get_all_partners(db, skip, limit, status=status, region=region)
     
-    # Get total count for pagination
-    total_count = partners.count()
-    
-    # Add header for total count
-    partners = partners.offset(skip).limit(limit).all()
+    # 订单数来自partner_orders关联表，整页一次分组查询
+    order_counts = PartnerService.get_order_counts(db, [partner.partner_id for partner in partners])
     
     # Convert to schema response
     result = []
     for partner in partners:
-        # 由于Order模型现在使用customer_id而不是partner_id，这里暂时将订单数设为0
-        # 需要根据实际业务关系修改此查询
-        order_count = 0
         partner_info = PartnerService._partner_to_schema(partner)
-        partner_info.OrderCount = order_count
+        partner_info.OrderCount = order_counts[partner.partner_id]
         result.append(partner_info)
     
     # Return response with total count header
+    set_total_count(response, PartnerService.count_partners(db, status=status, region=region))
     return result
 
 
@@ -107,36 +101,24 @@ def delete_partner(
 
 @router.get("/orders", response_model=List[schemas.OrderInfo])
 def get_all_orders(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[str] = None,
     partner_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_admin: deps.TokenData = Depends(deps.get_current_admin_user)
 ):
     """Get all orders with filtering options (admin only)"""
-    orders = db.query(Order)
-    if status:
-        orders = orders.filter(Order.status == status)
-    # 移除partner_id筛选，因为Order模型现在使用customer_id
-    # 如果仍需按partner筛选订单，需要重新设计关联查询
-    
-    # Get total count for pagination
-    total_count = orders.count()
-    
-    # Get orders with pagination
-    orders = orders.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Convert to schema response
-    result = []
-    for order in orders:
-        # 订单关联到customer而不是partner，使用customer_id
-        order_info = OrderService._order_to_schema(db, order)
-        # 由于订单不再直接关联到合作伙伴，这里暂时使用通用名称
-        order_info.PartnerName = "Direct Customer Order"
-        result.append(order_info)
+    # 状态和合作伙伴（partner_orders关联表）筛选都在SQL中完成，分页结果不会变短
+    result = OrderService.get_all_orders(db, skip, limit, status=status, partner_id=partner_id)
+    for order_info in result:
+        if order_info.PartnerID is None:
+            # 未关联合作伙伴的订单
+            order_info.PartnerName = "Direct Customer Order"
     
     # Return response with total count header
+    set_total_count(response, OrderService.count_orders(db, status=status, partner_id=partner_id))
     return result
 
 
@@ -224,9 +206,10 @@ def associate_partner_with_order(
 
 @router.get("/partners/{partner_id}/orders", response_model=List[schemas.OrderInfo])
 def get_partner_orders(
+    response: Response,
     partner_id: int = Path(..., description="The Partner ID"),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[str] = None,
     db: Session = Depends(get_db),
     current_admin: deps.TokenData = Depends(deps.get_current_admin_user)
@@ -237,11 +220,8 @@ def get_partner_orders(
     if not partner:
         raise HTTPException(status_code=404, detail="Partner not found")
     
-    # 获取与该合作伙伴关联的所有订单
-    orders = OrderService.get_orders_by_partner(db, partner_id, skip, limit)
-    
-    # 如果有状态筛选，过滤结果
-    if status:
-        orders = [order for order in orders if order.Status == status]
+    # 获取与该合作伙伴关联的订单（状态筛选在SQL中完成）
+    orders = OrderService.get_orders_by_partner(db, partner_id, skip, limit, status=status)
     
+    set_total_count(response, OrderService.count_orders(db, status=status, partner_id=partner_id))
     return orders
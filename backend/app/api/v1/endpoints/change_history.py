@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Query, Path
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.db.database import get_db
+from app.models.user_models import User
+from app.services.change_tracking_service import ChangeTrackingService
+from app.schemas import schemas
+
+router = APIRouter()
+
+@router.get("/{table_name}/{record_id}", response_model=schemas.ChangeHistoryPage)
+def get_change_history(
+    table_name: str = Path(..., description="Tracked table, e.g. licenses"),
+    record_id: str = Path(..., description="Primary key of the record"),
+    before_id: Optional[int] = Query(None, description="NextBeforeID from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    include_archived: bool = Query(True, description="Also search months moved to the archive"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Get the change history of one record, newest first.
+
+    Covers both the live change_tracking table and months already moved to archive files.
+    """
+    return ChangeTrackingService.get_history(
+        db,
+        table_name=table_name,
+        record_id=record_id,
+        before_id=before_id,
+        limit=limit,
+        include_archived=include_archived
+    )
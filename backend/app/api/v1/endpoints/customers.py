@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
 from typing import List, Optional
 from sqlalchemy.orm import Session
+from datetime import date
 
 from app.db.database import get_db
+from app.core.http_cache import make_etag, conditional_response
+from app.core.pagination import set_total_count
 from app.services.customer_service import CustomerService
+from app.services.customer_match_service import CustomerMatchService
+from app.services.table_version_service import TableVersionService
+from app.services.timeline_service import TimelineService, TIMELINE_SOURCES
 from app.schemas import schemas
 
 router = APIRouter()
 
+# Tables whose changes invalidate each response shape (see TableVersionService)
+CUSTOMER_LIST_TABLES = ("customers",)
+CUSTOMER_LICENSES_TABLES = ("licenses",)
+CUSTOMER_STATISTICS_TABLES = ("customers", "licenses")
+
 @router.post("/", response_model=schemas.CustomerInfo)
 def create_customer(
     customer_data: schemas.CustomerCreate,
@@ -19,10 +30,21 @@ def create_customer(
 
 @router.get("/{customer_id}", response_model=schemas.CustomerInfo)
 def get_customer(
+    request: Request,
+    response: Response,
     customer_id: int = Path(..., description="The Customer ID"),
     db: Session = Depends(get_db)
 ):
     """Get detailed information about a specific customer"""
+    stamp = CustomerService.get_customer_updated_at(db, customer_id)
+    if not stamp:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    etag = make_etag("customer", stamp.customer_id, stamp.updated_at)
+    not_modified = conditional_response(request, response, etag, last_modified=stamp.updated_at)
+    if not_modified:
+        return not_modified
+    
     customer = CustomerService.get_customer(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -30,6 +52,8 @@ def get_customer(
 
 @router.get("/", response_model=List[schemas.CustomerInfo])
 def get_customers(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     name: Optional[str] = None,
@@ -39,6 +63,19 @@ def get_customers(
     db: Session = Depends(get_db)
 ):
     """Get list of customers with pagination and filtering"""
+    versions = TableVersionService.get_versions(db, CUSTOMER_LIST_TABLES)
+    etag = make_etag("customers:list", versions, sorted(request.query_params.multi_items()))
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    set_total_count(response, CustomerService.count_customers(
+        db,
+        name_filter=name,
+        industry=industry,
+        region=region,
+        customer_type=customer_type
+    ))
     return CustomerService.get_customers(
         db,
         skip=skip,
@@ -74,6 +111,8 @@ def delete_customer(
 
 @router.get("/{customer_id}/licenses", response_model=List[schemas.LicenseInfo])
 def get_customer_licenses(
+    request: Request,
+    response: Response,
     customer_id: int = Path(..., description="The Customer ID"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
@@ -81,15 +120,80 @@ def get_customer_licenses(
 ):
     """Get all licenses for a specific customer"""
     # First check if customer exists
-    customer = CustomerService.get_customer(db, customer_id)
-    if not customer:
+    if not CustomerService.get_customer_updated_at(db, customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    versions = TableVersionService.get_versions(db, CUSTOMER_LICENSES_TABLES)
+    etag = make_etag("customer:licenses", customer_id, versions, skip, limit)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     return CustomerService.get_customer_licenses(db, customer_id, skip, limit)
 
+@router.get("/{customer_id}/timeline", response_model=schemas.TimelinePage)
+def get_customer_timeline(
+    customer_id: int = Path(..., description="The Customer ID"),
+    cursor: Optional[str] = Query(None, description="NextCursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    sources: Optional[List[str]] = Query(None, description="Limit to changes, purchases, deployments and/or activations"),
+    db: Session = Depends(get_db)
+):
+    """Get everything that happened to a customer and its licenses, newest first"""
+    if not CustomerService.get_customer_updated_at(db, customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    if sources and any(source not in TIMELINE_SOURCES for source in sources):
+        raise HTTPException(status_code=400, detail=f"Unknown timeline source; expected {', '.join(TIMELINE_SOURCES)}")
+    
+    try:
+        return TimelineService.get_timeline(db, customer_id=customer_id, cursor=cursor, limit=limit, sources=sources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/matches/search", response_model=List[schemas.CustomerMatchCandidate])
+def search_customer_matches(
+    name: str = Query(..., min_length=1),
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    min_score: Optional[float] = Query(None, ge=0, le=1, description="Default: CUSTOMER_MATCH_REVIEW_THRESHOLD"),
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Find existing customers that look like the given name/email/phone, best match first"""
+    return CustomerMatchService.find_matches(db, name, email, phone, min_score=min_score, limit=limit)
+
+@router.get("/duplicates/scan", response_model=schemas.CustomerDuplicateScan)
+def scan_customer_duplicates(
+    min_score: Optional[float] = Query(None, ge=0, le=1, description="Default: CUSTOMER_MATCH_REVIEW_THRESHOLD"),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many groups"),
+    db: Session = Depends(get_db)
+):
+    """Scan all customers for likely duplicates and propose which ones to merge into which"""
+    return CustomerMatchService.find_duplicates(db, min_score=min_score, limit=limit)
+
+@router.post("/duplicates/merge", response_model=schemas.CustomerMergeResult)
+def merge_customers(
+    request: schemas.CustomerMergeRequest,
+    db: Session = Depends(get_db)
+):
+    """Merge duplicate customers into one: licenses and orders move to the surviving customer"""
+    try:
+        return CustomerMatchService.merge(db, request.SurvivorID, request.DuplicateIDs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/statistics/overview", response_model=schemas.CustomerStatistics)
 def get_customer_statistics(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get overview statistics for customers"""
+    # "New this month" is relative to today, so the date is part of the version
+    versions = TableVersionService.get_versions(db, CUSTOMER_STATISTICS_TABLES)
+    etag = make_etag("customers:statistics", versions, date.today())
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     return CustomerService.get_customer_statistics(db)
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from datetime import date
 
 from app.db.database import get_db
+from app.db.unit_of_work import UnitOfWorkRoute
+from app.core.http_cache import make_etag, conditional_response
+from app.core.pagination import set_total_count
+from app.core.single_flight import single_flight
 from app.services.deployment_service import DeploymentService
+from app.services.table_version_service import TableVersionService
 from app.schemas import schemas
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Tables whose changes invalidate each response shape (see TableVersionService)
+DEPLOYMENT_LIST_TABLES = ("deployment_records", "factory_engineers")
+DEPLOYMENT_STATISTICS_TABLES = ("deployment_records",)
 
 @router.post("/", response_model=schemas.DeploymentRecordInfo)
 def create_deployment_record(
@@ -24,10 +33,18 @@ def create_deployment_record(
 # IMPORTANT: This route must be defined before the /{deployment_id} route
 @router.get("/statistics", response_model=schemas.DeploymentStatistics)
 def get_deployment_statistics(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get statistics for deployments"""
-    return DeploymentService.get_deployment_statistics(db)
+    versions = TableVersionService.get_versions(db, DEPLOYMENT_STATISTICS_TABLES)
+    etag = make_etag("deployments:statistics", versions)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    return single_flight.run(DeploymentService.get_deployment_statistics, db, key=versions)
 
 @router.get("/{deployment_id}", response_model=schemas.DeploymentRecordInfo)
 def get_deployment_record(
@@ -43,6 +60,8 @@ def get_deployment_record(
 
 @router.get("/", response_model=List[schemas.DeploymentRecordInfo])
 def get_deployment_records(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     license_id: Optional[str] = None,
@@ -54,6 +73,21 @@ def get_deployment_records(
     db: Session = Depends(get_db)
 ):
     """Get list of deployment records with pagination and filtering"""
+    versions = TableVersionService.get_versions(db, DEPLOYMENT_LIST_TABLES)
+    etag = make_etag("deployments:list", versions, sorted(request.query_params.multi_items()))
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    set_total_count(response, DeploymentService.count_deployment_records(
+        db,
+        license_id=license_id,
+        deployment_type=deployment_type,
+        deployment_status=deployment_status,
+        deployed_by=deployed_by,
+        start_date=start_date,
+        end_date=end_date
+    ))
     return DeploymentService.get_deployment_records(
         db,
         skip=skip,
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from typing import List, Optional, Dict, Any
+from datetime import date
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
 from app.services.engineer_service import EngineerService
+from app.services.engineer_planner_service import EngineerPlannerService
 from app.schemas import schemas
 
 router = APIRouter()
@@ -134,3 +136,23 @@ def get_all_engineers_workload(
 ):
     """Get workload statistics for all engineers"""
     return EngineerService.get_engineer_workload(db)
+
+@router.get("/capacity/overview", response_model=schemas.CapacityOverview)
+def get_engineer_capacity(
+    start_date: Optional[date] = Query(None, description="First day of the window (default: today)"),
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db)
+):
+    """Busy days, utilization and next free day of every active engineer, from their planned and in-progress deployments"""
+    return EngineerPlannerService.get_capacity(db, start_date=start_date, days=days)
+
+@router.post("/assignments/propose", response_model=schemas.AssignmentProposal)
+def propose_engineer_assignments(
+    request: schemas.AssignmentProposalRequest,
+    db: Session = Depends(get_db)
+):
+    """Propose engineers for a batch of new deployments (expertise-constrained min-cost matching); nothing is saved"""
+    try:
+        return EngineerPlannerService.propose_assignments(db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+实体变更推送API
+通过SSE或WebSocket推送PO单、许可证、部署的变更事件，替代前端定时轮询
+"""
+
+import asyncio
+import json
+from datetime import timedelta
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.api import deps
+from app.core.config import settings
+from app.core.events import event_bus, Event
+from app.core.jwt import create_access_token
+from app.db.database import SessionLocal
+from app.models.user_models import User
+
+router = APIRouter()
+
+# 订阅票据的令牌类型，只能用于订阅事件，不能作为API的Bearer令牌
+STREAM_TICKET_TYPE = "event_stream_ticket"
+
+
+def _authenticate(token: Optional[str], token_type: str = STREAM_TICKET_TYPE) -> Optional[User]:
+    """校验令牌并返回用户；使用短生命周期的会话，避免长连接一直占用数据库连接"""
+    if not token:
+        return None
+    db = SessionLocal()
+    try:
+        user = deps.get_user_from_token(db, token, token_type)
+        if user is None or not user.is_active:
+            return None
+        return user
+    finally:
+        db.close()
+
+
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+
+def _format_sse(event: Event) -> str:
+    return f"id: {event.event_id}\nevent: {event.event_type}\ndata: {json.dumps(event.to_dict(), default=str)}\n\n"
+
+
+@router.post("/ticket", summary="获取事件订阅票据")
+def create_stream_ticket(current_user: User = Depends(deps.get_current_active_user)) -> Any:
+    """
+    签发短期有效的订阅票据，用于 GET /events/stream 和 /events/ws 的ticket查询参数
+
+    EventSource和浏览器WebSocket无法设置请求头，票据代替JWT出现在URL中（URL会进入访问日志和浏览器历史），
+    票据过期后重连会返回401，客户端应重新获取票据
+    """
+    expires_in = settings.EVENT_STREAM_TICKET_SECONDS
+    ticket = create_access_token(
+        data={"sub": current_user.username, "user_id": current_user.id},
+        expires_delta=timedelta(seconds=expires_in),
+        token_type=STREAM_TICKET_TYPE
+    )
+    return {"Ticket": ticket, "ExpiresIn": expires_in}
+
+
+@router.get("/stream", summary="订阅变更事件（SSE）")
+async def stream_events(
+    request: Request,
+    ticket: Optional[str] = Query(None, description="订阅票据（POST /events/ticket），EventSource无法设置请求头时使用"),
+    last_event_id: Optional[str] = Query(None, description="重新获取票据后续传时使用，浏览器自动重连时由Last-Event-ID请求头携带")
+):
+    """
+    以Server-Sent Events推送当前用户可见的变更事件
+
+    - 使用Authorization请求头中的JWT或ticket查询参数中的订阅票据认证
+    - 事件按角色过滤：销售只收到自己名下的许可证事件，工程师只收到自己参与的部署事件
+    - 断线重连时浏览器自动携带Last-Event-ID，服务端补发错过的事件；无法补发时推送resync事件
+    - 收到resync事件时客户端应重新拉取数据
+    """
+    bearer = _bearer_token(request.headers.get("authorization"))
+    user = _authenticate(bearer, "access_token") if bearer else _authenticate(ticket)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    subscriber = event_bus.subscribe(user, last_event_id=request.headers.get("last-event-id") or last_event_id)
+
+    async def event_generator():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # 心跳，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    ticket: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Query(None)
+):
+    """以WebSocket推送变更事件，消息格式与SSE的data相同；使用订阅票据（POST /events/ticket）认证"""
+    user = _authenticate(ticket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscriber = event_bus.subscribe(user, last_event_id=last_event_id)
+
+    async def sender():
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "ping"})
+                continue
+            await websocket.send_text(json.dumps(event.to_dict(), default=str))
+
+    async def receiver():
+        # 客户端消息仅用于检测断开
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(sender()), asyncio.create_task(receiver())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        event_bus.unsubscribe(subscriber)
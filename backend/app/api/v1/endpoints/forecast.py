@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.db.database import get_db
+from app.models.user_models import User
+from app.services.forecast_service import ForecastService, MAX_HORIZON, GROUP_BY_OPTIONS
+from app.schemas import schemas
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.SalesForecast)
+def get_sales_forecast(
+    horizon: int = Query(12, ge=1, le=MAX_HORIZON, description="Number of months to forecast, starting with the current one"),
+    group_by: Optional[str] = Query(None, description=f"Break down by {' or '.join(GROUP_BY_OPTIONS)}"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_sales_rep)
+):
+    """
+    Get the monthly revenue forecast: weighted lead pipeline, projected renewals and the
+    trend extrapolated from purchase history. Only admins and sales reps can view it.
+
+    Cached until leads, licenses, purchase records or customers change.
+    """
+    try:
+        return ForecastService.get_forecast(db, horizon=horizon, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
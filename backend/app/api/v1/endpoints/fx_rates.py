@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from datetime import date
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.db.database import get_db
+from app.db.unit_of_work import UnitOfWorkRoute
+from app.models.user_models import User
+from app.services.fx_service import FxService
+from app.schemas import schemas
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+@router.get("/", response_model=List[schemas.FxRateInfo])
+def get_fx_rates(
+    currency: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = 0,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Get daily FX rates (units of the base currency per unit of the currency), newest first per currency
+    """
+    return FxService.get_rates(db, currency=currency, start_date=start_date, end_date=end_date, skip=skip, limit=limit)
+
+
+@router.get("/status", response_model=schemas.FxStatus)
+def get_fx_status(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Get the base currency, the known rate range per currency and the number of amounts that
+    could not be converted yet (currency without rates)
+    """
+    return FxService.get_status(db)
+
+
+@router.put("/", response_model=schemas.FxRateUpsertResult)
+def upsert_fx_rates(
+    request: schemas.FxRateUpsertRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Insert or update daily FX rates. Stored base-currency amounts of purchases, purchase orders
+    and leads dated on or after the earliest changed rate are recomputed in the same transaction.
+    """
+    try:
+        return FxService.upsert_rates(db, request.Rates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.db.database import get_db
+from app.models.user_models import User
+from app.services.bulk_import_service import BulkImportService
+from app.schemas import schemas
+
+# Plain router: the import commits once per batch, which UnitOfWorkRoute would defer to the end of the request
+router = APIRouter()
+
+@router.post("/{entity}", response_model=schemas.BulkImportResult)
+def bulk_import(
+    entity: str,
+    request: schemas.BulkImportRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Bulk import customers, licenses or purchases (entity) from a CSV/XLSX file under BULK_IMPORT_DIR.
+    Rows are validated, their customer/sales rep/reseller/license references resolved and inserted
+    batch by batch; rows already present are skipped, so an interrupted import can be re-run.
+    Failed and skipped rows are listed in the CSV report at ReportPath. DryRun writes nothing.
+    """
+    try:
+        return BulkImportService.run(
+            db, entity, request.Path, column_mapping=request.ColumnMapping,
+            dry_run=request.DryRun, encoding=request.Encoding
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
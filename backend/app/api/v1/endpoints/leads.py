@@ -1,14 +1,22 @@
 from typing import List, Optional, Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.pagination import set_total_count
+from app.core.single_flight import single_flight
 from app.models.user_models import User
 from app.schemas import lead_schemas
 from app.services import lead_service
+from app.services.lead_analytics_service import LeadAnalyticsService, AggregatesNotBuilt, DIMENSIONS
+from app.services.lead_import_service import LeadImportService
+from app.services.table_version_service import TableVersionService
 
 router = APIRouter()
 
+# 销售漏斗读取的数据表（见TableVersionService）
+LEAD_FUNNEL_TABLES = ("leads", "lead_statuses")
+
 
 # 商机来源管理
 @router.post("/sources/", response_model=lead_schemas.LeadSource, status_code=201, summary="创建商机来源")
@@ -146,6 +154,7 @@ def create_lead(
 @router.get("/", response_model=List[lead_schemas.Lead], summary="获取商机列表")
 def read_leads(
     *,
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
     skip: int = 0,
@@ -167,6 +176,14 @@ def read_leads(
     if current_user.role == "partner":
         partner_id = current_user.partner_id  # 合作伙伴只能看到自己的商机
     
+    set_total_count(response, lead_service.count_leads(
+        db,
+        status_id=status_id,
+        sales_rep_id=sales_rep_id,
+        partner_id=partner_id,
+        source_id=source_id,
+        search_term=search
+    ))
     return lead_service.get_leads(
         db=db, 
         skip=skip, 
@@ -189,7 +206,144 @@ def read_lead_funnel(
     获取销售漏斗数据，包括各阶段商机数量和金额。
     只有管理员和销售代表可以查看销售漏斗数据。
     """
-    return lead_service.get_lead_funnel_data(db=db)
+    # 多个看板同时刷新时，相同数据版本的并发请求只查询一次数据库
+    versions = TableVersionService.get_versions(db, LEAD_FUNNEL_TABLES)
+    try:
+        return single_flight.run(lead_service.get_lead_funnel_data, db, key=versions, role=current_user.role)
+    except AggregatesNotBuilt as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/analytics/funnel", response_model=lead_schemas.LeadFunnelAnalytics, summary="获取漏斗转化分析")
+def read_lead_funnel_analytics(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_sales_rep),
+    dimension: str = Query("all", description=f"分组维度：{'/'.join(DIMENSIONS)}"),
+    key: str = Query("", description="维度取值：销售ID、来源ID或月份(YYYY-MM)"),
+    target_status_id: Optional[int] = Query(None, description="计算整体转化率的目标阶段（如已成交）")
+):
+    """
+    获取各阶段的当前数量、到达数量、阶段转化率和停留时长（中位数/平均值）。
+    数据来自状态流转的增量聚合，查询耗时与商机总数无关。
+    """
+    try:
+        return LeadAnalyticsService.get_funnel(db, dimension=dimension, dimension_key=key, target_status_id=target_status_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AggregatesNotBuilt as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/analytics/cohorts", response_model=List[lead_schemas.LeadCohortFunnel], summary="获取按创建月份的分批漏斗")
+def read_lead_cohorts(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_sales_rep),
+    start_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    end_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$")
+):
+    """
+    按商机创建月份分批，统计每批商机到达各阶段的数量与比例。
+    """
+    try:
+        return LeadAnalyticsService.get_cohorts(db, start_month=start_month, end_month=end_month)
+    except AggregatesNotBuilt as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/analytics/rebuild", response_model=Dict[str, int], summary="重建漏斗分析聚合")
+def rebuild_lead_analytics(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    根据状态流转日志和现有商机重新计算全部聚合。
+    只有管理员可以执行。
+    """
+    backfilled = LeadAnalyticsService.backfill_transitions(db)
+    rows = LeadAnalyticsService.rebuild(db)
+    return {"backfilled_leads": backfilled, "aggregate_rows": rows}
+
+
+# 商机导入
+@router.post("/imports", response_model=lead_schemas.LeadImportJob, status_code=201, summary="创建商机导入任务")
+def create_lead_import(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user),
+    import_in: lead_schemas.LeadImportCreate
+):
+    """
+    从服务器LEAD_IMPORT_DIR目录下的mbox文件、.eml文件目录或CSV/XLSX文件导入商机。
+    按合作伙伴邮箱映射识别合作伙伴、按邮箱或姓名识别销售代表，与已有商机（联系人邮箱，或公司+联系人）重复的记录跳过。
+    max_records大于0时立即处理这么多封邮件/行，其余通过 POST /leads/imports/{job_id}/run 或 import_leads.py 脚本继续。
+    只有管理员可以执行。
+    """
+    try:
+        job = LeadImportService.create_job(
+            db,
+            path=import_in.path,
+            source_type=import_in.source_type,
+            status_id=import_in.status_id,
+            source_id=import_in.source_id,
+            sales_rep_id=import_in.sales_rep_id,
+            currency=import_in.currency,
+            encoding=import_in.encoding,
+            created_by=current_user.username
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if import_in.max_records:
+        job = LeadImportService.run(db, job.job_id, max_records=import_in.max_records)
+    return LeadImportService.describe(job)
+
+
+@router.get("/imports", response_model=List[lead_schemas.LeadImportJob], summary="获取商机导入任务列表")
+def read_lead_imports(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user),
+    skip: int = 0,
+    limit: int = 100
+):
+    """
+    获取商机导入任务及其进度，最新的在前。
+    """
+    return [LeadImportService.describe(job) for job in LeadImportService.get_jobs(db, skip=skip, limit=limit)]
+
+
+@router.get("/imports/{job_id}", response_model=lead_schemas.LeadImportJob, summary="获取商机导入任务进度")
+def read_lead_import(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user),
+    job_id: int = Path(..., title="导入任务ID")
+):
+    """
+    获取导入任务的状态、断点和计数（已读取、已导入、重复、跳过）。
+    """
+    job = LeadImportService.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Lead import job not found")
+    return LeadImportService.describe(job)
+
+
+@router.post("/imports/{job_id}/run", response_model=lead_schemas.LeadImportJob, summary="继续商机导入任务")
+def run_lead_import(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user),
+    job_id: int = Path(..., title="导入任务ID"),
+    max_records: int = Query(10000, ge=1, description="本次最多处理的邮件/行数"),
+    force: bool = Query(False, description="接管状态为RUNNING的任务（执行它的进程已终止时使用）")
+):
+    """
+    从上次提交的断点继续处理导入任务；读完来源时任务状态为COMPLETED，否则为PAUSED。
+    只有管理员可以执行。
+    """
+    return LeadImportService.describe(LeadImportService.run(db, job_id, max_records=max_records, force=force))
 
 
 @router.get("/{lead_id}", response_model=lead_schemas.Lead, summary="获取特定商机")
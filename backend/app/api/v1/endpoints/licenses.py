@@ -1,13 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 
 from app.db.database import get_db
+from app.db.unit_of_work import UnitOfWorkRoute
+from app.core.http_cache import make_etag, conditional_response
+from app.core.pagination import set_total_count
+from app.core.single_flight import single_flight
 from app.services.license_service import LicenseService
+from app.services.table_version_service import TableVersionService
+from app.services.timeline_service import TimelineService, TIMELINE_SOURCES
 from app.schemas import schemas
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Plain router: batch renewal commits once per chunk, which UnitOfWorkRoute would defer to the end of the request
+batch_router = APIRouter()
+
+# Tables whose changes invalidate each response shape (see TableVersionService)
+LICENSE_LIST_TABLES = ("licenses",)
+LICENSE_DETAIL_TABLES = ("customers", "sales_reps", "resellers", "purchase_records", "deployment_records", "factory_engineers")
+
+# Upper bound on licenses per batch renewal request
+MAX_BATCH_RENEWALS = 5000
 
 @router.post("/create_license", response_model=schemas.LicenseIdResponse)
 def generate_license_id(license_data: dict = None):
@@ -58,10 +74,24 @@ def create_license(
 
 @router.get("/{license_id}", response_model=schemas.LicenseDetailedInfo)
 def get_license(
+    request: Request,
+    response: Response,
     license_id: str = Path(..., description="The License ID"),
     db: Session = Depends(get_db)
 ):
     """Get detailed information about a specific license"""
+    stamp = LicenseService.get_license_updated_at(db, license_id)
+    if not stamp:
+        raise HTTPException(status_code=404, detail="License not found")
+    
+    versions = TableVersionService.get_versions(db, LICENSE_DETAIL_TABLES)
+    etag = make_etag("license", stamp.license_id, stamp.updated_at, versions)
+    # No Last-Modified: the response includes purchases, deployments and related records whose changes
+    # don't move license.updated_at, so If-Modified-Since alone would validate stale copies
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     license = LicenseService.get_license(db, license_id)
     if not license:
         raise HTTPException(status_code=404, detail="License not found")
@@ -69,6 +99,8 @@ def get_license(
 
 @router.get("/", response_model=List[schemas.LicenseInfo])
 def get_licenses(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     customer_id: Optional[int] = None,
@@ -79,6 +111,20 @@ def get_licenses(
     db: Session = Depends(get_db)
 ):
     """Get list of licenses with pagination and filtering"""
+    versions = TableVersionService.get_versions(db, LICENSE_LIST_TABLES)
+    etag = make_etag("licenses:list", versions, sorted(request.query_params.multi_items()))
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    set_total_count(response, LicenseService.count_licenses(
+        db,
+        customer_id=customer_id,
+        status=status,
+        license_type=license_type,
+        expiring_before=expiring_before,
+        expiring_after=expiring_after
+    ))
     return LicenseService.get_licenses(
         db,
         skip=skip,
@@ -128,6 +174,38 @@ def renew_license(
         raise HTTPException(status_code=404, detail="License not found")
     return updated_license
 
+@batch_router.post("/renewals/batch", response_model=schemas.LicenseBatchRenewalResponse)
+def batch_renew_licenses(
+    renewal_request: schemas.LicenseBatchRenewalRequest,
+    db: Session = Depends(get_db)
+):
+    """Renew or expand many licenses in one call and return the per-license diff"""
+    if not renewal_request.Items:
+        raise HTTPException(status_code=400, detail="Items must not be empty")
+    if len(renewal_request.Items) > MAX_BATCH_RENEWALS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_RENEWALS} licenses per request")
+
+    return LicenseService.batch_renew_licenses(db, renewal_request)
+
+@router.get("/{license_id}/timeline", response_model=schemas.TimelinePage)
+def get_license_timeline(
+    license_id: str = Path(..., description="The License ID"),
+    cursor: Optional[str] = Query(None, description="NextCursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    sources: Optional[List[str]] = Query(None, description="Limit to changes, purchases, deployments and/or activations"),
+    db: Session = Depends(get_db)
+):
+    """Get everything that happened to a license, newest first"""
+    if not LicenseService.get_license_updated_at(db, license_id):
+        raise HTTPException(status_code=404, detail="License not found")
+    if sources and any(source not in TIMELINE_SOURCES for source in sources):
+        raise HTTPException(status_code=400, detail=f"Unknown timeline source; expected {', '.join(TIMELINE_SOURCES)}")
+    
+    try:
+        return TimelineService.get_timeline(db, license_id=license_id, cursor=cursor, limit=limit, sources=sources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/{license_id}/usage", response_model=schemas.LicenseInfo)
 def update_usage(
     license_id: str = Path(..., description="The License ID"),
@@ -146,16 +224,35 @@ def update_usage(
 
 @router.get("/expiring/soon", response_model=List[schemas.LicenseInfo])
 def get_expiring_licenses(
+    request: Request,
+    response: Response,
     days: int = Query(30, ge=1, le=365),
     limit: int = Query(10, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
     """Get licenses that will expire within the specified number of days"""
+    # The expiry window is relative to today, so the date is part of the version
+    versions = TableVersionService.get_versions(db, LICENSE_LIST_TABLES)
+    etag = make_etag("licenses:expiring", versions, date.today(), days, limit)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     return LicenseService.get_licenses_by_expiry(db, days, limit)
 
 @router.get("/statistics/overview", response_model=schemas.LicenseStatistics)
 def get_license_statistics(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Get overview statistics for licenses"""
-    return LicenseService.get_licenses_statistics(db)
+    # Monthly buckets are relative to today, so the date is part of the version
+    versions = TableVersionService.get_versions(db, LICENSE_LIST_TABLES)
+    etag = make_etag("licenses:statistics", versions, date.today())
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    # Dashboards refreshing together share one computation of the same versions and day
+    return single_flight.run(LicenseService.get_licenses_statistics, db, key=(versions, date.today()))
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from app.api import deps
+from app.core.config import settings
+from app.core.single_flight import single_flight
+from app.db.unit_of_work import commit_stats
+from app.models.user_models import User
+
+router = APIRouter()
+
+@router.get("/commits")
+def get_commit_report(
+    current_user: User = Depends(deps.get_current_admin_user)
+) -> Dict[str, Any]:
+    """
+    Commits per request for every route using the request-scoped unit of work, since startup
+    or the last reset.
+
+    `commits_per_request` is what the database saw; `commits_per_request_without_uow` counts the
+    commit() calls made by services, i.e. what each request cost before the unit of work.
+    """
+    return {
+        "unit_of_work_enabled": settings.UNIT_OF_WORK_ENABLED,
+        "routes": commit_stats.report(),
+    }
+
+@router.delete("/commits", status_code=204)
+def reset_commit_report(
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """Reset the commit counters"""
+    commit_stats.reset()
+
+@router.get("/single-flight")
+def get_single_flight_report(
+    current_user: User = Depends(deps.get_current_admin_user)
+) -> Dict[str, Any]:
+    """
+    Coalescing of identical concurrent statistics reads per function, since startup or the last reset.
+
+    `calls` requests asked for a result and `executions` actually queried the database; `coalesced`
+    requests shared a running execution instead (`max_waiters` at once). `wait_timeouts` gave up
+    waiting and executed themselves.
+    """
+    return {
+        "single_flight_enabled": settings.SINGLE_FLIGHT_ENABLED,
+        **single_flight.report(),
+    }
+
+@router.delete("/single-flight", status_code=204)
+def reset_single_flight_report(
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """Reset the single-flight counters"""
+    single_flight.reset()
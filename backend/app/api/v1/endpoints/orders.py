@@ -7,19 +7,26 @@
 """
 
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body, Request, Response
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
 from app.api import deps
 from app.api import deps_partner
+from app.api.idempotency import IdempotentRoute
+from app.core.http_cache import make_etag, conditional_response
 from app.models.user_models import User
 from app.models.partner_models import Partner
 from app.models.order_models import PurchaseOrder
 from app.services.order_service import OrderService
+from app.services.table_version_service import TableVersionService
 from app.schemas import order_schemas
 
-router = APIRouter()
+# 合作商系统超时重试时携带Idempotency-Key，重复提交直接返回首次结果（见app/api/idempotency.py）
+router = APIRouter(route_class=IdempotentRoute)
+
+# 影响订单列表响应的数据表（见TableVersionService）
+ORDER_LIST_TABLES = ("purchase_orders",)
 
 @router.post("/create", response_model=order_schemas.PurchaseOrderInfo)
 def create_order(
@@ -34,6 +41,9 @@ def create_order(
     
     身份验证：
     - 需要在请求头中提供X-Partner-UUID
+    
+    幂等：
+    - 可在请求头中提供Idempotency-Key，超时重试时使用同一个Key，不会重复创建订单，返回首次创建的结果
     """
     # 添加合作商信息到订单中
     source_details = order_data.source_details or {}
@@ -66,12 +76,25 @@ def create_manual_order(
 
 @router.get("/{order_id}", response_model=order_schemas.PurchaseOrderInfo)
 def get_order(
+    request: Request,
+    response: Response,
     order_id: int = Path(..., description="订单ID"),
     db: Session = Depends(get_db)
 ):
     """
     获取订单详情
+    
+    支持If-None-Match/If-Modified-Since条件请求，未变化时返回304
     """
+    stamp = OrderService.get_order_updated_at(db, order_id)
+    if not stamp:
+        raise HTTPException(status_code=404, detail=f"订单ID '{order_id}' 不存在")
+    
+    etag = make_etag("purchase_order", stamp.order_id, stamp.updated_at)
+    not_modified = conditional_response(request, response, etag, last_modified=stamp.updated_at)
+    if not_modified:
+        return not_modified
+    
     return OrderService.get_order(db, order_id)
 
 @router.get("/by-po-number/{po_number}", response_model=order_schemas.PurchaseOrderInfo)
@@ -86,6 +109,8 @@ def get_order_by_po_number(
 
 @router.get("/", response_model=order_schemas.PurchaseOrderList)
 def get_orders(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     po_number: Optional[str] = Query(None, description="采购订单号"),
@@ -97,7 +122,15 @@ def get_orders(
 ):
     """
     获取订单列表，支持分页和过滤
+    
+    支持If-None-Match条件请求，订单表未变化时返回304
     """
+    versions = TableVersionService.get_versions(db, ORDER_LIST_TABLES)
+    etag = make_etag("purchase_orders:list", versions, sorted(request.query_params.multi_items()))
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     orders = OrderService.get_orders(
         db, skip, limit, po_number, customer_id, customer_name, 
         order_status.value if order_status else None,
@@ -4,6 +4,7 @@ from app.db.database import get_db
 from app.models.partner_models import Partner
 from app.core.security import get_password_hash
 from app.schemas.schemas import PartnerInfo
+from app.services.table_version_service import TableVersionService
 
 router = APIRouter()
 
@@ -47,6 +48,7 @@ def create_test_partner(db: Session = Depends(get_db)):
     )
     
     db.add(new_partner)
+    TableVersionService.bump(db, "partners")
     db.commit()
     db.refresh(new_partner)
     
@@ -137,12 +137,32 @@ def create_email_mapping(
     """
     创建新的邮箱映射
     
+    email_address可以是完整邮箱地址，也可以是@example.com（整个域名）或@*.example.com（任意子域名）
+    
     权限：
     - 仅管理员可以创建
     """
     return PartnerEmailMappingService.create_email_mapping(db, mapping_data)
 
 
+@router.post("/email-mappings/resolve", response_model=partner_identity_schemas.EmailResolveResponse)
+def resolve_emails(
+    request: partner_identity_schemas.EmailResolveRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    批量识别邮箱地址对应的合作商身份（如来信地址、采购订单联系人邮箱）
+    
+    匹配顺序：完整邮箱地址 > 整个域名（@example.com）> 最具体的子域名通配（@*.example.com），
+    仅匹配启用的身份和合作商；结果顺序与请求一致
+    
+    权限：
+    - 仅管理员可以查看
+    """
+    return PartnerEmailMappingService.resolve_emails(db, request.emails)
+
+
 @router.get("/email-mappings/{mapping_id}", response_model=partner_identity_schemas.PartnerEmailMappingInfo)
 def get_email_mapping(
     mapping_id: int = Path(..., description="映射ID"),
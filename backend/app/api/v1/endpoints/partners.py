@@ -1,28 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.services.partner_service import PartnerService, OrderService
 from app.schemas import partner_schemas as schemas
 from app.db.database import get_db
+from app.api.idempotency import IdempotentUnitOfWorkRoute
+from app.core.pagination import set_total_count
 from app.api import deps
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentUnitOfWorkRoute)
 
 
 @router.get("/", response_model=List[schemas.PartnerInfo])
 async def get_all_partners(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: deps.TokenData = Depends(deps.get_current_field_staff),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
 ):
     """获取所有合作伙伴列表
     
     根据运营需求，允许销售代表和工程师也可以查看合作伙伴信息
     """
     partners = PartnerService.get_all_partners(db, skip=skip, limit=limit)
+    set_total_count(response, PartnerService.count_partners(db))
     return [PartnerService._partner_to_schema(partner) for partner in partners]
 
 
@@ -90,13 +94,16 @@ def create_order(
 
 @router.get("/orders", response_model=List[schemas.OrderInfo])
 def get_partner_orders(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
     db: Session = Depends(get_db),
     current_partner: deps.TokenData = Depends(deps.get_current_partner)
 ):
     """Get partner's orders"""
-    return OrderService.get_orders_by_partner(db, current_partner.partner_id, skip, limit)
+    set_total_count(response, OrderService.count_orders(db, status=status, partner_id=current_partner.partner_id))
+    return OrderService.get_orders_by_partner(db, current_partner.partner_id, skip, limit, status=status)
 
 
 @router.get("/orders/{order_id}", response_model=schemas.OrderInfo)
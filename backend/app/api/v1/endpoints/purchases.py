@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from datetime import date
 
 from app.db.database import get_db
+from app.db.unit_of_work import UnitOfWorkRoute
+from app.core.pagination import set_total_count
 from app.services.purchase_service import PurchaseService
 from app.schemas import schemas
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 @router.post("/", response_model=schemas.PurchaseRecordInfo)
 def create_purchase_record(
@@ -34,6 +36,7 @@ def get_purchase_record(
 
 @router.get("/", response_model=List[schemas.PurchaseRecordInfo])
 def get_purchase_records(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     license_id: Optional[str] = None,
@@ -44,6 +47,14 @@ def get_purchase_records(
     db: Session = Depends(get_db)
 ):
     """Get list of purchase records with pagination and filtering"""
+    set_total_count(response, PurchaseService.count_purchase_records(
+        db,
+        license_id=license_id,
+        purchase_type=purchase_type,
+        payment_status=payment_status,
+        start_date=start_date,
+        end_date=end_date
+    ))
     return PurchaseService.get_purchase_records(
         db,
         skip=skip,
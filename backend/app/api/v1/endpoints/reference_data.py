@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.db.database import get_db
+from app.core.http_cache import make_etag, conditional_response
+from app.models.user_models import User
+from app.services.reference_data_service import ReferenceDataService
+from app.schemas import schemas
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.ReferenceDataResponse)
+def get_reference_data(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Get all lookup tables (lead statuses/sources, sales reps, resellers, engineers) and enums.
+
+    Served from the in-process reference-data cache; the ETag is derived from the table
+    versions, so a revalidation is answered with 304 without touching the lookup tables.
+    """
+    versions = ReferenceDataService.get_versions(db)
+    etag = make_etag("reference-data", versions)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    return ReferenceDataService.get_reference_data(db)
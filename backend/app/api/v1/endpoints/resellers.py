@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
+from datetime import date
 
 from app.db.database import get_db
+from app.services.sales_performance_service import COMPARE_OPTIONS
 from app.services.reseller_service import ResellerService
 from app.schemas import schemas
 
@@ -90,6 +92,8 @@ def get_reseller_licenses(
 @router.get("/{reseller_id}/performance", response_model=Dict[str, Any])
 def get_reseller_performance(
     reseller_id: int = Path(..., description="The Reseller ID"),
+    start_date: Optional[date] = Query(None, description="Defaults to January 1st of the current year"),
+    end_date: Optional[date] = Query(None, description="Defaults to today"),
     db: Session = Depends(get_db)
 ):
     """Get sales performance metrics for a specific reseller"""
@@ -98,11 +102,20 @@ def get_reseller_performance(
     if not reseller:
         raise HTTPException(status_code=404, detail="Reseller not found")
     
-    return ResellerService.get_reseller_performance(db, reseller_id)
+    try:
+        return ResellerService.get_reseller_performance(db, reseller_id, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/performance/overview", response_model=Dict[str, Any])
 def get_all_resellers_performance(
+    start_date: Optional[date] = Query(None, description="Defaults to January 1st of the current year"),
+    end_date: Optional[date] = Query(None, description="Defaults to today"),
+    compare: str = Query("previous_period", description=f"Comparison period: {', '.join(COMPARE_OPTIONS)}"),
     db: Session = Depends(get_db)
 ):
-    """Get performance metrics for all resellers"""
-    return ResellerService.get_reseller_performance(db)
+    """Get performance metrics for all resellers, ranked by revenue, with the comparison period"""
+    try:
+        return ResellerService.get_reseller_performance(db, start_date=start_date, end_date=end_date, compare=compare)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
+from datetime import date
 
 from app.db.database import get_db
+from app.services.sales_performance_service import COMPARE_OPTIONS
 from app.services.sales_rep_service import SalesRepService
 from app.schemas import schemas
 
@@ -114,6 +116,8 @@ def get_sales_rep_licenses(
 @router.get("/{sales_rep_id}/performance", response_model=Dict[str, Any])
 def get_sales_rep_performance(
     sales_rep_id: int = Path(..., description="The Sales Rep ID"),
+    start_date: Optional[date] = Query(None, description="Defaults to January 1st of the current year"),
+    end_date: Optional[date] = Query(None, description="Defaults to today"),
     db: Session = Depends(get_db)
 ):
     """Get sales performance metrics for a specific sales representative"""
@@ -122,11 +126,20 @@ def get_sales_rep_performance(
     if not sales_rep:
         raise HTTPException(status_code=404, detail="Sales representative not found")
     
-    return SalesRepService.get_sales_performance(db, sales_rep_id)
+    try:
+        return SalesRepService.get_sales_performance(db, sales_rep_id, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/performance/overview", response_model=Dict[str, Any])
 def get_all_sales_reps_performance(
+    start_date: Optional[date] = Query(None, description="Defaults to January 1st of the current year"),
+    end_date: Optional[date] = Query(None, description="Defaults to today"),
+    compare: str = Query("previous_period", description=f"Comparison period: {', '.join(COMPARE_OPTIONS)}"),
     db: Session = Depends(get_db)
 ):
-    """Get performance metrics for all sales representatives"""
-    return SalesRepService.get_sales_performance(db)
+    """Get performance metrics for all sales representatives, ranked by revenue, with the comparison period"""
+    try:
+        return SalesRepService.get_sales_performance(db, start_date=start_date, end_date=end_date, compare=compare)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
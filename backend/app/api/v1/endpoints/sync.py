@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.db.database import get_db
+from app.models.user_models import User
+from app.services.sync_service import SyncService, SYNC_ENTITIES
+from app.schemas import sync_schemas
+
+router = APIRouter()
+
+@router.get("/", response_model=sync_schemas.SyncResponse)
+def get_changes(
+    since: Optional[str] = Query(None, description="Token from the previous sync; omit for a full snapshot"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum rows per entity in this response"),
+    entities: Optional[List[str]] = Query(None, description="Entities to sync (default: all)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Get licenses, customers, purchase orders and leads changed since the `since` token.
+
+    Apply `upserts` then `deletes` to the local cache and keep `next_token` for the next call.
+    Changes written shortly before the previous call can be sent again, so apply them idempotently.
+    When `has_more` is true, call again immediately with `next_token`.
+    """
+    if entities:
+        unknown = [entity for entity in entities if entity not in SYNC_ENTITIES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sync entities: {', '.join(unknown)}")
+
+    try:
+        return SyncService.get_changes(db, since=since, limit=limit, entities=entities)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -26,6 +26,83 @@ class Settings(BaseSettings):
             return v
         return f"mysql+pymysql://{values.get('MYSQL_USER')}:{values.get('MYSQL_PASSWORD')}@{values.get('MYSQL_HOST')}:{values.get('MYSQL_PORT')}/{values.get('MYSQL_DB')}"
     
+    # Event push settings (see app/core/events.py); "local" is the only broker, so events only reach
+    # subscribers connected to the worker that published them: run a single worker when push is used
+    EVENT_BROKER: str = os.getenv("EVENT_BROKER", "local")
+    # Lifetime of the ticket from POST /events/ticket that authenticates the SSE/WebSocket URL
+    EVENT_STREAM_TICKET_SECONDS: int = int(os.getenv("EVENT_STREAM_TICKET_SECONDS", "60"))
+    EVENT_SUBSCRIBER_QUEUE_SIZE: int = 100
+    EVENT_HEARTBEAT_SECONDS: int = 15
+
+    # change_tracking retention (see app/services/change_tracking_service.py)
+    CHANGE_TRACKING_RETENTION_MONTHS: int = int(os.getenv("CHANGE_TRACKING_RETENTION_MONTHS", "12"))
+    CHANGE_TRACKING_ARCHIVE_DIR: str = os.getenv("CHANGE_TRACKING_ARCHIVE_DIR", "archive/change_tracking")
+
+    # One commit per request for routers using UnitOfWorkRoute (see app/db/unit_of_work.py)
+    UNIT_OF_WORK_ENABLED: bool = os.getenv("UNIT_OF_WORK_ENABLED", "true").lower() != "false"
+
+    # Seconds between table_versions checks of the reference-data cache (see app/services/reference_data_service.py);
+    # writes in this worker invalidate immediately, this bounds staleness for writes made by other workers
+    REFERENCE_DATA_CHECK_INTERVAL: float = float(os.getenv("REFERENCE_DATA_CHECK_INTERVAL", "5"))
+
+    # Multi-currency amounts (see app/services/fx_service.py): amounts are also stored converted to
+    # BASE_CURRENCY at write time; rates are re-read from fx_rates at most every FX_RATE_CHECK_INTERVAL seconds
+    BASE_CURRENCY: str = os.getenv("BASE_CURRENCY", "CNY")
+    FX_RATE_CHECK_INTERVAL: float = float(os.getenv("FX_RATE_CHECK_INTERVAL", "5"))
+
+    # List total counts (see app/services/count_service.py): exact counts are cached per filter until the
+    # tables' versions move, at most COUNT_CACHE_TTL seconds; unfiltered counts of tables the database
+    # estimates above COUNT_ESTIMATE_THRESHOLD rows use the estimate (0 = always exact)
+    COUNT_CACHE_TTL: float = float(os.getenv("COUNT_CACHE_TTL", "60"))
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+    COUNT_ESTIMATE_THRESHOLD: int = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "1000000"))
+
+    # Customer matching (see app/services/customer_match_service.py): PO customers scoring at least
+    # CUSTOMER_MATCH_AUTO_THRESHOLD against an existing customer with the same written name, email domain or phone
+    # are attached to it instead of creating a new one; pairs from CUSTOMER_MATCH_REVIEW_THRESHOLD up are proposed
+    # as duplicates. Blocking keys shared by more than CUSTOMER_MATCH_MAX_BLOCK customers are too common to narrow
+    # the search and are skipped
+    CUSTOMER_MATCH_AUTO_THRESHOLD: float = float(os.getenv("CUSTOMER_MATCH_AUTO_THRESHOLD", "0.92"))
+    CUSTOMER_MATCH_REVIEW_THRESHOLD: float = float(os.getenv("CUSTOMER_MATCH_REVIEW_THRESHOLD", "0.75"))
+    CUSTOMER_MATCH_MAX_BLOCK: int = 200
+
+    # Partner email routing (see app/services/partner_identity_service.py): the in-memory index of email mappings
+    # is re-checked against table_versions at most every PARTNER_EMAIL_ROUTING_CHECK_INTERVAL seconds;
+    # a batch resolve accepts at most PARTNER_EMAIL_RESOLVE_MAX_BATCH addresses
+    PARTNER_EMAIL_ROUTING_CHECK_INTERVAL: float = float(os.getenv("PARTNER_EMAIL_ROUTING_CHECK_INTERVAL", "5"))
+    PARTNER_EMAIL_RESOLVE_MAX_BATCH: int = 10000
+
+    # Lead import (see app/services/lead_import_service.py): sources are read from files under LEAD_IMPORT_DIR and
+    # inserted LEAD_IMPORT_CHUNK_SIZE leads per transaction, each committing the job's resume checkpoint
+    LEAD_IMPORT_DIR: str = os.getenv("LEAD_IMPORT_DIR", "imports/leads")
+    LEAD_IMPORT_CHUNK_SIZE: int = int(os.getenv("LEAD_IMPORT_CHUNK_SIZE", "500"))
+
+    # Comma-separated IDs of the lead statuses that close a lead (seeded as won, lost and cancelled); the revenue
+    # forecast pipeline (see app/services/forecast_service.py) only counts leads in the other, open stages
+    LEAD_CLOSED_STATUS_IDS: str = os.getenv("LEAD_CLOSED_STATUS_IDS", "4,5,6")
+
+    # Bulk import of customers/licenses/purchase records (see app/services/bulk_import_service.py): CSV/XLSX files
+    # under BULK_IMPORT_DIR are validated and inserted BULK_IMPORT_BATCH_SIZE rows per transaction; error reports
+    # are written to BULK_IMPORT_DIR/reports
+    BULK_IMPORT_DIR: str = os.getenv("BULK_IMPORT_DIR", "imports/bulk")
+    BULK_IMPORT_BATCH_SIZE: int = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "2000"))
+
+    # Idempotency-Key support for partner-facing writes (see app/services/idempotency_service.py): responses are
+    # replayed for IDEMPOTENCY_TTL_HOURS; the most recent IDEMPOTENCY_CACHE_MAX_ENTRIES are also kept in memory.
+    # A retry of a request still in flight waits up to IDEMPOTENCY_WAIT_SECONDS for its result. A running request
+    # refreshes its key's heartbeat; a key not refreshed for IDEMPOTENCY_LOCK_TIMEOUT seconds belongs to a crashed
+    # worker and is taken over
+    IDEMPOTENCY_TTL_HOURS: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    IDEMPOTENCY_CACHE_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 64 * 1024
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    IDEMPOTENCY_LOCK_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+
+    # Single-flight coalescing of identical statistics reads (see app/core/single_flight.py): requests joining a
+    # running identical computation wait up to SINGLE_FLIGHT_WAIT_SECONDS for its result, then execute it themselves
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() != "false"
+    SINGLE_FLIGHT_WAIT_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "30"))
+
     # CORS settings
     BACKEND_CORS_ORIGINS: list[str] = [
         "http://localhost",
@@ -0,0 +1,259 @@
+"""
+实体变更事件总线
+服务层在写入提交后发布事件，经Broker分发到事件总线，
+再推送给本进程内的SSE/WebSocket订阅者，替代前端的定时轮询
+
+目前只提供进程内的LocalBroker：事件只能送达发布它的worker上的订阅者，
+启用推送时后端须以单worker运行（见DEVELOPER_GUIDE.md的部署说明）
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from contextvars import ContextVar, Token
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 各实体事件可见的角色
+EVENT_ROLES = {
+    "purchase_order": {"admin", "commercial_ops"},
+    "license": {"admin", "commercial_ops", "sales_rep"},
+    "deployment": {"admin", "commercial_ops", "engineer"},
+}
+
+# 订阅者队列溢出或Last-Event-ID无法续传时下发，客户端收到后应全量刷新（或调用 GET /sync）
+RESYNC_EVENT_TYPE = "resync"
+
+
+class Event:
+    """一条实体变更事件，event_id由接收端的事件总线分配"""
+
+    __slots__ = ("event_type", "entity_id", "data", "timestamp", "event_id")
+
+    def __init__(
+        self,
+        event_type: str,
+        entity_id: Any = None,
+        data: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
+        event_id: Optional[str] = None
+    ):
+        self.event_type = event_type
+        self.entity_id = entity_id
+        self.data = data or {}
+        self.timestamp = timestamp or datetime.utcnow().isoformat()
+        self.event_id = event_id
+
+    @property
+    def entity(self) -> str:
+        return self.event_type.split(".", 1)[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.event_id,
+            "type": self.event_type,
+            "entity_id": self.entity_id,
+            "data": self.data,
+            "timestamp": self.timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "Event":
+        return cls(
+            event_type=payload["type"],
+            entity_id=payload.get("entity_id"),
+            data=payload.get("data"),
+            timestamp=payload.get("timestamp"),
+        )
+
+
+class EventBroker(ABC):
+    """
+    事件总线之间的事件传输接口
+    start()注册事件总线的投递回调，publish()须把事件送达所有已注册的回调（包括发布者自己）
+    """
+
+    @abstractmethod
+    def start(self, deliver: Callable[[Event], None]) -> None:
+        ...
+
+    @abstractmethod
+    def publish(self, event: Event) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBroker(EventBroker):
+    """
+    进程内Broker：直接投递给所有注册的事件总线
+    只能送达同一进程内的事件总线，不支持多worker部署；
+    多个EventBus共享一个LocalBroker可在测试中模拟多worker，跨进程部署需另行实现EventBroker并注册到BROKERS
+    """
+
+    def __init__(self):
+        self._callbacks: List[Callable[[Event], None]] = []
+        self._lock = threading.Lock()
+
+    def start(self, deliver: Callable[[Event], None]) -> None:
+        with self._lock:
+            self._callbacks.append(deliver)
+
+    def publish(self, event: Event) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for deliver in callbacks:
+            # 每个worker拿到独立副本，event_id由各自的总线分配
+            deliver(Event.from_dict(event.to_dict()))
+
+    def close(self) -> None:
+        with self._lock:
+            self._callbacks.clear()
+
+
+BROKERS = {
+    "local": LocalBroker,
+}
+
+
+class Subscriber:
+    """一个SSE/WebSocket连接，持有有界队列；消费过慢时丢弃积压并下发resync"""
+
+    def __init__(self, user: Any, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.role = user.role
+        self.sales_rep_id = user.sales_rep_id
+        self.engineer_id = user.engineer_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflows = 0
+
+    def accepts(self, event: Event) -> bool:
+        if event.event_type == RESYNC_EVENT_TYPE:
+            return True
+        if self.role not in EVENT_ROLES.get(event.entity, ()):
+            return False
+        # 销售和工程师只接收与自己相关的事件
+        if self.role == "sales_rep":
+            return self.sales_rep_id is not None and event.data.get("sales_rep_id") == self.sales_rep_id
+        if self.role == "engineer":
+            return self.engineer_id is not None and self.engineer_id in event.data.get("engineer_ids", ())
+        return True
+
+    def offer(self, event: Event) -> None:
+        """在订阅者所在的事件循环线程中调用，永不阻塞发布方"""
+        if self.queue.full():
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event(RESYNC_EVENT_TYPE, data={"reason": "overflow"}, event_id=event.event_id))
+            return
+        self.queue.put_nowait(event)
+
+
+# 请求级工作单元（app/db/unit_of_work.py）提交前暂存的事件，提交成功后才发布
+_deferred_events: ContextVar[Optional[List[Tuple[str, Any, Optional[Dict[str, Any]]]]]] = ContextVar("deferred_events", default=None)
+
+
+class EventBus:
+    """本worker的事件总线：分配事件ID、保留近期事件供断线续传、扇出到订阅者"""
+
+    def __init__(self, broker: Optional[EventBroker] = None, max_queue: int = 100, history_size: int = 500):
+        self.instance_id = uuid.uuid4().hex[:8]
+        self.max_queue = max_queue
+        self._seq = itertools.count(1)
+        self._history: Deque[Event] = deque(maxlen=history_size)
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self.broker = broker or LocalBroker()
+        self.broker.start(self._dispatch)
+
+    def publish(self, event_type: str, entity_id: Any = None, data: Optional[Dict[str, Any]] = None) -> None:
+        """发布事件，应在数据库提交之后调用；推送失败只记录日志，不影响写入"""
+        deferred = _deferred_events.get()
+        if deferred is not None:
+            deferred.append((event_type, entity_id, data))
+            return
+        try:
+            self.broker.publish(Event(event_type, entity_id, data))
+        except Exception as e:
+            logger.error(f"Failed to publish event {event_type}: {str(e)}")
+
+    def defer_events(self) -> Token:
+        """当前请求内的publish改为暂存，直到publish_deferred/discard_deferred"""
+        return _deferred_events.set([])
+
+    def publish_deferred(self, token: Token) -> None:
+        """事务提交成功后发布暂存的事件"""
+        deferred = _deferred_events.get() or []
+        _deferred_events.reset(token)
+        for event_type, entity_id, data in deferred:
+            self.publish(event_type, entity_id, data)
+
+    def discard_deferred(self, token: Token) -> None:
+        """事务回滚时丢弃暂存的事件"""
+        _deferred_events.reset(token)
+
+    def _dispatch(self, event: Event) -> None:
+        # 可能在任意线程（同步端点的线程池、Broker线程）中调用
+        with self._lock:
+            event.event_id = f"{self.instance_id}-{next(self._seq)}"
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            if subscriber.accepts(event):
+                try:
+                    subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+                except RuntimeError:
+                    # 事件循环已关闭，连接即将被清理
+                    pass
+
+    def subscribe(self, user: Any, last_event_id: Optional[str] = None) -> Subscriber:
+        """注册订阅者（须在事件循环中调用），可按Last-Event-ID补发错过的事件"""
+        subscriber = Subscriber(user, asyncio.get_running_loop(), self.max_queue)
+
+        with self._lock:
+            self._subscribers.add(subscriber)
+            missed = self._events_after(last_event_id) if last_event_id else []
+
+        if missed is None:
+            subscriber.offer(Event(RESYNC_EVENT_TYPE, data={"reason": "history_unavailable"}))
+        else:
+            for event in missed:
+                if subscriber.accepts(event):
+                    subscriber.offer(event)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _events_after(self, last_event_id: str) -> Optional[List[Event]]:
+        """返回last_event_id之后的事件；ID来自其他worker或已滚出历史时返回None"""
+        instance_id, _, seq = last_event_id.partition("-")
+        if instance_id != self.instance_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if self._history and int(self._history[0].event_id.rsplit("-", 1)[1]) > seq + 1:
+            return None
+        return [event for event in self._history if int(event.event_id.rsplit("-", 1)[1]) > seq]
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_bus = EventBus(
+    broker=BROKERS[settings.EVENT_BROKER](),
+    max_queue=settings.EVENT_SUBSCRIBER_QUEUE_SIZE,
+)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP条件请求工具
+基于ETag/Last-Modified实现304协商缓存，避免轮询时重复下载未变化的数据
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    根据资源标识和版本信息生成弱ETag
+    
+    Args:
+        parts: 参与计算的各部分（主键、更新时间、表版本、查询参数等）
+        
+    Returns:
+        str: 形如 W/"<sha1>" 的ETag
+    """
+    raw = "|".join(
+        repr(sorted(part.items())) if isinstance(part, dict) else str(part)
+        for part in parts
+    )
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def _to_utc(value: datetime) -> datetime:
+    """
+    转换为UTC并去掉微秒（HTTP日期精度为秒）。数据库中的naive时间由datetime.now()写入，
+    按服务器本地时区解释（astimezone对naive时间即按本地时间处理）
+    """
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    判断客户端缓存是否仍然有效
+    
+    If-None-Match 优先；仅当其缺失时才使用 If-Modified-Since
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        client_tags = {_strip_weak(tag) for tag in if_none_match.split(",")}
+        return _strip_weak(etag) in client_tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is not None and if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _to_utc(last_modified) <= _to_utc(since)
+    
+    return False
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """
+    处理条件请求
+    
+    客户端缓存有效时返回304响应（调用方应直接返回它，跳过查询和序列化）；
+    否则把ETag等头部写入response并返回None
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache"
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_to_utc(last_modified), usegmt=True)
+    
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
@@ -11,7 +11,8 @@ SECRET_KEY = settings.SECRET_KEY
 
 def create_access_token(
     data: dict, 
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    token_type: str = "access_token"
 ) -> str:
     """
     创建JWT访问令牌
@@ -19,6 +20,7 @@ def create_access_token(
     Args:
         data: 要编码到JWT中的数据
         expires_delta: 可选的过期时间增量
+        token_type: 令牌类型，只能用于对应的用途（如SSE订阅票据）
         
     Returns:
         str: 编码的JWT访问令牌
@@ -37,7 +39,7 @@ def create_access_token(
     to_encode.update({
         "exp": expire,
         "iat": datetime.utcnow(),
-        "type": "access_token"
+        "type": token_type
     })
     
     # 编码并返回JWT
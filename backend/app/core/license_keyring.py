@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线激活码签名密钥环
+支持多把验证密钥同时有效：激活码内嵌密钥编号，验证时按编号O(1)选取密钥；
+轮换时新增密钥并切换签名密钥即可，旧激活码在旧密钥下线前保持有效
+
+环境变量：
+- LICENSE_SECRET_KEY: 编号0的原始密钥（轮换前签发的所有激活码都使用它）
+- LICENSE_SIGNING_KEYS: 其他密钥，格式为 "1:secret1,2:secret2"（编号1-255，密钥中不能含逗号）
+- LICENSE_ACTIVE_KEY_ID: 新激活码使用的密钥编号，默认0
+- LICENSE_RETIRED_KEY_IDS: 已下线、不再接受验证的密钥编号，如 "0"（确认重新签发完成后再下线）
+"""
+
+import os
+import hashlib
+import hmac
+from typing import Dict, Iterable, Optional, Tuple
+
+# v2激活码的MAC域分隔前缀，避免与v1签名混用
+V2_MAC_DOMAIN = b"dify-offline-v2"
+
+
+class LicenseKeyring:
+    """按密钥编号缓存预先完成密钥调度的HMAC上下文，每次签名/验证只需copy()"""
+
+    def __init__(self, keys: Dict[int, str], active_key_id: int = 0, retired_key_ids: Iterable[int] = ()):
+        for key_id in keys:
+            if not 0 <= key_id <= 255:
+                raise ValueError(f"密钥编号必须在0-255之间: {key_id}")
+        if active_key_id not in keys:
+            raise ValueError(f"签名密钥编号{active_key_id}未配置")
+        retired = set(retired_key_ids)
+        if active_key_id in retired:
+            raise ValueError(f"签名密钥编号{active_key_id}已下线")
+
+        self.active_key_id = active_key_id
+        self._v1_contexts = {}
+        self._v2_contexts = {}
+        for key_id, secret in keys.items():
+            if key_id in retired:
+                continue
+            raw = secret.encode('utf-8')
+            self._v1_contexts[key_id] = hmac.new(raw, digestmod=hashlib.sha256)
+            self._v2_contexts[key_id] = hmac.new(raw, V2_MAC_DOMAIN, hashlib.sha256)
+
+    @property
+    def key_ids(self) -> Tuple[int, ...]:
+        """当前接受验证的密钥编号"""
+        return tuple(sorted(self._v2_contexts))
+
+    def v1_mac(self, key_id: Optional[int] = None) -> Optional["hmac.HMAC"]:
+        """v1签名用的HMAC上下文副本；key_id为None时使用签名密钥，密钥未配置或已下线时返回None"""
+        context = self._v1_contexts.get(self.active_key_id if key_id is None else key_id)
+        return context.copy() if context else None
+
+    def v2_mac(self, key_id: Optional[int] = None) -> Optional["hmac.HMAC"]:
+        """v2签名用的HMAC上下文副本（已包含域分隔前缀）"""
+        context = self._v2_contexts.get(self.active_key_id if key_id is None else key_id)
+        return context.copy() if context else None
+
+
+def _parse_key_ids(value: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in value.replace(" ", "").split(",") if part)
+
+
+def load_keyring_from_env() -> LicenseKeyring:
+    keys = {0: os.environ.get("LICENSE_SECRET_KEY", "dify_license_secret_key_2025")}
+    for entry in os.environ.get("LICENSE_SIGNING_KEYS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key_id, _, secret = entry.partition(":")
+        if not secret:
+            raise ValueError(f"LICENSE_SIGNING_KEYS格式错误: {key_id}")
+        keys[int(key_id)] = secret
+
+    return LicenseKeyring(
+        keys,
+        active_key_id=int(os.environ.get("LICENSE_ACTIVE_KEY_ID", "0")),
+        retired_key_ids=_parse_key_ids(os.environ.get("LICENSE_RETIRED_KEY_IDS", "")),
+    )
+
+
+keyring = load_keyring_from_env()
@@ -9,15 +9,21 @@
 import os
 import time
 import json
-import hashlib
 import base64
 import hmac
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 from typing import Dict, Any, Optional, List, Tuple
 
-# 安全密钥，实际应用中应从环境变量或安全存储获取
-LICENSE_SECRET_KEY = os.environ.get("LICENSE_SECRET_KEY", "dify_license_secret_key_2025")
+from app.core.license_keyring import keyring
+
+# 新生成的离线激活码版本：2为紧凑二进制格式，1为旧的JSON格式（仅在客户端尚未升级时使用）
+OFFLINE_CODE_VERSION = int(os.environ.get("LICENSE_OFFLINE_CODE_VERSION", "2"))
+
+# v2格式常量
+_V2_VERSION = 2
+_V2_DATE_EPOCH = date(2000, 1, 1)     # 日期字段存储为距此的天数
+_V2_MAC_SIZE = 16                     # HMAC-SHA256截断为128位，离线暴力伪造仍不可行
 
 def generate_online_license(license_data: Dict[str, Any]) -> str:
     """
@@ -37,44 +43,161 @@ def generate_online_license(license_data: Dict[str, Any]) -> str:
     # 在实际系统中，这里会包含更多验证和许可证服务器交互
     return license_key
 
-def generate_offline_license(license_data: Dict[str, Any], cluster_id: str) -> str:
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+def _to_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _write_varint(buf: bytearray, value: int) -> None:
+    """无符号LEB128变长整数"""
+    if value < 0:
+        raise ValueError("激活码字段不能为负数")
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("变长整数过长")
+
+def _write_str(buf: bytearray, value: Any) -> None:
+    raw = str(value or "").encode('utf-8')
+    _write_varint(buf, len(raw))
+    buf += raw
+
+def _read_str(data: bytes, pos: int) -> Tuple[str, int]:
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    if end > len(data):
+        raise ValueError("字段长度越界")
+    return data[pos:end].decode('utf-8'), end
+
+def _v2_mac(body: bytes, cluster_id: str, key_id: int) -> Optional[bytes]:
+    """MAC覆盖集群ID和全部字段；集群ID不写入激活码，由验证方提供。密钥不可用时返回None"""
+    mac = keyring.v2_mac(key_id)
+    if mac is None:
+        return None
+    cluster = cluster_id.encode('utf-8')
+    message = bytearray()
+    _write_varint(message, len(cluster))
+    message += cluster
+    message += body
+    mac.update(message)
+    return mac.digest()[:_V2_MAC_SIZE]
+
+def _encode_v2(license_data: Dict[str, Any], cluster_id: str, generated_at: datetime) -> str:
     """
-    基于许可证数据和集群ID生成离线激活码
-    
-    Args:
-        license_data: 许可证数据
-        cluster_id: 客户端集群ID
-        
-    Returns:
-        str: 加密的离线激活码
+    v2布局（字节）：
+    版本(1) | 密钥编号(1) | 随机数(4) | 生成时间-分钟 | 客户ID | 起始日期 | 到期日期 | 授权工作区 | 授权用户
+    | 许可证ID | 产品名称 | 许可证类型 | MAC(16)
+    整数为varint，日期为距2000-01-01的天数，字符串为varint长度前缀的UTF-8；整体为无填充的base64url
     """
-    if not cluster_id:
-        raise ValueError("离线激活需要提供有效的Cluster ID")
-    
+    key_id = keyring.active_key_id
+    buf = bytearray((_V2_VERSION, key_id))
+    buf += os.urandom(4)
+    _write_varint(buf, int(generated_at.timestamp()) // 60)
+    _write_varint(buf, int(license_data["customer_id"] or 0))
+    _write_varint(buf, (_to_date(license_data["start_date"]) - _V2_DATE_EPOCH).days)
+    _write_varint(buf, (_to_date(license_data["expiry_date"]) - _V2_DATE_EPOCH).days)
+    _write_varint(buf, int(license_data["authorized_workspaces"] or 0))
+    _write_varint(buf, int(license_data["authorized_users"] or 0))
+    _write_str(buf, license_data["license_id"])
+    _write_str(buf, license_data["product_name"])
+    _write_str(buf, license_data["license_type"])
+    body = bytes(buf)
+    return base64.urlsafe_b64encode(body + _v2_mac(body, cluster_id, key_id)).decode('ascii').rstrip("=")
+
+def _decode_v2(offline_code: str, cluster_id: str, today: date) -> Tuple[bool, Dict[str, Any]]:
+    try:
+        raw = base64.urlsafe_b64decode(offline_code + "=" * (-len(offline_code) % 4))
+    except (ValueError, TypeError):
+        return False, {"error": "无效的激活码格式"}
+    if len(raw) <= 6 + _V2_MAC_SIZE or raw[0] != _V2_VERSION:
+        return False, {"error": "无效的激活码格式"}
+
+    body, mac = raw[:-_V2_MAC_SIZE], raw[-_V2_MAC_SIZE:]
+    key_id = raw[1]
+    expected_mac = _v2_mac(body, cluster_id, key_id)
+    if expected_mac is None:
+        return False, {"error": "激活码的签名密钥已失效，请重新生成激活码"}
+    if not hmac.compare_digest(expected_mac, mac):
+        return False, {"error": "激活码签名验证失败或与当前集群不匹配"}
+
+    try:
+        pos = 6
+        numbers = []
+        for _ in range(6):
+            value, pos = _read_varint(body, pos)
+            numbers.append(value)
+        generated_minutes, customer_id, start_days, expiry_days, workspaces, users = numbers
+        license_id, pos = _read_str(body, pos)
+        product_name, pos = _read_str(body, pos)
+        license_type, pos = _read_str(body, pos)
+    except (IndexError, ValueError, UnicodeDecodeError):
+        return False, {"error": "无效的激活码格式"}
+
+    expiry_date = _V2_DATE_EPOCH + timedelta(days=expiry_days)
+    if expiry_date < today:
+        return False, {"error": "许可证已过期"}
+
+    return True, {
+        "version": _V2_VERSION,
+        "key_id": key_id,
+        "license_id": license_id,
+        "customer_id": customer_id,
+        "product_name": product_name,
+        "license_type": license_type,
+        "start_date": (_V2_DATE_EPOCH + timedelta(days=start_days)).isoformat(),
+        "expiry_date": expiry_date.isoformat(),
+        "authorized_workspaces": workspaces,
+        "authorized_users": users,
+        "cluster_id": cluster_id,
+        "generated_at": datetime.fromtimestamp(generated_minutes * 60).isoformat(),
+        "nonce": body[2:6].hex()
+    }
+
+def _generate_offline_license_v1(license_data: Dict[str, Any], cluster_id: str) -> str:
+    """旧版离线激活码：排序键JSON的Base64 + HMAC-SHA256签名"""
     # 构建包含所有重要许可证信息的数据负载
     payload = {
         "license_id": license_data["license_id"],
         "customer_id": license_data["customer_id"],
         "product_name": license_data["product_name"],
         "license_type": license_data["license_type"],
-        "start_date": license_data["start_date"].isoformat() if isinstance(license_data["start_date"], datetime) else license_data["start_date"],
-        "expiry_date": license_data["expiry_date"].isoformat() if isinstance(license_data["expiry_date"], datetime) else license_data["expiry_date"],
+        "start_date": _isoformat(license_data["start_date"]),
+        "expiry_date": _isoformat(license_data["expiry_date"]),
         "authorized_workspaces": license_data["authorized_workspaces"],
         "authorized_users": license_data["authorized_users"],
         "cluster_id": cluster_id,
         "generated_at": datetime.now().isoformat(),
         "nonce": str(uuid.uuid4())
     }
+    # 编号0的密钥不写入key_id，保持与轮换前签发的激活码格式一致
+    if keyring.active_key_id:
+        payload["key_id"] = keyring.active_key_id
     
     # 转换为JSON字符串
     payload_json = json.dumps(payload, sort_keys=True)
     
     # 使用HMAC-SHA256对数据进行签名
-    signature = hmac.new(
-        LICENSE_SECRET_KEY.encode('utf-8'),
-        payload_json.encode('utf-8'),
-        hashlib.sha256
-    ).digest()
+    mac = keyring.v1_mac()
+    mac.update(payload_json.encode('utf-8'))
+    signature = mac.digest()
     
     # 对JSON数据进行Base64编码
     payload_base64 = base64.b64encode(payload_json.encode('utf-8')).decode('utf-8')
@@ -87,17 +210,7 @@ def generate_offline_license(license_data: Dict[str, Any], cluster_id: str) -> s
     
     return offline_code
 
-def verify_offline_license(offline_code: str, cluster_id: str) -> Tuple[bool, Dict[str, Any]]:
-    """
-    验证离线激活码是否有效
-    
-    Args:
-        offline_code: 离线激活码
-        cluster_id: 当前集群ID
-        
-    Returns:
-        Tuple[bool, dict]: (是否有效, 许可证数据)
-    """
+def _verify_offline_license_v1(offline_code: str, cluster_id: str) -> Tuple[bool, Dict[str, Any]]:
     try:
         # 分离负载和签名
         parts = offline_code.split('.')
@@ -114,12 +227,12 @@ def verify_offline_license(offline_code: str, cluster_id: str) -> Tuple[bool, Di
         if payload.get("cluster_id") != cluster_id:
             return False, {"error": "激活码与当前集群不匹配"}
         
-        # 验证签名
-        expected_signature = hmac.new(
-            LICENSE_SECRET_KEY.encode('utf-8'),
-            payload_json.encode('utf-8'),
-            hashlib.sha256
-        ).digest()
+        # 按激活码中的密钥编号验证签名
+        mac = keyring.v1_mac(int(payload.get("key_id", 0)))
+        if mac is None:
+            return False, {"error": "激活码的签名密钥已失效，请重新生成激活码"}
+        mac.update(payload_json.encode('utf-8'))
+        expected_signature = mac.digest()
         
         actual_signature = base64.b64decode(signature_base64)
         
@@ -136,38 +249,92 @@ def verify_offline_license(offline_code: str, cluster_id: str) -> Tuple[bool, Di
     except Exception as e:
         return False, {"error": f"验证失败: {str(e)}"}
 
-def log_activation_change(license_data: Dict[str, Any], 
-                          from_mode: str, 
-                          to_mode: str, 
-                          cluster_id: Optional[str] = None) -> Dict[str, Any]:
+def generate_offline_license(license_data: Dict[str, Any], cluster_id: str, version: Optional[int] = None) -> str:
     """
-    记录激活方式变更历史
+    基于许可证数据和集群ID生成离线激活码
     
     Args:
         license_data: 许可证数据
-        from_mode: 原激活方式
-        to_mode: 新激活方式
-        cluster_id: 集群ID（离线模式时需要）
+        cluster_id: 客户端集群ID
+        version: 激活码版本，默认为OFFLINE_CODE_VERSION
         
     Returns:
-        dict: 更新后的激活历史记录
+        str: 签名的离线激活码
     """
-    # 获取现有历史记录或初始化
-    history = license_data.get("activation_history", {})
-    if not history:
-        history = {"changes": []}
-    
-    # 添加新的变更记录
-    change_record = {
-        "timestamp": datetime.now().isoformat(),
-        "from_mode": from_mode,
-        "to_mode": to_mode,
-        "cluster_id": cluster_id if to_mode == "OFFLINE" else None
-    }
+    if not cluster_id:
+        raise ValueError("离线激活需要提供有效的Cluster ID")
     
-    if "changes" not in history:
-        history["changes"] = []
+    if (version or OFFLINE_CODE_VERSION) == 1:
+        return _generate_offline_license_v1(license_data, cluster_id)
+    return _encode_v2(license_data, cluster_id, datetime.now())
+
+def generate_offline_licenses(items: List[Tuple[Dict[str, Any], str]], version: Optional[int] = None) -> List[str]:
+    """
+    批量生成离线激活码
     
-    history["changes"].append(change_record)
+    Args:
+        items: (许可证数据, 集群ID) 列表
+        version: 激活码版本，默认为OFFLINE_CODE_VERSION
+        
+    Returns:
+        List[str]: 与items一一对应的激活码
+    """
+    for _, cluster_id in items:
+        if not cluster_id:
+            raise ValueError("离线激活需要提供有效的Cluster ID")
+    
+    if (version or OFFLINE_CODE_VERSION) == 1:
+        return [_generate_offline_license_v1(license_data, cluster_id) for license_data, cluster_id in items]
     
-    return history
+    generated_at = datetime.now()
+    return [_encode_v2(license_data, cluster_id, generated_at) for license_data, cluster_id in items]
+
+def verify_offline_license(offline_code: str, cluster_id: str) -> Tuple[bool, Dict[str, Any]]:
+    """
+    验证离线激活码是否有效（自动识别v1/v2格式）
+    
+    Args:
+        offline_code: 离线激活码
+        cluster_id: 当前集群ID
+        
+    Returns:
+        Tuple[bool, dict]: (是否有效, 许可证数据)
+    """
+    return verify_offline_licenses([(offline_code, cluster_id)])[0]
+
+def verify_offline_licenses(items: List[Tuple[str, str]]) -> List[Tuple[bool, Dict[str, Any]]]:
+    """
+    批量验证离线激活码
+    v2激活码无需JSON解析，且共享预先初始化的HMAC上下文；v1激活码（含"."）走旧的验证流程
+    
+    Args:
+        items: (离线激活码, 集群ID) 列表
+        
+    Returns:
+        List[Tuple[bool, dict]]: 与items一一对应的 (是否有效, 许可证数据)
+    """
+    today = date.today()
+    results = []
+    for offline_code, cluster_id in items:
+        offline_code = (offline_code or "").strip()
+        if "." in offline_code:
+            results.append(_verify_offline_license_v1(offline_code, cluster_id))
+        else:
+            results.append(_decode_v2(offline_code, cluster_id or "", today))
+    return results
+
+def offline_code_key_id(offline_code: str) -> Optional[int]:
+    """
+    读取激活码的签名密钥编号（不验证签名），用于判断密钥轮换后哪些激活码需要重新签发
+    
+    Returns:
+        Optional[int]: 密钥编号，无法识别的激活码返回None
+    """
+    try:
+        if "." in offline_code:
+            payload = json.loads(base64.b64decode(offline_code.split('.')[0]).decode('utf-8'))
+            return int(payload.get("key_id", 0))
+        raw = base64.urlsafe_b64decode(offline_code[:4])
+        return raw[1] if raw[0] == _V2_VERSION else None
+    except (ValueError, TypeError, IndexError, AttributeError):
+        return None
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分页列表的总数头部
+列表接口统一通过 X-Total-Count 返回筛选后的总条数（见 app/services/count_service.py）
+"""
+
+from fastapi import Response
+
+from app.services.count_service import TotalCount
+
+
+def set_total_count(response: Response, count: TotalCount) -> None:
+    """
+    写入 X-Total-Count；总数来自数据库统计信息（估算值）时同时写入 X-Total-Count-Estimated: true
+    """
+    response.headers["X-Total-Count"] = str(count.total)
+    if count.estimated:
+        response.headers["X-Total-Count-Estimated"] = "true"
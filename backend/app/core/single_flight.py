@@ -0,0 +1,131 @@
+"""
+Single-flight coalescing of identical expensive reads.
+
+`single_flight.run(fn, db, key=..., role=...)` calls `fn(db)` unless an identical call - same
+function, same key (the arguments that determine the result, e.g. filters and table_versions)
+and same caller role - is already running in this worker. In that case the request waits for
+the running call and returns its result (or raises its exception) instead of querying the
+database again, so N dashboards refreshing together cost one execution. Nothing is cached:
+the next call after a flight lands executes again.
+
+Put the table versions the result depends on in the key, so a request that arrives after a
+write never joins a computation that started before it. A follower that waits longer than
+SINGLE_FLIGHT_WAIT_SECONDS executes the call itself. Per-function counters are reported by
+GET /metrics/single-flight.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable form of a key: dicts (e.g. table versions) and lists become tuples"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class Flight:
+    """One in-flight execution and the requests waiting for it"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """In-flight calls by (function, key, role), with per-function counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Flight] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _count(self, name: str) -> Dict[str, float]:
+        return self._stats.setdefault(name, {
+            "calls": 0, "executions": 0, "coalesced": 0, "wait_timeouts": 0, "errors": 0,
+            "max_waiters": 0, "total_seconds": 0.0,
+        })
+
+    def run(self, fn: Callable[..., T], *args: Any, key: Any = (), role: Optional[str] = None) -> T:
+        """fn(*args), shared with an identical call already running; key holds what the result depends on besides args"""
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return fn(*args)
+
+        flight_key = (name, freeze(key), role)
+        with self._lock:
+            stats = self._count(name)
+            stats["calls"] += 1
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = Flight()
+            else:
+                flight.waiters += 1
+                stats["coalesced"] += 1
+                stats["max_waiters"] = max(stats["max_waiters"], flight.waiters)
+
+        if not leader:
+            if flight.done.wait(settings.SINGLE_FLIGHT_WAIT_SECONDS):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            with self._lock:
+                stats["coalesced"] -= 1
+                stats["wait_timeouts"] += 1
+            return self._execute(name, fn, args)  # not on the shared flight, which still belongs to its leader
+
+        try:
+            flight.result = self._execute(name, fn, args)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[flight_key]
+            flight.done.set()
+
+    def _execute(self, name: str, fn: Callable[..., T], args: tuple) -> T:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return fn(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                stats = self._count(name)
+                stats["executions"] += 1
+                stats["errors"] += int(failed)
+                stats["total_seconds"] += time.perf_counter() - started
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            functions = {name: dict(stats) for name, stats in self._stats.items()}
+            in_flight = len(self._flights)
+        for stats in functions.values():
+            executions = stats["executions"] or 1
+            stats["coalesced_ratio"] = round(stats["coalesced"] / (stats["calls"] or 1), 3)
+            stats["avg_ms"] = round(stats.pop("total_seconds") * 1000 / executions, 2)
+        return {"in_flight": in_flight, "functions": functions}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,88 @@
+"""
+Request-scoped batch loaders (DataLoader-style).
+
+A loader maps primary keys to response objects through one batch function and lives in
+Session.info, so everything running on the request's session shares it:
+
+- load_many() fetches every key not cached yet with one call of the batch function
+  (chunked at MAX_BATCH_SIZE keys), so a page costs a fixed number of queries whatever
+  its size; keys requested again later in the request come from the cache
+- queries that already loaded full rows (lists, detail pages) prime() the loader instead
+  of reading the same records again
+- any write on the session clears its loaders: ORM flushes, bulk query.update()/delete()
+  and Core insert/update/delete or text statements run through Session.execute, as well as
+  a rollback; so a request never reads back values from before its own writes. Statements
+  run directly on db.connection() bypass the session and are not seen
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+# Session.info key: batch function -> BatchLoader for this session
+LOADERS_KEY = "batch_loaders"
+
+# Keys per batch query; bounds the size of the IN (...) list
+MAX_BATCH_SIZE = 500
+
+BatchFunction = Callable[[Session, List[Hashable]], Dict[Hashable, Any]]
+
+
+class BatchLoader:
+    def __init__(self, db: Session, batch_fn: BatchFunction):
+        self._db = db
+        self._batch_fn = batch_fn
+        self._cache: Dict[Hashable, Optional[Any]] = {}
+        self.batches = 0  # batch calls made, for tests and query-count assertions
+
+    def load(self, key: Hashable) -> Optional[Any]:
+        return self.load_many([key])[0]
+
+    def load_many(self, keys: Iterable[Hashable]) -> List[Optional[Any]]:
+        """Values in key order, None for keys that do not exist"""
+        keys = list(keys)
+        missing = list(dict.fromkeys(key for key in keys if key not in self._cache))
+        for start in range(0, len(missing), MAX_BATCH_SIZE):
+            chunk = missing[start:start + MAX_BATCH_SIZE]
+            found = self._batch_fn(self._db, chunk)
+            self.batches += 1
+            for key in chunk:
+                self._cache[key] = found.get(key)  # misses are cached too
+        return [self._cache[key] for key in keys]
+
+    def prime(self, key: Hashable, value: Any) -> None:
+        self._cache[key] = value
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def get_loader(db: Session, batch_fn: BatchFunction) -> BatchLoader:
+    """The session's loader for batch_fn, created on first use"""
+    loaders = db.info.setdefault(LOADERS_KEY, {})
+    loader = loaders.get(batch_fn)
+    if loader is None:
+        loader = loaders[batch_fn] = BatchLoader(db, batch_fn)
+    return loader
+
+
+def _clear_loaders(session: Session) -> None:
+    for loader in session.info.get(LOADERS_KEY, {}).values():
+        loader.clear()
+
+
+@event.listens_for(Session, "after_flush")
+def _clear_after_flush(session: Session, flush_context: Any) -> None:
+    _clear_loaders(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _clear_before_write(orm_execute_state: ORMExecuteState) -> None:
+    # Bulk query.update()/delete() and Core writes change rows without a flush
+    if not orm_execute_state.is_select:
+        _clear_loaders(orm_execute_state.session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session: Session) -> None:
+    _clear_loaders(session)
@@ -1,17 +1,21 @@
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.unit_of_work import UnitOfWorkSession, attach_request_session
 
 engine = create_engine(settings.DATABASE_URI, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=UnitOfWorkSession)
 
 Base = declarative_base()
 
 # Dependency for fastapi
-def get_db():
+def get_db(request: Request = None):
     db = SessionLocal()
+    # Routes using UnitOfWorkRoute commit this session once, before the response is sent
+    attach_request_session(request, db)
     try:
         yield db
     finally:
@@ -0,0 +1,50 @@
+"""
+Relationship loading strategies, declared once per response shape.
+
+- many-to-one relationships are joined (one row per parent, no duplication)
+- collections are loaded with selectinload, one extra SELECT per collection level,
+  instead of joinedload which multiplies rows (purchases x deployments x engineers)
+- every shape ends with raiseload so a relationship the shape did not declare raises
+  instead of silently issuing one lazy query per row; sql_only lets back-references
+  that are already in the identity map resolve without a query
+"""
+
+from typing import Any, Tuple
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+
+from app.models.models import License, DeploymentRecord, DeploymentEngineer
+
+
+def _deployment_assignments(path) -> Tuple[Any, ...]:
+    """Engineer assignments (and each assignment's engineer) below a deployment record path"""
+    assignments = path.selectinload(DeploymentRecord.engineer_assignments)
+    return (
+        path.raiseload("*", sql_only=True),
+        assignments.raiseload("*", sql_only=True),
+        assignments.joinedload(DeploymentEngineer.engineer).raiseload("*", sql_only=True),
+    )
+
+
+LOADER_OPTIONS = {
+    # LicenseService.get_license -> schemas.LicenseDetailedInfo
+    "license_detail": lambda: (
+        joinedload(License.customer),
+        joinedload(License.sales_rep),
+        joinedload(License.reseller),
+        selectinload(License.purchase_records).raiseload("*", sql_only=True),
+        *_deployment_assignments(selectinload(License.deployment_records)),
+        raiseload("*", sql_only=True),
+    ),
+    # DeploymentService single record and list -> schemas.DeploymentRecordInfo
+    "deployment_record": lambda: (
+        selectinload(DeploymentRecord.engineer_assignments).joinedload(DeploymentEngineer.engineer)
+            .raiseload("*", sql_only=True),
+        selectinload(DeploymentRecord.engineer_assignments).raiseload("*", sql_only=True),
+        raiseload("*", sql_only=True),
+    ),
+}
+
+
+def loader_options(shape: str) -> Tuple[Any, ...]:
+    """Loader options for a response shape, for use as query.options(*loader_options(shape))"""
+    return LOADER_OPTIONS[shape]()
@@ -0,0 +1,172 @@
+"""
+Request-scoped unit of work.
+
+Routers created with `route_class=UnitOfWorkRoute` run each request as one transaction:
+- the request's session (from get_db) is switched into unit-of-work mode, where
+  `db.commit()` inside services only flushes (generated IDs are assigned, constraint
+  errors surface at the same place as before) and `db.refresh(obj)` on a freshly
+  flushed object is skipped; expired server defaults still load lazily on access
+- after the endpoint returns, and before the response is sent, the session commits once;
+  any exception (including one raised by that commit) rolls the whole request back
+- change events published during the request are held back until the commit succeeds
+
+Outside a UnitOfWorkRoute (scripts, background jobs, other routers) sessions behave as
+plain SQLAlchemy sessions. Per-route commit counts are kept in `commit_stats` so the
+before/after effect can be read from GET /metrics/commits.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.events import event_bus
+
+UOW_INFO_KEY = "unit_of_work"
+
+
+class UnitOfWorkSession(Session):
+    """Session whose commit()/refresh() defer to the request boundary while a unit of work is active"""
+
+    def commit(self) -> None:
+        uow = self.info.get(UOW_INFO_KEY)
+        if uow is None or not uow.enabled or uow.committing:
+            super().commit()
+            if uow is not None:
+                uow.commits += 1
+            return
+        uow.service_commits += 1
+        self.flush()
+
+    def refresh(self, instance: Any, *args: Any, **kwargs: Any) -> None:
+        uow = self.info.get(UOW_INFO_KEY)
+        if uow is not None and uow.enabled and not args and not kwargs:
+            # The flush already assigned primary keys; anything still expired loads on first access
+            uow.refreshes_skipped += 1
+            self.flush()
+            return
+        super().refresh(instance, *args, **kwargs)
+
+
+class UnitOfWork:
+    """State of one request's transaction"""
+
+    def __init__(self):
+        self.session: Optional[UnitOfWorkSession] = None
+        self.enabled = settings.UNIT_OF_WORK_ENABLED
+        self.committing = False
+        self.commits = 0
+        self.service_commits = 0
+        self.refreshes_skipped = 0
+
+    def attach(self, session: Session) -> None:
+        if self.session is None and isinstance(session, UnitOfWorkSession):
+            self.session = session
+            # Attached even when disabled so commits are still counted for the metrics
+            session.info[UOW_INFO_KEY] = self
+
+    def commit(self) -> None:
+        if self.session is None:
+            return
+        if not self.enabled:
+            self.session.info.pop(UOW_INFO_KEY, None)
+            return  # services already committed for real
+        self.committing = True
+        try:
+            self.session.commit()
+        finally:
+            self.committing = False
+            self.session.info.pop(UOW_INFO_KEY, None)
+
+    def rollback(self) -> None:
+        if self.session is None:
+            return
+        self.session.info.pop(UOW_INFO_KEY, None)
+        if self.enabled:
+            self.session.rollback()
+
+
+class CommitStats:
+    """Per-route counters: real commits versus commit() calls made by services"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+
+    def record(self, route: str, uow: UnitOfWork, duration: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                "requests": 0, "failed": 0, "commits": 0, "service_commits": 0,
+                "refreshes_skipped": 0, "total_seconds": 0.0,
+            })
+            stats["requests"] += 1
+            stats["failed"] += int(failed)
+            stats["commits"] += uow.commits
+            # Without a unit of work every service commit() is a real commit
+            stats["service_commits"] += uow.service_commits if uow.enabled else uow.commits
+            stats["refreshes_skipped"] += uow.refreshes_skipped
+            stats["total_seconds"] += duration
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+        for stats in routes.values():
+            requests = stats["requests"] or 1
+            stats["commits_per_request"] = round(stats["commits"] / requests, 2)
+            stats["commits_per_request_without_uow"] = round(stats["service_commits"] / requests, 2)
+            stats["avg_ms"] = round(stats.pop("total_seconds") * 1000 / requests, 2)
+        return routes
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+commit_stats = CommitStats()
+
+
+def attach_request_session(request: Optional[Request], session: Session) -> None:
+    """Called by get_db: join the request's unit of work if its route uses one"""
+    if request is None:
+        return
+    uow = getattr(request.state, UOW_INFO_KEY, None)
+    if uow is not None:
+        uow.attach(session)
+
+
+class UnitOfWorkRoute(APIRoute):
+    """APIRoute that wraps each request in a unit of work committed once before the response is sent"""
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+        route_name = f"{','.join(sorted(self.methods))} {self.path_format}"
+
+        async def handler(request: Request) -> Response:
+            uow = UnitOfWork()
+            setattr(request.state, UOW_INFO_KEY, uow)
+            events_token = event_bus.defer_events()
+            started = time.perf_counter()
+            failed = False
+            try:
+                response = await original_handler(request)
+                if response.status_code >= 400:
+                    # HTTPException responses are handled outside; anything else 4xx/5xx must not persist
+                    await run_in_threadpool(uow.rollback)
+                else:
+                    await run_in_threadpool(uow.commit)
+                event_bus.publish_deferred(events_token)
+                return response
+            except BaseException:
+                failed = True
+                event_bus.discard_deferred(events_token)
+                await run_in_threadpool(uow.rollback)
+                raise
+            finally:
+                commit_stats.record(route_name, uow, time.perf_counter() - started, failed)
+
+        return handler
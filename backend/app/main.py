@@ -43,7 +43,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Total-Count", "Content-Type", "Content-Length"],
+    expose_headers=["X-Total-Count", "X-Total-Count-Estimated", "Content-Type", "Content-Length", "ETag", "Last-Modified"],
 )
 
 # Add middleware for request timing
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, Enum, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, Enum, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -38,9 +38,9 @@ class Lead(Base):
     
     lead_id = Column(Integer, primary_key=True, index=True)
     lead_name = Column(String(200), nullable=False)
-    company_name = Column(String(200), nullable=False)
+    company_name = Column(String(200), nullable=False, index=True)  # 导入去重（无联系人邮箱时）
     contact_person = Column(String(100), nullable=False)
-    contact_email = Column(String(100))
+    contact_email = Column(String(100), index=True)  # 导入去重
     contact_phone = Column(String(20))
     
     # 关联销售代表
@@ -61,6 +61,7 @@ class Lead(Base):
     product_interest = Column(String(200))  # 感兴趣的产品
     estimated_value = Column(Float)  # 预估价值
     currency = Column(String(3), default="CNY")
+    estimated_value_base = Column(Float)  # 按创建日汇率折算的本位币预估价值（该币种尚无汇率时为空）
     expected_close_date = Column(Date)  # 预计成单日期
     probability = Column(Integer)  # 成单概率（百分比）
     
@@ -71,7 +72,7 @@ class Lead(Base):
     
     notes = Column(Text)
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # 增量同步水位线
     
     # Relationships
     sales_rep = relationship("SalesRep", foreign_keys=[sales_rep_id])
@@ -96,3 +97,72 @@ class LeadActivity(Base):
     
     # Relationships
     lead = relationship("Lead", back_populates="activities")
+
+
+class LeadStatusTransition(Base):
+    """商机状态流转日志（只追加），漏斗分析聚合的数据来源"""
+    __tablename__ = "lead_status_transitions"
+    
+    transition_id = Column(Integer, primary_key=True, index=True)
+    # 不设外键：商机删除后流转历史仍保留在统计中
+    lead_id = Column(Integer, nullable=False)
+    from_status_id = Column(Integer)  # 为空表示商机创建
+    to_status_id = Column(Integer, nullable=False)
+    # 流转发生时商机的归属，用于按销售/来源/创建月份分组
+    sales_rep_id = Column(Integer)
+    source_id = Column(Integer)
+    cohort_month = Column(String(7), nullable=False)  # 商机创建月份 YYYY-MM
+    seconds_in_from_status = Column(Integer)  # 在原状态停留的秒数
+    changed_at = Column(DateTime, nullable=False, default=func.now(), index=True)
+    
+    __table_args__ = (
+        Index("ix_lead_status_transitions_lead", "lead_id", "changed_at"),
+    )
+
+
+class LeadFunnelStat(Base):
+    """按维度增量维护的各阶段漏斗计数（dimension: all/sales_rep/source/cohort/month）"""
+    __tablename__ = "lead_funnel_stats"
+    
+    dimension = Column(String(20), primary_key=True)
+    dimension_key = Column(String(50), primary_key=True)  # all维度为空串；未分配销售/来源为空串
+    status_id = Column(Integer, primary_key=True)
+    current_count = Column(Integer, nullable=False, default=0)  # 当前处于该阶段的商机数
+    current_value = Column(Float, nullable=False, default=0)  # 当前处于该阶段的预估价值合计
+    reached_count = Column(Integer, nullable=False, default=0)  # 曾进入该阶段的商机数（每个商机只计一次）
+    exited_count = Column(Integer, nullable=False, default=0)  # 离开该阶段的次数
+    dwell_seconds = Column(Float, nullable=False, default=0)  # 离开时累计的停留时长
+
+
+class LeadStageDuration(Base):
+    """阶段停留时长的对数分桶直方图，用于常数时间估算中位数"""
+    __tablename__ = "lead_stage_durations"
+    
+    dimension = Column(String(20), primary_key=True)
+    dimension_key = Column(String(50), primary_key=True)
+    status_id = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class LeadImportJob(Base):
+    """商机导入任务：记录导入源和断点，按块提交的同一事务中更新，中断后可从断点继续"""
+    __tablename__ = "lead_import_jobs"
+    
+    job_id = Column(Integer, primary_key=True, index=True)
+    source_type = Column(Enum('MBOX', 'EML', 'CSV', 'XLSX', name='lead_import_source_enum'), nullable=False)
+    source_path = Column(String(500), nullable=False)  # 相对LEAD_IMPORT_DIR的路径
+    options = Column(JSON)  # 导入默认值：source_id、status_id、sales_rep_id、currency
+    status = Column(Enum('PENDING', 'RUNNING', 'PAUSED', 'COMPLETED', 'FAILED', name='lead_import_status_enum'), nullable=False, default='PENDING')
+    checkpoint = Column(JSON)  # 已提交的读取位置：mbox为字节偏移，EML目录为最后处理的文件，CSV/XLSX为行号
+    processed_count = Column(Integer, nullable=False, default=0)  # 已读取的邮件/行数
+    inserted_count = Column(Integer, nullable=False, default=0)
+    duplicate_count = Column(Integer, nullable=False, default=0)  # 与已有商机或本次导入重复
+    skipped_count = Column(Integer, nullable=False, default=0)  # 无法提取公司或联系人
+    error_count = Column(Integer, nullable=False, default=0)  # 无法解析或解码而跳过的邮件/行数
+    item_errors = Column(JSON)  # 前100条解析错误：[{"position": 邮件起始偏移/EML文件/行号, "error": 错误信息}]
+    last_error = Column(Text)
+    created_by = Column(String(100))
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime)
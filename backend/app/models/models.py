@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, Enum, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, Enum, ForeignKey, JSON, Boolean, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -18,10 +18,23 @@ class Customer(Base):
     region = Column(String(50))
     notes = Column(Text)
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # 增量同步水位线
     
     # Relationships
-    licenses = relationship("License", back_populates="customer")
+    licenses = relationship("License", back_populates="customer", passive_deletes=True)  # 删除客户时由数据库级联删除许可证
+
+
+class CustomerMatchKey(Base):
+    __tablename__ = "customer_match_keys"
+    __table_args__ = (
+        Index("ix_customer_match_keys_customer", "customer_id"),  # 客户更新/删除时替换其全部键
+    )
+    
+    # 客户查重的分块键（见customer_match_service.py）：name=规范化全名，token=名称词元，domain=企业邮箱域名，phone=电话末8位
+    # 匹配时只对至少共享一个键的客户打分，由客户写入路径维护，可由customers表重建
+    key_type = Column(Enum('name', 'token', 'domain', 'phone', name='customer_match_key_type_enum'), primary_key=True)
+    key_value = Column(String(100), primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.customer_id", ondelete="CASCADE"), primary_key=True)
 
 
 class SalesRep(Base):
@@ -81,7 +94,7 @@ class License(Base):
     activation_mode = Column(Enum('ONLINE', 'OFFLINE', name='activation_mode_enum'), default='ONLINE')
     cluster_id = Column(String(100), nullable=True)  # 离线激活需要的cluster ID
     offline_code = Column(String(255), nullable=True)  # 离线激活码
-    activation_history = Column(JSON, default=dict)  # 激活方式变更历史
+    activation_history = Column(JSON, nullable=True)  # 已废弃：变更历史改存activation_events表，仅供迁移脚本回填旧数据
     last_activation_change = Column(DateTime, nullable=True)  # 上次激活方式变更时间
     deployment_status = Column(Enum('PLANNED', 'IN_PROGRESS', 'COMPLETED', 'FAILED', name='deployment_status_enum'), default='PLANNED')
     deployment_date = Column(Date)
@@ -89,7 +102,7 @@ class License(Base):
     last_check_date = Column(Date)
     notes = Column(Text)
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # 增量同步水位线
     
     # Relationships
     customer = relationship("Customer", back_populates="licenses")
@@ -101,6 +114,10 @@ class License(Base):
 
 class PurchaseRecord(Base):
     __tablename__ = "purchase_records"
+    __table_args__ = (
+        Index("ix_purchase_records_license_time", "license_id", "created_at"),  # 许可证时间线按时间倒序读取
+        Index("ix_purchase_records_currency_date", "currency", "purchase_date"),  # 汇率更新后按币种、日期重算本位币金额
+    )
     
     purchase_id = Column(Integer, primary_key=True, index=True)
     license_id = Column(String(50), ForeignKey("licenses.license_id", ondelete="CASCADE"), nullable=False)
@@ -110,6 +127,7 @@ class PurchaseRecord(Base):
     contract_number = Column(String(50))
     amount = Column(Float, nullable=False)
     currency = Column(String(3), default="USD")
+    amount_base = Column(Float)  # 按购买日汇率折算的本位币金额（写入时计算，该币种尚无汇率时为空）
     payment_status = Column(Enum('PENDING', 'PAID', 'REFUNDED', 'CANCELLED', name='payment_status_enum'), default='PENDING')
     payment_date = Column(Date)
     workspaces_purchased = Column(Integer, default=0)
@@ -124,6 +142,35 @@ class PurchaseRecord(Base):
     license = relationship("License", back_populates="purchase_records")
 
 
+class SalesPerformanceDaily(Base):
+    __tablename__ = "sales_performance_daily"
+    __table_args__ = (
+        Index("ix_sales_performance_daily_dimension_day", "dimension", "day"),  # 排名/环比按日期范围扫描
+    )
+    
+    # 销售业绩日汇总：由购买记录写入路径增量维护（见sales_performance_service.py），可由purchase_records重建
+    dimension = Column(Enum('sales_rep', 'reseller', name='performance_dimension_enum'), primary_key=True)
+    dimension_id = Column(Integer, primary_key=True)  # sales_rep_id或reseller_id，0表示未分配
+    day = Column(Date, primary_key=True)
+    product_name = Column(String(100), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    purchase_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)  # 原币种金额
+    revenue_base = Column(Float, nullable=False, default=0)  # 本位币金额，跨币种汇总使用
+
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+    
+    # 每日汇率：1单位currency折合多少本位币（settings.BASE_CURRENCY）；某日无汇率时沿用此前最近一日
+    currency = Column(String(3), primary_key=True)
+    rate_date = Column(Date, primary_key=True)
+    rate = Column(Float, nullable=False)
+    source = Column(String(50))
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
 class FactoryEngineer(Base):
     __tablename__ = "factory_engineers"
     
@@ -143,6 +190,9 @@ class FactoryEngineer(Base):
 
 class DeploymentRecord(Base):
     __tablename__ = "deployment_records"
+    __table_args__ = (
+        Index("ix_deployment_records_license_time", "license_id", "created_at"),  # 许可证时间线按时间倒序读取
+    )
     
     deployment_id = Column(Integer, primary_key=True, index=True)
     license_id = Column(String(50), ForeignKey("licenses.license_id", ondelete="CASCADE"), nullable=False)
@@ -176,7 +226,11 @@ class DeploymentEngineer(Base):
 
 class ChangeTracking(Base):
     __tablename__ = "change_tracking"
+    __table_args__ = (
+        Index("ix_change_tracking_record", "table_name", "record_id", "changed_at"),
+    )
     
+    # MySQL上按changed_at月度分区（见migrate_change_tracking_partitions.py），过期分区由归档任务导出后删除
     change_id = Column(Integer, primary_key=True, index=True)
     table_name = Column(String(50), nullable=False)
     record_id = Column(String(50), nullable=False)
@@ -185,4 +239,52 @@ class ChangeTracking(Base):
     new_value = Column(Text)
     changed_by = Column(String(100), nullable=False)
     change_reason = Column(Text)
-    changed_at = Column(DateTime, default=func.now())
+    changed_at = Column(DateTime, default=func.now(), index=True)
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # 每次写入该表时递增，用于ETag和缓存失效
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+    
+    tombstone_id = Column(Integer, primary_key=True, index=True)  # 单调递增，作为删除记录的同步游标
+    table_name = Column(String(50), nullable=False, index=True)
+    record_id = Column(String(50), nullable=False)
+    deleted_at = Column(DateTime, default=func.now(), index=True)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    # 调用方凭据（X-Partner-UUID/Authorization）的哈希 + 调用方提供的Idempotency-Key
+    scope = Column(String(64), primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # 请求方法、路径、查询参数和请求体的SHA-256
+    status = Column(Enum('IN_PROGRESS', 'COMPLETED', name='idempotency_status_enum'), nullable=False, default='IN_PROGRESS')
+    locked_at = Column(DateTime, nullable=False)  # 处理中的请求定期刷新（心跳）；超过IDEMPOTENCY_LOCK_TIMEOUT未刷新视为已中断，可被接管
+    response_status = Column(Integer)
+    response_media_type = Column(String(100))
+    response_body = Column(LargeBinary)  # zlib压缩；已成功但响应过大时为空
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class ActivationEvent(Base):
+    __tablename__ = "activation_events"
+    __table_args__ = (
+        Index("ix_activation_events_license_time", "license_id", "created_at"),
+    )
+    
+    # 只追加不修改：每次激活方式变更或激活码重新生成写入一行
+    event_id = Column(Integer, primary_key=True, index=True)
+    license_id = Column(String(50), ForeignKey("licenses.license_id", ondelete="CASCADE"), nullable=False)
+    from_mode = Column(String(20), nullable=False)
+    to_mode = Column(String(20), nullable=False)
+    cluster_id = Column(String(100), nullable=True)
+    changed_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=func.now(), index=True)
@@ -27,6 +27,7 @@ class PurchaseOrder(Base):
     quantity = Column(Integer, default=1)
     amount = Column(Float, nullable=False)
     currency = Column(String(3), default="USD")
+    amount_base = Column(Float)  # 按下单日汇率折算的本位币金额（该币种尚无汇率时为空）
     
     # 订单规格
     authorized_workspaces = Column(Integer, default=0)
@@ -52,7 +53,7 @@ class PurchaseOrder(Base):
     
     # 时间戳
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # 增量同步水位线
     
     # 关系
     customer = relationship("Customer", foreign_keys=[customer_id])
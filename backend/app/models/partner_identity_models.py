@@ -37,7 +37,10 @@ class PartnerIdentity(Base):
 
 
 class PartnerEmailMapping(Base):
-    """合作商邮箱映射，用于将邮箱与合作商身份关联"""
+    """
+    合作商邮箱映射，用于将邮箱与合作商身份关联
+    email_address可以是完整邮箱地址，也可以是@example.com（整个域名）或@*.example.com（任意子域名）
+    """
     __tablename__ = "partner_email_mappings"
     
     mapping_id = Column(Integer, primary_key=True, index=True)
@@ -48,3 +51,17 @@ class PartnerEmailMapping(Base):
     
     # 关联
     identity = relationship("PartnerIdentity", back_populates="email_mappings")
+    
+    @property
+    def match_type(self):
+        """规则类型，见pattern_type"""
+        return self.pattern_type(self.email_address)
+    
+    @staticmethod
+    def pattern_type(email_address):
+        """规则类型：EXACT（完整邮箱地址）、DOMAIN（@example.com，整个域名）、SUBDOMAIN（@*.example.com，任意子域名）"""
+        if email_address.startswith("@*."):
+            return "SUBDOMAIN"
+        if email_address.startswith("@"):
+            return "DOMAIN"
+        return "EXACT"
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, Enum, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, Enum, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -46,6 +46,24 @@ class Order(Base):
     # partner = relationship("Partner", back_populates="orders", foreign_keys=[customer_id])
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at"),  # 订单列表按状态筛选、按创建时间倒序分页
+        Index("ix_orders_created_at", "created_at"),
+    )
+
+
+class PartnerOrder(Base):
+    """合作伙伴与订单的关联（合作伙伴下单或管理员手工关联）"""
+    __tablename__ = "partner_orders"
+
+    partner_id = Column(Integer, ForeignKey("partners.partner_id", ondelete="CASCADE"), primary_key=True)
+    order_id = Column(String(50), ForeignKey("orders.order_id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_partner_orders_order_id", "order_id"),  # 按订单反查合作伙伴
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime, date
 from pydantic import BaseModel, EmailStr, Field
 
@@ -171,3 +171,71 @@ class LeadFunnelData(BaseModel):
     stages: List[LeadCountByStatus]
     total_leads: int
     total_value: float
+    currency: Optional[str] = None  # 金额均为本位币
+
+
+# 漏斗与转化分析（由状态流转增量聚合得出）
+class LeadStageAnalytics(BaseModel):
+    status_id: int
+    status_name: str
+    current_count: int
+    current_value: float
+    reached_count: int  # 曾进入该阶段的商机数
+    conversion_rate: Optional[float] = None  # 到达下一阶段数/到达本阶段数
+    median_days_in_stage: Optional[float] = None  # 按分桶直方图估算
+    avg_days_in_stage: Optional[float] = None
+
+
+class LeadFunnelAnalytics(BaseModel):
+    dimension: str
+    dimension_key: str
+    stages: List[LeadStageAnalytics]
+    total_leads: int
+    total_value: float
+    currency: Optional[str] = None  # 金额均为本位币
+    overall_conversion_rate: Optional[float] = None  # 首阶段到target_status_id阶段
+
+
+class LeadCohortStage(BaseModel):
+    status_id: int
+    status_name: str
+    reached_count: int
+    reached_rate: Optional[float] = None
+
+
+class LeadCohortFunnel(BaseModel):
+    cohort_month: str
+    stages: List[LeadCohortStage]
+
+
+# 商机导入
+class LeadImportCreate(BaseModel):
+    path: str  # LEAD_IMPORT_DIR下的mbox文件、.eml文件目录或CSV/XLSX文件
+    source_type: Optional[str] = None  # MBOX/EML/CSV/XLSX，默认按路径判断
+    status_id: Optional[int] = None  # 默认第一个启用的商机状态
+    source_id: Optional[int] = None
+    sales_rep_id: Optional[int] = None  # 无法从来源识别销售代表时使用
+    currency: Optional[str] = None  # 来源未给出币种时使用，默认CNY
+    encoding: Optional[str] = None  # CSV文件编码，默认utf-8-sig
+    max_records: int = Field(0, ge=0)  # 创建后立即处理的邮件/行数，0表示只创建任务
+
+
+class LeadImportJob(BaseModel):
+    job_id: int
+    source_type: str
+    source_path: str
+    options: Optional[Dict[str, Any]] = None
+    status: str
+    checkpoint: Optional[Any] = None  # 已提交的读取位置
+    processed_count: int
+    inserted_count: int
+    duplicate_count: int
+    skipped_count: int
+    error_count: int = 0  # 无法解析或解码的邮件/行数
+    item_errors: Optional[List[Dict[str, Any]]] = None  # 前100条解析错误及其位置
+    progress: Optional[float] = None  # 已读取比例（仅mbox文件）
+    last_error: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
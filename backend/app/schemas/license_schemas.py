@@ -54,3 +54,71 @@ class LicenseInfo(BaseModel):
 
     class Config:
         orm_mode = True
+
+class ActivationEventInfo(BaseModel):
+    """单条激活方式变更记录"""
+    event_id: int
+    license_id: str
+    from_mode: str
+    to_mode: str
+    cluster_id: Optional[str] = None
+    changed_by: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class ActivationEventPage(BaseModel):
+    """分页的激活方式变更记录（按时间倒序）"""
+    items: List[ActivationEventInfo]
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多记录")
+
+class OfflineCodeBatchItem(BaseModel):
+    """批量生成中的单个许可证"""
+    license_id: str = Field(..., description="许可证ID")
+    cluster_id: str = Field(..., description="集群ID")
+
+class OfflineCodeBatchRequest(BaseModel):
+    """批量生成/重新生成离线激活码请求"""
+    items: List[OfflineCodeBatchItem] = Field(..., description="许可证与集群ID列表")
+    reason: Optional[str] = Field(None, description="生成理由")
+
+class OfflineCodeBatchResult(BaseModel):
+    """批量生成中单个许可证的结果"""
+    license_id: str
+    success: bool
+    offline_code: Optional[str] = None
+    cluster_id: Optional[str] = None
+    message: Optional[str] = None
+
+class OfflineCodeBatchResponse(BaseModel):
+    """批量生成离线激活码响应"""
+    total: int
+    succeeded: int
+    results: List[OfflineCodeBatchResult]
+
+class OfflineCodeVerifyItem(BaseModel):
+    """待验证的离线激活码"""
+    offline_code: str = Field(..., description="离线激活码（v1或v2格式）")
+    cluster_id: str = Field(..., description="集群ID")
+
+class OfflineCodeVerifyRequest(BaseModel):
+    """批量验证离线激活码请求"""
+    items: List[OfflineCodeVerifyItem]
+
+class OfflineCodeVerifyResult(BaseModel):
+    """单个激活码的验证结果"""
+    valid: bool
+    version: Optional[int] = None
+    key_id: Optional[int] = None
+    license_id: Optional[str] = None
+    expiry_date: Optional[date] = None
+    authorized_workspaces: Optional[int] = None
+    authorized_users: Optional[int] = None
+    error: Optional[str] = None
+
+class OfflineCodeVerifyResponse(BaseModel):
+    """批量验证离线激活码响应"""
+    total: int
+    valid: int
+    results: List[OfflineCodeVerifyResult]
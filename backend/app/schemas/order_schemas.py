@@ -65,6 +65,7 @@ class PurchaseOrderStatusUpdate(BaseModel):
 class PurchaseOrderInfo(PurchaseOrderBase):
     order_id: int
     customer_id: Optional[int]
+    amount_base: Optional[float] = Field(None, description="折算为本位币的金额（无汇率时为空）")
     order_status: OrderStatusEnum
     review_notes: Optional[str]
     reviewed_by: Optional[str]
@@ -6,7 +6,7 @@
 """
 
 from typing import Optional, List
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 
@@ -46,7 +46,7 @@ class PartnerIdentityDetail(PartnerIdentityInfo):
 
 # 基础邮箱映射Schema
 class PartnerEmailMappingBase(BaseModel):
-    email_address: EmailStr = Field(..., description="邮箱地址")
+    email_address: str = Field(..., description="邮箱地址，或域名规则：@example.com（整个域名）、@*.example.com（任意子域名）")
     description: Optional[str] = Field(None, description="描述")
 
 
@@ -59,12 +59,36 @@ class PartnerEmailMappingCreate(PartnerEmailMappingBase):
 class PartnerEmailMappingInfo(PartnerEmailMappingBase):
     mapping_id: int
     identity_id: int
+    match_type: str = Field(..., description="规则类型：EXACT、DOMAIN、SUBDOMAIN")
     created_at: datetime
     
     class Config:
         orm_mode = True
 
 
+# 批量邮箱路由请求Schema
+class EmailResolveRequest(BaseModel):
+    emails: List[str] = Field(..., description="待识别的邮箱地址")
+
+
+# 单个邮箱的路由结果
+class EmailResolveResult(BaseModel):
+    email: str = Field(..., description="请求中的邮箱地址")
+    matched: bool = Field(..., description="是否匹配到合作商身份")
+    identity_id: Optional[int] = Field(None, description="身份识别ID")
+    partner_id: Optional[int] = Field(None, description="合作商ID")
+    mapping_id: Optional[int] = Field(None, description="命中的邮箱映射ID")
+    pattern: Optional[str] = Field(None, description="命中的映射规则")
+    match_type: Optional[str] = Field(None, description="命中的规则类型：EXACT、DOMAIN、SUBDOMAIN")
+
+
+# 批量邮箱路由响应Schema
+class EmailResolveResponse(BaseModel):
+    results: List[EmailResolveResult] = Field(..., description="与请求顺序一致的路由结果")
+    matched: int = Field(..., description="匹配到身份的邮箱数")
+    unmatched: int = Field(..., description="未匹配的邮箱数")
+
+
 # 更新模型中的循环引用
 PartnerIdentityDetail.update_forward_refs()
 
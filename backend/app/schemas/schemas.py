@@ -3,6 +3,8 @@ from typing import Optional, List, Dict, Any, Union
 from datetime import date, datetime
 from enum import Enum
 
+from app.schemas import lead_schemas
+
 
 # Enum definitions for various status types
 class LicenseStatusEnum(str, Enum):
@@ -324,6 +326,7 @@ class EngineerAssignmentInfo(BaseModel):
 
 class PurchaseRecordInfo(PurchaseRecordBase):
     PurchaseID: int
+    AmountBase: Optional[float] = None  # Amount in settings.BASE_CURRENCY, None until the currency has rates
     CreatedAt: datetime
     UpdatedAt: datetime
     
@@ -376,6 +379,257 @@ class ChangeTrackingInfo(ChangeTrackingBase):
         orm_mode = True
 
 
+class ChangeHistoryPage(BaseModel):
+    Items: List[ChangeTrackingInfo]
+    NextBeforeID: Optional[int] = None  # pass as before_id for the next (older) page
+
+
+class TimelineEntry(BaseModel):
+    Source: str  # changes, purchases, deployments or activations
+    SourceID: int
+    Timestamp: datetime
+    LicenseID: Optional[str] = None
+    Summary: str
+    Details: Dict[str, Any] = {}
+
+
+class TimelinePage(BaseModel):
+    Items: List[TimelineEntry]
+    NextCursor: Optional[str] = None  # pass as cursor for the next (older) page
+
+
+# Reference data (lookup tables + enums) fetched once by the frontend
+class ReferenceDataResponse(BaseModel):
+    LeadStatuses: List[lead_schemas.LeadStatus]
+    LeadSources: List[lead_schemas.LeadSource]
+    SalesReps: List[SalesRepInfo]
+    Resellers: List[ResellerInfo]
+    Engineers: List[EngineerInfo]
+    Enums: Dict[str, List[str]]
+    Versions: Dict[str, int]
+
+
+# Revenue forecast
+class ForecastSeries(BaseModel):
+    Key: str  # sales_rep_id or region ("" = unassigned)
+    Values: List[float]  # one value per entry of SalesForecast.Months
+
+
+class ForecastComponent(BaseModel):
+    Total: List[float]
+    Groups: List[ForecastSeries] = []
+
+
+class SalesForecast(BaseModel):
+    Months: List[str]  # YYYY-MM, starting with the current month
+    GroupBy: Optional[str] = None
+    Pipeline: ForecastComponent  # probability-weighted open leads by expected close month
+    Renewals: ForecastComponent  # expiring licenses x latest amount x renewal rate
+    Combined: ForecastComponent  # Pipeline + Renewals
+    Trend: ForecastComponent  # extrapolated from monthly purchase history
+    RenewalRate: float
+    TrendMethod: str
+    HistoryMonths: int
+    Currency: str  # all amounts are in the base currency
+    Versions: Dict[str, int]
+    GeneratedAt: datetime
+
+
+# Engineer capacity planning
+class DeploymentRequirement(BaseModel):
+    LicenseID: str
+    DeploymentType: DeploymentTypeEnum
+    DeploymentDate: date
+    RequiredSkills: List[str] = []  # each must appear in the engineer's Expertise
+    EngineersNeeded: int = Field(1, ge=1, le=20)
+    ExpectedDurationDays: Optional[int] = Field(None, ge=1, le=365)  # default: learned from completed deployments
+
+
+class AssignmentProposalRequest(BaseModel):
+    Deployments: List[DeploymentRequirement]
+
+
+class DeploymentDuration(BaseModel):
+    Days: int
+    Samples: int
+
+
+class ProposedEngineer(BaseModel):
+    EngineerID: int
+    EngineerName: str
+    Email: Optional[str] = None
+
+
+class ProposedAssignment(BaseModel):
+    Index: int  # position in the request
+    LicenseID: str
+    DeploymentType: DeploymentTypeEnum
+    StartDate: date
+    EndDate: date
+    ExpectedDurationDays: int
+    Engineers: List[ProposedEngineer]
+    ConflictDays: int  # days overlapping the engineers' existing work
+    Cost: float
+    Reason: Optional[str] = None  # why the deployment could not be fully staffed
+
+
+class AssignmentProposal(BaseModel):
+    Assignments: List[ProposedAssignment]
+    Unassigned: List[ProposedAssignment]
+    Durations: Dict[str, DeploymentDuration]  # by deployment type, "*" = all types
+    EngineersConsidered: int
+    SolveMs: float
+
+
+class EngineerCapacity(BaseModel):
+    EngineerID: int
+    EngineerName: str
+    Expertise: Optional[str] = None
+    ActiveDeployments: int
+    BusyDays: int
+    Utilization: float
+    PeakConcurrent: int
+    NextFreeDate: Optional[date] = None  # None = busy for the whole window
+
+
+class CapacityOverview(BaseModel):
+    StartDate: date
+    Days: int
+    Durations: Dict[str, DeploymentDuration]
+    Engineers: List[EngineerCapacity]
+
+
+# Customer matching and deduplication
+class CustomerMatchCandidate(BaseModel):
+    CustomerID: int
+    CustomerName: str
+    ContactEmail: Optional[str] = None
+    ContactPhone: Optional[str] = None
+    Score: float  # 0..1
+    Reasons: List[str]  # name / similar_name / domain / phone
+
+
+class CustomerDuplicate(BaseModel):
+    CustomerID: int
+    CustomerName: str
+    Score: float
+    Reasons: List[str]
+    Licenses: int
+
+
+class CustomerDuplicateGroup(BaseModel):
+    SurvivorID: int  # proposed customer to keep: most licenses, then oldest
+    SurvivorName: str
+    SurvivorLicenses: int
+    Duplicates: List[CustomerDuplicate]
+
+
+class CustomerDuplicateScan(BaseModel):
+    CustomersScanned: int
+    PairsCompared: int
+    TotalGroups: int
+    Groups: List[CustomerDuplicateGroup]
+    ElapsedMs: float
+
+
+class CustomerMergeRequest(BaseModel):
+    SurvivorID: int
+    DuplicateIDs: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class CustomerMergeResult(BaseModel):
+    SurvivorID: int
+    MergedIDs: List[int]
+    LicensesMoved: int
+    PurchaseOrdersMoved: int
+    OrdersMoved: int
+    FilledFields: List[str]  # survivor fields that were empty and taken from a duplicate
+
+
+# FX rates (base-currency amounts)
+class FxRateCreate(BaseModel):
+    Currency: str = Field(..., min_length=3, max_length=3)
+    RateDate: date
+    Rate: float = Field(..., gt=0)  # units of the base currency per 1 unit of Currency
+    Source: Optional[str] = None
+
+
+class FxRateInfo(FxRateCreate):
+    CreatedAt: datetime
+    UpdatedAt: datetime
+
+
+class FxRateUpsertRequest(BaseModel):
+    Rates: List[FxRateCreate]
+
+
+class FxRateUpsertResult(BaseModel):
+    Inserted: int
+    Updated: int
+    Recomputed: Dict[str, int]  # rows whose base amount was recomputed, by table
+
+
+class FxCurrencyRange(BaseModel):
+    Currency: str
+    FirstDate: date
+    LastDate: date
+    Rates: int
+
+
+class FxStatus(BaseModel):
+    BaseCurrency: str
+    Currencies: List[FxCurrencyRange]
+    Unconverted: Dict[str, Dict[str, int]]  # rows without a base amount, by table and currency
+
+
+# Bulk import (one spreadsheet row each; names/emails are resolved to IDs by the importer)
+class CustomerImportRow(CustomerBase):
+    pass
+
+
+class LicenseImportRow(BaseModel):
+    LicenseID: Optional[str] = Field(None, max_length=50)  # kept from the old system; generated when empty
+    CustomerID: Optional[int] = None
+    CustomerName: Optional[str] = None  # used when CustomerID is empty
+    SalesRepID: Optional[int] = None
+    SalesRepEmail: Optional[str] = None  # used when SalesRepID is empty
+    ResellerID: Optional[int] = None
+    ResellerName: Optional[str] = None  # used when ResellerID is empty
+    ProductName: str = "Dify Enterprise"
+    ProductVersion: Optional[str] = None
+    LicenseType: str
+    OrderDate: Optional[date] = None  # defaults to StartDate
+    StartDate: date
+    ExpiryDate: date
+    AuthorizedWorkspaces: int = 0
+    AuthorizedUsers: int = 0
+    LicenseStatus: Optional[LicenseStatusEnum] = None  # defaults to ACTIVE/EXPIRED/PENDING from the dates
+    Notes: Optional[str] = None
+
+
+class PurchaseRecordImportRow(PurchaseRecordBase):
+    pass
+
+
+class BulkImportRequest(BaseModel):
+    Path: str  # CSV/XLSX file under BULK_IMPORT_DIR
+    ColumnMapping: Optional[Dict[str, str]] = None  # file header -> row field, on top of the built-in aliases
+    DryRun: bool = False  # validate and resolve only, write nothing
+    Encoding: Optional[str] = None  # CSV encoding, default utf-8-sig
+
+
+class BulkImportResult(BaseModel):
+    Entity: str
+    DryRun: bool
+    RowsRead: int
+    Inserted: int  # would be inserted, for a dry run
+    Skipped: int  # already present
+    Failed: int  # failed validation or reference resolution
+    IgnoredColumns: List[str]
+    ReportPath: Optional[str] = None  # CSV of failed/skipped rows, relative to BULK_IMPORT_DIR
+    Seconds: float
+
+
 # Statistics and dashboard schemas
 class CustomerStatistics(BaseModel):
     TotalCustomers: int
@@ -429,6 +683,47 @@ class LicenseIdResponse(BaseModel):
     licenseId: str
 
 
+# Batch renewal schemas
+class LicenseRenewalItem(BaseModel):
+    LicenseID: str
+    PurchaseType: PurchaseTypeEnum = PurchaseTypeEnum.RENEWAL  # RENEWAL or EXPANSION
+    NewExpiryDate: Optional[date] = None  # required for RENEWAL
+    WorkspacesPurchased: int = 0  # RENEWAL sets the authorized quantity, EXPANSION adds to it
+    UsersPurchased: int = 0
+    Amount: float = 0
+    Currency: Optional[str] = None  # defaults to the request-level value
+    OrderNumber: Optional[str] = None
+    ContractNumber: Optional[str] = None
+    Notes: Optional[str] = None
+
+
+class LicenseBatchRenewalRequest(BaseModel):
+    Items: List[LicenseRenewalItem]
+    PurchaseDate: date
+    OrderNumber: Optional[str] = None
+    ContractNumber: Optional[str] = None
+    Currency: str = "USD"
+    PaymentStatus: PaymentStatusEnum = PaymentStatusEnum.PENDING
+    PaymentDate: Optional[date] = None
+    DryRun: bool = False  # compute the diff without writing
+
+
+class LicenseRenewalResult(BaseModel):
+    LicenseID: str
+    Success: bool
+    Message: Optional[str] = None
+    Changes: Dict[str, Dict[str, Any]] = {}  # field -> {"old": ..., "new": ...}
+
+
+class LicenseBatchRenewalResponse(BaseModel):
+    Total: int
+    Succeeded: int
+    Failed: int
+    Reactivated: int  # licenses whose status changed to ACTIVE
+    DryRun: bool
+    Results: List[LicenseRenewalResult]
+
+
 # Partner schemas
 class PartnerBase(BaseModel):
     PartnerName: str
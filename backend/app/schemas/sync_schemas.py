@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from typing import List
+from pydantic import BaseModel, Field
+
+from app.schemas import schemas, order_schemas, lead_schemas
+
+
+# 各实体的增量变更：upserts按updated_at升序，deletes为已删除记录的主键
+class LicenseChanges(BaseModel):
+    upserts: List[schemas.LicenseInfo] = []
+    deletes: List[str] = []
+
+class CustomerChanges(BaseModel):
+    upserts: List[schemas.CustomerInfo] = []
+    deletes: List[str] = []
+
+class PurchaseOrderChanges(BaseModel):
+    upserts: List[order_schemas.PurchaseOrderInfo] = []
+    deletes: List[str] = []
+
+class LeadChanges(BaseModel):
+    upserts: List[lead_schemas.LeadInDB] = []
+    deletes: List[str] = []
+
+
+# 增量同步响应
+class SyncResponse(BaseModel):
+    next_token: str = Field(..., description="下次请求时作为since参数传入的同步令牌")
+    has_more: bool = Field(False, description="是否还有未返回的变更，为true时应立即使用next_token继续拉取")
+    licenses: LicenseChanges = LicenseChanges()
+    customers: CustomerChanges = CustomerChanges()
+    purchase_orders: PurchaseOrderChanges = PurchaseOrderChanges()
+    leads: LeadChanges = LeadChanges()
@@ -0,0 +1,132 @@
+"""
+激活方式变更记录服务
+变更记录写入只追加的activation_events表，按(created_at, event_id)倒序分页读取
+"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, insert
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+import base64
+
+from app.models.models import ActivationEvent
+
+# activation-info 中附带的最近记录条数，完整记录通过分页接口获取
+RECENT_EVENTS_LIMIT = 20
+
+
+class ActivationEventService:
+    """激活方式变更记录的写入与分页查询"""
+
+    @staticmethod
+    def record(
+        db: Session,
+        license_id: str,
+        from_mode: str,
+        to_mode: str,
+        cluster_id: Optional[str] = None,
+        changed_by: Optional[str] = None,
+        created_at: Optional[datetime] = None
+    ) -> ActivationEvent:
+        """追加一条变更记录（不提交事务），离线模式才记录集群ID"""
+        event = ActivationEvent(
+            license_id=license_id,
+            from_mode=from_mode or "ONLINE",
+            to_mode=to_mode,
+            cluster_id=cluster_id if to_mode == "OFFLINE" else None,
+            changed_by=changed_by,
+            created_at=created_at or datetime.now()
+        )
+        db.add(event)
+        return event
+
+    @staticmethod
+    def record_many(db: Session, events: List[Dict[str, Any]]) -> int:
+        """批量追加变更记录（单条多行INSERT，不提交事务），返回写入条数"""
+        if not events:
+            return 0
+        now = datetime.now()
+        rows = [
+            {
+                "license_id": event["license_id"],
+                "from_mode": event.get("from_mode") or "ONLINE",
+                "to_mode": event["to_mode"],
+                "cluster_id": event.get("cluster_id") if event["to_mode"] == "OFFLINE" else None,
+                "changed_by": event.get("changed_by"),
+                "created_at": event.get("created_at") or now
+            }
+            for event in events
+        ]
+        db.execute(insert(ActivationEvent), rows)
+        return len(rows)
+
+    @staticmethod
+    def encode_cursor(event: ActivationEvent) -> str:
+        raw = f"{event.created_at.isoformat()}|{event.event_id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """解析分页游标，格式错误时抛出ValueError"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, event_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+            return datetime.fromisoformat(created_at), int(event_id)
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise ValueError(f"无效的分页游标: {e}")
+
+    @staticmethod
+    def list_events(
+        db: Session,
+        license_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """
+        按时间倒序分页获取变更记录
+
+        使用(created_at, event_id)键集分页，翻页代价不随页数增长；
+        按许可证查询走(license_id, created_at)索引，按时间范围查询走created_at索引
+        """
+        query = db.query(ActivationEvent)
+        if license_id:
+            query = query.filter(ActivationEvent.license_id == license_id)
+        if since:
+            query = query.filter(ActivationEvent.created_at >= since)
+        if until:
+            query = query.filter(ActivationEvent.created_at < until)
+        if cursor:
+            cursor_time, cursor_id = ActivationEventService.decode_cursor(cursor)
+            query = query.filter(or_(
+                ActivationEvent.created_at < cursor_time,
+                and_(ActivationEvent.created_at == cursor_time, ActivationEvent.event_id < cursor_id)
+            ))
+
+        events = query.order_by(ActivationEvent.created_at.desc(), ActivationEvent.event_id.desc())\
+            .limit(limit + 1)\
+            .all()
+
+        has_more = len(events) > limit
+        events = events[:limit]
+        return {
+            "items": events,
+            "next_cursor": ActivationEventService.encode_cursor(events[-1]) if has_more else None
+        }
+
+    @staticmethod
+    def recent_history(db: Session, license_id: str, limit: int = RECENT_EVENTS_LIMIT) -> Dict[str, Any]:
+        """最近的变更记录，按时间正序，保持原activation_history的{"changes": [...]}结构"""
+        events = ActivationEventService.list_events(db, license_id=license_id, limit=limit)["items"]
+        return {
+            "changes": [
+                {
+                    "timestamp": event.created_at.isoformat() if event.created_at else None,
+                    "from_mode": event.from_mode,
+                    "to_mode": event.to_mode,
+                    "cluster_id": event.cluster_id
+                }
+                for event in reversed(events)
+            ]
+        }
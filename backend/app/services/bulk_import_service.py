@@ -0,0 +1,524 @@
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Type
+from abc import ABC, abstractmethod
+from datetime import datetime, date
+from itertools import chain
+from functools import lru_cache
+from types import SimpleNamespace
+import csv
+import json
+import os
+import re
+import time
+
+from app.core.config import settings
+from app.models.models import Customer, License, PurchaseRecord, SalesRep, Reseller, ChangeTracking
+from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.customer_match_service import CustomerMatchService
+from app.services.license_service import LicenseService
+from app.services.fx_service import FxService, default_currency
+from app.services.sales_performance_service import SalesPerformanceService, purchase_fact
+from app.services.lead_import_service import resolve_source_path, iter_csv, iter_xlsx, chunked
+
+DATE_PATTERN = re.compile(r"^(\d{4})[/.\-年](\d{1,2})[/.\-月](\d{1,2})日?$")  # 2024/1/5, 2024年1月5日
+GROUPED_NUMBER_PATTERN = re.compile(r"^-?\d{1,3}(,\d{3})+(\.\d+)?$")  # 12,000.50
+
+# (row number, issue) where issue is the report message
+Issue = Tuple[int, str]
+
+
+def header_key(header: Any) -> str:
+    """Headers and aliases are matched ignoring case, spaces, underscores and hyphens"""
+    return re.sub(r"[\s_\-]+", "", str(header or "")).lower()
+
+
+def clean_value(value: Any) -> Any:
+    """Spreadsheet cell -> value for the row model: blanks to None, Excel datetimes and common date/number formats normalized"""
+    if isinstance(value, datetime):
+        return value.date()
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    match = DATE_PATTERN.match(value)
+    if match:
+        year, month, day = match.groups()
+        return f"{year}-{int(month):02d}-{int(day):02d}"
+    if GROUPED_NUMBER_PATTERN.match(value):
+        return value.replace(",", "")
+    return value
+
+
+@lru_cache(maxsize=None)
+def column_lengths(model: Any) -> Dict[str, int]:
+    return {column.name: column.type.length for column in model.__table__.c if getattr(column.type, "length", None)}
+
+
+def too_long(model: Any, values: Dict[str, Any]) -> Optional[str]:
+    """The first string column whose value exceeds its length, so one bad row can't fail a whole batch insert"""
+    for column, length in column_lengths(model).items():
+        value = values.get(column)
+        if isinstance(value, str) and len(value) > length:
+            return column
+    return None
+
+
+def reference(label: str, given_id: Optional[int], known_ids: set, key: Optional[str], ids_by_key: Dict[str, int]) -> Tuple[Optional[int], Optional[str]]:
+    """(ID, problem) of an optional reference given either by ID or by a name/email key (matched case-insensitively)"""
+    if given_id:
+        return (given_id, None) if given_id in known_ids else (None, f"{label} {given_id} not found")
+    if key:
+        found = ids_by_key.get(key.strip().casefold())
+        return (found, None) if found else (None, f"{label} '{key}' not found")
+    return None, None
+
+
+class ErrorReport:
+    """CSV of failed and skipped rows with their original cells, created on the first issue"""
+
+    def __init__(self, entity: str):
+        self.relative_path = os.path.join("reports", f"{entity}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.csv")
+        self._file = None
+        self._writer = None
+
+    def write(self, row_number: int, status: str, message: str, data: Dict[Any, Any]) -> None:
+        if self._writer is None:
+            path = os.path.join(settings.BULK_IMPORT_DIR, self.relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, "w", newline="", encoding="utf-8-sig")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["row", "status", "message", "data"])
+        self._writer.writerow([row_number, status, message, json.dumps(data, ensure_ascii=False, default=str)])
+
+    def close(self) -> Optional[str]:
+        """Relative path of the report, None if nothing was reported"""
+        if self._file is None:
+            return None
+        self._file.close()
+        return self.relative_path
+
+
+class BulkImporter(ABC):
+    """One importable entity: its row model, header aliases, reference resolution and batch insert"""
+
+    entity: str
+    row_model: Type[BaseModel]
+    aliases: Dict[str, Tuple[str, ...]] = {}
+    upper_fields: Tuple[str, ...] = ()  # enum/currency codes, accepted in any case
+
+    def __init__(self):
+        self.fields_by_header = {header_key(field): field for field in self.row_model.model_fields}
+        for field, aliases in self.aliases.items():
+            for alias in aliases:
+                self.fields_by_header.setdefault(header_key(alias), field)
+
+    def map_headers(self, headers: List[Any], column_mapping: Optional[Dict[str, str]]) -> Tuple[Dict[Any, str], List[str]]:
+        """(file header -> row field, ignored headers); column_mapping entries win over the aliases"""
+        explicit = {header_key(header): field for header, field in (column_mapping or {}).items()}
+        unknown = set(explicit.values()) - set(self.row_model.model_fields)
+        if unknown:
+            raise ValueError(f"Unknown {self.entity} fields in column mapping: {', '.join(sorted(unknown))}")
+        mapping, ignored = {}, []
+        for header in headers:
+            field = explicit.get(header_key(header)) or self.fields_by_header.get(header_key(header))
+            if field and field not in mapping.values():
+                mapping[header] = field
+            elif header not in (None, ""):
+                ignored.append(str(header))
+        return mapping, ignored
+
+    def prepare(self, raw: Dict[Any, Any], mapping: Dict[Any, str]) -> Dict[str, Any]:
+        values = {}
+        for header, field in mapping.items():
+            value = clean_value(raw.get(header))
+            if value is not None:
+                values[field] = value.upper() if field in self.upper_fields and isinstance(value, str) else value
+        return values
+
+    def validate(self, batch: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Tuple[int, Any]], List[Issue]]:
+        """
+        Validate a batch row by row: one invalid row would fail a whole-list validation, and real files have
+        a few bad rows in most batches, so validating the list first would validate most rows twice
+        """
+        valid, failed = [], []
+        for row_number, values in batch:
+            try:
+                valid.append((row_number, self.row_model.model_validate(values)))
+            except ValidationError as e:
+                failed.append((row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                )))
+        return valid, failed
+
+    @abstractmethod
+    def resolve(self, db: Session, rows: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, Any]], List[Issue], List[Issue]]:
+        """(rows ready to insert, failed, skipped as already present), with set-based lookups for the whole batch"""
+
+    @abstractmethod
+    def insert(self, db: Session, items: List[Any]) -> None:
+        """Insert the resolved rows of a batch; the caller commits"""
+
+
+class CustomerImporter(BulkImporter):
+    """Customers; a name that already exists (exactly) is skipped, fuzzy duplicates are left to the duplicate scan"""
+
+    entity = "customers"
+    row_model = schemas.CustomerImportRow
+    aliases = {
+        "CustomerName": ("customer", "name", "company", "客户", "客户名称", "公司名称"),
+        "ContactPerson": ("contact", "联系人"),
+        "ContactEmail": ("email", "邮箱"),
+        "ContactPhone": ("phone", "电话"),
+        "Address": ("地址",),
+        "Industry": ("行业",),
+        "CustomerType": ("type", "客户类型"),
+        "Region": ("地区", "区域"),
+        "Notes": ("备注",),
+    }
+
+    def resolve(self, db, rows):
+        names = {row.CustomerName.strip() for _, row in rows}
+        existing = {name.casefold() for (name,) in db.query(Customer.customer_name).filter(Customer.customer_name.in_(names))}
+        ready, failed, skipped = [], [], []
+        for row_number, row in rows:
+            key = row.CustomerName.strip().casefold()
+            if key in existing:
+                skipped.append((row_number, f"Customer '{row.CustomerName.strip()}' already exists"))
+                continue
+            values = {
+                "customer_name": row.CustomerName.strip(), "contact_person": row.ContactPerson,
+                "contact_email": row.ContactEmail, "contact_phone": row.ContactPhone, "address": row.Address,
+                "industry": row.Industry, "customer_type": row.CustomerType, "region": row.Region, "notes": row.Notes,
+            }
+            column = too_long(Customer, values)
+            if column:
+                failed.append((row_number, f"{column} is too long"))
+                continue
+            existing.add(key)
+            ready.append((row_number, values))
+        return ready, failed, skipped
+
+    def insert(self, db, items):
+        # Multi-row INSERT, then the new IDs by name (unique within the batch and new to the table): the ORM
+        # would insert row by row to get each generated key back on databases without INSERT ... RETURNING
+        now = datetime.now()
+        db.execute(insert(Customer), [dict(values, created_at=now, updated_at=now) for values in items])
+        ids = dict(
+            db.query(Customer.customer_name, Customer.customer_id)
+            .filter(Customer.customer_name.in_([values["customer_name"] for values in items]))
+        )
+        CustomerMatchService.index_new_customers(
+            db, [SimpleNamespace(customer_id=ids[values["customer_name"]], **values) for values in items]
+        )
+        TableVersionService.bump(db, "customers")
+
+
+class LicenseImporter(BulkImporter):
+    """Licenses, keeping the old system's license IDs (a license ID that already exists is skipped)"""
+
+    entity = "licenses"
+    row_model = schemas.LicenseImportRow
+    upper_fields = ("LicenseStatus",)
+    aliases = {
+        "LicenseID": ("license", "license_no", "许可证号", "许可证ID"),
+        "CustomerName": ("customer", "客户", "客户名称"),
+        "SalesRepEmail": ("sales_rep", "sales", "销售", "销售邮箱"),
+        "ResellerName": ("reseller", "经销商"),
+        "ProductName": ("product", "产品"),
+        "ProductVersion": ("version", "版本"),
+        "LicenseType": ("type", "许可证类型"),
+        "OrderDate": ("订单日期",),
+        "StartDate": ("start", "开始日期"),
+        "ExpiryDate": ("expiry", "end_date", "到期日期"),
+        "AuthorizedWorkspaces": ("workspaces", "授权工作区"),
+        "AuthorizedUsers": ("users", "授权用户"),
+        "LicenseStatus": ("status", "状态"),
+        "Notes": ("备注",),
+    }
+
+    def resolve(self, db, rows):
+        customer_ids = {row.CustomerID for _, row in rows if row.CustomerID}
+        known_customers = {customer_id for (customer_id,) in db.query(Customer.customer_id).filter(Customer.customer_id.in_(customer_ids))}
+        customers_by_name: Dict[str, List[int]] = {}
+        names = {row.CustomerName.strip() for _, row in rows if not row.CustomerID and row.CustomerName}
+        for name, customer_id in db.query(Customer.customer_name, Customer.customer_id).filter(Customer.customer_name.in_(names)):
+            customers_by_name.setdefault(name.casefold(), []).append(customer_id)
+
+        emails = {row.SalesRepEmail.strip().lower() for _, row in rows if not row.SalesRepID and row.SalesRepEmail}
+        reps_by_email = {
+            email.casefold(): sales_rep_id for sales_rep_id, email in
+            db.query(SalesRep.sales_rep_id, SalesRep.email).filter(func.lower(SalesRep.email).in_(emails))
+        }
+        rep_ids = {row.SalesRepID for _, row in rows if row.SalesRepID}
+        known_reps = {rep_id for (rep_id,) in db.query(SalesRep.sales_rep_id).filter(SalesRep.sales_rep_id.in_(rep_ids))}
+        reseller_names = {row.ResellerName.strip() for _, row in rows if not row.ResellerID and row.ResellerName}
+        resellers_by_name = {
+            name.casefold(): reseller_id for reseller_id, name in
+            db.query(Reseller.reseller_id, Reseller.reseller_name).filter(Reseller.reseller_name.in_(reseller_names))
+        }
+        reseller_ids = {row.ResellerID for _, row in rows if row.ResellerID}
+        known_resellers = {reseller_id for (reseller_id,) in db.query(Reseller.reseller_id).filter(Reseller.reseller_id.in_(reseller_ids))}
+
+        given_ids = {row.LicenseID for _, row in rows if row.LicenseID}
+        taken = {license_id for (license_id,) in db.query(License.license_id).filter(License.license_id.in_(given_ids))}
+
+        today = date.today()
+        ready, failed, skipped = [], [], []
+        for row_number, row in rows:
+            if row.LicenseID and row.LicenseID in taken:
+                skipped.append((row_number, f"License '{row.LicenseID}' already exists"))
+                continue
+            if row.CustomerID:
+                customer_id = row.CustomerID if row.CustomerID in known_customers else None
+                problem = f"Customer {row.CustomerID} not found"
+            elif row.CustomerName:
+                matches = customers_by_name.get(row.CustomerName.strip().casefold(), [])
+                customer_id = matches[0] if len(matches) == 1 else None
+                problem = f"Customer '{row.CustomerName}' " + ("not found" if not matches else f"matches {len(matches)} customers; give CustomerID")
+            else:
+                customer_id, problem = None, "CustomerID or CustomerName is required"
+            if customer_id is None:
+                failed.append((row_number, problem))
+                continue
+            sales_rep_id, problem = reference("Sales rep", row.SalesRepID, known_reps, row.SalesRepEmail, reps_by_email)
+            if problem:
+                failed.append((row_number, problem))
+                continue
+            reseller_id, problem = reference("Reseller", row.ResellerID, known_resellers, row.ResellerName, resellers_by_name)
+            if problem:
+                failed.append((row_number, problem))
+                continue
+            if row.ExpiryDate < row.StartDate:
+                failed.append((row_number, "ExpiryDate is before StartDate"))
+                continue
+
+            status = row.LicenseStatus.value if row.LicenseStatus else (
+                "PENDING" if row.StartDate > today else "EXPIRED" if row.ExpiryDate < today else "ACTIVE"
+            )
+            values = {
+                "license_id": row.LicenseID, "customer_id": customer_id, "sales_rep_id": sales_rep_id,
+                "reseller_id": reseller_id, "product_name": row.ProductName, "product_version": row.ProductVersion,
+                "license_type": row.LicenseType, "order_date": row.OrderDate or row.StartDate,
+                "start_date": row.StartDate, "expiry_date": row.ExpiryDate,
+                "authorized_workspaces": row.AuthorizedWorkspaces, "authorized_users": row.AuthorizedUsers,
+                "actual_workspaces": 0, "actual_users": 0, "license_status": status, "notes": row.Notes,
+            }
+            column = too_long(License, values)
+            if column:
+                failed.append((row_number, f"{column} is too long"))
+                continue
+            if row.LicenseID:
+                taken.add(row.LicenseID)  # a later row with the same ID in this batch is skipped
+            ready.append((row_number, values))
+
+        # Generated IDs have a short random part: re-draw the few that collide with existing or batch IDs
+        pending = [values for _, values in ready if not values["license_id"]]
+        while pending:
+            for values in pending:
+                values["license_id"] = LicenseService.generate_license_id(values["license_type"])
+            drawn = {values["license_id"] for values in pending}
+            collided = {license_id for (license_id,) in db.query(License.license_id).filter(License.license_id.in_(drawn))}
+            seen = set(taken)
+            retry = []
+            for values in pending:
+                if values["license_id"] in collided or values["license_id"] in seen:
+                    retry.append(values)
+                seen.add(values["license_id"])
+            taken |= drawn
+            pending = retry
+        return ready, failed, skipped
+
+    def insert(self, db, items):
+        now = datetime.now()
+        db.execute(insert(License), [dict(values, created_at=now, updated_at=now) for values in items])
+        db.execute(insert(ChangeTracking), [
+            {
+                "table_name": "licenses",
+                "record_id": values["license_id"],
+                "field_name": "creation",
+                "new_value": json.dumps({
+                    "license_id": values["license_id"],
+                    "customer_id": values["customer_id"],
+                    "license_type": values["license_type"],
+                    "created_at": now.isoformat(),
+                }),
+                "changed_by": "system",
+                "change_reason": "Bulk import",
+                "changed_at": now,
+            }
+            for values in items
+        ])
+        TableVersionService.bump(db, "licenses")
+
+
+class PurchaseRecordImporter(BulkImporter):
+    """
+    Historical purchase records of existing licenses. Unlike a single renewal/expansion entered through the API,
+    an imported record does not move the license's dates or capacity: the licenses are imported in their current state.
+    A row identical to an existing record (license, type, date, amount, order number) is skipped, so a failed
+    import can be re-run.
+    """
+
+    entity = "purchases"
+    row_model = schemas.PurchaseRecordImportRow
+    upper_fields = ("PurchaseType", "PaymentStatus", "Currency")
+    aliases = {
+        "LicenseID": ("license", "license_no", "许可证号", "许可证ID"),
+        "PurchaseType": ("type", "购买类型"),
+        "PurchaseDate": ("date", "购买日期"),
+        "OrderNumber": ("order", "订单号"),
+        "ContractNumber": ("contract", "合同号"),
+        "Amount": ("金额",),
+        "Currency": ("币种",),
+        "PaymentStatus": ("payment", "付款状态"),
+        "PaymentDate": ("付款日期",),
+        "WorkspacesPurchased": ("workspaces",),
+        "UsersPurchased": ("users",),
+        "NewExpiryDate": ("新到期日期",),
+        "Notes": ("备注",),
+    }
+
+    @staticmethod
+    def _key(license_id: str, purchase_type: str, purchase_date: date, amount: float, order_number: Optional[str]) -> Tuple:
+        return license_id, purchase_type, purchase_date, round(amount, 2), order_number or None
+
+    def resolve(self, db, rows):
+        license_ids = {row.LicenseID for _, row in rows}
+        licenses = {
+            row.license_id: row for row in db.query(License.license_id, License.sales_rep_id, License.reseller_id, License.product_name)
+            .filter(License.license_id.in_(license_ids))
+        }
+        existing = {
+            self._key(*row) for row in db.query(
+                PurchaseRecord.license_id, PurchaseRecord.purchase_type, PurchaseRecord.purchase_date,
+                PurchaseRecord.amount, PurchaseRecord.order_number
+            ).filter(PurchaseRecord.license_id.in_(license_ids))
+        }
+        currency_default = default_currency(PurchaseRecord)
+
+        ready, failed, skipped = [], [], []
+        for row_number, row in rows:
+            license = licenses.get(row.LicenseID)
+            if license is None:
+                failed.append((row_number, f"License '{row.LicenseID}' not found"))
+                continue
+            key = self._key(row.LicenseID, row.PurchaseType.value, row.PurchaseDate, row.Amount, row.OrderNumber)
+            if key in existing:
+                skipped.append((row_number, "Purchase record already exists"))
+                continue
+            values = {
+                "license_id": row.LicenseID, "purchase_type": row.PurchaseType.value, "purchase_date": row.PurchaseDate,
+                "order_number": row.OrderNumber, "contract_number": row.ContractNumber, "amount": row.Amount,
+                "currency": row.Currency, "payment_status": row.PaymentStatus.value, "payment_date": row.PaymentDate,
+                "workspaces_purchased": row.WorkspacesPurchased, "users_purchased": row.UsersPurchased,
+                "previous_expiry_date": row.PreviousExpiryDate, "new_expiry_date": row.NewExpiryDate, "notes": row.Notes,
+            }
+            column = too_long(PurchaseRecord, values)
+            if column:
+                failed.append((row_number, f"{column} is too long"))
+                continue
+            values["amount_base"] = FxService.to_base(db, row.Amount, row.Currency, row.PurchaseDate, currency_default)
+            existing.add(key)
+            ready.append((row_number, (values, license)))
+        return ready, failed, skipped
+
+    def insert(self, db, items):
+        now = datetime.now()
+        db.execute(insert(PurchaseRecord), [dict(values, created_at=now, updated_at=now) for values, _ in items])
+        SalesPerformanceService.record(db, added=[purchase_fact(license, SimpleNamespace(**values)) for values, license in items])
+        TableVersionService.bump(db, "purchase_records")
+
+
+IMPORTERS: Dict[str, BulkImporter] = {
+    importer.entity: importer for importer in (CustomerImporter(), LicenseImporter(), PurchaseRecordImporter())
+}
+
+
+class BulkImportService:
+    """
+    Bulk import of customers, licenses and purchase records from CSV/XLSX files under BULK_IMPORT_DIR.
+
+    Rows stream from the file (csv.reader / openpyxl read-only mode) in batches of BULK_IMPORT_BATCH_SIZE:
+    each batch is validated with the entity's Pydantic row model, its names/emails are resolved to IDs
+    with one IN query per referenced table, and the rows that pass are inserted with multi-row INSERTs
+    and committed, so memory stays at one batch whatever the file size. Rows already present are
+    skipped, which makes an interrupted import safe to re-run. Failed and skipped rows are written,
+    with their original cells, to a CSV report. A dry run resolves and checks each batch the same way
+    but, writing nothing, only sees duplicates within a batch, not across batches of the file.
+    """
+
+    @staticmethod
+    def _read(full_path: str, encoding: Optional[str]) -> Iterator[Tuple[int, Dict[Any, Any]]]:
+        suffix = os.path.splitext(full_path)[1].lower()
+        if suffix == ".csv":
+            return iter_csv(full_path, encoding=encoding or "utf-8-sig")
+        if suffix == ".xlsx":
+            return iter_xlsx(full_path)
+        raise ValueError("Bulk import reads .csv and .xlsx files")
+
+    @staticmethod
+    def run(
+        db: Session,
+        entity: str,
+        path: str,
+        column_mapping: Optional[Dict[str, str]] = None,
+        dry_run: bool = False,
+        encoding: Optional[str] = None
+    ) -> Dict[str, Any]:
+        importer = IMPORTERS.get(entity)
+        if importer is None:
+            raise ValueError(f"Unknown import entity '{entity}'; expected one of {', '.join(IMPORTERS)}")
+        full_path = resolve_source_path(path, settings.BULK_IMPORT_DIR)
+        if os.path.isdir(full_path):
+            raise ValueError("Bulk import reads .csv and .xlsx files")
+        started = time.monotonic()
+
+        rows = BulkImportService._read(full_path, encoding)
+        first = next(rows, None)
+        mapping, ignored = importer.map_headers(list(first[1]) if first else [], column_mapping)
+        if first and not mapping:
+            raise ValueError(f"No column of the file matches a {entity} field")
+
+        report = ErrorReport(entity)
+        read = inserted = skipped_count = failed_count = 0
+        try:
+            for batch in chunked(chain([first] if first else [], rows), settings.BULK_IMPORT_BATCH_SIZE):
+                raw = dict(batch)
+                prepared = [(row_number, importer.prepare(cells, mapping)) for row_number, cells in batch]
+                prepared = [(row_number, values) for row_number, values in prepared if values]  # blank lines
+                read += len(prepared)
+
+                valid, failed = importer.validate(prepared)
+                ready, unresolved, skipped = importer.resolve(db, valid) if valid else ([], [], [])
+                failed += unresolved
+                if ready and not dry_run:
+                    importer.insert(db, [item for _, item in ready])
+                    db.commit()
+
+                inserted += len(ready)
+                failed_count += len(failed)
+                skipped_count += len(skipped)
+                for issues, status in ((failed, "FAILED"), (skipped, "SKIPPED")):
+                    for row_number, message in sorted(issues):
+                        report.write(row_number, status, message, raw[row_number])
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            report_path = report.close()
+
+        return {
+            "Entity": entity,
+            "DryRun": dry_run,
+            "RowsRead": read,
+            "Inserted": inserted,
+            "Skipped": skipped_count,
+            "Failed": failed_count,
+            "IgnoredColumns": ignored,
+            "ReportPath": report_path,
+            "Seconds": round(time.monotonic() - started, 2),
+        }
@@ -0,0 +1,333 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, text
+from sqlalchemy.engine import Engine
+from typing import List, Optional, Dict, Any, Tuple, Iterator, FrozenSet
+from datetime import datetime, date
+from functools import lru_cache
+import gzip
+import json
+import os
+import zlib
+
+from app.core.config import settings
+from app.models.models import ChangeTracking
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_KEY_CACHE_MONTHS = 24  # months whose record key sets are kept in memory
+PARTITION_MAXVALUE = "pmax"
+
+ARCHIVE_COLUMNS = (
+    "change_id", "table_name", "record_id", "field_name", "old_value",
+    "new_value", "changed_by", "change_reason", "changed_at",
+)
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def _committed_path(path: str) -> str:
+    return path + ".committed"
+
+
+def _committed_size(path: str) -> int:
+    """Bytes of an archive written by completed appends; the whole file for archives without the marker"""
+    try:
+        with open(_committed_path(path)) as marker:
+            return int(marker.read().strip())
+    except (OSError, ValueError):
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _set_committed_size(path: str, size: int) -> None:
+    tmp_path = _committed_path(path) + ".tmp"
+    with open(tmp_path, "w") as marker:
+        marker.write(str(size))
+        marker.flush()
+        os.fsync(marker.fileno())
+    os.replace(tmp_path, _committed_path(path))
+
+
+def iter_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Rows of one archived month in file order, streamed. The file is a series of gzip members, one per
+    appended batch; a member left incomplete by an interrupted append is ignored (its rows are still in
+    the hot table) and cut off by the next append.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                if not line.endswith("\n"):
+                    return
+                yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, zlib.error):
+        return
+
+
+@lru_cache(maxsize=ARCHIVE_KEY_CACHE_MONTHS)
+def _archive_keys(path: str, mtime: float, size: int) -> FrozenSet[str]:
+    """
+    The record keys ("table:record_id") present in one archived month, so history lookups skip months
+    that never touched the record. Only the keys are kept, for the most recently used months; cached
+    per (path, mtime, size) so an extended archive is picked up automatically.
+    """
+    return frozenset(f"{row['table_name']}:{row['record_id']}" for row in iter_archive(path))
+
+
+class ChangeTrackingService:
+    """
+    Retention for change_tracking: rows older than the retention window are moved, one calendar
+    month at a time, to gzip'd JSON-lines files and removed from the hot table. On MySQL the table
+    is range-partitioned by month so removal is a DROP PARTITION; elsewhere (SQLite) it is a batched
+    DELETE over the changed_at index. History lookups by record ID read both transparently.
+    """
+
+    @staticmethod
+    def archive_dir() -> str:
+        return settings.CHANGE_TRACKING_ARCHIVE_DIR
+
+    @staticmethod
+    def archive_path(month: date) -> str:
+        return os.path.join(ChangeTrackingService.archive_dir(), f"change_tracking-{month.year:04d}-{month.month:02d}.jsonl.gz")
+
+    @staticmethod
+    def archived_months() -> List[date]:
+        """Archived months, newest first"""
+        directory = ChangeTrackingService.archive_dir()
+        if not os.path.isdir(directory):
+            return []
+        months = []
+        for name in os.listdir(directory):
+            if name.startswith("change_tracking-") and name.endswith(".jsonl.gz"):
+                year, month = name[len("change_tracking-"):-len(".jsonl.gz")].split("-")
+                months.append(date(int(year), int(month), 1))
+        return sorted(months, reverse=True)
+
+    @staticmethod
+    def retention_cutoff(retention_months: Optional[int] = None, today: Optional[date] = None) -> date:
+        """First day of the oldest month kept in the hot table"""
+        if retention_months is None:
+            retention_months = settings.CHANGE_TRACKING_RETENTION_MONTHS
+        return add_months(month_start(today or date.today()), -retention_months)
+
+    # --- MySQL partition management -------------------------------------------------------
+
+    @staticmethod
+    def is_partitioned(engine: Engine) -> bool:
+        if engine.dialect.name != "mysql":
+            return False
+        with engine.connect() as conn:
+            count = conn.execute(text(
+                "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'change_tracking' AND PARTITION_NAME IS NOT NULL"
+            )).scalar()
+        return bool(count)
+
+    @staticmethod
+    def _partition_names(engine: Engine) -> List[str]:
+        with engine.connect() as conn:
+            return [row[0] for row in conn.execute(text(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'change_tracking' AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION"
+            ))]
+
+    @staticmethod
+    def _partition_clause(month: date) -> str:
+        upper = add_months(month, 1)
+        return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))"
+
+    @staticmethod
+    def ensure_future_partitions(engine: Engine, months_ahead: int = 3) -> List[str]:
+        """Split pmax so that every month up to months_ahead has its own partition"""
+        if not ChangeTrackingService.is_partitioned(engine):
+            return []
+        existing = set(ChangeTrackingService._partition_names(engine))
+        target = add_months(month_start(date.today()), months_ahead)
+        months = []
+        month = month_start(date.today())
+        while month <= target:
+            if partition_name(month) not in existing:
+                months.append(month)
+            month = add_months(month, 1)
+        if not months:
+            return []
+        clauses = ", ".join(ChangeTrackingService._partition_clause(month) for month in months)
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE change_tracking REORGANIZE PARTITION {PARTITION_MAXVALUE} INTO "
+                f"({clauses}, PARTITION {PARTITION_MAXVALUE} VALUES LESS THAN MAXVALUE)"
+            ))
+        return [partition_name(month) for month in months]
+
+    # --- Archival -------------------------------------------------------------------------
+
+    @staticmethod
+    def _row_to_dict(row: Any) -> Dict[str, Any]:
+        data = {column: getattr(row, column) for column in ARCHIVE_COLUMNS}
+        data["changed_at"] = row.changed_at.isoformat() if row.changed_at else None
+        return data
+
+    @staticmethod
+    def _append_archive(month: date, rows: List[Dict[str, Any]]) -> None:
+        """
+        Append one batch to a month's archive as a new gzip member and fsync it. The committed size is
+        only moved past the member once it is durable; an append interrupted before that is cut off here
+        on the next run, so a partial member never ends up in the middle of the file.
+        """
+        path = ChangeTrackingService.archive_path(month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        committed = _committed_size(path)
+        with open(path, "ab") as raw:
+            raw.truncate(committed)
+            raw.seek(committed)
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9) as archive:
+                archive.write("".join(
+                    json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows
+                ).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+            size = raw.tell()
+        _set_committed_size(path, size)
+
+    @staticmethod
+    def archive_month(db: Session, month: date, dry_run: bool = False) -> int:
+        """
+        Export one month of change_tracking to its archive file and remove it from the hot table,
+        ARCHIVE_BATCH_SIZE rows at a time: each batch is appended to the archive and durable before it
+        is deleted (without partitions), so memory stays at one batch however large the month.
+        Re-running after an interruption may append rows already archived; lookups keep one per change_id.
+        """
+        lower, upper = month, add_months(month, 1)
+        in_month = (ChangeTracking.changed_at >= lower, ChangeTracking.changed_at < upper)
+
+        if dry_run:
+            return db.query(func.count(ChangeTracking.change_id)).filter(*in_month).scalar() or 0
+
+        engine = db.get_bind()
+        drop_partition = ChangeTrackingService.is_partitioned(engine) \
+            and partition_name(month) in ChangeTrackingService._partition_names(engine)
+
+        archived, last_id = 0, 0
+        while True:
+            batch = db.query(*(getattr(ChangeTracking, column) for column in ARCHIVE_COLUMNS))\
+                .filter(*in_month, ChangeTracking.change_id > last_id)\
+                .order_by(ChangeTracking.change_id.asc())\
+                .limit(ARCHIVE_BATCH_SIZE)\
+                .all()
+            if not batch:
+                break
+            # The archive is durable before anything is removed from the hot table
+            ChangeTrackingService._append_archive(month, [ChangeTrackingService._row_to_dict(row) for row in batch])
+            last_id = batch[-1].change_id
+            archived += len(batch)
+            if not drop_partition:
+                db.query(ChangeTracking)\
+                    .filter(ChangeTracking.change_id.in_([row.change_id for row in batch]))\
+                    .delete(synchronize_session=False)
+                db.commit()
+
+        if archived and drop_partition:
+            db.commit()
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE change_tracking DROP PARTITION {partition_name(month)}"))
+        return archived
+
+    @staticmethod
+    def archive_expired(
+        db: Session,
+        retention_months: Optional[int] = None,
+        dry_run: bool = False
+    ) -> List[Tuple[date, int]]:
+        """Archive every month older than the retention window; returns (month, rows archived)"""
+        cutoff = ChangeTrackingService.retention_cutoff(retention_months)
+        oldest = db.query(func.min(ChangeTracking.changed_at))\
+            .filter(ChangeTracking.changed_at < cutoff)\
+            .scalar()
+        archived = []
+        if oldest is not None:
+            month = month_start(oldest.date() if isinstance(oldest, datetime) else oldest)
+            while month < cutoff:
+                count = ChangeTrackingService.archive_month(db, month, dry_run=dry_run)
+                if count:
+                    archived.append((month, count))
+                month = add_months(month, 1)
+
+        if not dry_run:
+            ChangeTrackingService.ensure_future_partitions(db.get_bind())
+        return archived
+
+    # --- History --------------------------------------------------------------------------
+
+    @staticmethod
+    def _to_schema(row: Dict[str, Any]) -> Dict[str, Any]:
+        changed_at = row["changed_at"]
+        return {
+            "ChangeID": row["change_id"],
+            "TableName": row["table_name"],
+            "RecordID": row["record_id"],
+            "FieldName": row["field_name"],
+            "OldValue": row["old_value"],
+            "NewValue": row["new_value"],
+            "ChangedBy": row["changed_by"],
+            "ChangeReason": row["change_reason"],
+            "ChangedAt": datetime.fromisoformat(changed_at) if isinstance(changed_at, str) else changed_at,
+        }
+
+    @staticmethod
+    def get_history(
+        db: Session,
+        table_name: str,
+        record_id: str,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+        include_archived: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Change history of one record, newest first, spanning the hot table and archived months.
+
+        Paged by change_id: archived months are always older than the hot table, so hot rows
+        are read first (via the (table_name, record_id, changed_at) index) and archived months
+        only when the page isn't full; months that never touched the record are skipped using
+        the cached key set of each archive, the others are streamed keeping only the record's rows.
+        """
+        query = db.query(ChangeTracking)\
+            .filter(ChangeTracking.table_name == table_name, ChangeTracking.record_id == record_id)
+        if before_id is not None:
+            query = query.filter(ChangeTracking.change_id < before_id)
+        hot = query.order_by(ChangeTracking.change_id.desc()).limit(limit + 1).all()
+        items = [ChangeTrackingService._to_schema(ChangeTrackingService._row_to_dict(row)) for row in hot]
+
+        if len(items) <= limit and include_archived:
+            key = f"{table_name}:{record_id}"
+            hot_ids = {item["ChangeID"] for item in items}
+            for month in ChangeTrackingService.archived_months():
+                path = ChangeTrackingService.archive_path(month)
+                if key not in _archive_keys(path, os.path.getmtime(path), os.path.getsize(path)):
+                    continue
+                rows = {}  # a re-run archive may repeat rows; keep one per change_id
+                for row in iter_archive(path):
+                    if row["table_name"] != table_name or row["record_id"] != record_id:
+                        continue
+                    if (before_id is not None and row["change_id"] >= before_id) or row["change_id"] in hot_ids:
+                        continue
+                    rows[row["change_id"]] = row
+                items.extend(ChangeTrackingService._to_schema(rows[change_id]) for change_id in sorted(rows, reverse=True))
+                if len(items) > limit:
+                    break
+
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {
+            "Items": items,
+            "NextBeforeID": items[-1]["ChangeID"] if has_more else None
+        }
@@ -0,0 +1,113 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session, Query
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Sequence
+from collections import OrderedDict
+import threading
+import time
+
+from app.core.config import settings
+from app.services.table_version_service import TableVersionService, CHANGED_TABLES_KEY
+
+
+class TotalCount(NamedTuple):
+    total: int
+    estimated: bool = False  # taken from the database's table statistics, not counted
+
+
+class CountCache:
+    """
+    In-process LRU of exact list counts, keyed by list name and filter values.
+
+    Each entry is stamped with the table_versions of the tables the count reads and is only
+    served while those versions are unchanged and it is younger than COUNT_CACHE_TTL seconds
+    (the TTL bounds staleness for writes that do not go through TableVersionService.bump).
+    """
+
+    def __init__(self, max_entries: int):
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[Any, float, int]]" = OrderedDict()  # key -> (stamp, stored_at, value)
+
+    def get(self, key: Hashable, stamp: Any) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != stamp or time.monotonic() - entry[1] >= settings.COUNT_CACHE_TTL:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: Hashable, stamp: Any, value: int) -> None:
+        with self._lock:
+            self._entries[key] = (stamp, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache(settings.COUNT_CACHE_MAX_ENTRIES)
+
+
+def estimate_table_rows(db: Session, table_name: str) -> Optional[int]:
+    """Row count from the database's table statistics, None where the dialect has none (SQLite)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        sql = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+    elif dialect == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"
+    else:
+        return None
+    estimate = db.execute(text(sql), {"table_name": table_name}).scalar()
+    return int(estimate) if estimate is not None and estimate >= 0 else None  # -1: never analyzed
+
+
+class CountService:
+    """Total counts for paginated lists (X-Total-Count)"""
+
+    @staticmethod
+    def count(
+        db: Session,
+        name: str,
+        query: Query,
+        tables: Sequence[str],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> TotalCount:
+        """
+        Number of rows of query (its ORDER BY / OFFSET / LIMIT are ignored).
+
+        name and filters identify the query in the cache, so the same name and filter values must
+        always build the same query; tables are every table the query reads. Without filters, a
+        single table the database estimates at COUNT_ESTIMATE_THRESHOLD rows or more is not counted.
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        tables = tuple(sorted(set(tables)))
+        unpaged = query.order_by(None).limit(None).offset(None)
+
+        if not set(tables).isdisjoint(db.info.get(CHANGED_TABLES_KEY, ())):
+            # This transaction wrote these tables and hasn't committed: count, don't cache
+            return TotalCount(unpaged.count())
+
+        if not filters and len(tables) == 1 and settings.COUNT_ESTIMATE_THRESHOLD:
+            key = ("estimate", tables[0])
+            estimate = count_cache.get(key, None)
+            if estimate is None:
+                estimate = estimate_table_rows(db, tables[0])
+                estimate = -1 if estimate is None else estimate  # cached too, so SQLite doesn't ask again
+                count_cache.put(key, None, estimate)
+            if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                return TotalCount(estimate, estimated=True)
+
+        versions = TableVersionService.get_versions(db, tables)
+        stamp = tuple(versions[table] for table in tables)
+        key = (name, tuple(sorted(filters.items(), key=lambda item: item[0])))
+        total = count_cache.get(key, stamp)
+        if total is None:
+            total = unpaged.count()
+            count_cache.put(key, stamp, total)
+        return TotalCount(total)
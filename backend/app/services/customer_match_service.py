@@ -0,0 +1,492 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, insert, or_
+from typing import List, Optional, Dict, Any, Tuple, NamedTuple, Iterable, FrozenSet
+from datetime import datetime
+from difflib import SequenceMatcher
+import re
+import time
+import unicodedata
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.models.models import Customer, CustomerMatchKey, License, ChangeTracking, SyncTombstone
+from app.models.order_models import PurchaseOrder
+from app.models.partner_models import Order
+from app.services.table_version_service import TableVersionService
+
+# Words that say what kind of entity a customer is, not which one
+LEGAL_WORDS = {
+    "the", "co", "company", "corp", "corporation", "inc", "incorporated", "ltd", "limited", "llc", "plc",
+    "gmbh", "ag", "sa", "srl", "bv", "pte", "pty", "kk", "group", "holding", "holdings",
+}
+CJK_LEGAL_WORDS = ("股份有限公司", "有限责任公司", "有限公司", "分公司", "集团", "公司")
+
+# Shared mailbox providers: an address there says nothing about the company
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "live.com", "msn.com", "yahoo.com", "icloud.com",
+    "me.com", "qq.com", "foxmail.com", "163.com", "126.com", "yeah.net", "sina.com", "sina.cn", "sohu.com",
+    "aliyun.com", "139.com",
+}
+
+PHONE_KEY_DIGITS = 8  # trailing digits compared, so country/area prefixes don't matter
+MAX_TOKENS = 16
+
+# Evidence weights; fields missing on either side are left out of the weighted average
+NAME_WEIGHT, DOMAIN_WEIGHT, PHONE_WEIGHT = 0.7, 0.2, 0.1
+
+# Duplicate scan: blocks up to this size are compared pairwise, larger ones only between
+# neighbours in name order (SCAN_WINDOW each side), as is the whole table in name order
+SCAN_FULL_BLOCK = 20
+SCAN_WINDOW = 5
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+|[一-鿿]+")
+BRACKETED_PATTERN = re.compile(r"[(\[（【][^)\]）】]*[)\]）】]")  # "(北京)", "(China)"
+
+
+class MatchProfile(NamedTuple):
+    customer_id: Optional[int]
+    name: str
+    name_key: str  # normalized name without spaces
+    words: FrozenSet[str]  # compared for overlap; CJK runs as character bigrams
+    tokens: Tuple[str, ...]  # blocking keys: the words of 2+ characters
+    domain: Optional[str]
+    phone: Optional[str]
+
+
+def _is_cjk(word: str) -> bool:
+    return "一" <= word[0] <= "鿿"
+
+
+def name_words(name: Optional[str]) -> List[str]:
+    """Lowercased words of a company name without punctuation, bracketed notes and legal-form words"""
+    text = unicodedata.normalize("NFKC", name or "").lower()
+    text = BRACKETED_PATTERN.sub(" ", text)
+    for word in CJK_LEGAL_WORDS:
+        text = text.replace(word, " ")
+    return [word for word in WORD_PATTERN.findall(text) if word not in LEGAL_WORDS]
+
+
+def exact_name(name: Optional[str]) -> str:
+    """A name as written, only normalized for width, case and spacing (brackets and legal words kept)"""
+    return " ".join(unicodedata.normalize("NFKC", name or "").casefold().split())
+
+
+def email_domain(email: Optional[str]) -> Optional[str]:
+    if not email or "@" not in email:
+        return None
+    domain = email.rsplit("@", 1)[1].strip().lower()
+    return domain if domain and domain not in FREE_MAIL_DOMAINS else None
+
+
+def phone_key(phone: Optional[str]) -> Optional[str]:
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-PHONE_KEY_DIGITS:] if len(digits) >= PHONE_KEY_DIGITS else None
+
+
+def make_profile(customer_id: Optional[int], name: Optional[str], email: Optional[str], phone: Optional[str]) -> MatchProfile:
+    words = name_words(name)
+    parts = []
+    for word in words:
+        if _is_cjk(word) and len(word) > 1:
+            # CJK names aren't space separated: use character bigrams
+            parts.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            parts.append(word)
+    tokens = tuple(dict.fromkeys(part for part in parts if len(part) >= 2))[:MAX_TOKENS]
+    name_key = "".join(words) or (name or "").strip().lower()
+    return MatchProfile(
+        customer_id, name or "", name_key[:100], frozenset(parts), tokens, email_domain(email), phone_key(phone)
+    )
+
+
+def match_keys(profile: MatchProfile) -> List[Tuple[str, str]]:
+    """Blocking keys of a profile: candidates are customers sharing at least one"""
+    keys = [("name", profile.name_key)] if profile.name_key else []
+    keys += [("token", token) for token in profile.tokens]
+    if profile.domain:
+        keys.append(("domain", profile.domain[:100]))
+    if profile.phone:
+        keys.append(("phone", profile.phone))
+    return keys
+
+
+def name_similarity(a: MatchProfile, b: MatchProfile, at_least: float = 0.0) -> float:
+    """max(edit similarity of the normalized names, Jaccard of their words); less if it can't reach at_least"""
+    if a.name_key == b.name_key:
+        return 1.0
+    jaccard = len(a.words & b.words) / len(a.words | b.words) if a.words and b.words else 0.0
+    length = len(a.name_key) + len(b.name_key)
+    if not length or max(jaccard, 2.0 * min(len(a.name_key), len(b.name_key)) / length) < at_least:
+        return jaccard  # the edit similarity can't beat its length bound
+    return max(jaccard, SequenceMatcher(None, a.name_key, b.name_key, autojunk=False).ratio())
+
+
+def score_pair(a: MatchProfile, b: MatchProfile, min_score: float = 0.0) -> Tuple[float, List[str]]:
+    """Weighted similarity in [0, 1] and the evidence that matched"""
+    weights = NAME_WEIGHT
+    matched = 0.0
+    reasons = []
+    if a.domain and b.domain:
+        weights += DOMAIN_WEIGHT
+        if a.domain == b.domain:
+            matched += DOMAIN_WEIGHT
+            reasons.append("domain")
+    if a.phone and b.phone:
+        weights += PHONE_WEIGHT
+        if a.phone == b.phone:
+            matched += PHONE_WEIGHT
+            reasons.append("phone")
+    # The name similarity needed for the pair to reach min_score at all
+    needed = (min_score * weights - matched) / NAME_WEIGHT
+    if needed > 1.0:
+        return matched / weights, reasons
+    name = name_similarity(a, b, at_least=needed)
+    if name == 1.0:
+        reasons.insert(0, "name")
+    elif name >= 0.5:
+        reasons.insert(0, "similar_name")
+    return round((matched + NAME_WEIGHT * name) / weights, 4), reasons
+
+
+class CustomerMatchService:
+    """
+    Customer deduplication: blocking keys + similarity scoring.
+
+    Each customer has blocking keys in customer_match_keys (normalized name, name tokens,
+    company email domain, phone). Matching an incoming customer only scores the customers that
+    share a key with it, found through the key table's primary key, so it stays a couple of
+    indexed lookups regardless of the table size. Keys shared by more than CUSTOMER_MATCH_MAX_BLOCK
+    customers (common words) are skipped.
+    """
+
+    # --- Key maintenance ------------------------------------------------------------------
+
+    @staticmethod
+    def index_customer(db: Session, customer: Customer) -> None:
+        """Replace a customer's blocking keys; call after flush (customer_id assigned), before commit"""
+        db.query(CustomerMatchKey).filter(CustomerMatchKey.customer_id == customer.customer_id)\
+            .delete(synchronize_session=False)
+        profile = make_profile(customer.customer_id, customer.customer_name, customer.contact_email, customer.contact_phone)
+        keys = match_keys(profile)
+        if keys:
+            db.execute(insert(CustomerMatchKey), [
+                {"key_type": key_type, "key_value": key_value, "customer_id": customer.customer_id}
+                for key_type, key_value in keys
+            ])
+
+    @staticmethod
+    def index_new_customers(db: Session, customers: Iterable[Any]) -> None:
+        """Write the blocking keys of new customers (objects/rows with the customer columns) in one multi-row insert"""
+        rows = [
+            {"key_type": key_type, "key_value": key_value, "customer_id": customer.customer_id}
+            for customer in customers
+            for key_type, key_value in match_keys(
+                make_profile(customer.customer_id, customer.customer_name, customer.contact_email, customer.contact_phone)
+            )
+        ]
+        if rows:
+            db.execute(insert(CustomerMatchKey), rows)
+
+    @staticmethod
+    def unindex_customers(db: Session, customer_ids: Iterable[int]) -> None:
+        db.query(CustomerMatchKey).filter(CustomerMatchKey.customer_id.in_(list(customer_ids)))\
+            .delete(synchronize_session=False)
+
+    @staticmethod
+    def rebuild_index(db: Session) -> int:
+        """Recompute every blocking key from the customers table; returns keys written"""
+        db.query(CustomerMatchKey).delete(synchronize_session=False)
+        written = 0
+        batch = []
+        rows = db.query(Customer.customer_id, Customer.customer_name, Customer.contact_email, Customer.contact_phone)\
+            .yield_per(1000)
+        for row in rows:
+            for key_type, key_value in match_keys(make_profile(*row)):
+                batch.append({"key_type": key_type, "key_value": key_value, "customer_id": row.customer_id})
+            if len(batch) >= 5000:
+                db.execute(insert(CustomerMatchKey), batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(CustomerMatchKey), batch)
+            written += len(batch)
+        db.commit()
+        return written
+
+    # --- Matching -------------------------------------------------------------------------
+
+    @staticmethod
+    def find_matches(
+        db: Session,
+        name: Optional[str],
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+        min_score: Optional[float] = None,
+        limit: int = 5,
+        exclude_ids: Iterable[int] = ()
+    ) -> List[Dict[str, Any]]:
+        """Existing customers similar to the given name/email/phone, best first"""
+        min_score = settings.CUSTOMER_MATCH_REVIEW_THRESHOLD if min_score is None else min_score
+        probe = make_profile(None, name, email, phone)
+        keys = match_keys(probe)
+        if not keys:
+            return []
+
+        K = CustomerMatchKey
+        key_filter = or_(*[and_(K.key_type == key_type, K.key_value == key_value) for key_type, key_value in keys])
+        blocks = db.query(K.key_type, K.key_value, func.count())\
+            .filter(key_filter)\
+            .group_by(K.key_type, K.key_value)\
+            .all()
+        usable = [
+            (key_type, key_value) for key_type, key_value, size in blocks
+            if key_type == "name" or size <= settings.CUSTOMER_MATCH_MAX_BLOCK
+        ]
+        if not usable:
+            return []
+        candidate_ids = db.query(K.customer_id).filter(
+            or_(*[and_(K.key_type == key_type, K.key_value == key_value) for key_type, key_value in usable])
+        ).distinct().subquery()
+        rows = db.query(Customer.customer_id, Customer.customer_name, Customer.contact_email, Customer.contact_phone)\
+            .filter(Customer.customer_id.in_(candidate_ids.select()))\
+            .all()
+
+        excluded = set(exclude_ids)
+        matches = []
+        for row in rows:
+            if row.customer_id in excluded:
+                continue
+            score, reasons = score_pair(probe, make_profile(*row), min_score)
+            if score >= min_score:
+                matches.append({
+                    "CustomerID": row.customer_id,
+                    "CustomerName": row.customer_name,
+                    "ContactEmail": row.contact_email,
+                    "ContactPhone": row.contact_phone,
+                    "Score": score,
+                    "Reasons": reasons,
+                })
+        matches.sort(key=lambda match: (-match["Score"], match["CustomerID"]))
+        return matches[:limit]
+
+    @staticmethod
+    def resolve(db: Session, name: Optional[str], email: Optional[str] = None, phone: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        The existing customer an incoming one is taken to be, if any: it must score CUSTOMER_MATCH_AUTO_THRESHOLD
+        and either have exactly the same name as written or share the company email domain or phone. The normalized
+        name drops bracketed notes and legal-form words, so "阿里巴巴(北京)有限公司" and "阿里巴巴(上海)有限公司", or
+        "Dify Group" and "Dify Holdings", score 1.0 on the name alone while being different legal entities;
+        such candidates are left to the duplicate scan for review instead of being attached automatically.
+        """
+        matches = CustomerMatchService.find_matches(db, name, email, phone, min_score=settings.CUSTOMER_MATCH_AUTO_THRESHOLD)
+        written = exact_name(name)
+        for match in matches:
+            if exact_name(match["CustomerName"]) == written or {"domain", "phone"} & set(match["Reasons"]):
+                return match
+        return None
+
+    # --- Batch deduplication -------------------------------------------------------------
+
+    @staticmethod
+    def find_duplicates(db: Session, min_score: Optional[float] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Scan the whole customers table for likely duplicates and propose merges.
+
+        Candidate pairs come from sorting (O(n log n)): customers sharing a blocking key are compared
+        pairwise when the block is small and only between name-order neighbours when it is large,
+        plus a sorted-neighbourhood pass over all normalized names (catches typos that share no key).
+        Pairs scoring min_score or more are clustered; each cluster keeps the customer with the most
+        licenses (then the oldest) and proposes merging the others into it.
+        """
+        started = time.perf_counter()
+        min_score = settings.CUSTOMER_MATCH_REVIEW_THRESHOLD if min_score is None else min_score
+        profiles = [
+            make_profile(*row)
+            for row in db.query(Customer.customer_id, Customer.customer_name, Customer.contact_email, Customer.contact_phone)
+        ]
+        by_id = {profile.customer_id: profile for profile in profiles}
+
+        candidates = set()
+
+        def add_window(ordered: List[MatchProfile]) -> None:
+            for i, profile in enumerate(ordered):
+                for other in ordered[i + 1:i + 1 + SCAN_WINDOW]:
+                    candidates.add((min(profile.customer_id, other.customer_id), max(profile.customer_id, other.customer_id)))
+
+        # Every (key, customer) entry, sorted so each block is a consecutive run
+        entries = sorted(
+            (key, profile.name_key, profile.customer_id)
+            for profile in profiles
+            for key in match_keys(profile)
+        )
+        start = 0
+        while start < len(entries):
+            end = start
+            while end < len(entries) and entries[end][0] == entries[start][0]:
+                end += 1
+            block = [by_id[customer_id] for _, _, customer_id in entries[start:end]]  # already in name order
+            if len(block) <= SCAN_FULL_BLOCK:
+                for i, profile in enumerate(block):
+                    for other in block[i + 1:]:
+                        candidates.add((min(profile.customer_id, other.customer_id), max(profile.customer_id, other.customer_id)))
+            else:
+                add_window(block)
+            start = end
+
+        add_window(sorted(profiles, key=lambda profile: profile.name_key))
+        add_window(sorted(profiles, key=lambda profile: profile.name_key[::-1]))  # names differing at the start
+
+        # Score, then cluster with union-find
+        parent: Dict[int, int] = {}
+
+        def find(customer_id: int) -> int:
+            root = customer_id
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while customer_id != root:
+                parent[customer_id], customer_id = root, parent.get(customer_id, customer_id)
+            return root
+
+        scored: Dict[Tuple[int, int], Tuple[float, List[str]]] = {}
+        for a, b in candidates:
+            score, reasons = score_pair(by_id[a], by_id[b], min_score)
+            if score >= min_score:
+                scored[(a, b)] = (score, reasons)
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        clusters: Dict[int, List[int]] = {}
+        for customer_id in {customer_id for pair in scored for customer_id in pair}:
+            clusters.setdefault(find(customer_id), []).append(customer_id)
+
+        clustered_ids = [customer_id for members in clusters.values() for customer_id in members]
+        license_counts: Dict[int, int] = {}
+        for chunk_start in range(0, len(clustered_ids), 1000):
+            chunk = clustered_ids[chunk_start:chunk_start + 1000]
+            license_counts.update(
+                db.query(License.customer_id, func.count(License.license_id))
+                .filter(License.customer_id.in_(chunk))
+                .group_by(License.customer_id)
+                .all()
+            )
+
+        groups = []
+        for members in clusters.values():
+            survivor = min(members, key=lambda customer_id: (-license_counts.get(customer_id, 0), customer_id))
+            duplicates = []
+            for customer_id in sorted(members):
+                if customer_id == survivor:
+                    continue
+                pair = (min(survivor, customer_id), max(survivor, customer_id))
+                # Score against the survivor; members linked only through another member get that pair's best score
+                score, reasons = scored.get(pair) or score_pair(by_id[survivor], by_id[customer_id])
+                duplicates.append({
+                    "CustomerID": customer_id,
+                    "CustomerName": by_id[customer_id].name,
+                    "Score": score,
+                    "Reasons": reasons,
+                    "Licenses": license_counts.get(customer_id, 0),
+                })
+            duplicates.sort(key=lambda duplicate: (-duplicate["Score"], duplicate["CustomerID"]))
+            groups.append({
+                "SurvivorID": survivor,
+                "SurvivorName": by_id[survivor].name,
+                "SurvivorLicenses": license_counts.get(survivor, 0),
+                "Duplicates": duplicates,
+            })
+        groups.sort(key=lambda group: (-group["Duplicates"][0]["Score"], group["SurvivorID"]))
+
+        return {
+            "CustomersScanned": len(profiles),
+            "PairsCompared": len(candidates),
+            "Groups": groups[:limit] if limit else groups,
+            "TotalGroups": len(groups),
+            "ElapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    # --- Merge ------------------------------------------------------------------------------
+
+    @staticmethod
+    def merge(db: Session, survivor_id: int, duplicate_ids: List[int], changed_by: str = "system") -> Dict[str, Any]:
+        """
+        Merge duplicate customers into survivor_id: their licenses, purchase orders and orders are
+        re-pointed with one UPDATE per table, the survivor's empty contact fields are filled from
+        the duplicates, and the duplicates are deleted (with sync tombstones).
+        """
+        duplicate_ids = sorted(set(duplicate_ids))
+        if not duplicate_ids:
+            raise ValueError("DuplicateIDs must not be empty")
+        if survivor_id in duplicate_ids:
+            raise ValueError("The surviving customer cannot also be merged away")
+        survivor = db.query(Customer).filter(Customer.customer_id == survivor_id).first()
+        if not survivor:
+            raise ValueError(f"Customer with ID {survivor_id} not found")
+        duplicates = db.query(Customer).filter(Customer.customer_id.in_(duplicate_ids)).order_by(Customer.customer_id).all()
+        missing = set(duplicate_ids) - {customer.customer_id for customer in duplicates}
+        if missing:
+            raise ValueError(f"Customers not found: {', '.join(str(customer_id) for customer_id in sorted(missing))}")
+
+        now = datetime.now()
+        moved_licenses = [
+            (license_id, customer_id) for license_id, customer_id in
+            db.query(License.license_id, License.customer_id).filter(License.customer_id.in_(duplicate_ids))
+        ]
+        licenses_moved = db.query(License).filter(License.customer_id.in_(duplicate_ids))\
+            .update({License.customer_id: survivor_id, License.updated_at: now}, synchronize_session=False)
+        purchase_orders_moved = db.query(PurchaseOrder).filter(PurchaseOrder.customer_id.in_(duplicate_ids))\
+            .update({PurchaseOrder.customer_id: survivor_id}, synchronize_session=False)
+        orders_moved = db.query(Order).filter(Order.customer_id.in_(duplicate_ids))\
+            .update({Order.customer_id: survivor_id}, synchronize_session=False)
+
+        filled = {}
+        for field in ("contact_person", "contact_email", "contact_phone", "address", "industry", "customer_type", "region"):
+            if getattr(survivor, field):
+                continue
+            value = next((getattr(customer, field) for customer in duplicates if getattr(customer, field)), None)
+            if value:
+                setattr(survivor, field, value)
+                filled[field] = value
+        merged_note = "Merged customers: " + ", ".join(f"#{customer.customer_id} {customer.customer_name}" for customer in duplicates)
+        survivor.notes = f"{survivor.notes}\n{merged_note}" if survivor.notes else merged_note
+        survivor.updated_at = now
+
+        change_rows = [
+            {
+                "table_name": "licenses", "record_id": license_id, "field_name": "customer_id",
+                "old_value": str(old_customer_id), "new_value": str(survivor_id),
+                "changed_by": changed_by, "change_reason": "Customer merge", "changed_at": now,
+            }
+            for license_id, old_customer_id in moved_licenses
+        ]
+        change_rows.extend(
+            {
+                "table_name": "customers", "record_id": str(survivor_id), "field_name": field,
+                "old_value": None, "new_value": str(value),
+                "changed_by": changed_by, "change_reason": "Customer merge", "changed_at": now,
+            }
+            for field, value in filled.items()
+        )
+        if change_rows:
+            db.execute(insert(ChangeTracking), change_rows)
+        db.add_all([SyncTombstone(table_name="customers", record_id=str(customer_id)) for customer_id in duplicate_ids])
+
+        CustomerMatchService.unindex_customers(db, duplicate_ids)
+        db.query(Customer).filter(Customer.customer_id.in_(duplicate_ids)).delete(synchronize_session=False)
+        db.flush()
+        CustomerMatchService.index_customer(db, survivor)
+        TableVersionService.bump(db, "customers", "licenses", "purchase_orders", "orders")
+        db.commit()
+
+        event_bus.publish("customer.merged", survivor_id, {
+            "merged_customer_ids": duplicate_ids,
+            "licenses_moved": licenses_moved,
+        })
+        return {
+            "SurvivorID": survivor_id,
+            "MergedIDs": duplicate_ids,
+            "LicensesMoved": licenses_moved,
+            "PurchaseOrdersMoved": purchase_orders_moved,
+            "OrdersMoved": orders_moved,
+            "FilledFields": sorted(filled),
+        }
@@ -1,10 +1,14 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, Query
 from sqlalchemy import func, and_, or_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
 
-from app.models.models import Customer, License
+from app.models.models import Customer, License, SyncTombstone
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.count_service import CountService, TotalCount
+from app.services.sales_performance_service import SalesPerformanceService
+from app.services.customer_match_service import CustomerMatchService
 
 
 class CustomerService:
@@ -25,11 +29,21 @@ class CustomerService:
         )
         
         db.add(db_customer)
+        db.flush()
+        CustomerMatchService.index_customer(db, db_customer)
+        TableVersionService.bump(db, "customers")
         db.commit()
         db.refresh(db_customer)
         
         return db_customer
 
+    @staticmethod
+    def get_customer_updated_at(db: Session, customer_id: int) -> Optional[Any]:
+        """Get (customer_id, updated_at) for conditional requests without loading the full record"""
+        return db.query(Customer.customer_id, Customer.updated_at)\
+            .filter(Customer.customer_id == customer_id)\
+            .first()
+
     @staticmethod
     def get_customer(db: Session, customer_id: int) -> Optional[schemas.CustomerInfo]:
         """Get detailed information about a specific customer"""
@@ -38,6 +52,11 @@ class CustomerService:
         if not customer:
             return None
             
+        return CustomerService._customer_to_info(customer)
+
+    @staticmethod
+    def _customer_to_info(customer: Customer) -> schemas.CustomerInfo:
+        """Convert a customer model to the CustomerInfo schema"""
         return schemas.CustomerInfo(
             CustomerID=customer.customer_id,
             CustomerName=customer.customer_name,
@@ -54,16 +73,13 @@ class CustomerService:
         )
 
     @staticmethod
-    def get_customers(
+    def _customers_query(
         db: Session,
-        skip: int = 0,
-        limit: int = 100,
         name_filter: Optional[str] = None,
         industry: Optional[str] = None,
         region: Optional[str] = None,
         customer_type: Optional[str] = None
-    ) -> List[schemas.CustomerInfo]:
-        """Get list of customers with filtering options"""
+    ) -> Query:
         query = db.query(Customer)
         
         # Apply filters
@@ -75,6 +91,20 @@ class CustomerService:
             query = query.filter(Customer.region == region)
         if customer_type:
             query = query.filter(Customer.customer_type == customer_type)
+        return query
+
+    @staticmethod
+    def get_customers(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        name_filter: Optional[str] = None,
+        industry: Optional[str] = None,
+        region: Optional[str] = None,
+        customer_type: Optional[str] = None
+    ) -> List[schemas.CustomerInfo]:
+        """Get list of customers with filtering options"""
+        query = CustomerService._customers_query(db, name_filter, industry, region, customer_type)
         
         # Apply pagination
         customers = query.order_by(Customer.customer_name).offset(skip).limit(limit).all()
@@ -98,6 +128,20 @@ class CustomerService:
             for customer in customers
         ]
 
+    @staticmethod
+    def count_customers(
+        db: Session,
+        name_filter: Optional[str] = None,
+        industry: Optional[str] = None,
+        region: Optional[str] = None,
+        customer_type: Optional[str] = None
+    ) -> TotalCount:
+        """Total for get_customers with the same filters"""
+        query = CustomerService._customers_query(db, name_filter, industry, region, customer_type)
+        return CountService.count(db, "customers", query, ["customers"], {
+            "name": name_filter, "industry": industry, "region": region, "customer_type": customer_type,
+        })
+
     @staticmethod
     def update_customer(
         db: Session, 
@@ -120,7 +164,10 @@ class CustomerService:
         
         # Update the last modified date
         customer.updated_at = datetime.now()
+        if update_data.keys() & {"CustomerName", "ContactEmail", "ContactPhone"}:
+            CustomerMatchService.index_customer(db, customer)
         
+        TableVersionService.bump(db, "customers")
         db.commit()
         db.refresh(customer)
         
@@ -148,7 +195,19 @@ class CustomerService:
         if not customer:
             return False
         
+        # Licenses go with the customer via ON DELETE CASCADE, so tombstone them too
+        license_ids = [
+            license_id for (license_id,) in
+            db.query(License.license_id).filter(License.customer_id == customer_id).all()
+        ]
+        db.add_all([SyncTombstone(table_name="licenses", record_id=license_id) for license_id in license_ids])
+        db.add(SyncTombstone(table_name="customers", record_id=str(customer_id)))
+        
+        SalesPerformanceService.record(db, removed=SalesPerformanceService.license_facts(db, License.customer_id == customer_id))
+        
+        CustomerMatchService.unindex_customers(db, [customer_id])
         db.delete(customer)
+        TableVersionService.bump(db, "customers", "licenses")
         db.commit()
         
         return True
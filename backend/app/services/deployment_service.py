@@ -1,13 +1,67 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, Query
 from sqlalchemy import func, and_, or_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date, timedelta
 
 from app.models.models import DeploymentRecord, License, DeploymentEngineer, FactoryEngineer
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.count_service import CountService, TotalCount
+from app.core.events import event_bus
+from app.db.loader_options import loader_options
+from app.db.batch_loader import BatchLoader, get_loader
 
 
 class DeploymentService:
+    @staticmethod
+    def to_schema(deployment: DeploymentRecord) -> schemas.DeploymentRecordInfo:
+        """Convert a deployment record loaded with loader_options("deployment_record") (or built in this session)"""
+        return schemas.DeploymentRecordInfo(
+            DeploymentID=deployment.deployment_id,
+            LicenseID=deployment.license_id,
+            DeploymentType=deployment.deployment_type,
+            DeploymentDate=deployment.deployment_date,
+            DeployedBy=deployment.deployed_by,
+            DeploymentStatus=deployment.deployment_status,
+            DeploymentEnvironment=deployment.deployment_environment,
+            ServerInfo=deployment.server_info,
+            CompletionDate=deployment.completion_date,
+            Notes=deployment.notes,
+            CreatedAt=deployment.created_at,
+            UpdatedAt=deployment.updated_at,
+            EngineerAssignments=[
+                schemas.EngineerAssignmentInfo(
+                    EngineerID=assignment.engineer.engineer_id,
+                    EngineerName=assignment.engineer.engineer_name,
+                    Email=assignment.engineer.email,
+                    Role=assignment.role
+                )
+                for assignment in deployment.engineer_assignments
+            ]
+        )
+
+    @staticmethod
+    def _load_records(db: Session, deployment_ids: List[int]) -> Dict[int, schemas.DeploymentRecordInfo]:
+        """Batch function of the deployment loader: two queries (records, then assignments with engineers)"""
+        deployments = db.query(DeploymentRecord)\
+            .options(*loader_options("deployment_record"))\
+            .filter(DeploymentRecord.deployment_id.in_(deployment_ids))\
+            .all()
+        return {deployment.deployment_id: DeploymentService.to_schema(deployment) for deployment in deployments}
+
+    @staticmethod
+    def loader(db: Session) -> BatchLoader:
+        """Request-scoped loader of DeploymentRecordInfo by deployment ID"""
+        return get_loader(db, DeploymentService._load_records)
+
+    @staticmethod
+    def prime(db: Session, records: List[schemas.DeploymentRecordInfo]) -> List[schemas.DeploymentRecordInfo]:
+        """Seed the loader with records another query already loaded; returns them unchanged"""
+        loader = DeploymentService.loader(db)
+        for record in records:
+            loader.prime(record.DeploymentID, record)
+        return records
+
     @staticmethod
     def create_deployment_record(db: Session, deployment_data: schemas.DeploymentRecordCreate) -> schemas.DeploymentRecordInfo:
         """Create a new deployment record with optional engineer assignments"""
@@ -29,28 +83,24 @@ class DeploymentService:
             notes=deployment_data.Notes
         )
         
+        # Verify all assigned engineers up front with one query, so nothing is written on failure
+        assignments = deployment_data.EngineerAssignments or []
+        engineer_ids = {assignment.EngineerID for assignment in assignments}
+        engineers = {
+            engineer.engineer_id: engineer
+            for engineer in db.query(FactoryEngineer).filter(FactoryEngineer.engineer_id.in_(engineer_ids)).all()
+        } if engineer_ids else {}
+        for assignment in assignments:
+            if assignment.EngineerID not in engineers:
+                raise ValueError(f"Engineer with ID {assignment.EngineerID} not found")
+        
+        # Assignments go through the relationship so a single flush inserts the record and its assignments
+        for assignment in assignments:
+            db_deployment.engineer_assignments.append(DeploymentEngineer(
+                engineer=engineers[assignment.EngineerID],
+                role=assignment.Role
+            ))
         db.add(db_deployment)
-        db.commit()
-        db.refresh(db_deployment)
-        
-        # Add engineer assignments if provided
-        if deployment_data.EngineerAssignments:
-            for assignment in deployment_data.EngineerAssignments:
-                # Verify the engineer exists
-                engineer = db.query(FactoryEngineer).filter(FactoryEngineer.engineer_id == assignment.EngineerID).first()
-                if not engineer:
-                    raise ValueError(f"Engineer with ID {assignment.EngineerID} not found")
-                
-                # Create the assignment
-                db_assignment = DeploymentEngineer(
-                    deployment_id=db_deployment.deployment_id,
-                    engineer_id=assignment.EngineerID,
-                    role=assignment.Role
-                )
-                
-                db.add(db_assignment)
-            
-            db.commit()
         
         # Update the license deployment status and date
         if deployment_data.DeploymentStatus == schemas.DeploymentStatusEnum.COMPLETED:
@@ -61,95 +111,31 @@ class DeploymentService:
             license.deployment_status = "IN_PROGRESS"
         
         license.updated_at = datetime.now()
+        TableVersionService.bump(db, "deployment_records", "licenses")
         db.commit()
         
-        # Refresh to get the full deployment with assignments
-        db_deployment = db.query(DeploymentRecord)\
-            .options(joinedload(DeploymentRecord.engineer_assignments).joinedload(DeploymentEngineer.engineer))\
-            .filter(DeploymentRecord.deployment_id == db_deployment.deployment_id)\
-            .first()
-        
-        # Convert engineer assignments
-        engineer_assignments = []
-        for assignment in db_deployment.engineer_assignments:
-            engineer = assignment.engineer
-            engineer_assignments.append(schemas.EngineerAssignmentInfo(
-                EngineerID=engineer.engineer_id,
-                EngineerName=engineer.engineer_name,
-                Email=engineer.email,
-                Role=assignment.role
-            ))
+        if deployment_data.DeploymentStatus == schemas.DeploymentStatusEnum.COMPLETED:
+            DeploymentService._publish_completed(db_deployment, license)
         
-        # Convert deployment record to schema
-        return schemas.DeploymentRecordInfo(
-            DeploymentID=db_deployment.deployment_id,
-            LicenseID=db_deployment.license_id,
-            DeploymentType=db_deployment.deployment_type,
-            DeploymentDate=db_deployment.deployment_date,
-            DeployedBy=db_deployment.deployed_by,
-            DeploymentStatus=db_deployment.deployment_status,
-            DeploymentEnvironment=db_deployment.deployment_environment,
-            ServerInfo=db_deployment.server_info,
-            CompletionDate=db_deployment.completion_date,
-            Notes=db_deployment.notes,
-            EngineerAssignments=engineer_assignments,
-            CreatedAt=db_deployment.created_at,
-            UpdatedAt=db_deployment.updated_at
-        )
+        # Build the response from the objects already in the session instead of re-querying
+        return DeploymentService.to_schema(db_deployment)
 
     @staticmethod
     def get_deployment_record(db: Session, deployment_id: int) -> Optional[schemas.DeploymentRecordInfo]:
         """Get detailed information about a specific deployment record"""
-        deployment = db.query(DeploymentRecord)\
-            .options(joinedload(DeploymentRecord.engineer_assignments).joinedload(DeploymentEngineer.engineer))\
-            .filter(DeploymentRecord.deployment_id == deployment_id)\
-            .first()
-        
-        if not deployment:
-            return None
-            
-        # Convert engineer assignments
-        engineer_assignments = []
-        for assignment in deployment.engineer_assignments:
-            engineer = assignment.engineer
-            engineer_assignments.append(schemas.EngineerAssignmentInfo(
-                EngineerID=engineer.engineer_id,
-                EngineerName=engineer.engineer_name,
-                Email=engineer.email,
-                Role=assignment.role
-            ))
-        
-        return schemas.DeploymentRecordInfo(
-            DeploymentID=deployment.deployment_id,
-            LicenseID=deployment.license_id,
-            DeploymentType=deployment.deployment_type,
-            DeploymentDate=deployment.deployment_date,
-            DeployedBy=deployment.deployed_by,
-            DeploymentStatus=deployment.deployment_status,
-            DeploymentEnvironment=deployment.deployment_environment,
-            ServerInfo=deployment.server_info,
-            CompletionDate=deployment.completion_date,
-            Notes=deployment.notes,
-            CreatedAt=deployment.created_at,
-            UpdatedAt=deployment.updated_at,
-            EngineerAssignments=engineer_assignments
-        )
+        return DeploymentService.loader(db).load(deployment_id)
 
     @staticmethod
-    def get_deployment_records(
+    def _deployment_records_query(
         db: Session,
-        skip: int = 0,
-        limit: int = 100,
         license_id: Optional[str] = None,
         deployment_type: Optional[schemas.DeploymentTypeEnum] = None,
         deployment_status: Optional[schemas.DeploymentStatusEnum] = None,
         deployed_by: Optional[str] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None
-    ) -> List[schemas.DeploymentRecordInfo]:
-        """Get list of deployment records with filtering options"""
-        query = db.query(DeploymentRecord)\
-            .options(joinedload(DeploymentRecord.engineer_assignments).joinedload(DeploymentEngineer.engineer))
+    ) -> Query:
+        query = db.query(DeploymentRecord)
         
         # Apply filters
         if license_id:
@@ -164,41 +150,59 @@ class DeploymentService:
             query = query.filter(DeploymentRecord.deployment_date >= start_date)
         if end_date:
             query = query.filter(DeploymentRecord.deployment_date <= end_date)
+        return query
+
+    @staticmethod
+    def get_deployment_records(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        license_id: Optional[str] = None,
+        deployment_type: Optional[schemas.DeploymentTypeEnum] = None,
+        deployment_status: Optional[schemas.DeploymentStatusEnum] = None,
+        deployed_by: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[schemas.DeploymentRecordInfo]:
+        """Get list of deployment records with filtering options"""
+        query = DeploymentService._deployment_records_query(
+                db, license_id, deployment_type, deployment_status, deployed_by, start_date, end_date
+            )\
+            .options(*loader_options("deployment_record"))
         
         # Apply pagination
         deployments = query.order_by(DeploymentRecord.deployment_date.desc()).offset(skip).limit(limit).all()
         
-        # Convert to schema model with engineer assignments
-        result = []
-        for deployment in deployments:
-            # Convert engineer assignments
-            engineer_assignments = []
-            for assignment in deployment.engineer_assignments:
-                engineer = assignment.engineer
-                engineer_assignments.append(schemas.EngineerAssignmentInfo(
-                    EngineerID=engineer.engineer_id,
-                    EngineerName=engineer.engineer_name,
-                    Email=engineer.email,
-                    Role=assignment.role
-                ))
-            
-            result.append(schemas.DeploymentRecordInfo(
-                DeploymentID=deployment.deployment_id,
-                LicenseID=deployment.license_id,
-                DeploymentType=deployment.deployment_type,
-                DeploymentDate=deployment.deployment_date,
-                DeployedBy=deployment.deployed_by,
-                DeploymentStatus=deployment.deployment_status,
-                DeploymentEnvironment=deployment.deployment_environment,
-                ServerInfo=deployment.server_info,
-                CompletionDate=deployment.completion_date,
-                Notes=deployment.notes,
-                CreatedAt=deployment.created_at,
-                UpdatedAt=deployment.updated_at,
-                EngineerAssignments=engineer_assignments
-            ))
-        
-        return result
+        return DeploymentService.prime(db, [DeploymentService.to_schema(deployment) for deployment in deployments])
+
+    @staticmethod
+    def count_deployment_records(
+        db: Session,
+        license_id: Optional[str] = None,
+        deployment_type: Optional[schemas.DeploymentTypeEnum] = None,
+        deployment_status: Optional[schemas.DeploymentStatusEnum] = None,
+        deployed_by: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> TotalCount:
+        """Total for get_deployment_records with the same filters"""
+        query = DeploymentService._deployment_records_query(
+            db, license_id, deployment_type, deployment_status, deployed_by, start_date, end_date
+        )
+        return CountService.count(db, "deployment_records", query, ["deployment_records"], {
+            "license_id": license_id, "deployment_type": deployment_type, "deployment_status": deployment_status,
+            "deployed_by": deployed_by, "start_date": start_date, "end_date": end_date,
+        })
+
+    @staticmethod
+    def _publish_completed(deployment: DeploymentRecord, license: Optional[License]) -> None:
+        """Push a deployment.completed event to subscribed clients (after commit)"""
+        event_bus.publish("deployment.completed", deployment.deployment_id, {
+            "license_id": deployment.license_id,
+            "sales_rep_id": license.sales_rep_id if license else None,
+            "engineer_ids": [assignment.engineer_id for assignment in deployment.engineer_assignments],
+            "completion_date": deployment.completion_date,
+        })
 
     @staticmethod
     def update_deployment_record(
@@ -248,52 +252,34 @@ class DeploymentService:
                 
                 db.add(db_assignment)
         
+        TableVersionService.bump(db, "deployment_records")
         db.commit()
         db.refresh(deployment)
         
         # Update the license if the deployment status changed to COMPLETED
-        if deployment_data.DeploymentStatus == schemas.DeploymentStatusEnum.COMPLETED and old_status != "COMPLETED":
+        completed = deployment_data.DeploymentStatus == schemas.DeploymentStatusEnum.COMPLETED and old_status != "COMPLETED"
+        license = None
+        if completed:
             license = db.query(License).filter(License.license_id == deployment.license_id).first()
             if license:
                 license.deployment_status = "COMPLETED"
                 license.deployment_date = deployment.completion_date or deployment.deployment_date
                 license.license_status = "ACTIVE"  # Activate the license once deployment is complete
                 license.updated_at = datetime.now()
+                TableVersionService.bump(db, "licenses")
                 db.commit()
         
         # Refresh to get the full deployment with assignments
         deployment = db.query(DeploymentRecord)\
-            .options(joinedload(DeploymentRecord.engineer_assignments).joinedload(DeploymentEngineer.engineer))\
+            .options(*loader_options("deployment_record"))\
             .filter(DeploymentRecord.deployment_id == deployment_id)\
             .first()
         
-        # Convert engineer assignments
-        engineer_assignments = []
-        for assignment in deployment.engineer_assignments:
-            engineer = assignment.engineer
-            engineer_assignments.append(schemas.EngineerAssignmentInfo(
-                EngineerID=engineer.engineer_id,
-                EngineerName=engineer.engineer_name,
-                Email=engineer.email,
-                Role=assignment.role
-            ))
+        if completed:
+            DeploymentService._publish_completed(deployment, license)
         
         # Return the updated deployment
-        return schemas.DeploymentRecordInfo(
-            DeploymentID=deployment.deployment_id,
-            LicenseID=deployment.license_id,
-            DeploymentType=deployment.deployment_type,
-            DeploymentDate=deployment.deployment_date,
-            DeployedBy=deployment.deployed_by,
-            DeploymentStatus=deployment.deployment_status,
-            DeploymentEnvironment=deployment.deployment_environment,
-            ServerInfo=deployment.server_info,
-            CompletionDate=deployment.completion_date,
-            Notes=deployment.notes,
-            CreatedAt=deployment.created_at,
-            UpdatedAt=deployment.updated_at,
-            EngineerAssignments=engineer_assignments
-        )
+        return DeploymentService.to_schema(deployment)
 
     @staticmethod
     def delete_deployment_record(db: Session, deployment_id: int) -> bool:
@@ -326,10 +312,12 @@ class DeploymentService:
                     license.deployment_date = None
                 
                 license.updated_at = datetime.now()
+                TableVersionService.bump(db, "licenses")
                 db.commit()
         
         # Delete the deployment (will cascade to engineer assignments)
         db.delete(deployment)
+        TableVersionService.bump(db, "deployment_records")
         db.commit()
         
         return True
@@ -0,0 +1,362 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, timedelta
+import time
+
+import numpy as np
+
+from app.models.models import DeploymentRecord, DeploymentEngineer, FactoryEngineer
+from app.schemas import schemas
+
+# Deployments that occupy an engineer's calendar
+ACTIVE_DEPLOYMENT_STATUSES = ("PLANNED", "IN_PROGRESS")
+
+# Expected duration when a deployment type has no completed history yet
+DEFAULT_DURATION_DAYS = 3
+# Learned durations are clamped to this, so one forgotten completion date doesn't block a calendar for months
+MAX_DURATION_DAYS = 60
+
+# Assignment costs: an engineer without the required expertise is never chosen; a day that overlaps
+# existing work costs far more than a day of nearby load, so conflicts only happen when unavoidable
+INFEASIBLE = 1e9
+CONFLICT_DAY_COST = 100.0
+# Busy days within this many days around a deployment count as load, to spread work evenly
+LOAD_WINDOW_DAYS = 14
+
+MAX_BATCH_DEPLOYMENTS = 1000
+
+
+def min_cost_assignment(cost: np.ndarray) -> np.ndarray:
+    """
+    Column assigned to each row of an n x m cost matrix (n <= m) minimising the total cost.
+
+    Shortest augmenting paths with column potentials (Jonker-Volgenant). Rows are first matched
+    greedily to a free column at their row minimum; each remaining row then runs Dijkstra over the
+    columns, settling every column tied at the current distance in one vectorised step. Planner
+    costs are small integers with many ties, so that takes a handful of steps per row rather
+    than one per column.
+    """
+    n, m = cost.shape
+    v = np.zeros(m)
+    col_row = np.full(m, -1, dtype=np.int64)
+    row_col = np.full(n, -1, dtype=np.int64)
+
+    # Most constrained rows first, so flexible rows don't take their only cheap column
+    tight = cost == cost.min(axis=1, keepdims=True)
+    unmatched = []
+    for row in np.argsort(tight.sum(axis=1), kind="stable"):
+        free = np.flatnonzero(tight[row] & (col_row < 0))
+        if free.size:
+            col_row[free[0]] = row
+            row_col[row] = free[0]
+        else:
+            unmatched.append(row)
+
+    for start in unmatched:
+        dist = cost[start] - v
+        pred = np.full(m, start, dtype=np.int64)
+        ready = np.zeros(m, dtype=bool)
+        while True:
+            mu = dist[~ready].min()
+            todo = np.flatnonzero(~ready & (dist == mu))
+            free = todo[col_row[todo] < 0]
+            if free.size:
+                column = free[0]
+                break
+            ready[todo] = True
+            rows = col_row[todo]
+            through = mu + (cost[rows] - v) - (cost[rows, todo] - v[todo])[:, None]
+            best = through.argmin(axis=0)
+            candidate = through[best, np.arange(m)]
+            better = ~ready & (candidate < dist)
+            dist[better] = candidate[better]
+            pred[better] = rows[best[better]]
+        v[ready] += dist[ready] - mu
+        # Flip the path back to the start row
+        while True:
+            row = pred[column]
+            col_row[column] = row
+            row_col[row], column = column, row_col[row]
+            if row == start:
+                break
+    return row_col
+
+
+def has_expertise(expertise: Optional[str], required: List[str]) -> bool:
+    """Every required skill appears (case-insensitively) in the engineer's expertise text"""
+    text = (expertise or "").lower()
+    return all(skill.strip().lower() in text for skill in required if skill.strip())
+
+
+class EngineerCalendar:
+    """Day-occupancy matrix (engineers x days from origin); intervals are half-open [start, end)"""
+
+    def __init__(self, engineer_ids: List[int], origin: date, days: int):
+        self.index = {engineer_id: row for row, engineer_id in enumerate(engineer_ids)}
+        self.origin = origin
+        self.days = days
+        self._diff = np.zeros((len(engineer_ids), days + 1), dtype=np.int64)
+
+    def offset(self, value: date) -> int:
+        return int(np.clip((value - self.origin).days, 0, self.days))
+
+    def add(self, rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> None:
+        np.add.at(self._diff, (rows, starts), 1)
+        np.add.at(self._diff, (rows, ends), -1)
+
+    @property
+    def busy(self) -> np.ndarray:
+        """Concurrent deployments per engineer and day"""
+        return np.cumsum(self._diff, axis=1)[:, :self.days]
+
+    def prefix_sums(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Cumulative occupied days and cumulative load with a leading zero column, for O(1) range sums"""
+        busy = self.busy
+        zero = np.zeros((busy.shape[0], 1), dtype=np.int64)
+        occupied = np.hstack([zero, np.cumsum(busy > 0, axis=1)])
+        load = np.hstack([zero, np.cumsum(busy, axis=1)])
+        return occupied, load
+
+
+class EngineerPlannerService:
+    """
+    Capacity planning and assignment proposals for factory engineers.
+
+    An engineer's calendar is their PLANNED / IN_PROGRESS deployments, each occupying
+    [deployment_date, deployment_date + expected duration), where the expected duration is the
+    median completion_date - deployment_date of completed deployments of the same type.
+    """
+
+    @staticmethod
+    def learn_durations(db: Session) -> Dict[str, Dict[str, Any]]:
+        """Expected duration in days per deployment type ("*" = all types) with the sample size"""
+        rows = db.query(
+                DeploymentRecord.deployment_type, DeploymentRecord.deployment_date, DeploymentRecord.completion_date
+            )\
+            .filter(
+                DeploymentRecord.deployment_status == "COMPLETED",
+                DeploymentRecord.completion_date.isnot(None)
+            )\
+            .all()
+
+        by_type: Dict[str, List[int]] = {}
+        for deployment_type, started, completed in rows:
+            if completed >= started:
+                days = (completed - started).days + 1
+                by_type.setdefault(deployment_type, []).append(days)
+                by_type.setdefault("*", []).append(days)
+
+        durations = {"*": {"Days": DEFAULT_DURATION_DAYS, "Samples": 0}}
+        for deployment_type, samples in by_type.items():
+            days = int(np.clip(round(float(np.median(samples))), 1, MAX_DURATION_DAYS))
+            durations[deployment_type] = {"Days": days, "Samples": len(samples)}
+        return durations
+
+    @staticmethod
+    def _duration(durations: Dict[str, Dict[str, Any]], deployment_type: Any) -> int:
+        key = getattr(deployment_type, "value", deployment_type)
+        return (durations.get(key) or durations["*"])["Days"]
+
+    @staticmethod
+    def _active_engineers(db: Session) -> List[FactoryEngineer]:
+        return db.query(FactoryEngineer)\
+            .filter(FactoryEngineer.status == "ACTIVE")\
+            .order_by(FactoryEngineer.engineer_id)\
+            .all()
+
+    @staticmethod
+    def _build_calendar(
+        db: Session,
+        engineers: List[FactoryEngineer],
+        durations: Dict[str, Dict[str, Any]],
+        origin: date,
+        days: int,
+        today: date
+    ) -> Tuple[EngineerCalendar, Dict[int, int]]:
+        """Calendar of the engineers' active deployments; also returns active deployments per engineer"""
+        calendar = EngineerCalendar([engineer.engineer_id for engineer in engineers], origin, days)
+        rows = db.query(
+                DeploymentEngineer.engineer_id,
+                DeploymentRecord.deployment_type,
+                DeploymentRecord.deployment_date,
+                DeploymentRecord.deployment_status
+            )\
+            .join(DeploymentRecord, DeploymentRecord.deployment_id == DeploymentEngineer.deployment_id)\
+            .filter(
+                DeploymentRecord.deployment_status.in_(ACTIVE_DEPLOYMENT_STATUSES),
+                DeploymentEngineer.engineer_id.in_(list(calendar.index))
+            )\
+            .all()
+
+        active: Dict[int, int] = {}
+        engineer_rows, starts, ends = [], [], []
+        for engineer_id, deployment_type, deployment_date, status in rows:
+            active[engineer_id] = active.get(engineer_id, 0) + 1
+            end = deployment_date + timedelta(days=EngineerPlannerService._duration(durations, deployment_type))
+            if status == "IN_PROGRESS" and end <= today:
+                end = today + timedelta(days=1)  # overrunning: still busy today
+            engineer_rows.append(calendar.index[engineer_id])
+            starts.append(calendar.offset(deployment_date))
+            ends.append(calendar.offset(end))
+        if engineer_rows:
+            calendar.add(np.array(engineer_rows), np.array(starts), np.array(ends))
+        return calendar, active
+
+    @staticmethod
+    def get_capacity(db: Session, start_date: Optional[date] = None, days: int = 30) -> Dict[str, Any]:
+        """Busy days, utilisation and first free day of every active engineer over [start_date, start_date + days)"""
+        today = date.today()
+        start_date = start_date or today
+        durations = EngineerPlannerService.learn_durations(db)
+        engineers = EngineerPlannerService._active_engineers(db)
+        calendar, active = EngineerPlannerService._build_calendar(db, engineers, durations, start_date, days, today)
+
+        busy = calendar.busy
+        occupied = busy > 0
+        busy_days = occupied.sum(axis=1)
+        # argmin of a boolean row is its first False, i.e. the first free day (if the row has one)
+        first_free = np.where(occupied.all(axis=1), -1, np.argmin(occupied, axis=1))
+
+        items = []
+        for row, engineer in enumerate(engineers):
+            items.append({
+                "EngineerID": engineer.engineer_id,
+                "EngineerName": engineer.engineer_name,
+                "Expertise": engineer.expertise,
+                "ActiveDeployments": active.get(engineer.engineer_id, 0),
+                "BusyDays": int(busy_days[row]),
+                "Utilization": round(float(busy_days[row]) / days, 4) if days else 0.0,
+                "PeakConcurrent": int(busy[row].max()) if days else 0,
+                "NextFreeDate": start_date + timedelta(days=int(first_free[row])) if first_free[row] >= 0 else None,
+            })
+        items.sort(key=lambda item: (item["Utilization"], item["EngineerID"]))
+
+        return {
+            "StartDate": start_date,
+            "Days": days,
+            "Durations": durations,
+            "Engineers": items,
+        }
+
+    @staticmethod
+    def propose_assignments(db: Session, request: schemas.AssignmentProposalRequest) -> Dict[str, Any]:
+        """
+        Propose engineers for a batch of new deployments; nothing is written.
+
+        Each deployment needs EngineersNeeded distinct engineers with the required expertise. Slots are
+        matched to engineers by min-cost assignment, where a slot's cost for an engineer is
+        CONFLICT_DAY_COST per day overlapping their calendar plus their busy days around it. When there
+        are more slots than engineers, the earliest slots are matched first and later rounds see the
+        calendar including earlier proposals, so one engineer can take several non-overlapping deployments.
+        """
+        deployments = request.Deployments
+        if not deployments:
+            raise ValueError("Deployments must not be empty")
+        if len(deployments) > MAX_BATCH_DEPLOYMENTS:
+            raise ValueError(f"At most {MAX_BATCH_DEPLOYMENTS} deployments per request")
+
+        started_at = time.perf_counter()
+        today = date.today()
+        durations = EngineerPlannerService.learn_durations(db)
+        engineers = EngineerPlannerService._active_engineers(db)
+
+        starts = [deployment.DeploymentDate for deployment in deployments]
+        lengths = [
+            deployment.ExpectedDurationDays or EngineerPlannerService._duration(durations, deployment.DeploymentType)
+            for deployment in deployments
+        ]
+        origin = min(min(starts), today) - timedelta(days=LOAD_WINDOW_DAYS)
+        horizon = max(start + timedelta(days=length) for start, length in zip(starts, lengths))
+        days = (horizon - origin).days + LOAD_WINDOW_DAYS + 1
+        calendar, _ = EngineerPlannerService._build_calendar(db, engineers, durations, origin, days, today)
+
+        # Eligibility per distinct skill set (deployments x engineers)
+        skill_masks: Dict[Tuple[str, ...], np.ndarray] = {}
+        eligible = np.zeros((len(deployments), len(engineers)), dtype=bool)
+        for index, deployment in enumerate(deployments):
+            skills = tuple(sorted(skill.strip().lower() for skill in deployment.RequiredSkills if skill.strip()))
+            if skills not in skill_masks:
+                skill_masks[skills] = np.array([has_expertise(engineer.expertise, list(skills)) for engineer in engineers], dtype=bool)
+            eligible[index] = skill_masks[skills]
+
+        start_offsets = np.array([calendar.offset(start) for start in starts])
+        end_offsets = np.array([calendar.offset(start + timedelta(days=length)) for start, length in zip(starts, lengths)])
+        window_starts = np.clip(start_offsets - LOAD_WINDOW_DAYS, 0, days)
+        window_ends = np.clip(end_offsets + LOAD_WINDOW_DAYS, 0, days)
+
+        # One slot per engineer needed, earliest deployments first
+        pending = [index for index in np.argsort(start_offsets, kind="stable") for _ in range(deployments[index].EngineersNeeded)]
+        assigned: Dict[int, List[int]] = {index: [] for index in range(len(deployments))}
+        conflicts = np.zeros(len(deployments), dtype=np.int64)
+        costs = np.zeros(len(deployments))
+
+        while pending and engineers:
+            taken = np.zeros((len(deployments), len(engineers)), dtype=bool)
+            for index, rows in assigned.items():
+                taken[index, rows] = True
+            # Drop slots that no remaining engineer can take
+            pending = [index for index in pending if (eligible[index] & ~taken[index]).any()]
+            batch, pending = pending[:len(engineers)], pending[len(engineers):]
+            if not batch:
+                break
+
+            occupied, load = calendar.prefix_sums()
+            slots = np.array(batch)
+            overlap = (occupied[:, end_offsets[slots]] - occupied[:, start_offsets[slots]]).T
+            nearby = (load[:, window_ends[slots]] - load[:, window_starts[slots]]).T
+            cost = CONFLICT_DAY_COST * overlap + nearby
+            cost[~(eligible[slots] & ~taken[slots])] = INFEASIBLE
+
+            columns = min_cost_assignment(cost)
+            placed = 0
+            rows, row_starts, row_ends = [], [], []
+            for slot, column in enumerate(columns):
+                index = batch[slot]
+                if column < 0 or cost[slot, column] >= INFEASIBLE:
+                    pending.append(index)  # its eligible engineers went to other slots this round
+                    continue
+                placed += 1
+                assigned[index].append(int(column))
+                conflicts[index] += int(overlap[slot, column])
+                costs[index] += float(cost[slot, column])
+                rows.append(int(column))
+                row_starts.append(start_offsets[index])
+                row_ends.append(end_offsets[index])
+            if rows:
+                calendar.add(np.array(rows), np.array(row_starts), np.array(row_ends))
+            if not placed:
+                break
+
+        proposals, unassigned = [], []
+        for index, deployment in enumerate(deployments):
+            chosen = [engineers[row] for row in assigned[index]]
+            entry = {
+                "Index": index,
+                "LicenseID": deployment.LicenseID,
+                "DeploymentType": deployment.DeploymentType,
+                "StartDate": starts[index],
+                "EndDate": starts[index] + timedelta(days=lengths[index] - 1),
+                "ExpectedDurationDays": lengths[index],
+                "Engineers": [
+                    {"EngineerID": engineer.engineer_id, "EngineerName": engineer.engineer_name, "Email": engineer.email}
+                    for engineer in chosen
+                ],
+                "ConflictDays": int(conflicts[index]),
+                "Cost": round(float(costs[index]), 2),
+            }
+            if len(chosen) < deployment.EngineersNeeded:
+                entry["Reason"] = (
+                    "No active engineer has the required expertise" if not eligible[index].any()
+                    else f"Only {int(eligible[index].sum())} eligible engineer(s) for {deployment.EngineersNeeded} needed"
+                )
+                unassigned.append(entry)
+            else:
+                proposals.append(entry)
+
+        return {
+            "Assignments": proposals,
+            "Unassigned": unassigned,
+            "Durations": durations,
+            "EngineersConsidered": len(engineers),
+            "SolveMs": round((time.perf_counter() - started_at) * 1000, 1),
+        }
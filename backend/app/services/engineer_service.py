@@ -5,6 +5,7 @@ from datetime import datetime
 
 from app.models.models import FactoryEngineer, DeploymentEngineer, DeploymentRecord
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
 
 
 class EngineerService:
@@ -21,6 +22,7 @@ class EngineerService:
         )
         
         db.add(db_engineer)
+        TableVersionService.bump(db, "factory_engineers")
         db.commit()
         db.refresh(db_engineer)
         
@@ -119,6 +121,7 @@ class EngineerService:
         # Update the last modified date
         engineer.updated_at = datetime.now()
         
+        TableVersionService.bump(db, "factory_engineers")
         db.commit()
         db.refresh(engineer)
         
@@ -156,6 +159,7 @@ class EngineerService:
             raise ValueError("Cannot delete engineer with active deployment assignments. Reassign or complete deployments first.")
         
         db.delete(engineer)
+        TableVersionService.bump(db, "factory_engineers", "deployment_records")
         db.commit()
         
         return True
@@ -187,14 +191,9 @@ class EngineerService:
         if not deployment_ids:
             return []
         
-        # Get the deployment records using the deployment service
-        deployment_records = []
-        for deployment_id in deployment_ids:
-            deployment = DeploymentService.get_deployment_record(db, deployment_id)
-            if deployment:
-                deployment_records.append(deployment)
-        
-        return deployment_records
+        # One batch for the whole page instead of one query per deployment
+        deployment_records = DeploymentService.loader(db).load_many(deployment_ids)
+        return [deployment for deployment in deployment_records if deployment]
     
     @staticmethod
     def get_engineer_workload(db: Session, engineer_id: Optional[int] = None) -> Dict[str, Any]:
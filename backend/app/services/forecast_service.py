@@ -0,0 +1,310 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import extract, select
+from typing import List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from datetime import date, datetime
+import threading
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.models import License, Customer, PurchaseRecord
+from app.models.lead_models import Lead
+from app.services.table_version_service import TableVersionService
+
+# Tables a forecast is computed from; any write to them (via TableVersionService.bump) invalidates cached forecasts
+FORECAST_TABLES = ("leads", "licenses", "purchase_records", "customers")
+
+GROUP_BY_OPTIONS = ("sales_rep", "region")
+
+MAX_HORIZON = 24
+# Complete months of purchase history used for the trend fit
+HISTORY_MONTHS = 36
+# Fewer months than this and the fit drops the month-of-year terms (trend only)
+SEASONAL_MIN_MONTHS = 24
+# Window for the historical renewal rate, in months
+RENEWAL_RATE_WINDOW = 12
+# Purchase types whose amount prices the next renewal of a license
+RENEWAL_PRICE_TYPES = ("NEW", "RENEWAL")
+
+CACHE_SIZE = 16
+
+
+def month_index(value: date) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def closed_status_ids() -> List[int]:
+    return [int(part) for part in settings.LEAD_CLOSED_STATUS_IDS.split(",") if part.strip()]
+
+
+def _columns(rows: List[Tuple], count: int) -> List[Tuple]:
+    """Transpose result rows into one tuple per column"""
+    return list(zip(*rows)) if rows else [()] * count
+
+
+def _month_array(years: Tuple, months: Tuple) -> np.ndarray:
+    """year*12 + month - 1 per row, -1 where the date is NULL"""
+    year = np.array([y if y is not None else -1 for y in years], dtype=np.int64)
+    month = np.array([m if m is not None else 1 for m in months], dtype=np.int64)
+    return np.where(year >= 0, year * 12 + month - 1, -1)
+
+
+def _float_array(values: Tuple) -> np.ndarray:
+    return np.array([v if v is not None else 0.0 for v in values], dtype=np.float64)
+
+
+def _group_codes(values: Tuple) -> Tuple[List[str], np.ndarray]:
+    """Distinct group keys (NULL -> "") and each row's index into them"""
+    position: Dict[str, int] = {}
+    codes = np.fromiter(
+        (position.setdefault("" if v is None else str(v), len(position)) for v in values),
+        dtype=np.int64, count=len(values)
+    )
+    # Renumber so groups come out in key order
+    keys = sorted(position)
+    renumber = np.array([position[key] for key in keys], dtype=np.int64).argsort()
+    return keys, renumber[codes] if len(codes) else codes
+
+
+class ForecastService:
+    """
+    Revenue forecast computed with NumPy over whole tables at once:
+    - pipeline: open leads' (not in LEAD_CLOSED_STATUS_IDS) estimated value weighted by probability, by expected close month
+    - renewals: licenses expiring in each month x their latest NEW/RENEWAL amount x the historical renewal rate
+    - trend: least-squares fit of monthly revenue (linear trend + month-of-year), solved for all groups in one call
+
+    Results are cached per (horizon, group_by, month) and reused until one of FORECAST_TABLES changes version.
+    All amounts are the stored base-currency amounts (amount_base / estimated_value_base); rows whose
+    currency has no FX rate yet count as 0.
+    """
+
+    _cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_forecast(
+        db: Session,
+        horizon: int = 12,
+        group_by: Optional[str] = None,
+        today: Optional[date] = None
+    ) -> Dict[str, Any]:
+        if group_by is not None and group_by not in GROUP_BY_OPTIONS:
+            raise ValueError(f"Unknown group_by '{group_by}'; expected one of {', '.join(GROUP_BY_OPTIONS)}")
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+
+        current = month_index(today or date.today())
+        versions = TableVersionService.get_versions(db, FORECAST_TABLES)
+        key = (horizon, group_by, current, tuple(sorted(versions.items())))
+        with ForecastService._lock:
+            if key in ForecastService._cache:
+                ForecastService._cache.move_to_end(key)
+                return ForecastService._cache[key]
+
+        result = ForecastService._compute(db, horizon, group_by, current)
+        result["Versions"] = versions
+        with ForecastService._lock:
+            ForecastService._cache[key] = result
+            while len(ForecastService._cache) > CACHE_SIZE:
+                ForecastService._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def clear_cache() -> None:
+        with ForecastService._lock:
+            ForecastService._cache.clear()
+
+    # --- Computation ----------------------------------------------------------------------
+
+    @staticmethod
+    def _component(total: np.ndarray, groups: Optional[np.ndarray], keys: List[str]) -> Dict[str, Any]:
+        component = {"Total": np.round(total, 2).tolist(), "Groups": []}
+        if groups is not None:
+            component["Groups"] = [
+                {"Key": key, "Values": np.round(groups[index], 2).tolist()}
+                for index, key in enumerate(keys)
+            ]
+        return component
+
+    @staticmethod
+    def _by_group(codes: np.ndarray, offsets: np.ndarray, weights: np.ndarray, group_count: int, width: int) -> np.ndarray:
+        """Sum weights into a (group, offset) matrix with a single bincount"""
+        flat = np.bincount(codes * width + offsets, weights=weights, minlength=group_count * width)
+        return flat.reshape(group_count, width)
+
+    @staticmethod
+    def _pipeline(db: Session, horizon: int, group_by: Optional[str], current: int) -> Dict[str, Any]:
+        group_column = {"sales_rep": Lead.sales_rep_id, "region": Lead.region}.get(group_by, Lead.sales_rep_id)
+        rows = db.connection().execute(select(
+            Lead.estimated_value_base,
+            Lead.probability,
+            extract("year", Lead.expected_close_date),
+            extract("month", Lead.expected_close_date),
+            group_column
+        ).where(
+            # Only open stages are pipeline: won revenue shows up in purchase history, lost leads never will.
+            # Leads whose expected close date has passed are treated as closed too
+            Lead.status_id.notin_(closed_status_ids()),
+            Lead.expected_close_date >= month_start(current),
+            Lead.expected_close_date < month_start(current + horizon),
+            Lead.estimated_value_base > 0,
+            Lead.probability > 0
+        )).all()
+        values, probabilities, years, months, groups = _columns(rows, 5)
+
+        offsets = _month_array(years, months) - current
+        weighted = _float_array(values) * np.clip(_float_array(probabilities), 0, 100) / 100
+        mask = (offsets >= 0) & (offsets < horizon)
+
+        total = np.bincount(offsets[mask], weights=weighted[mask], minlength=horizon)
+        if group_by is None:
+            return ForecastService._component(total, None, [])
+        keys, codes = _group_codes(groups)
+        matrix = ForecastService._by_group(codes[mask], offsets[mask], weighted[mask], len(keys), horizon)
+        return ForecastService._component(total, matrix, keys)
+
+    @staticmethod
+    def _renewals(db: Session, horizon: int, group_by: Optional[str], current: int) -> Tuple[Dict[str, Any], float]:
+        group_column = {"sales_rep": License.sales_rep_id, "region": Customer.region}.get(group_by, License.sales_rep_id)
+        license_rows = db.connection().execute(
+            select(
+                License.license_id,
+                extract("year", License.expiry_date),
+                extract("month", License.expiry_date),
+                License.license_status,
+                group_column
+            ).join(Customer, Customer.customer_id == License.customer_id)
+        ).all()
+        license_ids, years, months, statuses, groups = _columns(license_rows, 5)
+        expiry = _month_array(years, months)
+        live = np.array([status != "TERMINATED" for status in statuses], dtype=bool)
+
+        purchase_rows = db.connection().execute(
+            select(
+                PurchaseRecord.license_id,
+                PurchaseRecord.amount_base,
+                PurchaseRecord.purchase_type,
+                extract("year", PurchaseRecord.previous_expiry_date),
+                extract("month", PurchaseRecord.previous_expiry_date)
+            ).order_by(PurchaseRecord.purchase_date, PurchaseRecord.purchase_id)
+        ).all()
+        purchase_licenses, amounts, purchase_types, previous_years, previous_months = _columns(purchase_rows, 5)
+
+        # Latest NEW/RENEWAL amount per license: with purchases in date order, the last write per index wins.
+        # Expansions and upgrades aren't what a renewal costs, and amounts not yet converted (no FX rate) are unknown
+        position = {license_id: index for index, license_id in enumerate(license_ids)}
+        license_codes = np.array([position.get(license_id, -1) for license_id in purchase_licenses], dtype=np.int64)
+        priced = np.array([
+            purchase_type in RENEWAL_PRICE_TYPES and amount is not None
+            for purchase_type, amount in zip(purchase_types, amounts)
+        ], dtype=bool)
+        known = (license_codes >= 0) & priced
+        latest_amount = np.zeros(len(license_ids), dtype=np.float64)
+        latest_amount[license_codes[known]] = _float_array(amounts)[known]
+
+        # Renewal rate over the last window: licenses renewed whose previous expiry fell in the window,
+        # against those plus licenses that expired in the window and were not renewed
+        window_start = current - RENEWAL_RATE_WINDOW
+        previous_expiry = _month_array(previous_years, previous_months)
+        is_renewal = np.array([purchase_type == "RENEWAL" for purchase_type in purchase_types], dtype=bool)
+        renewed = int(np.count_nonzero(is_renewal & (previous_expiry >= window_start) & (previous_expiry < current)))
+        lapsed = int(np.count_nonzero(live & (expiry >= window_start) & (expiry < current)))
+        rate = renewed / (renewed + lapsed) if renewed + lapsed else 1.0
+
+        offsets = expiry - current
+        mask = live & (offsets >= 0) & (offsets < horizon)
+        projected = latest_amount * rate
+
+        total = np.bincount(offsets[mask], weights=projected[mask], minlength=horizon)
+        if group_by is None:
+            return ForecastService._component(total, None, []), rate
+        keys, codes = _group_codes(groups)
+        matrix = ForecastService._by_group(codes[mask], offsets[mask], projected[mask], len(keys), horizon)
+        return ForecastService._component(total, matrix, keys), rate
+
+    @staticmethod
+    def _trend(db: Session, horizon: int, group_by: Optional[str], current: int) -> Tuple[Dict[str, Any], str, int]:
+        group_column = {"sales_rep": License.sales_rep_id, "region": Customer.region}.get(group_by, License.sales_rep_id)
+        start = current - HISTORY_MONTHS
+        rows = db.connection().execute(
+            select(
+                PurchaseRecord.amount_base,
+                extract("year", PurchaseRecord.purchase_date),
+                extract("month", PurchaseRecord.purchase_date),
+                group_column
+            )
+            .join(License, License.license_id == PurchaseRecord.license_id)
+            .join(Customer, Customer.customer_id == License.customer_id)
+            .where(PurchaseRecord.purchase_date >= month_start(start), PurchaseRecord.purchase_date < month_start(current))
+        ).all()
+        amounts, years, months, groups = _columns(rows, 4)
+        offsets = _month_array(years, months) - start
+        amounts = _float_array(amounts)
+
+        keys, codes = _group_codes(groups) if group_by else ([], np.zeros(len(amounts), dtype=np.int64))
+        # Column 0 is the total, columns 1.. the groups; all are fitted together
+        history = np.zeros((HISTORY_MONTHS, len(keys) + 1))
+        history[:, 0] = np.bincount(offsets, weights=amounts, minlength=HISTORY_MONTHS)
+        if keys:
+            history[:, 1:] = ForecastService._by_group(codes, offsets, amounts, len(keys), HISTORY_MONTHS).T
+
+        # Fit only from the first month with any revenue, so a young business isn't fitted to leading zeros
+        active = np.flatnonzero(history[:, 0])
+        first = int(active[0]) if active.size else HISTORY_MONTHS - 1
+        observed = HISTORY_MONTHS - first
+        seasonal = observed >= SEASONAL_MIN_MONTHS
+
+        def design(month_offsets: np.ndarray) -> np.ndarray:
+            columns = [np.ones(len(month_offsets)), month_offsets.astype(np.float64)]
+            if seasonal:
+                month_of_year = (start + month_offsets) % 12
+                columns.extend((month_of_year == m).astype(np.float64) for m in range(1, 12))
+            return np.column_stack(columns)
+
+        fitted_months = np.arange(first, HISTORY_MONTHS)
+        coefficients, *_ = np.linalg.lstsq(design(fitted_months), history[first:], rcond=None)
+        future = design(np.arange(HISTORY_MONTHS, HISTORY_MONTHS + horizon)) @ coefficients
+        future = np.clip(future, 0, None)
+
+        component = ForecastService._component(future[:, 0], future[:, 1:].T if keys else None, keys)
+        return component, "linear+seasonal" if seasonal else "linear", observed
+
+    @staticmethod
+    def _compute(db: Session, horizon: int, group_by: Optional[str], current: int) -> Dict[str, Any]:
+        pipeline = ForecastService._pipeline(db, horizon, group_by, current)
+        renewals, renewal_rate = ForecastService._renewals(db, horizon, group_by, current)
+        trend, method, observed = ForecastService._trend(db, horizon, group_by, current)
+
+        # Bottom-up forecast: pipeline + renewals, per group where both have the group
+        combined_groups: Dict[str, np.ndarray] = {}
+        for component in (pipeline, renewals):
+            for series in component["Groups"]:
+                combined_groups.setdefault(series["Key"], np.zeros(horizon))
+                combined_groups[series["Key"]] += np.array(series["Values"])
+        combined = {
+            "Total": np.round(np.array(pipeline["Total"]) + np.array(renewals["Total"]), 2).tolist(),
+            "Groups": [{"Key": key, "Values": np.round(values, 2).tolist()} for key, values in sorted(combined_groups.items())],
+        }
+
+        return {
+            "Months": [month_label(current + offset) for offset in range(horizon)],
+            "GroupBy": group_by,
+            "Pipeline": pipeline,
+            "Renewals": renewals,
+            "Combined": combined,
+            "Trend": trend,
+            "RenewalRate": round(renewal_rate, 4),
+            "TrendMethod": method,
+            "HistoryMonths": observed,
+            "Currency": settings.BASE_CURRENCY,
+            "GeneratedAt": datetime.now(),
+        }
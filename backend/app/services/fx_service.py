@@ -0,0 +1,308 @@
+from sqlalchemy import DateTime, func, or_, select, distinct
+from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, datetime
+from bisect import bisect_right
+import threading
+import time
+
+from app.core.config import settings
+from app.models.models import FxRate, PurchaseRecord
+from app.models.order_models import PurchaseOrder
+from app.models.lead_models import Lead
+from app.schemas import schemas
+from app.services.table_version_service import TableVersionService, CHANGED_TABLES_KEY
+
+# currency -> (rate dates as ordinals, rates), both in date order
+RateTable = Dict[str, Tuple[List[int], List[float]]]
+
+# model -> (amount attribute, base amount attribute, attribute whose day the rate is taken on)
+NORMALIZED_AMOUNTS = {
+    PurchaseRecord: ("amount", "amount_base", "purchase_date"),
+    PurchaseOrder: ("amount", "amount_base", "order_date"),
+    Lead: ("estimated_value", "estimated_value_base", "created_at"),
+}
+
+
+def default_currency(model: Any) -> str:
+    """The currency column default, which rows without a currency are in"""
+    return model.__table__.c.currency.default.arg
+
+
+def _load_rates(db: Session) -> RateTable:
+    rates: RateTable = {}
+    for currency, rate_date, rate in db.query(FxRate.currency, FxRate.rate_date, FxRate.rate)\
+            .order_by(FxRate.currency, FxRate.rate_date):
+        dates, values = rates.setdefault(currency, ([], []))
+        dates.append(rate_date.toordinal())
+        values.append(rate)
+    return rates
+
+
+def rate_on(rates: RateTable, currency: str, on: date) -> Optional[float]:
+    """Rate in force on a day: the latest rate on or before it (the earliest known before the first); None if unknown"""
+    if currency == settings.BASE_CURRENCY:
+        return 1.0
+    entry = rates.get(currency)
+    if not entry:
+        return None
+    dates, values = entry
+    index = bisect_right(dates, on.toordinal()) - 1
+    return values[max(index, 0)]
+
+
+class FxRateCache:
+    """
+    In-process copy of fx_rates for write-time conversion, stamped with the table's table_versions counter.
+
+    Lookups are a dict access plus a binary search over the currency's rate dates. The version is
+    re-read at most every FX_RATE_CHECK_INTERVAL seconds (writes from other workers) and rate
+    writes in this worker invalidate the copy as soon as their transaction commits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates: RateTable = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> RateTable:
+        if "fx_rates" in db.info.get(CHANGED_TABLES_KEY, ()):
+            # This transaction wrote rates that aren't committed yet: read them, don't cache them
+            return _load_rates(db)
+
+        with self._lock:
+            stale = time.monotonic() - self._checked_at >= settings.FX_RATE_CHECK_INTERVAL
+            rates, version = self._rates, self._version
+        if not stale and version is not None:
+            return rates
+
+        current = TableVersionService.get_versions(db, ["fx_rates"])["fx_rates"]
+        if current != version:
+            # The version was read before the rows, so a concurrent commit at worst causes one extra reload
+            rates = _load_rates(db)
+        with self._lock:
+            self._rates, self._version, self._checked_at = rates, current, time.monotonic()
+        return rates
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+
+fx_rate_cache = FxRateCache()
+
+
+# Rate writes in this worker are visible as soon as they commit
+TableVersionService.on_commit(["fx_rates"], lambda changed: fx_rate_cache.invalidate())
+
+
+class FxService:
+    """Daily FX rates and base-currency (settings.BASE_CURRENCY) amounts"""
+
+    @staticmethod
+    def rate(db: Session, currency: str, on: date) -> Optional[float]:
+        return rate_on(fx_rate_cache.get(db), currency.upper(), on)
+
+    @staticmethod
+    def to_base(db: Session, amount: Optional[float], currency: Optional[str], on: date, default: str = "USD") -> Optional[float]:
+        """amount in the base currency at the rate in force on the given day; None if the currency has no rates"""
+        if amount is None:
+            return None
+        rate = FxService.rate(db, currency or default, on)
+        return round(amount * rate, 2) if rate is not None else None
+
+    @staticmethod
+    def normalize(db: Session, obj: Any) -> None:
+        """Set the base-currency amount of a purchase record, purchase order or lead from its amount and currency"""
+        amount_attr, base_attr, date_attr = NORMALIZED_AMOUNTS[type(obj)]
+        on = getattr(obj, date_attr) or date.today()  # created_at is only set on flush
+        if isinstance(on, datetime):
+            on = on.date()
+        base = FxService.to_base(db, getattr(obj, amount_attr), obj.currency, on, default_currency(type(obj)))
+        setattr(obj, base_attr, base)
+
+    # --- Rates --------------------------------------------------------------------------
+
+    @staticmethod
+    def get_rates(
+        db: Session,
+        currency: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        skip: int = 0,
+        limit: int = 1000
+    ) -> List[schemas.FxRateInfo]:
+        query = db.query(FxRate)
+        if currency:
+            query = query.filter(FxRate.currency == currency.upper())
+        if start_date:
+            query = query.filter(FxRate.rate_date >= start_date)
+        if end_date:
+            query = query.filter(FxRate.rate_date <= end_date)
+        rows = query.order_by(FxRate.currency, FxRate.rate_date.desc()).offset(skip).limit(limit).all()
+        return [
+            schemas.FxRateInfo(
+                Currency=row.currency, RateDate=row.rate_date, Rate=row.rate, Source=row.source,
+                CreatedAt=row.created_at, UpdatedAt=row.updated_at
+            )
+            for row in rows
+        ]
+
+    @staticmethod
+    def upsert_rates(db: Session, rates: List[schemas.FxRateCreate]) -> Dict[str, Any]:
+        """
+        Insert or update daily rates, then recompute the stored base amounts they affect.
+
+        A rate applies from its day until the next known rate, so only rows dated on or after the
+        earliest changed day of each currency are recomputed (all of that currency's rows when the
+        change is its new earliest rate, which also covers the days before it).
+        """
+        if not rates:
+            raise ValueError("Rates must not be empty")
+        incoming: Dict[Tuple[str, date], schemas.FxRateCreate] = {}
+        for item in rates:
+            currency = item.Currency.upper()
+            if currency == settings.BASE_CURRENCY:
+                raise ValueError(f"{currency} is the base currency; its rate is always 1")
+            incoming[(currency, item.RateDate)] = item
+
+        currencies = {currency for currency, _ in incoming}
+        earliest = dict(
+            db.query(FxRate.currency, func.min(FxRate.rate_date))
+            .filter(FxRate.currency.in_(currencies))
+            .group_by(FxRate.currency)
+            .all()
+        )
+        existing = {
+            (row.currency, row.rate_date): row
+            for row in db.query(FxRate).filter(
+                FxRate.currency.in_(currencies),
+                FxRate.rate_date.in_({rate_date for _, rate_date in incoming})
+            )
+        }
+
+        starts: Dict[str, Optional[date]] = {}
+        inserted = updated = 0
+        for (currency, rate_date), item in incoming.items():
+            row = existing.get((currency, rate_date))
+            if row is None:
+                db.add(FxRate(currency=currency, rate_date=rate_date, rate=item.Rate, source=item.Source))
+                inserted += 1
+            elif row.rate != item.Rate or row.source != item.Source:
+                row.rate, row.source = item.Rate, item.Source
+                updated += 1
+            else:
+                continue
+            first = earliest.get(currency)
+            if currency in starts and starts[currency] is None:
+                continue
+            if first is None or rate_date <= first:
+                starts[currency] = None
+            else:
+                starts[currency] = min(starts.get(currency) or rate_date, rate_date)
+
+        recomputed = {}
+        if starts:
+            TableVersionService.bump(db, "fx_rates")
+            db.flush()
+            recomputed = FxService.recompute(db, starts)
+        db.commit()
+        return {"Inserted": inserted, "Updated": updated, "Recomputed": recomputed}
+
+    # --- Stored base amounts --------------------------------------------------------------
+
+    @staticmethod
+    def recompute(db: Session, starts: Optional[Dict[str, Optional[date]]] = None) -> Dict[str, int]:
+        """
+        Recompute base amounts with one set-based UPDATE per table and currency; starts maps currency
+        -> first affected day (None = all rows), None recomputes every currency. Rows are looked up
+        through the (currency, date) indexes and each rate through the fx_rates primary key.
+        Returns rows updated per table.
+
+        The sales performance and lead funnel aggregates are adjusted by the difference between the
+        affected rows' totals before and after the UPDATE, so only the aggregate rows of the affected
+        days are written. Nothing is committed: the caller's transaction covers rates, amounts and
+        aggregates together.
+        """
+        from app.services.sales_performance_service import SalesPerformanceService
+        from app.services.lead_analytics_service import LeadAnalyticsService
+
+        updated: Dict[str, int] = {}
+        for model, (amount_attr, base_attr, date_attr) in NORMALIZED_AMOUNTS.items():
+            amount, base = getattr(model, amount_attr), getattr(model, base_attr)
+            day = getattr(model, date_attr)
+            if isinstance(day.type, DateTime):
+                day = func.date(day)
+            default = default_currency(model)
+
+            targets = starts
+            if targets is None:
+                present = {currency or default for (currency,) in db.query(distinct(model.currency))}
+                targets = {currency: None for currency in present}
+
+            count = 0
+            for currency, start in targets.items():
+                matches = model.currency == currency
+                if currency == default:
+                    matches = or_(matches, model.currency.is_(None))
+                if currency == settings.BASE_CURRENCY:
+                    value = amount
+                else:
+                    latest = select(FxRate.rate)\
+                        .where(FxRate.currency == currency, FxRate.rate_date <= day)\
+                        .order_by(FxRate.rate_date.desc())\
+                        .limit(1)\
+                        .scalar_subquery()
+                    first = select(FxRate.rate)\
+                        .where(FxRate.currency == currency)\
+                        .order_by(FxRate.rate_date)\
+                        .limit(1)\
+                        .scalar_subquery()
+                    value = func.round(amount * func.coalesce(latest, first), 2)
+                criteria = [matches] if start is None else [matches, day >= start]
+                if model is PurchaseRecord:
+                    before = SalesPerformanceService.license_facts(db, *criteria)
+                elif model is Lead:
+                    before = LeadAnalyticsService.stage_values(db, *criteria)
+                changed = db.query(model).filter(*criteria).update({base: value}, synchronize_session=False)
+                if changed and model is PurchaseRecord:
+                    # counts and revenue net out; only revenue_base moves
+                    SalesPerformanceService.record(db, added=SalesPerformanceService.license_facts(db, *criteria), removed=before)
+                elif changed and model is Lead:
+                    LeadAnalyticsService.record_revalued(db, before, LeadAnalyticsService.stage_values(db, *criteria))
+                count += changed
+            updated[model.__tablename__] = count
+
+        changed_tables = [table for table, count in updated.items() if count]
+        if changed_tables:
+            TableVersionService.bump(db, *changed_tables)
+        return updated
+
+    @staticmethod
+    def get_status(db: Session) -> Dict[str, Any]:
+        """Known rate ranges per currency, and rows without a base amount (currencies with no rates yet)"""
+        ranges = db.query(FxRate.currency, func.min(FxRate.rate_date), func.max(FxRate.rate_date), func.count())\
+            .group_by(FxRate.currency)\
+            .order_by(FxRate.currency)\
+            .all()
+        unconverted: Dict[str, Dict[str, int]] = {}
+        for model, (amount_attr, base_attr, _) in NORMALIZED_AMOUNTS.items():
+            rows = db.query(model.currency, func.count())\
+                .filter(getattr(model, base_attr).is_(None), getattr(model, amount_attr).isnot(None))\
+                .group_by(model.currency)\
+                .all()
+            default = default_currency(model)
+            counts = {}
+            for currency, count in rows:
+                counts[currency or default] = counts.get(currency or default, 0) + count
+            unconverted[model.__tablename__] = counts
+        return {
+            "BaseCurrency": settings.BASE_CURRENCY,
+            "Currencies": [
+                {"Currency": currency, "FirstDate": first, "LastDate": last, "Rates": count}
+                for currency, first, last, count in ranges
+            ],
+            "Unconverted": unconverted,
+        }
@@ -0,0 +1,192 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple, NamedTuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import threading
+import time
+import zlib
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import IdempotencyKey
+
+# Outcomes of IdempotencyStore.claim
+CLAIMED = "claimed"  # the caller executes the request and then completes or releases the key
+REPLAY = "replay"  # the request was already executed: send the stored response
+IN_PROGRESS = "in_progress"  # another worker is executing it right now
+
+PURGE_INTERVAL = 300  # seconds between deletions of expired keys
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    media_type: Optional[str]
+    body: Optional[bytes]  # None: the request succeeded but its response was too large (or streamed) to store
+    expires_at: datetime
+
+
+class IdempotencyConflict(ValueError):
+    """The key was already used for a different request"""
+
+
+def request_fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}?{query}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def credential_scope(name: str, value: str) -> str:
+    """Keys are per caller: the scope is a hash of the credential, which is never stored itself"""
+    return f"{name}:{hashlib.sha256(value.encode()).hexdigest()[:40]}"
+
+
+class IdempotencyStore:
+    """
+    Responses of requests sent with an Idempotency-Key, keyed by (caller scope, key).
+
+    The idempotency_keys table is the source of truth shared by all workers: a key is claimed by
+    inserting its row (the primary key makes concurrent claims of the same key exclusive), and
+    completed by storing the zlib-compressed response on it. Completed responses are also kept in
+    a size-bounded in-process LRU so most retries are answered without a database round trip.
+    While the request runs, its worker refreshes locked_at (heartbeat); a key whose heartbeat is
+    older than IDEMPOTENCY_LOCK_TIMEOUT belongs to a crashed worker and can be taken over.
+    Keys expire after IDEMPOTENCY_TTL_HOURS and are deleted periodically.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses: "OrderedDict[Tuple[str, str], StoredResponse]" = OrderedDict()
+        self._purged_at = 0.0
+
+    def _remember(self, scope: str, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._responses[(scope, key)] = stored
+            self._responses.move_to_end((scope, key))
+            while len(self._responses) > settings.IDEMPOTENCY_CACHE_MAX_ENTRIES:
+                self._responses.popitem(last=False)
+
+    def _cached(self, scope: str, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._responses.get((scope, key))
+            if stored is None:
+                return None
+            if stored.expires_at <= datetime.now():
+                del self._responses[(scope, key)]
+                return None
+            self._responses.move_to_end((scope, key))
+            return stored
+
+    def _purge_expired(self, db: Session) -> None:
+        with self._lock:
+            if time.monotonic() - self._purged_at < PURGE_INTERVAL:
+                return
+            self._purged_at = time.monotonic()
+        db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= datetime.now()).delete(synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def _take_over(db: Session, row: IdempotencyKey, fingerprint: str, now: datetime) -> bool:
+        """Re-claim an expired key or one abandoned by a crashed worker, unless another worker got to it first"""
+        taken = db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == row.scope,
+            IdempotencyKey.idempotency_key == row.idempotency_key,
+            IdempotencyKey.locked_at == row.locked_at
+        ).update({
+            "fingerprint": fingerprint, "status": "IN_PROGRESS", "locked_at": now,
+            "response_status": None, "response_media_type": None, "response_body": None,
+            "expires_at": now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+        }, synchronize_session=False)
+        db.commit()
+        return bool(taken)
+
+    def claim(self, scope: str, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """(CLAIMED | REPLAY | IN_PROGRESS, stored response for REPLAY); IdempotencyConflict if the request differs"""
+        stored = self._cached(scope, key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+            return REPLAY, stored
+
+        db = SessionLocal()
+        try:
+            self._purge_expired(db)
+            now = datetime.now()
+            db.add(IdempotencyKey(
+                scope=scope, idempotency_key=key, fingerprint=fingerprint, status="IN_PROGRESS",
+                locked_at=now, expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+            ))
+            try:
+                db.commit()
+                return CLAIMED, None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.get(IdempotencyKey, (scope, key))
+            if row is None:
+                return IN_PROGRESS, None  # released in between: the caller's next attempt claims it
+            if row.expires_at <= now:
+                return (CLAIMED if self._take_over(db, row, fingerprint, now) else IN_PROGRESS), None
+            if row.fingerprint != fingerprint:
+                raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+            if row.status == "COMPLETED":
+                stored = StoredResponse(
+                    row.fingerprint, row.response_status, row.response_media_type,
+                    zlib.decompress(row.response_body) if row.response_body is not None else None, row.expires_at
+                )
+                self._remember(scope, key, stored)
+                return REPLAY, stored
+            if row.locked_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                return (CLAIMED if self._take_over(db, row, fingerprint, now) else IN_PROGRESS), None
+            return IN_PROGRESS, None
+        finally:
+            db.close()
+
+    def heartbeat(self, scope: str, key: str) -> None:
+        """Mark a claimed key as still being executed, so it is not taken over while the request runs"""
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.idempotency_key == key,
+                IdempotencyKey.status == "IN_PROGRESS"
+            ).update({"locked_at": datetime.now()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def complete(self, scope: str, key: str, fingerprint: str, status_code: int, media_type: Optional[str], body: Optional[bytes]) -> None:
+        """Store the response of a claimed key; body None keeps only the marker that the request succeeded"""
+        expires_at = datetime.now() + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.idempotency_key == key,
+                IdempotencyKey.status == "IN_PROGRESS"
+            ).update({
+                "status": "COMPLETED", "response_status": status_code, "response_media_type": media_type,
+                "response_body": zlib.compress(body) if body is not None else None, "expires_at": expires_at,
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self._remember(scope, key, StoredResponse(fingerprint, status_code, media_type, body, expires_at))
+
+    def release(self, scope: str, key: str) -> None:
+        """Give up a claimed key without a stored response (the request failed), so a retry executes it again"""
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.idempotency_key == key,
+                IdempotencyKey.status == "IN_PROGRESS"
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+idempotency_store = IdempotencyStore()
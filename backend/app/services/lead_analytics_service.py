@@ -0,0 +1,427 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import insert, func, case
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime
+from collections import defaultdict
+import math
+
+from app.core.config import settings
+from app.models.lead_models import Lead, LeadStatusTransition, LeadFunnelStat, LeadStageDuration
+from app.services.reference_data_service import ReferenceDataService
+
+# Aggregation dimensions; "month" is the month a lead entered a stage, "cohort" the month it was created
+DIMENSIONS = ("all", "sales_rep", "source", "cohort", "month")
+
+# Time-in-stage histogram: bucket 0 is < 1 hour, bucket i covers [2^(i-1), 2^i) hours, the last bucket is open-ended
+DURATION_BUCKETS = 16
+
+
+def month_key(value: Optional[datetime]) -> str:
+    return (value or datetime.now()).strftime("%Y-%m")
+
+
+def duration_bucket(seconds: float) -> int:
+    hours = seconds / 3600
+    if hours < 1:
+        return 0
+    return min(int(math.log2(hours)) + 1, DURATION_BUCKETS - 1)
+
+
+def bucket_bounds(bucket: int) -> Tuple[float, float]:
+    """Lower and upper bound of a histogram bucket, in hours"""
+    if bucket == 0:
+        return 0.0, 1.0
+    return float(2 ** (bucket - 1)), float(2 ** bucket)
+
+
+def median_from_histogram(counts: Dict[int, int]) -> Optional[float]:
+    """Median in hours, interpolated inside the bucket that holds it"""
+    total = sum(counts.values())
+    if not total:
+        return None
+    half, seen = total / 2, 0
+    for bucket in range(DURATION_BUCKETS):
+        count = counts.get(bucket, 0)
+        if count and seen + count >= half:
+            lower, upper = bucket_bounds(bucket)
+            return lower + (upper - lower) * (half - seen) / count
+        seen += count
+    return None
+
+
+class AggregatesNotBuilt(RuntimeError):
+    """Leads exist but the funnel aggregates are empty: migrate_lead_analytics.py has not been run"""
+
+
+class LeadSnapshot:
+    """The attributes of a lead that the funnel aggregates are keyed on"""
+
+    __slots__ = ("status_id", "sales_rep_id", "source_id", "estimated_value", "cohort_month")
+
+    def __init__(self, lead: Lead):
+        self.status_id = lead.status_id
+        self.sales_rep_id = lead.sales_rep_id
+        self.source_id = lead.source_id
+        self.estimated_value = lead.estimated_value_base or 0  # base currency, so stages sum across currencies
+        self.cohort_month = month_key(lead.created_at)
+
+    def keys(self, changed_at: Optional[datetime] = None) -> List[Tuple[str, str]]:
+        """(dimension, dimension_key) pairs this lead counts towards"""
+        keys = [
+            ("all", ""),
+            ("sales_rep", str(self.sales_rep_id or "")),
+            ("source", str(self.source_id or "")),
+            ("cohort", self.cohort_month),
+        ]
+        if changed_at is not None:
+            keys.append(("month", month_key(changed_at)))
+        return keys
+
+
+class LeadAnalyticsService:
+    """
+    Funnel and conversion analytics maintained incrementally from lead status transitions.
+
+    Every status change is appended to lead_status_transitions and applied as counter deltas
+    to lead_funnel_stats / lead_stage_durations for each dimension the lead belongs to, so
+    reads touch one row per stage (plus a fixed number of histogram buckets) regardless of
+    how many leads exist. rebuild() recomputes all aggregates from the log and the leads table.
+
+    Reads never write: the aggregates are built once by migrate_lead_analytics.py (or
+    POST /leads/analytics/rebuild) and kept current by the write paths from then on.
+    """
+
+    @staticmethod
+    def _increment(db: Session, model: Any, key: Dict[str, Any], deltas: Dict[str, float]) -> None:
+        """Atomically add deltas to a counter row, creating it on first use"""
+        filters = [getattr(model, column) == value for column, value in key.items()]
+        values = {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()}
+        if db.query(model).filter(*filters).update(values, synchronize_session=False):
+            return
+        try:
+            with db.begin_nested():
+                db.execute(insert(model).values(**key, **deltas))
+        except IntegrityError:
+            db.query(model).filter(*filters).update(values, synchronize_session=False)
+
+    @staticmethod
+    def _stage_delta(pending: Dict[Tuple, Dict[str, float]], keys: List[Tuple[str, str]], status_id: int, **deltas: float) -> None:
+        """Accumulate deltas per LeadFunnelStat row so each row is written once per change"""
+        for dimension, dimension_key in keys:
+            row = pending.setdefault((LeadFunnelStat, dimension, dimension_key, status_id), defaultdict(float))
+            for column, delta in deltas.items():
+                row[column] += delta
+
+    @staticmethod
+    def _apply(db: Session, pending: Dict[Tuple, Dict[str, float]]) -> None:
+        for (model, dimension, dimension_key, status_id, *bucket), deltas in pending.items():
+            deltas = {column: delta for column, delta in deltas.items() if delta}
+            if not deltas:
+                continue
+            key = {"dimension": dimension, "dimension_key": dimension_key, "status_id": status_id}
+            if bucket:
+                key["bucket"] = bucket[0]
+            LeadAnalyticsService._increment(db, model, key, deltas)
+
+    @staticmethod
+    def record_created(db: Session, lead: Lead) -> None:
+        """Count a new lead in its initial stage. Call after flush (lead_id assigned), before commit."""
+        LeadAnalyticsService.record_created_many(db, [lead])
+
+    @staticmethod
+    def record_created_many(db: Session, leads: List[Lead]) -> None:
+        """
+        Count a batch of new leads (bulk import): one multi-row insert of their creation
+        transitions, and each counter row they touch written once with the batch's total.
+        """
+        if not leads:
+            return
+        now = datetime.now()
+        transitions = []
+        pending = {}
+        for lead in leads:
+            after = LeadSnapshot(lead)
+            transitions.append({
+                "lead_id": lead.lead_id,
+                "from_status_id": None,
+                "to_status_id": after.status_id,
+                "sales_rep_id": after.sales_rep_id,
+                "source_id": after.source_id,
+                "cohort_month": after.cohort_month,
+                "changed_at": now,
+            })
+            LeadAnalyticsService._stage_delta(pending, after.keys(now), after.status_id, reached_count=1)
+            LeadAnalyticsService._stage_delta(
+                pending, after.keys(), after.status_id, current_count=1, current_value=after.estimated_value
+            )
+        db.execute(insert(LeadStatusTransition), transitions)
+        LeadAnalyticsService._apply(db, pending)
+
+    @staticmethod
+    def record_change(db: Session, lead: Lead, before: LeadSnapshot) -> None:
+        """
+        Apply an update of a lead to the aggregates: a status change is logged as a transition
+        (reached/exited/time-in-stage), and any change of status, owner, source or value moves
+        the lead's "current" contribution from its old keys to its new ones.
+        """
+        after = LeadSnapshot(lead)
+        after.cohort_month = before.cohort_month
+        pending = {}
+
+        if after.status_id != before.status_id:
+            now = datetime.now()
+            # One aggregate row: when the lead entered its previous status, and whether it was in the new one before
+            last_changed_at, reached_before = db.query(
+                func.max(LeadStatusTransition.changed_at),
+                func.max(case((LeadStatusTransition.to_status_id == after.status_id, 1), else_=0))
+            ).filter(LeadStatusTransition.lead_id == lead.lead_id).one()
+            entered_at = last_changed_at or lead.created_at
+            dwell = max(int((now - entered_at).total_seconds()), 0) if entered_at else None
+
+            db.add(LeadStatusTransition(
+                lead_id=lead.lead_id,
+                from_status_id=before.status_id,
+                to_status_id=after.status_id,
+                sales_rep_id=after.sales_rep_id,
+                source_id=after.source_id,
+                cohort_month=after.cohort_month,
+                seconds_in_from_status=dwell,
+                changed_at=now
+            ))
+            # Exits are keyed like the logged transition (owner/source after the change) so that
+            # rebuild() reproduces the same numbers from the log
+            transition_keys = after.keys(now)
+            LeadAnalyticsService._stage_delta(
+                pending, transition_keys, before.status_id, exited_count=1, dwell_seconds=dwell or 0
+            )
+            if dwell is not None:
+                for dimension, dimension_key in transition_keys:
+                    pending[(LeadStageDuration, dimension, dimension_key, before.status_id, duration_bucket(dwell))] = {"count": 1}
+            if not reached_before:
+                LeadAnalyticsService._stage_delta(pending, transition_keys, after.status_id, reached_count=1)
+
+        before_keys, after_keys = before.keys(), after.keys()
+        if after.status_id != before.status_id or before_keys != after_keys or after.estimated_value != before.estimated_value:
+            LeadAnalyticsService._stage_delta(
+                pending, before_keys, before.status_id, current_count=-1, current_value=-before.estimated_value
+            )
+            LeadAnalyticsService._stage_delta(
+                pending, after_keys, after.status_id, current_count=1, current_value=after.estimated_value
+            )
+        LeadAnalyticsService._apply(db, pending)
+
+    @staticmethod
+    def stage_values(db: Session, *criteria: Any) -> Dict[Tuple, Dict[str, float]]:
+        """Base-currency value of the leads matching criteria, per funnel row they count towards"""
+        values = {}
+        leads = db.query(Lead.status_id, Lead.sales_rep_id, Lead.source_id, Lead.estimated_value_base, Lead.created_at)\
+            .filter(*criteria)\
+            .yield_per(1000)
+        for lead in leads:
+            snapshot = LeadSnapshot(lead)
+            LeadAnalyticsService._stage_delta(values, snapshot.keys(), snapshot.status_id, current_value=snapshot.estimated_value)
+        return values
+
+    @staticmethod
+    def record_revalued(db: Session, before: Dict[Tuple, Dict[str, float]], after: Dict[Tuple, Dict[str, float]]) -> None:
+        """Apply a change of stored base amounts (FX recompute): the difference of two stage_values() results"""
+        pending = {key: defaultdict(float, values) for key, values in after.items()}
+        for key, values in before.items():
+            pending.setdefault(key, defaultdict(float))["current_value"] -= values["current_value"]
+        LeadAnalyticsService._apply(db, pending)
+
+    @staticmethod
+    def record_deleted(db: Session, lead: Lead) -> None:
+        """Remove a deleted lead from the current-stage counts; its history stays in the aggregates"""
+        before = LeadSnapshot(lead)
+        pending = {}
+        LeadAnalyticsService._stage_delta(
+            pending, before.keys(), before.status_id, current_count=-1, current_value=-before.estimated_value
+        )
+        LeadAnalyticsService._apply(db, pending)
+
+    # --- Reads ----------------------------------------------------------------------------
+
+    @staticmethod
+    def check_built(db: Session) -> None:
+        """Raise AggregatesNotBuilt rather than report an all-zero funnel for existing leads"""
+        if db.query(LeadFunnelStat.status_id).first() is None and db.query(Lead.lead_id).first() is not None:
+            raise AggregatesNotBuilt("Lead funnel aggregates have not been built; run migrate_lead_analytics.py")
+
+    @staticmethod
+    def get_funnel(
+        db: Session,
+        dimension: str = "all",
+        dimension_key: str = "",
+        target_status_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Funnel for one dimension value: per stage (in display order) the current count/value,
+        how many leads ever reached it, conversion to the next stage and time spent in it.
+
+        Stage conversion is reached(next) / reached(stage), so leads that skip a stage can push
+        a rate above 1. The overall rate is reached(target) / reached(first stage) and is only
+        given for an explicit target (e.g. the won stage), since the last stage may be "lost".
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'; expected one of {', '.join(DIMENSIONS)}")
+        if dimension == "all":
+            dimension_key = ""
+
+        stats = {
+            row.status_id: row for row in db.query(LeadFunnelStat)
+            .filter(LeadFunnelStat.dimension == dimension, LeadFunnelStat.dimension_key == dimension_key)
+        }
+        if not stats:
+            LeadAnalyticsService.check_built(db)
+        histograms: Dict[int, Dict[int, int]] = defaultdict(dict)
+        for row in db.query(LeadStageDuration.status_id, LeadStageDuration.bucket, LeadStageDuration.count)\
+                .filter(LeadStageDuration.dimension == dimension, LeadStageDuration.dimension_key == dimension_key):
+            histograms[row.status_id][row.bucket] = row.count
+
+        statuses = ReferenceDataService.get_lead_statuses(db)
+        stages = []
+        for index, status in enumerate(statuses):
+            stat = stats.get(status.status_id)
+            reached = stat.reached_count if stat else 0
+            next_stat = stats.get(statuses[index + 1].status_id) if index + 1 < len(statuses) else None
+            exited = stat.exited_count if stat else 0
+            median_hours = median_from_histogram(histograms.get(status.status_id, {}))
+            stages.append({
+                "status_id": status.status_id,
+                "status_name": status.status_name,
+                "current_count": stat.current_count if stat else 0,
+                "current_value": float(stat.current_value) if stat else 0.0,
+                "reached_count": reached,
+                "conversion_rate": round(next_stat.reached_count / reached, 4) if next_stat and reached else None,
+                "median_days_in_stage": round(median_hours / 24, 2) if median_hours is not None else None,
+                "avg_days_in_stage": round(stat.dwell_seconds / exited / 86400, 2) if exited else None,
+            })
+
+        first_reached = stages[0]["reached_count"] if stages else 0
+        target_reached = next((stage["reached_count"] for stage in stages if stage["status_id"] == target_status_id), None)
+        return {
+            "dimension": dimension,
+            "dimension_key": dimension_key,
+            "stages": stages,
+            "total_leads": sum(stage["current_count"] for stage in stages),
+            "total_value": sum(stage["current_value"] for stage in stages),
+            "currency": settings.BASE_CURRENCY,
+            "overall_conversion_rate": round(target_reached / first_reached, 4) if first_reached and target_reached is not None else None,
+        }
+
+    @staticmethod
+    def get_cohorts(db: Session, start_month: Optional[str] = None, end_month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per creation month, how many of that month's leads reached each stage"""
+        query = db.query(LeadFunnelStat.dimension_key, LeadFunnelStat.status_id, LeadFunnelStat.reached_count)\
+            .filter(LeadFunnelStat.dimension == "cohort")
+        if start_month:
+            query = query.filter(LeadFunnelStat.dimension_key >= start_month)
+        if end_month:
+            query = query.filter(LeadFunnelStat.dimension_key <= end_month)
+
+        reached: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for row in query:
+            reached[row.dimension_key][row.status_id] = row.reached_count
+        if not reached:
+            LeadAnalyticsService.check_built(db)
+
+        statuses = ReferenceDataService.get_lead_statuses(db)
+        cohorts = []
+        for month in sorted(reached):
+            counts = reached[month]
+            size = counts.get(statuses[0].status_id, 0) if statuses else 0
+            cohorts.append({
+                "cohort_month": month,
+                "stages": [
+                    {
+                        "status_id": status.status_id,
+                        "status_name": status.status_name,
+                        "reached_count": counts.get(status.status_id, 0),
+                        "reached_rate": round(counts.get(status.status_id, 0) / size, 4) if size else None,
+                    }
+                    for status in statuses
+                ],
+            })
+        return cohorts
+
+    # --- Maintenance ----------------------------------------------------------------------
+
+    @staticmethod
+    def backfill_transitions(db: Session) -> int:
+        """Log a creation transition for every lead that has none (history before this log existed)"""
+        logged = db.query(LeadStatusTransition.lead_id).distinct()
+        leads = db.query(Lead.lead_id, Lead.status_id, Lead.sales_rep_id, Lead.source_id, Lead.created_at)\
+            .filter(Lead.lead_id.notin_(logged))\
+            .all()
+        if leads:
+            db.execute(insert(LeadStatusTransition), [
+                {
+                    "lead_id": lead.lead_id,
+                    "from_status_id": None,
+                    "to_status_id": lead.status_id,
+                    "sales_rep_id": lead.sales_rep_id,
+                    "source_id": lead.source_id,
+                    "cohort_month": month_key(lead.created_at),
+                    "changed_at": lead.created_at or datetime.now(),
+                }
+                for lead in leads
+            ])
+        db.commit()
+        return len(leads)
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Recompute every aggregate from the transition log and the current leads; returns rows written"""
+        stats: Dict[Tuple[str, str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        durations: Dict[Tuple[str, str, int, int], int] = defaultdict(int)
+
+        reached = set()
+        transitions = db.query(LeadStatusTransition).order_by(
+            LeadStatusTransition.lead_id, LeadStatusTransition.changed_at, LeadStatusTransition.transition_id
+        ).yield_per(1000)
+        for row in transitions:
+            month = month_key(row.changed_at)
+            keys = [("all", ""), ("sales_rep", str(row.sales_rep_id or "")), ("source", str(row.source_id or "")),
+                    ("cohort", row.cohort_month), ("month", month)]
+            if row.from_status_id is not None:
+                for dimension, dimension_key in keys:
+                    stat = stats[(dimension, dimension_key, row.from_status_id)]
+                    stat["exited_count"] += 1
+                    if row.seconds_in_from_status is not None:
+                        stat["dwell_seconds"] += row.seconds_in_from_status
+                        durations[(dimension, dimension_key, row.from_status_id, duration_bucket(row.seconds_in_from_status))] += 1
+            if (row.lead_id, row.to_status_id) not in reached:
+                reached.add((row.lead_id, row.to_status_id))
+                for dimension, dimension_key in keys:
+                    stats[(dimension, dimension_key, row.to_status_id)]["reached_count"] += 1
+
+        for lead in db.query(Lead).yield_per(1000):
+            snapshot = LeadSnapshot(lead)
+            for dimension, dimension_key in snapshot.keys():
+                stat = stats[(dimension, dimension_key, snapshot.status_id)]
+                stat["current_count"] += 1
+                stat["current_value"] += snapshot.estimated_value
+
+        db.query(LeadFunnelStat).delete(synchronize_session=False)
+        db.query(LeadStageDuration).delete(synchronize_session=False)
+        stat_rows = [
+            {
+                "dimension": dimension, "dimension_key": dimension_key, "status_id": status_id,
+                "current_count": int(values["current_count"]), "current_value": values["current_value"],
+                "reached_count": int(values["reached_count"]), "exited_count": int(values["exited_count"]),
+                "dwell_seconds": values["dwell_seconds"],
+            }
+            for (dimension, dimension_key, status_id), values in stats.items()
+        ]
+        duration_rows = [
+            {"dimension": dimension, "dimension_key": dimension_key, "status_id": status_id, "bucket": bucket, "count": count}
+            for (dimension, dimension_key, status_id, bucket), count in durations.items()
+        ]
+        if stat_rows:
+            db.execute(insert(LeadFunnelStat), stat_rows)
+        if duration_rows:
+            db.execute(insert(LeadStageDuration), duration_rows)
+        db.commit()
+        return len(stat_rows) + len(duration_rows)
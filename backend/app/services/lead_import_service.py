@@ -0,0 +1,617 @@
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from typing import List, Optional, Dict, Any, Iterator, Iterable, Tuple, Callable
+from datetime import datetime, date
+from email import policy
+from email.header import decode_header, make_header
+from email.message import Message
+from email.errors import MessageError
+from email.parser import BytesParser
+from email.utils import getaddresses, parsedate_to_datetime
+from functools import lru_cache
+from itertools import islice
+from email_validator import validate_email, EmailNotValidError
+import csv
+import os
+import re
+
+from app.core.config import settings
+from app.models.models import SalesRep
+from app.models.partner_models import Partner
+from app.models.lead_models import Lead, LeadImportJob, LeadSource, LeadStatus
+from app.services.table_version_service import TableVersionService
+from app.services.lead_analytics_service import LeadAnalyticsService
+from app.services.fx_service import FxService, default_currency
+from app.services.partner_identity_service import email_routing_cache
+from app.services.customer_match_service import email_domain
+
+SOURCE_TYPES = ("MBOX", "EML", "CSV", "XLSX")
+SOURCE_SUFFIXES = {".mbox": "MBOX", ".mbx": "MBOX", ".csv": "CSV", ".xlsx": "XLSX"}
+
+# Only the headers and the start of the body are read; the rest of a large message (attachments) is dropped
+MAX_MESSAGE_BYTES = 1 << 20
+BODY_SCAN_LINES = 80
+NOTES_EXCERPT_CHARS = 1000
+
+# Errors of a malformed message or row: the item is counted in error_count and, for the first
+# MAX_ITEM_ERRORS, recorded in item_errors; anything else fails the run (IndexError: getaddresses
+# on some malformed address lists)
+EXTRACT_ERRORS = (MessageError, UnicodeError, ValueError, IndexError)
+MAX_ITEM_ERRORS = 100
+
+# Column headers (CSV/XLSX) and "Label: value" lines in email bodies -> lead field
+FIELD_ALIASES = {
+    "lead_name": ("lead_name", "lead", "opportunity", "商机名称", "商机"),
+    "company_name": ("company_name", "company", "organization", "公司", "公司名称", "客户", "客户名称"),
+    "contact_person": ("contact_person", "contact", "contact_name", "name", "联系人", "姓名"),
+    "contact_email": ("contact_email", "email", "e-mail", "邮箱", "电子邮件"),
+    "contact_phone": ("contact_phone", "phone", "mobile", "tel", "电话", "手机"),
+    "industry": ("industry", "行业"),
+    "region": ("region", "地区", "区域"),
+    "product_interest": ("product_interest", "product", "产品", "感兴趣的产品"),
+    "estimated_value": ("estimated_value", "budget", "amount", "value", "预算", "预估价值", "金额"),
+    "currency": ("currency", "币种"),
+    "expected_close_date": ("expected_close_date", "close_date", "预计成单日期"),
+    "probability": ("probability", "成单概率"),
+    "notes": ("notes", "备注"),
+    "sales_rep": ("sales_rep", "sales_rep_email", "sales", "销售", "销售代表"),
+    "partner": ("partner", "partner_email", "合作伙伴"),
+}
+FIELD_BY_ALIAS = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+
+LABEL_PATTERN = re.compile(r"^\s*([^:：]{1,30}?)\s*[:：]\s*(.+?)\s*$")
+REPLY_PREFIX_PATTERN = re.compile(r"^\s*((re|fw|fwd|回复|答复|转发)\s*[:：]\s*)+", re.IGNORECASE)
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+# Second-level labels under country TLDs (acme.com.cn -> acme)
+GENERIC_LABELS = {"com", "net", "org", "gov", "edu", "co", "ac"}
+
+# Record read from a source: (checkpoint after it, raw fields or message)
+SourceItem = Tuple[Any, Any]
+
+
+def header_field(header: Any) -> Optional[str]:
+    """Lead field a column header or body label stands for"""
+    key = re.sub(r"[\s\-]+", "_", str(header or "").strip().lower())
+    return FIELD_BY_ALIAS.get(key) or FIELD_BY_ALIAS.get(key.replace("_", ""))
+
+
+def company_from_domain(email: Optional[str]) -> Optional[str]:
+    """Company name guessed from a business email domain (mail.acme.com.cn -> Acme); None for free mail"""
+    domain = email_domain(email)
+    if not domain:
+        return None
+    labels = domain.split(".")[:-1]
+    if len(labels) > 1 and labels[-1] in GENERIC_LABELS:
+        labels = labels[:-1]
+    return labels[-1].capitalize() if labels and labels[-1] else None
+
+
+def resolve_source_path(path: str, import_dir: Optional[str] = None) -> str:
+    """Absolute path of a source under import_dir (default LEAD_IMPORT_DIR); paths escaping that directory are rejected"""
+    import_dir = import_dir or settings.LEAD_IMPORT_DIR
+    root = os.path.realpath(import_dir)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"Import sources must be under {import_dir}")
+    if not os.path.exists(full):
+        raise ValueError(f"Import source '{path}' not found")
+    return full
+
+
+def detect_source_type(full_path: str) -> str:
+    if os.path.isdir(full_path):
+        return "EML"
+    source_type = SOURCE_SUFFIXES.get(os.path.splitext(full_path)[1].lower())
+    if source_type is None:
+        raise ValueError(f"Cannot tell the format of '{os.path.basename(full_path)}'; pass source_type")
+    return source_type
+
+
+# --- Sources: generators yielding (checkpoint after the item, item) ------------------------
+
+def iter_mbox(path: str, offset: int = 0) -> Iterator[SourceItem]:
+    """
+    Messages of an mbox file from a byte offset; the checkpoint is the offset of the next message.
+    Reads line by line, so memory is bounded by MAX_MESSAGE_BYTES whatever the file size
+    (mailbox.mbox would first index every message).
+    """
+    with open(path, "rb") as mbox:
+        mbox.seek(offset)
+        position, lines, size = offset, None, 0
+        for line in mbox:
+            if line.startswith(b"From "):
+                if lines is not None:
+                    yield position, b"".join(lines)
+                lines, size = [], 0
+            elif lines is not None and size < MAX_MESSAGE_BYTES:
+                if line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+                    line = line[1:]  # mboxrd quoting of body lines starting with "From "
+                lines.append(line)
+                size += len(line)
+            position += len(line)
+        if lines is not None:
+            yield position, b"".join(lines)
+
+
+def _walk_key(relative_path: str) -> Tuple[Tuple[int, str], ...]:
+    """Sort key matching the walk order of iter_eml_dir: a directory's files, then its subdirectories"""
+    parts = relative_path.split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+def iter_eml_dir(root: str, after: Optional[str] = None) -> Iterator[SourceItem]:
+    """.eml files under a directory in a stable order; the checkpoint is the last file's relative path"""
+    after_key = _walk_key(after) if after else None
+    for directory, subdirectories, files in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        prefix = () if relative_dir == "." else tuple((1, part) for part in relative_dir.split(os.sep))
+        subdirectories.sort()
+        if after_key is not None:
+            # Skip whole subtrees that were finished before the checkpoint
+            depth = len(prefix) + 1
+            subdirectories[:] = [name for name in subdirectories if prefix + ((1, name),) >= after_key[:depth]]
+        for name in sorted(files):
+            if not name.lower().endswith(".eml"):
+                continue
+            relative_path = name if not prefix else os.path.join(relative_dir, name)
+            if after_key is not None and _walk_key(relative_path) <= after_key:
+                continue
+            with open(os.path.join(directory, name), "rb") as message:
+                yield relative_path, message.read(MAX_MESSAGE_BYTES)
+
+
+def iter_csv(path: str, start_row: int = 0, encoding: str = "utf-8-sig") -> Iterator[SourceItem]:
+    """Rows of a CSV file as {header: value}; the checkpoint is the number of data rows read"""
+    with open(path, newline="", encoding=encoding) as source:
+        reader = csv.reader(source)
+        header = next(reader, None)
+        if header is None:
+            return
+        for row_number, row in enumerate(islice(reader, start_row, None), start_row + 1):
+            yield row_number, dict(zip(header, row))
+
+
+def iter_xlsx(path: str, start_row: int = 0) -> Iterator[SourceItem]:
+    """Rows of the first worksheet as {header: value}, read in openpyxl's streaming (read-only) mode"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import requires the openpyxl package")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), None)
+        if header is None:
+            return
+        rows = sheet.iter_rows(min_row=start_row + 2, values_only=True)
+        for row_number, row in enumerate(rows, start_row + 1):
+            if any(value not in (None, "") for value in row):
+                yield row_number, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+# --- Extraction ---------------------------------------------------------------------------
+
+def _text(value: Any, column: Optional[str] = None) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    if column is not None:
+        length = Lead.__table__.c[column].type.length
+        text = text[:length] if length else text
+    return text
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    digits = re.sub(r"[^\d.\-]", "", str(value))
+    try:
+        return float(digits) if digits else None
+    except ValueError:
+        return None
+
+
+def _date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date) or value is None:
+        return value
+    text = str(value).strip().replace("/", "-")
+    try:
+        return datetime.strptime(text[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def valid_email(value: Optional[str]) -> Optional[str]:
+    """Lower-cased address if it passes the same syntax check as the lead schemas (EmailStr), else None"""
+    if not value or "@" not in value:
+        return None
+    try:
+        validate_email(value, check_deliverability=False)
+    except EmailNotValidError:
+        return None
+    return value.lower()
+
+
+def _header_text(value: Any) -> str:
+    """Header value with RFC 2047 encoded words (=?utf-8?b?...?=) decoded"""
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except (LookupError, UnicodeError, ValueError):
+        return str(value)
+
+
+def _message_text(message: Message) -> str:
+    """Plain text of a message body (HTML with the tags stripped), empty when it cannot be decoded"""
+    parts = [part for part in message.walk() if part.get_content_maintype() == "text" and not part.get_filename()]
+    part = next((part for part in parts if part.get_content_subtype() == "plain"), None) \
+        or next((part for part in parts if part.get_content_subtype() == "html"), None)
+    if part is None:
+        return ""
+    payload = part.get_payload(decode=True)
+    if not isinstance(payload, bytes):
+        return ""
+    try:
+        content = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    except LookupError:
+        content = payload.decode("utf-8", errors="replace")
+    if part.get_content_subtype() == "html":
+        content = HTML_TAG_PATTERN.sub(" ", content)
+    return content
+
+
+class ImportContext:
+    """Per-run lookups (sales reps, partners, email routes) and the job's defaults, loaded once per run"""
+
+    def __init__(self, db: Session, options: Dict[str, Any]):
+        self.options = options
+        self.routes = email_routing_cache.get(db)
+        self.sales_reps_by_email: Dict[str, int] = {}
+        self.sales_reps_by_name: Dict[str, int] = {}
+        for sales_rep_id, name, email in db.query(SalesRep.sales_rep_id, SalesRep.sales_rep_name, SalesRep.email):
+            if email:
+                self.sales_reps_by_email.setdefault(email.strip().lower(), sales_rep_id)
+            self.sales_reps_by_name.setdefault(name.strip().casefold(), sales_rep_id)
+        self.partners_by_name = {
+            name.strip().casefold(): partner_id
+            for partner_id, name in db.query(Partner.partner_id, Partner.partner_name)
+        }
+        self.currency = options.get("currency") or default_currency(Lead)
+
+    def partner_id(self, value: Optional[str]) -> Optional[int]:
+        if not value:
+            return None
+        if "@" in value:
+            route = self.routes.resolve(value)
+            return route.partner_id if route else None
+        return self.partners_by_name.get(value.strip().casefold())
+
+    def sales_rep_id(self, value: Optional[str]) -> Optional[int]:
+        if not value:
+            return None
+        key = value.strip().lower()
+        return self.sales_reps_by_email.get(key) or self.sales_reps_by_name.get(key.casefold())
+
+    def draft(self, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Lead column values from extracted fields; None when neither a company nor a contact can be found"""
+        email = valid_email(_text(fields.get("contact_email"), "contact_email"))
+        contact = _text(fields.get("contact_person"), "contact_person") or (email.split("@")[0] if email else None)
+        company = _text(fields.get("company_name"), "company_name") or _text(company_from_domain(email), "company_name")
+        if not company or not contact:
+            return None
+
+        currency = (_text(fields.get("currency")) or self.currency).upper()
+        probability = _number(fields.get("probability"))
+        return {
+            "lead_name": _text(fields.get("lead_name"), "lead_name") or _text(f"{company} - {contact}", "lead_name"),
+            "company_name": company,
+            "contact_person": contact,
+            "contact_email": email,
+            "contact_phone": _text(fields.get("contact_phone"), "contact_phone"),
+            "sales_rep_id": fields.get("sales_rep_id") or self.sales_rep_id(_text(fields.get("sales_rep"))) or self.options.get("sales_rep_id"),
+            "partner_id": fields.get("partner_id") or self.partner_id(_text(fields.get("partner"))),
+            "source_id": self.options.get("source_id"),
+            "status_id": self.options["status_id"],
+            "industry": _text(fields.get("industry"), "industry"),
+            "region": _text(fields.get("region"), "region"),
+            "product_interest": _text(fields.get("product_interest"), "product_interest"),
+            "estimated_value": _number(fields.get("estimated_value")),
+            "currency": currency if len(currency) == 3 else self.currency,
+            "expected_close_date": _date(fields.get("expected_close_date")),
+            "probability": int(probability) if probability is not None and 0 <= probability <= 100 else None,
+            "last_activity_date": fields.get("last_activity_date"),
+            "notes": _text(fields.get("notes")),
+        }
+
+    def from_row(self, row: Dict[Any, Any]) -> Optional[Dict[str, Any]]:
+        fields = {}
+        for header, value in row.items():
+            field = header_field(header)
+            if field and value not in (None, ""):
+                fields[field] = value
+        return self.draft(fields)
+
+    def from_message(self, raw: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Lead from an inquiry email. "Label: value" lines near the top of the body (公司: ..., Phone: ...)
+        win; otherwise the contact is the first sender that is neither a mapped partner address nor a
+        sales rep, the partner is the first address routed by the partner email mappings and the sales
+        rep the first recipient (or sender) who is one.
+        """
+        # compat32 keeps headers as raw strings; the default policy's structured header parsing costs
+        # several times more than the rest of the import, and only a few headers are used
+        message = BytesParser(policy=policy.compat32).parsebytes(raw)
+        body = _message_text(message)
+
+        fields: Dict[str, Any] = {}
+        for line in body.splitlines()[:BODY_SCAN_LINES]:
+            match = LABEL_PATTERN.match(line)
+            if match:
+                field = header_field(match.group(1))
+                if field and field not in fields:
+                    fields[field] = match.group(2)
+
+        senders = getaddresses([str(value) for value in message.get_all("reply-to", []) + message.get_all("from", [])])
+        recipients = getaddresses([str(value) for value in message.get_all("to", []) + message.get_all("cc", [])])
+        senders = [(_header_text(name), address) for name, address in senders]
+        contact = None
+        addresses = [(True, name, address) for name, address in senders] + [(False, name, address) for name, address in recipients]
+        for is_sender, name, address in addresses:
+            address = address.strip().lower()
+            if "@" not in address:
+                continue
+            route = self.routes.resolve(address)
+            if route is not None:
+                fields.setdefault("partner_id", route.partner_id)
+            elif address in self.sales_reps_by_email:
+                fields.setdefault("sales_rep_id", self.sales_reps_by_email[address])
+            elif is_sender and contact is None:
+                contact = (name, address)
+        if contact is not None:
+            fields.setdefault("contact_email", contact[1])
+            if contact[0]:
+                fields.setdefault("contact_person", contact[0])
+
+        subject = REPLY_PREFIX_PATTERN.sub("", _header_text(message.get("subject"))).strip()
+        if subject:
+            fields.setdefault("lead_name", subject)
+        try:
+            received_at = parsedate_to_datetime(str(message.get("date"))) if message.get("date") else None
+        except (TypeError, ValueError):
+            received_at = None
+        if received_at is not None:
+            fields["last_activity_date"] = received_at.replace(tzinfo=None)
+
+        excerpt = re.sub(r"\s+", " ", body).strip()[:NOTES_EXCERPT_CHARS]
+        origin = f"Imported from email {(message.get('message-id') or '').strip()}".strip()
+        fields["notes"] = "\n\n".join(part for part in (fields.get("notes"), origin, excerpt) if part)
+        return self.draft(fields)
+
+
+def dedup_keys(draft: Dict[str, Any]) -> List[Tuple[str, ...]]:
+    """A lead is a duplicate of another with the same contact email, or the same company and contact"""
+    keys = [("name", draft["company_name"].casefold(), draft["contact_person"].casefold())]
+    if draft["contact_email"]:
+        keys.append(("email", draft["contact_email"]))
+    return keys
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class LeadImportService:
+    """
+    Resumable lead import from mbox files, directories of .eml files and CSV/XLSX sheets.
+
+    Sources are read by generators (one message or row at a time) and written LEAD_IMPORT_CHUNK_SIZE
+    leads per transaction; each transaction also stores the job's checkpoint, so an interrupted run
+    resumes after the last committed chunk without duplicating or losing rows, and memory stays
+    bounded by one chunk whatever the archive size. Duplicates are detected per chunk against the
+    leads table (which holds earlier chunks) through the contact_email / company_name indexes.
+    """
+
+    @staticmethod
+    def create_job(
+        db: Session,
+        path: str,
+        source_type: Optional[str] = None,
+        status_id: Optional[int] = None,
+        source_id: Optional[int] = None,
+        sales_rep_id: Optional[int] = None,
+        currency: Optional[str] = None,
+        encoding: Optional[str] = None,
+        created_by: Optional[str] = None
+    ) -> LeadImportJob:
+        full_path = resolve_source_path(path)
+        source_type = (source_type or detect_source_type(full_path)).upper()
+        if source_type not in SOURCE_TYPES:
+            raise ValueError(f"Unknown source_type '{source_type}'; expected one of {', '.join(SOURCE_TYPES)}")
+        if (source_type == "EML") != os.path.isdir(full_path):
+            raise ValueError("EML sources are directories; other sources are files")
+
+        if status_id is None:
+            first = db.query(LeadStatus.status_id).filter(LeadStatus.is_active == True)\
+                .order_by(LeadStatus.display_order, LeadStatus.status_id).first()
+            if first is None:
+                raise ValueError("No active lead status to import leads into")
+            status_id = first.status_id
+        elif db.get(LeadStatus, status_id) is None:
+            raise ValueError(f"Lead status {status_id} not found")
+        if source_id is not None and db.get(LeadSource, source_id) is None:
+            raise ValueError(f"Lead source {source_id} not found")
+        if sales_rep_id is not None and db.get(SalesRep, sales_rep_id) is None:
+            raise ValueError(f"Sales rep {sales_rep_id} not found")
+
+        job = LeadImportJob(
+            source_type=source_type,
+            source_path=os.path.relpath(full_path, os.path.realpath(settings.LEAD_IMPORT_DIR)),
+            options={
+                "status_id": status_id, "source_id": source_id, "sales_rep_id": sales_rep_id,
+                "currency": currency.upper() if currency else None, "encoding": encoding,
+            },
+            status="PENDING",
+            created_by=created_by
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def get_job(db: Session, job_id: int) -> Optional[LeadImportJob]:
+        return db.query(LeadImportJob).filter(LeadImportJob.job_id == job_id).first()
+
+    @staticmethod
+    def get_jobs(db: Session, skip: int = 0, limit: int = 100) -> List[LeadImportJob]:
+        return db.query(LeadImportJob).order_by(LeadImportJob.job_id.desc()).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def describe(job: LeadImportJob) -> Dict[str, Any]:
+        """The job's columns plus progress: the share of the source read (mbox files only, other sources have no cheap total)"""
+        info = {column.name: getattr(job, column.name) for column in LeadImportJob.__table__.columns}
+        progress = None
+        if job.status == "COMPLETED":
+            progress = 1.0
+        elif job.source_type == "MBOX":
+            try:
+                size = os.path.getsize(resolve_source_path(job.source_path))
+                progress = round(min((job.checkpoint or 0) / size, 1.0), 4) if size else 1.0
+            except (OSError, ValueError):
+                pass
+        info["progress"] = progress
+        return info
+
+    @staticmethod
+    def _read(job: LeadImportJob) -> Iterator[SourceItem]:
+        full_path = resolve_source_path(job.source_path)
+        if job.source_type == "MBOX":
+            return iter_mbox(full_path, job.checkpoint or 0)
+        if job.source_type == "EML":
+            return iter_eml_dir(full_path, job.checkpoint)
+        if job.source_type == "CSV":
+            return iter_csv(full_path, job.checkpoint or 0, (job.options or {}).get("encoding") or "utf-8-sig")
+        return iter_xlsx(full_path, job.checkpoint or 0)
+
+    @staticmethod
+    def _extract(job: LeadImportJob, context: ImportContext, items: Iterator[SourceItem]) -> Iterator[Tuple[Any, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """
+        (checkpoint, lead values or None if the item yields no lead, parse error or None) for each source item;
+        the error gives the item's position (mbox: offset of the message, EML: file, CSV/XLSX: row) and message
+        """
+        extract = context.from_row if job.source_type in ("CSV", "XLSX") else context.from_message
+        start = job.checkpoint or 0
+        for checkpoint, item in items:
+            try:
+                yield checkpoint, extract(item), None
+            except EXTRACT_ERRORS as e:
+                position = start if job.source_type == "MBOX" else checkpoint
+                yield checkpoint, None, {"position": position, "error": f"{type(e).__name__}: {e}"[:500]}
+            start = checkpoint
+
+    @staticmethod
+    def _write_chunk(db: Session, job: LeadImportJob, chunk: List[Tuple[Any, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+        drafts = [draft for _, draft, _ in chunk if draft is not None]
+        errors = [error for _, _, error in chunk if error is not None]
+        emails = {draft["contact_email"] for draft in drafts if draft["contact_email"]}
+        companies = {draft["company_name"] for draft in drafts}
+
+        seen = set()
+        if emails:
+            seen.update(("email", email.lower()) for (email,) in db.query(Lead.contact_email).filter(Lead.contact_email.in_(emails)))
+        if companies:
+            seen.update(
+                ("name", company.casefold(), contact.casefold())
+                for company, contact in db.query(Lead.company_name, Lead.contact_person).filter(Lead.company_name.in_(companies))
+            )
+
+        now = datetime.now()
+        leads = []
+        for draft in drafts:
+            keys = dedup_keys(draft)
+            if not seen.isdisjoint(keys):
+                job.duplicate_count += 1
+                continue
+            seen.update(keys)
+            lead = Lead(**draft, created_at=now)  # set here so the analytics snapshot doesn't reload it per lead
+            FxService.normalize(db, lead)
+            leads.append(lead)
+
+        if leads:
+            db.add_all(leads)
+            db.flush()
+            LeadAnalyticsService.record_created_many(db, leads)
+            TableVersionService.bump(db, "leads")
+        job.checkpoint = chunk[-1][0]
+        job.processed_count += len(chunk)
+        job.inserted_count += len(leads)
+        job.skipped_count += len(chunk) - len(drafts) - len(errors)
+        job.error_count = (job.error_count or 0) + len(errors)
+        recorded = job.item_errors or []
+        if errors and len(recorded) < MAX_ITEM_ERRORS:
+            job.item_errors = recorded + errors[:MAX_ITEM_ERRORS - len(recorded)]  # a new list, so the JSON change is saved
+        db.commit()
+
+    @staticmethod
+    def run(
+        db: Session,
+        job_id: int,
+        max_records: Optional[int] = None,
+        force: bool = False,
+        on_chunk: Optional[Callable[[LeadImportJob], None]] = None
+    ) -> LeadImportJob:
+        """
+        Process a job from its checkpoint: to the end of the source, or at most max_records messages/rows
+        (the job is then PAUSED and a later run continues). A RUNNING job is only taken over with force
+        (after the process running it died).
+        """
+        job = LeadImportService.get_job(db, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Lead import job not found")
+        if job.status == "COMPLETED":
+            return job
+        claimable = ["PENDING", "PAUSED", "FAILED"] + (["RUNNING"] if force else [])
+        claimed = db.query(LeadImportJob)\
+            .filter(LeadImportJob.job_id == job_id, LeadImportJob.status.in_(claimable))\
+            .update({LeadImportJob.status: "RUNNING", LeadImportJob.last_error: None}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            raise HTTPException(status_code=409, detail=f"Lead import job {job_id} is already running")
+        db.refresh(job)
+
+        try:
+            context = ImportContext(db, job.options or {})
+            items = LeadImportService._read(job)
+            if max_records is not None:
+                items = islice(items, max_records)
+            read = 0
+            for chunk in chunked(LeadImportService._extract(job, context, items), settings.LEAD_IMPORT_CHUNK_SIZE):
+                LeadImportService._write_chunk(db, job, chunk)
+                read += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(job)
+            finished = max_records is None or read < max_records
+            job.status = "COMPLETED" if finished else "PAUSED"
+            if finished:
+                job.finished_at = datetime.now()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            job.status = "FAILED"
+            job.last_error = str(e)[:2000]
+            db.commit()
+        db.refresh(job)
+        return job
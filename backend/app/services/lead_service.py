@@ -1,17 +1,25 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, Query
 from sqlalchemy import func, desc, asc
 from fastapi import HTTPException
 
+from app.core.config import settings
 from app.models.lead_models import Lead, LeadSource, LeadStatus, LeadActivity
+from app.models.models import SyncTombstone
 from app.schemas import lead_schemas
+from app.services.table_version_service import TableVersionService
+from app.services.count_service import CountService, TotalCount
+from app.services.reference_data_service import ReferenceDataService
+from app.services.lead_analytics_service import LeadAnalyticsService, LeadSnapshot
+from app.services.fx_service import FxService
 
 
 # LeadSource CRUD
 def create_lead_source(db: Session, source: lead_schemas.LeadSourceCreate) -> LeadSource:
     db_source = LeadSource(**source.dict())
     db.add(db_source)
+    TableVersionService.bump(db, "lead_sources")
     db.commit()
     db.refresh(db_source)
     return db_source
@@ -24,8 +32,8 @@ def get_lead_source(db: Session, source_id: int) -> LeadSource:
     return db_source
 
 
-def get_lead_sources(db: Session, skip: int = 0, limit: int = 100) -> List[LeadSource]:
-    return db.query(LeadSource).offset(skip).limit(limit).all()
+def get_lead_sources(db: Session, skip: int = 0, limit: int = 100) -> List[lead_schemas.LeadSource]:
+    return ReferenceDataService.get_lead_sources(db)[skip:skip + limit]
 
 
 def update_lead_source(db: Session, source_id: int, source: lead_schemas.LeadSourceUpdate) -> LeadSource:
@@ -33,6 +41,7 @@ def update_lead_source(db: Session, source_id: int, source: lead_schemas.LeadSou
     update_data = source.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_source, field, value)
+    TableVersionService.bump(db, "lead_sources")
     db.commit()
     db.refresh(db_source)
     return db_source
@@ -42,6 +51,7 @@ def update_lead_source(db: Session, source_id: int, source: lead_schemas.LeadSou
 def create_lead_status(db: Session, status: lead_schemas.LeadStatusCreate) -> LeadStatus:
     db_status = LeadStatus(**status.dict())
     db.add(db_status)
+    TableVersionService.bump(db, "lead_statuses")
     db.commit()
     db.refresh(db_status)
     return db_status
@@ -54,8 +64,8 @@ def get_lead_status(db: Session, status_id: int) -> LeadStatus:
     return db_status
 
 
-def get_lead_statuses(db: Session, skip: int = 0, limit: int = 100) -> List[LeadStatus]:
-    return db.query(LeadStatus).order_by(asc(LeadStatus.display_order)).offset(skip).limit(limit).all()
+def get_lead_statuses(db: Session, skip: int = 0, limit: int = 100) -> List[lead_schemas.LeadStatus]:
+    return ReferenceDataService.get_lead_statuses(db)[skip:skip + limit]
 
 
 def update_lead_status(db: Session, status_id: int, status: lead_schemas.LeadStatusUpdate) -> LeadStatus:
@@ -63,6 +73,7 @@ def update_lead_status(db: Session, status_id: int, status: lead_schemas.LeadSta
     update_data = status.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_status, field, value)
+    TableVersionService.bump(db, "lead_statuses")
     db.commit()
     db.refresh(db_status)
     return db_status
@@ -71,7 +82,11 @@ def update_lead_status(db: Session, status_id: int, status: lead_schemas.LeadSta
 # Lead CRUD
 def create_lead(db: Session, lead: lead_schemas.LeadCreate) -> Lead:
     db_lead = Lead(**lead.dict())
+    FxService.normalize(db, db_lead)
     db.add(db_lead)
+    db.flush()
+    LeadAnalyticsService.record_created(db, db_lead)
+    TableVersionService.bump(db, "leads")
     db.commit()
     db.refresh(db_lead)
     return db_lead
@@ -84,16 +99,14 @@ def get_lead(db: Session, lead_id: int) -> Lead:
     return db_lead
 
 
-def get_leads(
-    db: Session, 
-    skip: int = 0, 
-    limit: int = 100,
+def _leads_query(
+    db: Session,
     status_id: Optional[int] = None,
     sales_rep_id: Optional[int] = None,
     partner_id: Optional[int] = None,
     source_id: Optional[int] = None,
     search_term: Optional[str] = None
-) -> List[Lead]:
+) -> Query:
     query = db.query(Lead)
     
     if status_id:
@@ -116,15 +129,49 @@ def get_leads(
             (Lead.contact_person.ilike(search_pattern)) |
             (Lead.contact_email.ilike(search_pattern))
         )
-    
+    return query
+
+
+def get_leads(
+    db: Session, 
+    skip: int = 0, 
+    limit: int = 100,
+    status_id: Optional[int] = None,
+    sales_rep_id: Optional[int] = None,
+    partner_id: Optional[int] = None,
+    source_id: Optional[int] = None,
+    search_term: Optional[str] = None
+) -> List[Lead]:
+    query = _leads_query(db, status_id, sales_rep_id, partner_id, source_id, search_term)
     return query.order_by(desc(Lead.updated_at)).offset(skip).limit(limit).all()
 
 
+def count_leads(
+    db: Session,
+    status_id: Optional[int] = None,
+    sales_rep_id: Optional[int] = None,
+    partner_id: Optional[int] = None,
+    source_id: Optional[int] = None,
+    search_term: Optional[str] = None
+) -> TotalCount:
+    """Total for get_leads with the same filters"""
+    query = _leads_query(db, status_id, sales_rep_id, partner_id, source_id, search_term)
+    return CountService.count(db, "leads", query, ["leads"], {
+        "status_id": status_id, "sales_rep_id": sales_rep_id, "partner_id": partner_id,
+        "source_id": source_id, "search_term": search_term,
+    })
+
+
 def update_lead(db: Session, lead_id: int, lead: lead_schemas.LeadUpdate) -> Lead:
     db_lead = get_lead(db, lead_id)
+    before = LeadSnapshot(db_lead)
     update_data = lead.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_lead, field, value)
+    if update_data.keys() & {"estimated_value", "currency"}:
+        FxService.normalize(db, db_lead)
+    LeadAnalyticsService.record_change(db, db_lead, before)
+    TableVersionService.bump(db, "leads")
     db.commit()
     db.refresh(db_lead)
     return db_lead
@@ -132,11 +179,14 @@ def update_lead(db: Session, lead_id: int, lead: lead_schemas.LeadUpdate) -> Lea
 
 def update_lead_status_only(db: Session, lead_id: int, status_update: lead_schemas.LeadStatusUpdate) -> Lead:
     db_lead = get_lead(db, lead_id)
+    before = LeadSnapshot(db_lead)
     db_lead.status_id = status_update.status_id
     
     if status_update.notes:
         db_lead.notes = status_update.notes if not db_lead.notes else f"{db_lead.notes}\n\n{status_update.notes}"
     
+    LeadAnalyticsService.record_change(db, db_lead, before)
+    TableVersionService.bump(db, "leads")
     db.commit()
     db.refresh(db_lead)
     return db_lead
@@ -144,7 +194,10 @@ def update_lead_status_only(db: Session, lead_id: int, status_update: lead_schem
 
 def delete_lead(db: Session, lead_id: int) -> Dict[str, bool]:
     db_lead = get_lead(db, lead_id)
+    LeadAnalyticsService.record_deleted(db, db_lead)
+    db.add(SyncTombstone(table_name="leads", record_id=str(lead_id)))
     db.delete(db_lead)
+    TableVersionService.bump(db, "leads")
     db.commit()
     return {"success": True}
 
@@ -195,26 +248,15 @@ def delete_lead_activity(db: Session, activity_id: int) -> Dict[str, bool]:
 
 # Analytics Functions
 def get_lead_counts_by_status(db: Session) -> List[Dict[str, Any]]:
-    results = db.query(
-        LeadStatus.status_id,
-        LeadStatus.status_name,
-        func.count(Lead.lead_id).label('count'),
-        func.coalesce(func.sum(Lead.estimated_value), 0).label('total_value')
-    ).outerjoin(
-        Lead, LeadStatus.status_id == Lead.status_id
-    ).group_by(
-        LeadStatus.status_id, LeadStatus.status_name
-    ).order_by(
-        LeadStatus.display_order
-    ).all()
-    
+    # Read from the incrementally maintained funnel aggregates (see LeadAnalyticsService)
+    funnel = LeadAnalyticsService.get_funnel(db)
     return [
         lead_schemas.LeadCountByStatus(
-            status_id=r.status_id,
-            status_name=r.status_name,
-            count=r.count,
-            total_value=float(r.total_value)
-        ) for r in results
+            status_id=stage["status_id"],
+            status_name=stage["status_name"],
+            count=stage["current_count"],
+            total_value=stage["current_value"]
+        ) for stage in funnel["stages"]
     ]
 
 
@@ -226,5 +268,6 @@ def get_lead_funnel_data(db: Session) -> lead_schemas.LeadFunnelData:
     return lead_schemas.LeadFunnelData(
         stages=stages,
         total_leads=total_leads,
-        total_value=total_value
+        total_value=total_value,
+        currency=settings.BASE_CURRENCY
     )
@@ -1,12 +1,19 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import func, and_, or_, insert, update
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime, date, timedelta
 import uuid
 import json
 
-from app.models.models import License, Customer, SalesRep, Reseller, PurchaseRecord, DeploymentRecord, DeploymentEngineer, FactoryEngineer, ChangeTracking
+from app.models.models import License, Customer, SalesRep, Reseller, PurchaseRecord, DeploymentRecord, DeploymentEngineer, FactoryEngineer, ChangeTracking, SyncTombstone, ActivationEvent
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.count_service import CountService, TotalCount
+from app.services.deployment_service import DeploymentService
+from app.services.sales_performance_service import SalesPerformanceService, DEFAULT_CURRENCY, purchase_fact, reattribute
+from app.services.fx_service import FxService
+from app.core.events import event_bus
+from app.db.loader_options import loader_options
 
 
 class LicenseService:
@@ -44,8 +51,6 @@ class LicenseService:
         )
         
         db.add(db_license)
-        db.commit()
-        db.refresh(db_license)
         
         # Track the change
         change = ChangeTracking(
@@ -62,22 +67,26 @@ class LicenseService:
             change_reason="License creation"
         )
         db.add(change)
+        
+        # One commit for the license and its change record
+        TableVersionService.bump(db, "licenses")
         db.commit()
         
         return db_license
 
+    @staticmethod
+    def get_license_updated_at(db: Session, license_id: str) -> Optional[Any]:
+        """Get (license_id, updated_at) for conditional requests without loading the full record"""
+        return db.query(License.license_id, License.updated_at)\
+            .filter(License.license_id == license_id)\
+            .first()
+
     @staticmethod
     def get_license(db: Session, license_id: str) -> Optional[schemas.LicenseDetailedInfo]:
         """Get detailed information about a specific license"""
         # Get the license with all related entities
         license = db.query(License)\
-            .options(
-                joinedload(License.customer),
-                joinedload(License.sales_rep),
-                joinedload(License.reseller),
-                joinedload(License.purchase_records),
-                joinedload(License.deployment_records).joinedload(DeploymentRecord.engineer_assignments).joinedload(DeploymentEngineer.engineer)
-            )\
+            .options(*loader_options("license_detail"))\
             .filter(License.license_id == license_id)\
             .first()
             
@@ -91,35 +100,10 @@ class LicenseService:
     def _license_to_schema(db: Session, license: License) -> schemas.LicenseDetailedInfo:
         """Convert ORM model to Pydantic schema with proper case conversion"""
         
-        # Convert deployment records
-        deployment_records_info = []
-        for record in license.deployment_records:
-            # Convert engineer assignments
-            engineer_assignments = []
-            for assignment in record.engineer_assignments:
-                engineer = assignment.engineer
-                engineer_assignments.append(schemas.EngineerAssignmentInfo(
-                    EngineerID=engineer.engineer_id,
-                    EngineerName=engineer.engineer_name,
-                    Email=engineer.email,
-                    Role=assignment.role
-                ))
-            
-            deployment_records_info.append(schemas.DeploymentRecordInfo(
-                DeploymentID=record.deployment_id,
-                LicenseID=record.license_id,
-                DeploymentType=record.deployment_type,
-                DeploymentDate=record.deployment_date,
-                DeployedBy=record.deployed_by,
-                DeploymentStatus=record.deployment_status,
-                DeploymentEnvironment=record.deployment_environment,
-                ServerInfo=record.server_info,
-                CompletionDate=record.completion_date,
-                Notes=record.notes,
-                CreatedAt=record.created_at,
-                UpdatedAt=record.updated_at,
-                EngineerAssignments=engineer_assignments
-            ))
+        # Convert deployment records (and share them with the rest of the request via the deployment loader)
+        deployment_records_info = DeploymentService.prime(
+            db, [DeploymentService.to_schema(record) for record in license.deployment_records]
+        )
         
         # Convert purchase records
         purchase_records_info = []
@@ -132,6 +116,7 @@ class LicenseService:
                 OrderNumber=record.order_number,
                 ContractNumber=record.contract_number,
                 Amount=record.amount,
+                AmountBase=record.amount_base,
                 Currency=record.currency,
                 PaymentStatus=record.payment_status,
                 PaymentDate=record.payment_date,
@@ -220,22 +205,43 @@ class LicenseService:
         return license_info
 
     @staticmethod
-    def get_licenses(
+    def _license_to_info(license: License) -> schemas.LicenseInfo:
+        """Convert a license model to the flat LicenseInfo schema"""
+        return schemas.LicenseInfo(
+            LicenseID=license.license_id,
+            CustomerID=license.customer_id,
+            SalesRepID=license.sales_rep_id,
+            ResellerID=license.reseller_id,
+            ProductName=license.product_name,
+            ProductVersion=license.product_version,
+            LicenseType=license.license_type,
+            OrderDate=license.order_date,
+            StartDate=license.start_date,
+            ExpiryDate=license.expiry_date,
+            AuthorizedWorkspaces=license.authorized_workspaces,
+            AuthorizedUsers=license.authorized_users,
+            ActualWorkspaces=license.actual_workspaces,
+            ActualUsers=license.actual_users,
+            DeploymentStatus=license.deployment_status,
+            DeploymentDate=license.deployment_date,
+            LicenseStatus=license.license_status,
+            LastCheckDate=license.last_check_date,
+            Notes=license.notes,
+            CreatedAt=license.created_at,
+            UpdatedAt=license.updated_at
+        )
+    
+    @staticmethod
+    def _licenses_query(
         db: Session,
-        skip: int = 0,
-        limit: int = 100,
         customer_id: Optional[int] = None,
         status: Optional[schemas.LicenseStatusEnum] = None,
         deployment_type: Optional[str] = None,
         license_type: Optional[str] = None,
         expiring_before: Optional[date] = None,
         expiring_after: Optional[date] = None
-    ) -> List[schemas.LicenseInfo]:
-        """Get list of licenses with filtering options"""
-        query = db.query(License)\
-            .join(Customer)\
-            .outerjoin(SalesRep)\
-            .outerjoin(Reseller)
+    ) -> Query:
+        query = db.query(License)
         
         # Apply filters
         if customer_id:
@@ -250,6 +256,27 @@ class LicenseService:
             query = query.filter(License.expiry_date <= expiring_before)
         if expiring_after:
             query = query.filter(License.expiry_date >= expiring_after)
+        return query
+
+    @staticmethod
+    def get_licenses(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        customer_id: Optional[int] = None,
+        status: Optional[schemas.LicenseStatusEnum] = None,
+        deployment_type: Optional[str] = None,
+        license_type: Optional[str] = None,
+        expiring_before: Optional[date] = None,
+        expiring_after: Optional[date] = None
+    ) -> List[schemas.LicenseInfo]:
+        """Get list of licenses with filtering options"""
+        query = LicenseService._licenses_query(
+                db, customer_id, status, deployment_type, license_type, expiring_before, expiring_after
+            )\
+            .join(Customer)\
+            .outerjoin(SalesRep)\
+            .outerjoin(Reseller)
         
         # Apply pagination
         licenses = query.order_by(License.created_at.desc()).offset(skip).limit(limit).all()
@@ -282,6 +309,26 @@ class LicenseService:
             for license in licenses
         ]
 
+    @staticmethod
+    def count_licenses(
+        db: Session,
+        customer_id: Optional[int] = None,
+        status: Optional[schemas.LicenseStatusEnum] = None,
+        deployment_type: Optional[str] = None,
+        license_type: Optional[str] = None,
+        expiring_before: Optional[date] = None,
+        expiring_after: Optional[date] = None
+    ) -> TotalCount:
+        """Total for get_licenses with the same filters (every license has a customer, so the joins don't change it)"""
+        query = LicenseService._licenses_query(
+            db, customer_id, status, deployment_type, license_type, expiring_before, expiring_after
+        )
+        return CountService.count(db, "licenses", query, ["licenses"], {
+            "customer_id": customer_id, "status": status.value if status else None,
+            "deployment_type": deployment_type, "license_type": license_type,
+            "expiring_before": expiring_before, "expiring_after": expiring_after,
+        })
+
     @staticmethod
     def update_license(
         db: Session, 
@@ -300,10 +347,16 @@ class LicenseService:
         
         # Update fields if provided
         update_data = license_data.dict(exclude_unset=True)
+        
+        # Purchases are credited to the license's rep, reseller and product; read them before those change
+        sold = None
+        if any(update_data.get(key) is not None for key in ("SalesRepID", "ResellerID", "ProductName")):
+            sold = SalesPerformanceService.license_facts(db, License.license_id == license_id)
+        
         for key, value in update_data.items():
             if value is not None:
-                # Convert CamelCase to snake_case for database column names
-                db_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key]).lstrip('_')
+                # Convert CamelCase to snake_case for database column names (SalesRepID -> sales_rep_id)
+                db_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key.replace("ID", "Id")]).lstrip('_')
                 old_value = getattr(license, db_key)
                 
                 # Only update if the value is different
@@ -313,6 +366,13 @@ class LicenseService:
         
         # Only commit if there were changes
         if changes:
+            if sold and changes.keys() & {"sales_rep_id", "reseller_id", "product_name"}:
+                SalesPerformanceService.record(
+                    db,
+                    added=reattribute(sold, license.sales_rep_id, license.reseller_id, license.product_name),
+                    removed=sold
+                )
+            
             # Update the license status based on expiry date
             today = datetime.now().date()
             if license.expiry_date < today and license.license_status != 'EXPIRED':
@@ -325,6 +385,7 @@ class LicenseService:
             # Update the last modified date
             license.updated_at = datetime.now()
             
+            TableVersionService.bump(db, "licenses")
             db.commit()
             db.refresh(license)
             
@@ -342,6 +403,13 @@ class LicenseService:
                 db.add(change_record)
             
             db.commit()
+            
+            if changes.get("license_status", {}).get("new") == "EXPIRED":
+                event_bus.publish("license.expired", license.license_id, {
+                    "customer_id": license.customer_id,
+                    "sales_rep_id": license.sales_rep_id,
+                    "expiry_date": license.expiry_date,
+                })
         
         # Return the updated license
         return schemas.LicenseInfo(
@@ -392,8 +460,16 @@ class LicenseService:
         )
         db.add(change_record)
         
+        db.add(SyncTombstone(table_name="licenses", record_id=license_id))
+        
+        # Activation events have no ORM relationship (the table is append-only and unbounded)
+        db.query(ActivationEvent).filter(ActivationEvent.license_id == license_id).delete(synchronize_session=False)
+        
+        SalesPerformanceService.record(db, removed=SalesPerformanceService.license_facts(db, License.license_id == license_id))
+        
         # Delete the license (cascades to related records)
         db.delete(license)
+        TableVersionService.bump(db, "licenses", "purchase_records", "deployment_records")
         db.commit()
         
         return True
@@ -433,6 +509,8 @@ class LicenseService:
         )
         
         db.add(purchase_record)
+        FxService.normalize(db, purchase_record)
+        SalesPerformanceService.record(db, added=[purchase_fact(license, purchase_record)])
         
         # Update license with new expiry date and status
         license.expiry_date = renewal_data.NewExpiryDate
@@ -447,10 +525,6 @@ class LicenseService:
         
         license.updated_at = datetime.now()
         
-        db.commit()
-        db.refresh(license)
-        db.refresh(purchase_record)
-        
         # Record the changes
         changes = {
             "expiry_date": {"old": previous_expiry_date, "new": license.expiry_date},
@@ -476,8 +550,17 @@ class LicenseService:
             )
             db.add(change_record)
         
+        # One commit for the purchase record, the license update and the change records
+        TableVersionService.bump(db, "licenses", "purchase_records")
         db.commit()
         
+        event_bus.publish("license.renewed", license.license_id, {
+            "customer_id": license.customer_id,
+            "sales_rep_id": license.sales_rep_id,
+            "previous_expiry_date": previous_expiry_date,
+            "expiry_date": license.expiry_date,
+        })
+        
         # Return the updated license
         return schemas.LicenseInfo(
             LicenseID=license.license_id,
@@ -502,7 +585,155 @@ class LicenseService:
             CreatedAt=license.created_at,
             UpdatedAt=license.updated_at
         )
-    
+
+    @staticmethod
+    def batch_renew_licenses(
+        db: Session,
+        request: schemas.LicenseBatchRenewalRequest,
+        changed_by: str = "system",
+        chunk_size: int = 500
+    ) -> Dict[str, Any]:
+        """
+        Renew or expand many licenses at once (e.g. a customer's annual contract rollover).
+
+        Each chunk is applied set-wise in one transaction: one SELECT for the licenses, then
+        multi-row INSERTs for purchase records and change tracking and one executemany UPDATE
+        for the licenses. A failed item (unknown license, missing expiry date, duplicate) is
+        reported in the results without affecting the rest of the chunk.
+        """
+        results = []
+        reactivated = 0
+        renewed_events = []
+        now = datetime.now()
+        seen = set()
+
+        for start in range(0, len(request.Items), chunk_size):
+            chunk = request.Items[start:start + chunk_size]
+            ids = {item.LicenseID for item in chunk}
+            current = {
+                row.license_id: row
+                for row in db.query(
+                    License.license_id, License.customer_id, License.sales_rep_id, License.reseller_id, License.product_name,
+                    License.expiry_date, License.license_status, License.authorized_workspaces, License.authorized_users
+                ).filter(License.license_id.in_(ids)).all()
+            }
+
+            purchase_rows, license_rows, change_rows, sold = [], [], [], []
+            for item in chunk:
+                row = current.get(item.LicenseID)
+                error = None
+                if row is None:
+                    error = "License not found"
+                elif item.LicenseID in seen:
+                    error = "Duplicate license in request"
+                elif item.PurchaseType not in (schemas.PurchaseTypeEnum.RENEWAL, schemas.PurchaseTypeEnum.EXPANSION):
+                    error = "Purchase type must be RENEWAL or EXPANSION"
+                elif item.PurchaseType == schemas.PurchaseTypeEnum.RENEWAL and not item.NewExpiryDate:
+                    error = "NewExpiryDate is required for RENEWAL"
+                if error:
+                    results.append({"LicenseID": item.LicenseID, "Success": False, "Message": error})
+                    continue
+                seen.add(item.LicenseID)
+
+                # Same field semantics as renew_license (RENEWAL) and create_purchase_record (EXPANSION)
+                expiry_date = item.NewExpiryDate or row.expiry_date
+                status = "ACTIVE" if item.NewExpiryDate else row.license_status
+                workspaces, users = row.authorized_workspaces, row.authorized_users
+                if item.PurchaseType == schemas.PurchaseTypeEnum.RENEWAL:
+                    workspaces = item.WorkspacesPurchased if item.WorkspacesPurchased > 0 else workspaces
+                    users = item.UsersPurchased if item.UsersPurchased > 0 else users
+                else:
+                    workspaces = (workspaces or 0) + max(item.WorkspacesPurchased, 0)
+                    users = (users or 0) + max(item.UsersPurchased, 0)
+
+                changes = {}
+                for field, old, new in (
+                    ("expiry_date", row.expiry_date, expiry_date),
+                    ("license_status", row.license_status, status),
+                    ("authorized_workspaces", row.authorized_workspaces, workspaces),
+                    ("authorized_users", row.authorized_users, users),
+                ):
+                    if old != new:
+                        changes[field] = {"old": old, "new": new}
+                if changes.get("license_status"):
+                    reactivated += 1
+                results.append({"LicenseID": item.LicenseID, "Success": True, "Changes": changes})
+
+                purchase_rows.append({
+                    "license_id": item.LicenseID,
+                    "purchase_type": item.PurchaseType.value,
+                    "purchase_date": request.PurchaseDate,
+                    "order_number": item.OrderNumber or request.OrderNumber,
+                    "contract_number": item.ContractNumber or request.ContractNumber,
+                    "amount": item.Amount,
+                    "amount_base": FxService.to_base(db, item.Amount, item.Currency or request.Currency, request.PurchaseDate),
+                    "currency": item.Currency or request.Currency,
+                    "payment_status": request.PaymentStatus.value,
+                    "payment_date": request.PaymentDate,
+                    "workspaces_purchased": item.WorkspacesPurchased,
+                    "users_purchased": item.UsersPurchased,
+                    "previous_expiry_date": row.expiry_date,
+                    "new_expiry_date": expiry_date,
+                    "notes": item.Notes,
+                    "created_at": now
+                })
+                sold.append((
+                    row.sales_rep_id, row.reseller_id, row.product_name, request.PurchaseDate,
+                    purchase_rows[-1]["currency"] or DEFAULT_CURRENCY, 1, item.Amount, purchase_rows[-1]["amount_base"] or 0.0
+                ))
+                license_rows.append({
+                    "license_id": item.LicenseID,
+                    "expiry_date": expiry_date,
+                    "license_status": status,
+                    "authorized_workspaces": workspaces,
+                    "authorized_users": users,
+                    "updated_at": now
+                })
+                change_rows.extend(
+                    {
+                        "table_name": "licenses",
+                        "record_id": item.LicenseID,
+                        "field_name": field,
+                        "old_value": str(change["old"]),
+                        "new_value": str(change["new"]),
+                        "changed_by": changed_by,
+                        "change_reason": f"License batch {item.PurchaseType.value.lower()}: {field}",
+                        "changed_at": now
+                    }
+                    for field, change in changes.items()
+                )
+                renewed_events.append((item.LicenseID, {
+                    "customer_id": row.customer_id,
+                    "sales_rep_id": row.sales_rep_id,
+                    "previous_expiry_date": row.expiry_date,
+                    "expiry_date": expiry_date,
+                }))
+
+            if request.DryRun or not license_rows:
+                continue
+
+            db.execute(insert(PurchaseRecord), purchase_rows)
+            SalesPerformanceService.record(db, added=sold)
+            db.execute(update(License), license_rows)
+            if change_rows:
+                db.execute(insert(ChangeTracking), change_rows)
+            TableVersionService.bump(db, "licenses", "purchase_records")
+            db.commit()
+
+        if not request.DryRun:
+            for license_id, data in renewed_events:
+                event_bus.publish("license.renewed", license_id, data)
+
+        succeeded = sum(1 for result in results if result["Success"])
+        return {
+            "Total": len(results),
+            "Succeeded": succeeded,
+            "Failed": len(results) - succeeded,
+            "Reactivated": reactivated,
+            "DryRun": request.DryRun,
+            "Results": results
+        }
+
     @staticmethod
     def update_usage(
         db: Session,
@@ -538,6 +769,7 @@ class LicenseService:
         # Only commit if there were changes
         if changes:
             license.updated_at = datetime.now()
+            TableVersionService.bump(db, "licenses")
             db.commit()
             db.refresh(license)
             
@@ -599,32 +831,7 @@ class LicenseService:
             .all()
         
         # Convert to schema model
-        return [
-            schemas.LicenseInfo(
-                LicenseID=license.license_id,
-                CustomerID=license.customer_id,
-                SalesRepID=license.sales_rep_id,
-                ResellerID=license.reseller_id,
-                ProductName=license.product_name,
-                ProductVersion=license.product_version,
-                LicenseType=license.license_type,
-                OrderDate=license.order_date,
-                StartDate=license.start_date,
-                ExpiryDate=license.expiry_date,
-                AuthorizedWorkspaces=license.authorized_workspaces,
-                AuthorizedUsers=license.authorized_users,
-                ActualWorkspaces=license.actual_workspaces,
-                ActualUsers=license.actual_users,
-                DeploymentStatus=license.deployment_status,
-                DeploymentDate=license.deployment_date,
-                LicenseStatus=license.license_status,
-                LastCheckDate=license.last_check_date,
-                Notes=license.notes,
-                CreatedAt=license.created_at,
-                UpdatedAt=license.updated_at
-            )
-            for license in licenses
-        ]
+        return [LicenseService._license_to_info(license) for license in licenses]
     
     @staticmethod
     def get_licenses_statistics(db: Session) -> schemas.LicenseStatistics:
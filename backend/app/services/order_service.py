@@ -9,11 +9,16 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date, timedelta
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 
 from app.models.order_models import PurchaseOrder
 from app.models.models import Customer, License
 from app.services.license_service import LicenseService
+from app.services.table_version_service import TableVersionService
+from app.services.fx_service import FxService
+from app.services.customer_match_service import CustomerMatchService
+from app.core.events import event_bus
 from app.schemas import order_schemas
 
 class OrderService:
@@ -40,11 +45,32 @@ class OrderService:
         # 创建并保存新的PO单
         new_order = PurchaseOrder(**order_dict)
         db.add(new_order)
-        db.commit()
+        # 按订单日期汇率折算本位币金额
+        FxService.normalize(db, new_order)
+        TableVersionService.bump(db, "purchase_orders")
+        try:
+            db.commit()
+        except IntegrityError:
+            # 并发提交同一PO编号时，上面的查询都未查到，由唯一索引拦下后到的一个
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"采购订单号'{order_data.po_number}'已存在")
         db.refresh(new_order)
         
+        event_bus.publish("purchase_order.created", new_order.order_id, {
+            "po_number": new_order.po_number,
+            "customer_name": new_order.customer_name,
+            "order_source": new_order.order_source,
+        })
+        
         return new_order
     
+    @staticmethod
+    def get_order_updated_at(db: Session, order_id: int) -> Optional[Any]:
+        """获取(order_id, updated_at)，用于条件请求，无需加载完整订单"""
+        return db.query(PurchaseOrder.order_id, PurchaseOrder.updated_at)\
+            .filter(PurchaseOrder.order_id == order_id)\
+            .first()
+    
     @staticmethod
     def get_order(db: Session, order_id: int) -> PurchaseOrder:
         """获取PO单详情"""
@@ -63,6 +89,18 @@ class OrderService:
                 
         return order
     
+    @staticmethod
+    def _order_to_info(order: PurchaseOrder) -> order_schemas.PurchaseOrderInfo:
+        """转换为响应模型（不修改ORM对象，source_details的JSON字符串在副本上解析）"""
+        import json
+        data = {column.name: getattr(order, column.name) for column in PurchaseOrder.__table__.columns}
+        if data["source_details"] and isinstance(data["source_details"], str):
+            try:
+                data["source_details"] = json.loads(data["source_details"])
+            except json.JSONDecodeError:
+                data["source_details"] = None
+        return order_schemas.PurchaseOrderInfo(**data)
+    
     @staticmethod
     def get_order_by_po_number(db: Session, po_number: str) -> PurchaseOrder:
         """根据PO编号获取PO单详情"""
@@ -154,19 +192,26 @@ class OrderService:
         if status_data.order_status == "APPROVED" and not order.license_id:
             # 检查客户是否存在，不存在则需要创建新客户
             if not order.customer_id:
-                # 创建新客户
-                new_customer = Customer(
-                    customer_name=order.customer_name,
-                    contact_person=order.contact_person,
-                    contact_email=order.contact_email,
-                    contact_phone=order.contact_phone,
-                    # 其他必要的客户信息可以根据实际情况设置默认值
-                )
-                db.add(new_customer)
-                db.flush()  # 生成ID但还不提交
-                
-                # 更新订单的客户ID
-                order.customer_id = new_customer.customer_id
+                # 先按名称/邮箱域名/电话匹配已有客户，避免重复创建
+                match = CustomerMatchService.resolve(db, order.customer_name, order.contact_email, order.contact_phone)
+                if match:
+                    order.customer_id = match["CustomerID"]
+                else:
+                    # 创建新客户
+                    new_customer = Customer(
+                        customer_name=order.customer_name,
+                        contact_person=order.contact_person,
+                        contact_email=order.contact_email,
+                        contact_phone=order.contact_phone,
+                        # 其他必要的客户信息可以根据实际情况设置默认值
+                    )
+                    db.add(new_customer)
+                    db.flush()  # 生成ID但还不提交
+                    CustomerMatchService.index_customer(db, new_customer)
+                    TableVersionService.bump(db, "customers")
+                    
+                    # 更新订单的客户ID
+                    order.customer_id = new_customer.customer_id
             
             # 生成许可证
             license_data = OrderService._prepare_license_data(order)
@@ -181,8 +226,17 @@ class OrderService:
             pass
         
         # 提交更改
+        TableVersionService.bump(db, "purchase_orders")
         db.commit()
         db.refresh(order)
+        
+        # 推送审核结果（purchase_order.approved / purchase_order.rejected 等）
+        event_bus.publish(f"purchase_order.{status_data.order_status.lower()}", order.order_id, {
+            "po_number": order.po_number,
+            "order_status": order.order_status,
+            "license_id": order.license_id,
+            "customer_id": order.customer_id,
+        })
         return order
     
     @staticmethod
@@ -3,16 +3,177 @@
 
 """
 合作商身份识别服务
-处理UUID管理、邮箱映射关系
+处理UUID管理、邮箱映射关系，以及按邮箱地址识别合作商的路由索引
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, NamedTuple, Tuple
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
+import re
+import threading
+import time
 
+from app.core.config import settings
 from app.models.partner_models import Partner
 from app.models.partner_identity_models import PartnerIdentity, PartnerEmailMapping
 from app.schemas import partner_identity_schemas
+from app.services.table_version_service import TableVersionService, CHANGED_TABLES_KEY
+
+# 路由索引依赖的表：映射规则、身份是否启用、合作商是否启用
+ROUTING_TABLES = ("partner_email_mappings", "partner_identities", "partners")
+
+# 域名标签：字母数字（含非ASCII字符）和连字符，不以连字符开头或结尾
+DOMAIN_LABEL = re.compile(r"^\w(?:[\w-]*\w)?$")
+
+
+def normalize_pattern(value: str) -> str:
+    """
+    规范化邮箱映射规则（小写、去除首尾空白和末尾的点）
+    - alice@example.com：完整邮箱地址
+    - @example.com 或 example.com：整个域名
+    - @*.example.com 或 *.example.com：example.com的任意子域名（不含example.com本身）
+    格式不正确时抛出ValueError
+    """
+    pattern = value.strip().lower().rstrip(".")
+    local, _, domain = pattern.rpartition("@")
+    wildcard = domain.startswith("*.")
+    if wildcard:
+        domain = domain[2:]
+    labels = domain.split(".")
+    if len(labels) < 2 or not all(DOMAIN_LABEL.match(label) for label in labels):
+        raise ValueError(f"'{value}' 不是有效的邮箱地址或域名规则")
+    if local:
+        if wildcard or "@" in local or any(char.isspace() for char in local):
+            raise ValueError(f"'{value}' 不是有效的邮箱地址或域名规则")
+        return f"{local}@{domain}"
+    return f"@*.{domain}" if wildcard else f"@{domain}"
+
+
+class EmailRoute(NamedTuple):
+    """命中的邮箱映射规则"""
+    mapping_id: int
+    pattern: str
+    match_type: str
+    identity_id: int
+    partner_id: int
+
+
+class _DomainNode:
+    """反转域名标签树的节点，例如 com -> example -> mail"""
+    __slots__ = ("children", "domain", "subdomain")
+
+    def __init__(self):
+        self.children: Dict[str, "_DomainNode"] = {}
+        self.domain: Optional[EmailRoute] = None     # @example.com
+        self.subdomain: Optional[EmailRoute] = None  # @*.example.com
+
+
+class EmailRoutingIndex:
+    """
+    邮箱路由索引：完整地址存放在哈希表中，域名规则按反转的域名标签存放在前缀树中，
+    每个邮箱的查找代价只与其域名的层数有关，与规则数量无关
+    优先级：完整地址 > 整个域名 > 最具体的子域名通配
+    """
+
+    def __init__(self, routes: Iterable[EmailRoute] = ()):
+        self.exact: Dict[str, EmailRoute] = {}
+        self.root = _DomainNode()
+        for route in routes:
+            self.add(route)
+
+    def add(self, route: EmailRoute) -> None:
+        if route.match_type == "EXACT":
+            self.exact[route.pattern.lower()] = route
+            return
+        domain = route.pattern[3:] if route.match_type == "SUBDOMAIN" else route.pattern[1:]
+        node = self.root
+        for label in reversed(domain.lower().split(".")):
+            node = node.children.setdefault(label, _DomainNode())
+        if route.match_type == "SUBDOMAIN":
+            node.subdomain = route
+        else:
+            node.domain = route
+
+    def resolve(self, email: str) -> Optional[EmailRoute]:
+        """邮箱地址命中的规则，无法识别时返回None"""
+        address = email.strip().lower().rstrip(".")
+        local, _, domain = address.rpartition("@")
+        if not local or not domain:
+            return None
+        route = self.exact.get(address)
+        if route is not None:
+            return route
+
+        node, best = self.root, None
+        for label in reversed(domain.split(".")):
+            # 当前节点的子域名通配只匹配更深的域名，因此在继续向下之前记录
+            if node.subdomain is not None:
+                best = node.subdomain
+            node = node.children.get(label)
+            if node is None:
+                return best
+        return node.domain or best
+
+
+def _load_routes(db: Session) -> EmailRoutingIndex:
+    """由启用的身份和合作商的邮箱映射构建路由索引"""
+    rows = db.query(
+        PartnerEmailMapping.mapping_id, PartnerEmailMapping.email_address,
+        PartnerIdentity.identity_id, PartnerIdentity.partner_id
+    ).join(PartnerIdentity, PartnerIdentity.identity_id == PartnerEmailMapping.identity_id)\
+        .join(Partner, Partner.partner_id == PartnerIdentity.partner_id)\
+        .filter(PartnerIdentity.is_active == True, Partner.status == "ACTIVE")\
+        .order_by(PartnerEmailMapping.mapping_id)
+    return EmailRoutingIndex(
+        EmailRoute(mapping_id, pattern, PartnerEmailMapping.pattern_type(pattern), identity_id, partner_id)
+        for mapping_id, pattern, identity_id, partner_id in rows
+    )
+
+
+class EmailRoutingCache:
+    """
+    进程内的邮箱路由索引，以ROUTING_TABLES的table_versions版本号为戳
+    版本号最多每PARTNER_EMAIL_ROUTING_CHECK_INTERVAL秒重新读取一次（其他进程的写入），
+    本进程的写入在事务提交后立即使索引失效
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = EmailRoutingIndex()
+        self._stamp: Optional[Tuple[int, ...]] = None
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> EmailRoutingIndex:
+        if not set(ROUTING_TABLES).isdisjoint(db.info.get(CHANGED_TABLES_KEY, ())):
+            # 本事务修改了映射或身份且尚未提交：直接读取，不缓存
+            return _load_routes(db)
+
+        with self._lock:
+            stale = time.monotonic() - self._checked_at >= settings.PARTNER_EMAIL_ROUTING_CHECK_INTERVAL
+            index, stamp = self._index, self._stamp
+        if not stale and stamp is not None:
+            return index
+
+        versions = TableVersionService.get_versions(db, ROUTING_TABLES)
+        current = tuple(versions[table] for table in ROUTING_TABLES)
+        if current != stamp:
+            # 版本号先于数据读取，并发提交最多导致多一次重建
+            index = _load_routes(db)
+        with self._lock:
+            self._index, self._stamp, self._checked_at = index, current, time.monotonic()
+        return index
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stamp = None
+            self._checked_at = 0.0
+
+
+email_routing_cache = EmailRoutingCache()
+
+
+# 本进程内的映射/身份修改提交后立即生效
+TableVersionService.on_commit(ROUTING_TABLES, lambda changed: email_routing_cache.invalidate())
 
 
 class PartnerIdentityService:
@@ -74,6 +235,7 @@ class PartnerIdentityService:
         for key, value in identity_data.dict(exclude_unset=True).items():
             setattr(identity, key, value)
         
+        TableVersionService.bump(db, "partner_identities")
         db.commit()
         db.refresh(identity)
         
@@ -85,6 +247,7 @@ class PartnerIdentityService:
         identity = PartnerIdentityService.get_identity(db, identity_id)
         
         db.delete(identity)
+        TableVersionService.bump(db, "partner_identities", "partner_email_mappings")
         db.commit()
         
         return {"message": f"身份识别ID '{identity_id}' 已删除"}
@@ -130,21 +293,27 @@ class PartnerEmailMappingService:
         if not identity:
             raise HTTPException(status_code=404, detail=f"身份识别ID '{mapping_data.identity_id}' 不存在")
         
+        try:
+            email_address = normalize_pattern(mapping_data.email_address)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # 检查邮箱是否已存在
         existing_mapping = db.query(PartnerEmailMapping).filter(
-            PartnerEmailMapping.email_address == mapping_data.email_address
+            PartnerEmailMapping.email_address == email_address
         ).first()
         if existing_mapping:
-            raise HTTPException(status_code=400, detail=f"邮箱 '{mapping_data.email_address}' 已存在映射关系")
+            raise HTTPException(status_code=400, detail=f"邮箱 '{email_address}' 已存在映射关系")
         
         # 创建邮箱映射
         new_mapping = PartnerEmailMapping(
             identity_id=mapping_data.identity_id,
-            email_address=mapping_data.email_address,
+            email_address=email_address,
             description=mapping_data.description
         )
         
         db.add(new_mapping)
+        TableVersionService.bump(db, "partner_email_mappings")
         db.commit()
         db.refresh(new_mapping)
         
@@ -163,9 +332,9 @@ class PartnerEmailMappingService:
     
     @staticmethod
     def get_email_mapping_by_email(db: Session, email_address: str) -> PartnerEmailMapping:
-        """通过邮箱地址获取映射详情"""
+        """通过邮箱地址（或域名规则）获取映射详情；规则按规范化（小写）形式存储，旧数据由migrate_partner_email_mappings.py规范化"""
         mapping = db.query(PartnerEmailMapping).filter(
-            PartnerEmailMapping.email_address == email_address
+            PartnerEmailMapping.email_address == email_address.strip().lower()
         ).first()
         if not mapping:
             raise HTTPException(status_code=404, detail=f"邮箱 '{email_address}' 未找到映射关系")
@@ -174,9 +343,44 @@ class PartnerEmailMappingService:
     
     @staticmethod
     def get_identity_by_email(db: Session, email_address: str) -> PartnerIdentity:
-        """通过邮箱地址获取关联的身份识别详情"""
-        mapping = PartnerEmailMappingService.get_email_mapping_by_email(db, email_address)
-        return mapping.identity
+        """通过邮箱地址获取关联的身份识别详情（按完整地址、整个域名、子域名通配的顺序匹配）"""
+        route = email_routing_cache.get(db).resolve(email_address)
+        if route is None:
+            raise HTTPException(status_code=404, detail=f"邮箱 '{email_address}' 未找到映射关系")
+        return PartnerIdentityService.get_identity(db, route.identity_id)
+    
+    @staticmethod
+    def resolve_email(db: Session, email_address: str) -> Optional[EmailRoute]:
+        """邮箱地址命中的映射规则，未匹配时返回None"""
+        return email_routing_cache.get(db).resolve(email_address)
+    
+    @staticmethod
+    def resolve_emails(db: Session, emails: List[str]) -> Dict[str, Any]:
+        """
+        批量识别邮箱地址对应的合作商身份
+        整批只读取一次路由索引（版本未变时不查询数据库），结果顺序与请求一致
+        """
+        if len(emails) > settings.PARTNER_EMAIL_RESOLVE_MAX_BATCH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"单次最多识别{settings.PARTNER_EMAIL_RESOLVE_MAX_BATCH}个邮箱地址"
+            )
+        
+        index = email_routing_cache.get(db)
+        routes: Dict[str, Optional[EmailRoute]] = {}
+        results = []
+        matched = 0
+        for email in emails:
+            if email not in routes:
+                routes[email] = index.resolve(email)
+            route = routes[email]
+            if route is None:
+                results.append({"email": email, "matched": False})
+                continue
+            matched += 1
+            results.append({"email": email, "matched": True, **route._asdict()})
+        
+        return {"results": results, "matched": matched, "unmatched": len(emails) - matched}
     
     @staticmethod
     def delete_email_mapping(db: Session, mapping_id: int) -> Dict[str, Any]:
@@ -184,6 +388,7 @@ class PartnerEmailMappingService:
         mapping = PartnerEmailMappingService.get_email_mapping(db, mapping_id)
         
         db.delete(mapping)
+        TableVersionService.bump(db, "partner_email_mappings")
         db.commit()
         
         return {"message": f"邮箱映射ID '{mapping_id}' 已删除"}
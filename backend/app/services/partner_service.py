@@ -1,13 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, Query, selectinload
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 from datetime import datetime, date
 import uuid
 import re
-from typing import List, Optional
+from typing import List, Optional, Dict, Iterable, Tuple
 
-from app.models.partner_models import Partner, Order, OrderItem
+from app.models.partner_models import Partner, Order, OrderItem, PartnerOrder
 from app.schemas import partner_schemas as schemas
+from app.services.table_version_service import TableVersionService
+from app.services.count_service import CountService, TotalCount
 from app.core.security import get_password_hash, verify_password
 from app.core.jwt import create_access_token
 
@@ -37,6 +40,7 @@ class PartnerService:
         )
         
         db.add(db_partner)
+        TableVersionService.bump(db, "partners")
         db.commit()
         db.refresh(db_partner)
         return db_partner
@@ -74,9 +78,48 @@ class PartnerService:
         return db.query(Partner).filter(Partner.username == username).first()
     
     @staticmethod
-    def get_all_partners(db: Session, skip: int = 0, limit: int = 100) -> List[Partner]:
+    def _partners_query(db: Session, status: Optional[str] = None, region: Optional[str] = None) -> Query:
+        query = db.query(Partner)
+        if status:
+            query = query.filter(Partner.status == status)
+        if region:
+            query = query.filter(Partner.region == region)
+        return query
+
+    @staticmethod
+    def get_all_partners(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[str] = None,
+        region: Optional[str] = None
+    ) -> List[Partner]:
         """Get all partners with pagination"""
-        return db.query(Partner).offset(skip).limit(limit).all()
+        return PartnerService._partners_query(db, status, region)\
+            .order_by(Partner.partner_id)\
+            .offset(skip)\
+            .limit(limit)\
+            .all()
+
+    @staticmethod
+    def count_partners(db: Session, status: Optional[str] = None, region: Optional[str] = None) -> TotalCount:
+        """Total for get_all_partners with the same filters"""
+        query = PartnerService._partners_query(db, status, region)
+        return CountService.count(db, "partners", query, ["partners"], {"status": status, "region": region})
+
+    @staticmethod
+    def get_order_counts(db: Session, partner_ids: Iterable[int]) -> Dict[int, int]:
+        """Number of associated orders per partner (one grouped query)"""
+        partner_ids = list(partner_ids)
+        if not partner_ids:
+            return {}
+        rows = db.query(PartnerOrder.partner_id, func.count(PartnerOrder.order_id))\
+            .filter(PartnerOrder.partner_id.in_(partner_ids))\
+            .group_by(PartnerOrder.partner_id)\
+            .all()
+        counts = {partner_id: 0 for partner_id in partner_ids}
+        counts.update({partner_id: count for partner_id, count in rows})
+        return counts
     
     @staticmethod
     def update_partner(db: Session, partner_id: int, partner_data: schemas.PartnerUpdate) -> Optional[Partner]:
@@ -103,6 +146,7 @@ class PartnerService:
         for key, value in model_data.items():
             setattr(db_partner, key, value)
         
+        TableVersionService.bump(db, "partners")
         db.commit()
         db.refresh(db_partner)
         return db_partner
@@ -117,8 +161,10 @@ class PartnerService:
         # 检查是否有关联的订单或其他依赖关系
         # 这里可以添加额外的检查逻辑
         
-        # 删除合作伙伴
+        # 删除合作伙伴及其订单关联（订单本身保留）
+        db.query(PartnerOrder).filter(PartnerOrder.partner_id == partner_id).delete(synchronize_session=False)
         db.delete(db_partner)
+        TableVersionService.bump(db, "partners", "partner_orders")
         db.commit()
         return True
     
@@ -215,6 +261,9 @@ class OrderService:
             )
             db.add(db_item)
         
+        # 记录下单的合作伙伴，合作伙伴订单列表据此筛选
+        db.add(PartnerOrder(partner_id=partner_id, order_id=db_order.order_id))
+        TableVersionService.bump(db, "orders", "partner_orders")
         db.commit()
         db.refresh(db_order)
         
@@ -253,9 +302,33 @@ class OrderService:
         return order_info
     
     @staticmethod
-    def _order_to_schema(db: Session, order: Order) -> schemas.OrderInfo:
-        """Convert an Order model to an OrderInfo schema"""
+    def _order_partners(db: Session, order_ids: Iterable[str]) -> Dict[str, Tuple[int, str]]:
+        """(partner_id, partner_name) per order; an order associated with several partners reports the first"""
+        order_ids = list(order_ids)
+        if not order_ids:
+            return {}
+        rows = db.query(PartnerOrder.order_id, Partner.partner_id, Partner.partner_name)\
+            .join(Partner, Partner.partner_id == PartnerOrder.partner_id)\
+            .filter(PartnerOrder.order_id.in_(order_ids))\
+            .order_by(PartnerOrder.created_at, PartnerOrder.partner_id)\
+            .all()
+        partners: Dict[str, Tuple[int, str]] = {}
+        for order_id, partner_id, partner_name in rows:
+            partners.setdefault(order_id, (partner_id, partner_name))
+        return partners
+
+    @staticmethod
+    def _order_to_schema(
+        db: Session,
+        order: Order,
+        partners: Optional[Dict[str, Tuple[int, str]]] = None
+    ) -> schemas.OrderInfo:
+        """Convert an Order model to an OrderInfo schema (partners: preloaded _order_partners result for lists)"""
         from app.schemas.partner_schemas import OrderInfo, OrderItemInfo
+
+        if partners is None:
+            partners = OrderService._order_partners(db, [order.order_id])
+        partner_id, partner_name = partners.get(order.order_id, (None, None))
         
         # Convert order items
         order_items = []
@@ -280,25 +353,59 @@ class OrderService:
             TotalAmount=order.total_amount,
             Status=order.status,
             Notes=order.notes,
-            PartnerID=None,  # 订单现在不直接关联到合作伙伴
+            PartnerID=partner_id,
+            PartnerName=partner_name,
             CreatedAt=order.created_at,
             UpdatedAt=order.updated_at,
             OrderItems=order_items
         )
     
     @staticmethod
-    def get_orders_by_partner(db: Session, partner_id: int, skip: int = 0, limit: int = 100) -> List[schemas.OrderInfo]:
-        """Get orders for a specific partner"""
-        # Since we no longer have a direct relationship between orders and partners,
-        # we'll retrieve all orders and convert them to OrderInfo schemas
-        orders = db.query(Order)\
-            .order_by(Order.created_at.desc())\
+    def _orders_query(db: Session, status: Optional[str] = None, partner_id: Optional[int] = None) -> Query:
+        query = db.query(Order)
+        if partner_id is not None:
+            query = query.join(PartnerOrder, PartnerOrder.order_id == Order.order_id)\
+                .filter(PartnerOrder.partner_id == partner_id)
+        if status:
+            query = query.filter(Order.status == status)
+        return query
+
+    @staticmethod
+    def get_all_orders(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[str] = None,
+        partner_id: Optional[int] = None
+    ) -> List[schemas.OrderInfo]:
+        """Get orders, newest first, optionally filtered by status and associated partner"""
+        orders = OrderService._orders_query(db, status, partner_id)\
+            .options(selectinload(Order.order_items))\
+            .order_by(Order.created_at.desc(), Order.order_id.desc())\
             .offset(skip)\
             .limit(limit)\
             .all()
-            
-        # Convert the Order models to OrderInfo schemas
-        return [OrderService._order_to_schema(db, order) for order in orders]
+
+        partners = OrderService._order_partners(db, [order.order_id for order in orders])
+        return [OrderService._order_to_schema(db, order, partners) for order in orders]
+
+    @staticmethod
+    def count_orders(db: Session, status: Optional[str] = None, partner_id: Optional[int] = None) -> TotalCount:
+        """Total for get_all_orders with the same filters"""
+        query = OrderService._orders_query(db, status, partner_id)
+        tables = ["orders", "partner_orders"] if partner_id is not None else ["orders"]
+        return CountService.count(db, "orders", query, tables, {"status": status, "partner_id": partner_id})
+
+    @staticmethod
+    def get_orders_by_partner(
+        db: Session,
+        partner_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[str] = None
+    ) -> List[schemas.OrderInfo]:
+        """Get orders associated with a specific partner"""
+        return OrderService.get_all_orders(db, skip, limit, status=status, partner_id=partner_id)
     
     @staticmethod
     def get_order_by_id(db: Session, order_id: str, partner_id: Optional[int] = None) -> Optional[Order]:
@@ -317,6 +424,7 @@ class OrderService:
             return None
             
         db_order.status = status
+        TableVersionService.bump(db, "orders")
         db.commit()
         db.refresh(db_order)
         
@@ -350,6 +458,7 @@ class OrderService:
             # 例如：删除现有项目，添加新项目等
             pass
             
+        TableVersionService.bump(db, "orders")
         db.commit()
         db.refresh(db_order)
         
@@ -357,11 +466,7 @@ class OrderService:
     
     @staticmethod
     def associate_with_partner(db: Session, order_id: str, partner_id: int) -> Optional[schemas.OrderInfo]:
-        """将订单与合作伙伴关联
-        
-        注意：由于当前数据模型中，Order与Partner没有直接的关联字段，
-        这里我们使用元数据表或其他方法来建立关联。
-        """
+        """将订单与合作伙伴关联（写入partner_orders关联表，重复关联不报错）"""
         # 验证订单和合作伙伴是否存在
         order = db.query(Order).filter(Order.order_id == order_id).first()
         partner = db.query(Partner).filter(Partner.partner_id == partner_id).first()
@@ -369,16 +474,17 @@ class OrderService:
         if not order or not partner:
             return None
         
-        # 在这里，我们可以使用元数据或关联表来存储这种关系
-        # 例如，可以在订单的notes字段中添加关联信息
-        note = f"\n[{datetime.now()}] Associated with partner ID: {partner_id}, Name: {partner.partner_name}"
-        order.notes = (order.notes or "") + note
-        
-        # 也可以创建一个专门的关联表来存储这种关系
-        # 例如：db.add(PartnerOrderAssociation(order_id=order_id, partner_id=partner_id))
-        
-        db.commit()
-        db.refresh(order)
+        exists = db.query(PartnerOrder)\
+            .filter(PartnerOrder.partner_id == partner_id, PartnerOrder.order_id == order_id)\
+            .first()
+        if not exists:
+            try:
+                with db.begin_nested():
+                    db.add(PartnerOrder(partner_id=partner_id, order_id=order_id))
+            except IntegrityError:
+                pass  # 并发请求已写入同一关联
+            TableVersionService.bump(db, "partner_orders")
+            db.commit()
         
         # 返回更新后的订单信息，注意设置PartnerID
         order_info = OrderService._order_to_schema(db, order)
@@ -1,10 +1,15 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, Query, joinedload
 from sqlalchemy import func, and_, or_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date, timedelta
 
+from app.core.config import settings
 from app.models.models import PurchaseRecord, License, Customer, SalesRep, Reseller
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.count_service import CountService, TotalCount
+from app.services.sales_performance_service import SalesPerformanceService, purchase_fact
+from app.services.fx_service import FxService
 
 
 class PurchaseService:
@@ -35,8 +40,9 @@ class PurchaseService:
         )
         
         db.add(db_purchase)
-        db.commit()
-        db.refresh(db_purchase)
+        FxService.normalize(db, db_purchase)
+        SalesPerformanceService.record(db, added=[purchase_fact(license, db_purchase)])
+        tables = ["purchase_records"]
         
         # Update the license if this is a renewal or expansion
         if purchase_data.PurchaseType in [schemas.PurchaseTypeEnum.RENEWAL, schemas.PurchaseTypeEnum.EXPANSION]:
@@ -53,7 +59,11 @@ class PurchaseService:
                     license.authorized_users += purchase_data.UsersPurchased
             
             license.updated_at = datetime.now()
-            db.commit()
+            tables.append("licenses")
+        
+        # One commit for the purchase record and the license update
+        TableVersionService.bump(db, *tables)
+        db.commit()
         
         return db_purchase
 
@@ -73,6 +83,7 @@ class PurchaseService:
             OrderNumber=purchase.order_number,
             ContractNumber=purchase.contract_number,
             Amount=purchase.amount,
+            AmountBase=purchase.amount_base,
             Currency=purchase.currency,
             PaymentStatus=purchase.payment_status,
             PaymentDate=purchase.payment_date,
@@ -86,17 +97,14 @@ class PurchaseService:
         )
 
     @staticmethod
-    def get_purchase_records(
+    def _purchase_records_query(
         db: Session,
-        skip: int = 0,
-        limit: int = 100,
         license_id: Optional[str] = None,
         purchase_type: Optional[schemas.PurchaseTypeEnum] = None,
         payment_status: Optional[schemas.PaymentStatusEnum] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None
-    ) -> List[schemas.PurchaseRecordInfo]:
-        """Get list of purchase records with filtering options"""
+    ) -> Query:
         query = db.query(PurchaseRecord)
         
         # Apply filters
@@ -110,6 +118,21 @@ class PurchaseService:
             query = query.filter(PurchaseRecord.purchase_date >= start_date)
         if end_date:
             query = query.filter(PurchaseRecord.purchase_date <= end_date)
+        return query
+
+    @staticmethod
+    def get_purchase_records(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        license_id: Optional[str] = None,
+        purchase_type: Optional[schemas.PurchaseTypeEnum] = None,
+        payment_status: Optional[schemas.PaymentStatusEnum] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[schemas.PurchaseRecordInfo]:
+        """Get list of purchase records with filtering options"""
+        query = PurchaseService._purchase_records_query(db, license_id, purchase_type, payment_status, start_date, end_date)
         
         # Apply pagination
         purchases = query.order_by(PurchaseRecord.purchase_date.desc()).offset(skip).limit(limit).all()
@@ -124,6 +147,7 @@ class PurchaseService:
                 OrderNumber=purchase.order_number,
                 ContractNumber=purchase.contract_number,
                 Amount=purchase.amount,
+                AmountBase=purchase.amount_base,
                 Currency=purchase.currency,
                 PaymentStatus=purchase.payment_status,
                 PaymentDate=purchase.payment_date,
@@ -138,6 +162,22 @@ class PurchaseService:
             for purchase in purchases
         ]
 
+    @staticmethod
+    def count_purchase_records(
+        db: Session,
+        license_id: Optional[str] = None,
+        purchase_type: Optional[schemas.PurchaseTypeEnum] = None,
+        payment_status: Optional[schemas.PaymentStatusEnum] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> TotalCount:
+        """Total for get_purchase_records with the same filters"""
+        query = PurchaseService._purchase_records_query(db, license_id, purchase_type, payment_status, start_date, end_date)
+        return CountService.count(db, "purchase_records", query, ["purchase_records"], {
+            "license_id": license_id, "purchase_type": purchase_type, "payment_status": payment_status,
+            "start_date": start_date, "end_date": end_date,
+        })
+
     @staticmethod
     def update_purchase_record(
         db: Session, 
@@ -154,6 +194,7 @@ class PurchaseService:
         old_workspaces = purchase.workspaces_purchased
         old_users = purchase.users_purchased
         old_expiry_date = purchase.new_expiry_date
+        sold_before = purchase_fact(purchase.license, purchase)
         
         # Update fields if provided
         update_data = purchase_data.dict(exclude_unset=True)
@@ -165,7 +206,11 @@ class PurchaseService:
         
         # Update the last modified date
         purchase.updated_at = datetime.now()
+        FxService.normalize(db, purchase)
+        
+        SalesPerformanceService.record(db, added=[purchase_fact(purchase.license, purchase)], removed=[sold_before])
         
+        TableVersionService.bump(db, "purchase_records")
         db.commit()
         db.refresh(purchase)
         
@@ -189,6 +234,7 @@ class PurchaseService:
                         license.authorized_users = license.authorized_users - old_users + purchase_data.UsersPurchased
                 
                 license.updated_at = datetime.now()
+                TableVersionService.bump(db, "licenses")
                 db.commit()
         
         # Return the updated purchase record
@@ -200,6 +246,7 @@ class PurchaseService:
             OrderNumber=purchase.order_number,
             ContractNumber=purchase.contract_number,
             Amount=purchase.amount,
+            AmountBase=purchase.amount_base,
             Currency=purchase.currency,
             PaymentStatus=purchase.payment_status,
             PaymentDate=purchase.payment_date,
@@ -242,9 +289,12 @@ class PurchaseService:
                     license.notes = (license.notes or "") + f"\nRenewal purchase record {purchase_id} was deleted on {datetime.now()}, license may need review."
                 
                 license.updated_at = datetime.now()
+                TableVersionService.bump(db, "licenses")
                 db.commit()
         
+        SalesPerformanceService.record(db, removed=[purchase_fact(purchase.license, purchase)])
         db.delete(purchase)
+        TableVersionService.bump(db, "purchase_records")
         db.commit()
         
         return True
@@ -259,11 +309,14 @@ class PurchaseService:
         start_date = date(target_year, 1, 1)
         end_date = date(target_year, 12, 31)
         
+        # All revenue figures are in the base currency
+        revenue_sum = func.coalesce(func.sum(PurchaseRecord.amount_base), 0)
+        
         # Total revenue for all time
-        total_revenue = db.query(func.sum(PurchaseRecord.amount)).scalar() or 0
+        total_revenue = db.query(revenue_sum).scalar() or 0
         
         # Revenue for the target year
-        annual_revenue = db.query(func.sum(PurchaseRecord.amount))\
+        annual_revenue = db.query(revenue_sum)\
             .filter(
                 PurchaseRecord.purchase_date >= start_date,
                 PurchaseRecord.purchase_date <= end_date
@@ -272,7 +325,7 @@ class PurchaseService:
         # Monthly revenue for the target year
         monthly_revenue_query = db.query(
                 func.extract('month', PurchaseRecord.purchase_date).label("month"),
-                func.sum(PurchaseRecord.amount).label("revenue")
+                revenue_sum.label("revenue")
             )\
             .filter(
                 PurchaseRecord.purchase_date >= start_date,
@@ -291,7 +344,7 @@ class PurchaseService:
         # Revenue by purchase type
         revenue_by_type_query = db.query(
                 PurchaseRecord.purchase_type,
-                func.sum(PurchaseRecord.amount).label("revenue")
+                revenue_sum.label("revenue")
             )\
             .filter(
                 PurchaseRecord.purchase_date >= start_date,
@@ -306,7 +359,7 @@ class PurchaseService:
         revenue_by_customer_query = db.query(
                 Customer.customer_id,
                 Customer.customer_name,
-                func.sum(PurchaseRecord.amount).label("revenue")
+                revenue_sum.label("revenue")
             )\
             .join(License, License.license_id == PurchaseRecord.license_id)\
             .join(Customer, Customer.customer_id == License.customer_id)\
@@ -315,7 +368,7 @@ class PurchaseService:
                 PurchaseRecord.purchase_date <= end_date
             )\
             .group_by(Customer.customer_id, Customer.customer_name)\
-            .order_by(func.sum(PurchaseRecord.amount).desc())\
+            .order_by(revenue_sum.desc())\
             .limit(10)
         
         top_customers = [
@@ -333,5 +386,6 @@ class PurchaseService:
             "annual_revenue": float(annual_revenue),
             "monthly_revenue": monthly_revenue,
             "revenue_by_purchase_type": revenue_by_type,
-            "top_customers_by_revenue": top_customers
+            "top_customers_by_revenue": top_customers,
+            "currency": settings.BASE_CURRENCY
         }
@@ -0,0 +1,162 @@
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Tuple, Callable, Iterable
+import threading
+import time
+
+from app.core.config import settings
+from app.models.lead_models import LeadSource, LeadStatus
+from app.schemas import schemas, lead_schemas
+from app.schemas import order_schemas, partner_schemas
+from app.services.table_version_service import TableVersionService, CHANGED_TABLES_KEY
+
+# Row cap per reference table; these are lookup tables with tens of rows
+REFERENCE_TABLE_LIMIT = 10000
+
+
+def _load_lead_statuses(db: Session) -> List[Any]:
+    rows = db.query(LeadStatus).order_by(LeadStatus.display_order, LeadStatus.status_id).limit(REFERENCE_TABLE_LIMIT).all()
+    return [lead_schemas.LeadStatus.model_validate(row, from_attributes=True) for row in rows]
+
+
+def _load_lead_sources(db: Session) -> List[Any]:
+    rows = db.query(LeadSource).order_by(LeadSource.source_id).limit(REFERENCE_TABLE_LIMIT).all()
+    return [lead_schemas.LeadSource.model_validate(row, from_attributes=True) for row in rows]
+
+
+def _load_sales_reps(db: Session) -> List[Any]:
+    from app.services.sales_rep_service import SalesRepService
+    return SalesRepService.get_sales_reps(db, limit=REFERENCE_TABLE_LIMIT)["items"]
+
+
+def _load_resellers(db: Session) -> List[Any]:
+    from app.services.reseller_service import ResellerService
+    return ResellerService.get_resellers(db, limit=REFERENCE_TABLE_LIMIT)
+
+
+def _load_engineers(db: Session) -> List[Any]:
+    from app.services.engineer_service import EngineerService
+    return EngineerService.get_engineers(db, limit=REFERENCE_TABLE_LIMIT)["items"]
+
+
+# table name (as used by TableVersionService) -> loader returning response-schema objects
+REFERENCE_TABLES: Dict[str, Callable[[Session], List[Any]]] = {
+    "lead_statuses": _load_lead_statuses,
+    "lead_sources": _load_lead_sources,
+    "sales_reps": _load_sales_reps,
+    "resellers": _load_resellers,
+    "factory_engineers": _load_engineers,
+}
+
+# Enums the frontend renders as dropdowns; part of the code, so they never change at runtime
+REFERENCE_ENUMS = {
+    "LicenseStatus": schemas.LicenseStatusEnum,
+    "DeploymentStatus": schemas.DeploymentStatusEnum,
+    "DeploymentType": schemas.DeploymentTypeEnum,
+    "PurchaseType": schemas.PurchaseTypeEnum,
+    "PaymentStatus": schemas.PaymentStatusEnum,
+    "Status": schemas.StatusEnum,
+    "PartnerStatus": partner_schemas.PartnerStatusEnum,
+    "OrderStatus": order_schemas.OrderStatusEnum,
+    "OrderSource": order_schemas.OrderSourceEnum,
+    "ActivationMode": order_schemas.ActivationModeEnum,
+}
+
+
+class ReferenceDataCache:
+    """
+    In-process cache of small lookup tables, stamped with their table_versions counter.
+
+    A table is reloaded only when its version moves. Versions are re-read at most every
+    REFERENCE_DATA_CHECK_INTERVAL seconds (writes from other workers), and writes in this
+    worker (TableVersionService.bump) drop the affected tables as soon as their transaction commits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, List[Any]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._checked_at = 0.0
+
+    def get(self, db: Session, table_names: Iterable[str]) -> Tuple[Dict[str, int], Dict[str, List[Any]]]:
+        """(versions, items) for the given reference tables"""
+        table_names = list(table_names)
+        if not REFERENCE_TABLES.keys().isdisjoint(db.info.get(CHANGED_TABLES_KEY, ())):
+            # This transaction wrote reference data that isn't committed yet: read it, don't cache it
+            versions = TableVersionService.get_versions(db, table_names)
+            return versions, {name: REFERENCE_TABLES[name](db) for name in table_names}
+
+        with self._lock:
+            stale = time.monotonic() - self._checked_at >= settings.REFERENCE_DATA_CHECK_INTERVAL
+            entries = dict(self._entries)
+            versions = dict(self._versions)
+        if stale or any(name not in entries for name in table_names):
+            versions = TableVersionService.get_versions(db, REFERENCE_TABLES)
+            with self._lock:
+                self._versions = versions
+                self._checked_at = time.monotonic()
+
+        items = {}
+        for name in table_names:
+            entry = entries.get(name)
+            if entry is None or entry[0] != versions[name]:
+                # The version was read before the rows, so a concurrent commit at worst causes one extra reload
+                entry = (versions[name], REFERENCE_TABLES[name](db))
+                with self._lock:
+                    self._entries[name] = entry
+            items[name] = entry[1]
+        return {name: versions[name] for name in table_names}, items
+
+    def invalidate(self, *table_names: str) -> None:
+        with self._lock:
+            for name in table_names:
+                self._entries.pop(name, None)
+            self._checked_at = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._checked_at = 0.0
+
+
+reference_data_cache = ReferenceDataCache()
+
+
+# Writes in this worker are visible as soon as they commit
+TableVersionService.on_commit(REFERENCE_TABLES, lambda changed: reference_data_cache.invalidate(*changed))
+
+
+class ReferenceDataService:
+    """Read-mostly lookup tables served from ReferenceDataCache"""
+
+    @staticmethod
+    def get_table(db: Session, table_name: str) -> List[Any]:
+        _, items = reference_data_cache.get(db, [table_name])
+        return items[table_name]
+
+    @staticmethod
+    def get_lead_statuses(db: Session) -> List[lead_schemas.LeadStatus]:
+        return ReferenceDataService.get_table(db, "lead_statuses")
+
+    @staticmethod
+    def get_lead_sources(db: Session) -> List[lead_schemas.LeadSource]:
+        return ReferenceDataService.get_table(db, "lead_sources")
+
+    @staticmethod
+    def get_versions(db: Session) -> Dict[str, int]:
+        versions, _ = reference_data_cache.get(db, REFERENCE_TABLES)
+        return versions
+
+    @staticmethod
+    def get_reference_data(db: Session) -> Dict[str, Any]:
+        """All reference tables and enums in one payload, plus the versions they were read at"""
+        versions, items = reference_data_cache.get(db, REFERENCE_TABLES)
+        return {
+            "LeadStatuses": items["lead_statuses"],
+            "LeadSources": items["lead_sources"],
+            "SalesReps": items["sales_reps"],
+            "Resellers": items["resellers"],
+            "Engineers": items["factory_engineers"],
+            "Enums": {name: [member.value for member in enum] for name, enum in REFERENCE_ENUMS.items()},
+            "Versions": versions,
+        }
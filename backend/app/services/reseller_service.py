@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, date
 
 from app.models.models import Reseller, License, PurchaseRecord
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.sales_performance_service import SalesPerformanceService
 
 
 class ResellerService:
@@ -23,6 +25,7 @@ class ResellerService:
         )
         
         db.add(db_reseller)
+        TableVersionService.bump(db, "resellers")
         db.commit()
         db.refresh(db_reseller)
         
@@ -117,6 +120,7 @@ class ResellerService:
         # Update the last modified date
         reseller.updated_at = datetime.now()
         
+        TableVersionService.bump(db, "resellers")
         db.commit()
         db.refresh(reseller)
         
@@ -143,7 +147,11 @@ class ResellerService:
         if not reseller:
             return False
         
+        # Its licenses become unassigned (ON DELETE SET NULL); move their sales with them
+        SalesPerformanceService.unassign(db, "reseller", reseller_id)
+        
         db.delete(reseller)
+        TableVersionService.bump(db, "resellers", "licenses")
         db.commit()
         
         return True
@@ -185,87 +193,43 @@ class ResellerService:
         ]
     
     @staticmethod
-    def get_reseller_performance(db: Session, reseller_id: Optional[int] = None) -> Dict[str, Any]:
-        """Get sales performance metrics for a reseller or all resellers"""
-        from sqlalchemy import and_, extract, func
-        from datetime import datetime, timedelta
-        
+    def get_reseller_performance(
+        db: Session,
+        reseller_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        compare: str = "none"
+    ) -> Dict[str, Any]:
+        """Get sales performance metrics for a reseller or all resellers over a date range (default: year to date)"""
         today = datetime.now().date()
-        year_start = datetime(today.year, 1, 1).date()
-        
-        # Base query for reseller data
-        query = db.query(
-                Reseller.reseller_id,
-                Reseller.reseller_name,
-                func.count(License.license_id).label("total_licenses"),
-                func.sum(PurchaseRecord.amount).label("total_revenue")
-            )\
-            .join(License, License.reseller_id == Reseller.reseller_id)\
-            .join(PurchaseRecord, PurchaseRecord.license_id == License.license_id)\
-            .filter(PurchaseRecord.purchase_date >= year_start)\
-            .group_by(Reseller.reseller_id, Reseller.reseller_name)
-        
-        # If reseller_id is provided, filter by that reseller
-        if reseller_id:
-            query = query.filter(Reseller.reseller_id == reseller_id)
-        
-        # Execute the query
-        results = query.all()
+        start_date = start_date or date(today.year, 1, 1)
+        end_date = end_date or today
         
-        # Format the results
         if reseller_id:
-            # Single reseller performance
-            if not results:
-                return {
-                    "total_licenses": 0,
-                    "total_revenue": 0,
-                    "monthly_performance": []
-                }
-                
-            result = results[0]
-            
-            # Get monthly performance
-            monthly_query = db.query(
-                    func.extract('month', PurchaseRecord.purchase_date).label("month"),
-                    func.count(License.license_id).label("licenses"),
-                    func.sum(PurchaseRecord.amount).label("revenue")
-                )\
-                .join(License, License.license_id == PurchaseRecord.license_id)\
-                .filter(
-                    License.reseller_id == reseller_id,
-                    PurchaseRecord.purchase_date >= year_start
-                )\
-                .group_by(func.extract('month', PurchaseRecord.purchase_date))\
-                .order_by(func.extract('month', PurchaseRecord.purchase_date))
-            
-            monthly_data = monthly_query.all()
-            
+            # Single reseller performance, by month
+            name = db.query(Reseller.reseller_name).filter(Reseller.reseller_id == reseller_id).scalar()
+            performance = SalesPerformanceService.get_series(db, "reseller", reseller_id, start_date, end_date)
             return {
-                "reseller_id": result.reseller_id,
-                "reseller_name": result.reseller_name,
-                "total_licenses": result.total_licenses or 0,
-                "total_revenue": float(result.total_revenue or 0),
-                "monthly_performance": [
-                    {
-                        "month": int(month),
-                        "licenses": licenses,
-                        "revenue": float(revenue) if revenue else 0
-                    }
-                    for month, licenses, revenue in monthly_data
-                ]
-            }
-        else:
-            # All resellers performance
-            return {
-                "resellers": [
-                    {
-                        "reseller_id": result.reseller_id,
-                        "reseller_name": result.reseller_name,
-                        "total_licenses": result.total_licenses or 0,
-                        "total_revenue": float(result.total_revenue or 0)
-                    }
-                    for result in results
-                ],
-                "total_licenses": sum(result.total_licenses or 0 for result in results),
-                "total_revenue": sum(float(result.total_revenue or 0) for result in results)
+                "reseller_id": reseller_id,
+                "reseller_name": name,
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_licenses": performance["total_licenses"],
+                "total_revenue": performance["total_revenue"],
+                "currency": performance["currency"],
+                "monthly_performance": performance["series"]
             }
+        
+        # All resellers, ranked by revenue
+        ranking = SalesPerformanceService.get_ranking(db, "reseller", start_date, end_date, compare=compare)
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "compare": compare,
+            "previous_start_date": ranking["previous_start_date"],
+            "previous_end_date": ranking["previous_end_date"],
+            "resellers": ranking["items"],
+            "total_licenses": sum(item["total_licenses"] for item in ranking["items"]),
+            "total_revenue": sum(item["total_revenue"] for item in ranking["items"]),
+            "currency": ranking["currency"]
+        }
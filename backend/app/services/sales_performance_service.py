@@ -0,0 +1,346 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, or_, case, extract, func, insert, literal, select
+from typing import List, Optional, Dict, Any, Tuple, Iterable
+from datetime import date, timedelta
+from collections import defaultdict
+
+from app.core.config import settings
+from app.models.models import License, PurchaseRecord, SalesPerformanceDaily
+from app.services.reference_data_service import ReferenceDataService
+
+# dimension -> License column the purchase is attributed through
+DIMENSIONS = {
+    "sales_rep": License.sales_rep_id,
+    "reseller": License.reseller_id,
+}
+
+# dimension -> (reference table, id field, name field) used to label rankings
+DIMENSION_NAMES = {
+    "sales_rep": ("sales_reps", "SalesRepID", "SalesRepName"),
+    "reseller": ("resellers", "ResellerID", "ResellerName"),
+}
+
+COMPARE_OPTIONS = ("previous_period", "previous_year", "none")
+GRANULARITIES = ("day", "month")
+
+# Purchases without a currency are stored with the column default
+DEFAULT_CURRENCY = "USD"
+
+# (sales_rep_id, reseller_id, product_name, day, currency, purchase_count, revenue, revenue_base)
+PurchaseFact = Tuple[Optional[int], Optional[int], str, date, str, int, float, float]
+
+
+def purchase_fact(license: Any, purchase: Any) -> PurchaseFact:
+    """The fact a single purchase contributes, from objects/rows carrying the license and purchase columns"""
+    return (
+        license.sales_rep_id,
+        license.reseller_id,
+        license.product_name,
+        purchase.purchase_date,
+        purchase.currency or DEFAULT_CURRENCY,
+        1,
+        purchase.amount or 0.0,
+        purchase.amount_base or 0.0,
+    )
+
+
+def reattribute(facts: Iterable[PurchaseFact], sales_rep_id: Optional[int], reseller_id: Optional[int], product_name: str) -> List[PurchaseFact]:
+    """The same purchases credited to another rep/reseller/product"""
+    return [(sales_rep_id, reseller_id, product_name) + fact[3:] for fact in facts]
+
+
+def previous_range(start: date, end: date, compare: str) -> Optional[Tuple[date, date]]:
+    if compare == "previous_period":
+        length = end - start + timedelta(days=1)
+        return start - length, end - length
+    if compare == "previous_year":
+        def year_earlier(value: date) -> date:
+            # Feb 29 maps to Feb 28
+            return value.replace(year=value.year - 1, day=min(value.day, 28) if value.month == 2 else value.day)
+        return year_earlier(start), year_earlier(end)
+    return None
+
+
+def percent_change(current: float, previous: float) -> Optional[float]:
+    if not previous:
+        return None
+    return round((current - previous) / previous * 100, 2)
+
+
+class SalesPerformanceService:
+    """
+    Daily sales performance per sales rep / reseller, product and currency.
+
+    Each row holds the revenue in its currency and in the base currency (from the purchases'
+    amount_base), so cross-currency totals are plain SUMs of revenue_base.
+
+    sales_performance_daily is kept up to date by the purchase write paths (and by license
+    changes that move purchases to another rep, reseller or product) through record(), in the
+    same transaction as the write. Reports for any date range are then a single range scan
+    over (dimension, day) instead of a licenses x purchase_records join.
+    """
+
+    # --- Maintenance --------------------------------------------------------------------
+
+    @staticmethod
+    def license_facts(db: Session, *criteria: Any) -> List[PurchaseFact]:
+        """Purchases of the licenses matching criteria, aggregated per fact key, as currently attributed"""
+        rows = db.query(
+                License.sales_rep_id,
+                License.reseller_id,
+                License.product_name,
+                PurchaseRecord.purchase_date,
+                PurchaseRecord.currency,
+                func.count(PurchaseRecord.purchase_id),
+                func.sum(PurchaseRecord.amount),
+                func.sum(PurchaseRecord.amount_base)
+            )\
+            .join(PurchaseRecord, PurchaseRecord.license_id == License.license_id)\
+            .filter(*criteria)\
+            .group_by(
+                License.sales_rep_id, License.reseller_id, License.product_name,
+                PurchaseRecord.purchase_date, PurchaseRecord.currency
+            )\
+            .all()
+        return [
+            (sales_rep_id, reseller_id, product_name, day, currency or DEFAULT_CURRENCY, count, revenue or 0.0, revenue_base or 0.0)
+            for sales_rep_id, reseller_id, product_name, day, currency, count, revenue, revenue_base in rows
+        ]
+
+    @staticmethod
+    def record(db: Session, added: Iterable[PurchaseFact] = (), removed: Iterable[PurchaseFact] = ()) -> None:
+        """Apply purchase facts to the daily table; added and removed facts for the same row net out first"""
+        pending: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        for facts, sign in ((added, 1), (removed, -1)):
+            for sales_rep_id, reseller_id, product_name, day, currency, count, revenue, revenue_base in facts:
+                for dimension, dimension_id in (("sales_rep", sales_rep_id), ("reseller", reseller_id)):
+                    row = pending[(dimension, dimension_id or 0, day, product_name, currency)]
+                    row[0] += sign * count
+                    row[1] += sign * revenue
+                    row[2] += sign * revenue_base
+
+        for (dimension, dimension_id, day, product_name, currency), (count, revenue, revenue_base) in pending.items():
+            if not count and not revenue and not revenue_base:
+                continue
+            SalesPerformanceService._increment(db, {
+                "dimension": dimension, "dimension_id": dimension_id, "day": day,
+                "product_name": product_name, "currency": currency,
+            }, count, revenue, revenue_base)
+
+    @staticmethod
+    def unassign(db: Session, dimension: str, dimension_id: int) -> None:
+        """Move the sales of a rep/reseller about to be deleted to "unassigned" (dimension_id 0)"""
+        sold = SalesPerformanceService.license_facts(db, DIMENSIONS[dimension] == dimension_id)
+        if dimension == "sales_rep":
+            moved = [(None,) + fact[1:] for fact in sold]
+        else:
+            moved = [fact[:1] + (None,) + fact[2:] for fact in sold]
+        SalesPerformanceService.record(db, added=moved, removed=sold)
+
+    @staticmethod
+    def _increment(db: Session, key: Dict[str, Any], count: int, revenue: float, revenue_base: float) -> None:
+        """Atomically add to a daily row, creating it on first use"""
+        filters = [getattr(SalesPerformanceDaily, column) == value for column, value in key.items()]
+        values = {
+            SalesPerformanceDaily.purchase_count: SalesPerformanceDaily.purchase_count + count,
+            SalesPerformanceDaily.revenue: SalesPerformanceDaily.revenue + revenue,
+            SalesPerformanceDaily.revenue_base: SalesPerformanceDaily.revenue_base + revenue_base,
+        }
+        if db.query(SalesPerformanceDaily).filter(*filters).update(values, synchronize_session=False):
+            return
+        try:
+            with db.begin_nested():
+                db.execute(insert(SalesPerformanceDaily).values(
+                    **key, purchase_count=count, revenue=revenue, revenue_base=revenue_base
+                ))
+        except IntegrityError:
+            db.query(SalesPerformanceDaily).filter(*filters).update(values, synchronize_session=False)
+
+    @staticmethod
+    def rebuild(db: Session, start_date: Optional[date] = None) -> int:
+        """Recompute the daily table from purchase_records, from start_date on (all days if None); returns rows written"""
+        stale = db.query(SalesPerformanceDaily)
+        if start_date:
+            stale = stale.filter(SalesPerformanceDaily.day >= start_date)
+        stale.delete(synchronize_session=False)
+        currency = func.coalesce(PurchaseRecord.currency, DEFAULT_CURRENCY)
+        written = 0
+        for dimension, column in DIMENSIONS.items():
+            dimension_id = func.coalesce(column, 0)
+            source = select(
+                    literal(dimension), dimension_id, PurchaseRecord.purchase_date, License.product_name, currency,
+                    func.count(PurchaseRecord.purchase_id), func.sum(PurchaseRecord.amount),
+                    func.coalesce(func.sum(PurchaseRecord.amount_base), 0.0)
+                )\
+                .join(License, License.license_id == PurchaseRecord.license_id)\
+                .group_by(dimension_id, PurchaseRecord.purchase_date, License.product_name, currency)
+            if start_date:
+                source = source.where(PurchaseRecord.purchase_date >= start_date)
+            result = db.execute(insert(SalesPerformanceDaily).from_select(
+                ["dimension", "dimension_id", "day", "product_name", "currency", "purchase_count", "revenue", "revenue_base"],
+                source
+            ))
+            written += result.rowcount or 0
+        db.commit()
+        return written
+
+    # --- Reports ------------------------------------------------------------------------
+
+    @staticmethod
+    def _filters(dimension: str, product_name: Optional[str], currency: Optional[str]) -> List[Any]:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'")
+        filters = [SalesPerformanceDaily.dimension == dimension]
+        if product_name:
+            filters.append(SalesPerformanceDaily.product_name == product_name)
+        if currency:
+            filters.append(SalesPerformanceDaily.currency == currency)
+        return filters
+
+    @staticmethod
+    def _revenue(currency: Optional[str]) -> Any:
+        """Revenue column to report: amounts in the filtered currency, otherwise base-currency amounts"""
+        return SalesPerformanceDaily.revenue if currency else SalesPerformanceDaily.revenue_base
+
+    @staticmethod
+    def get_series(
+        db: Session,
+        dimension: str,
+        dimension_id: int,
+        start_date: date,
+        end_date: date,
+        granularity: str = "month",
+        product_name: Optional[str] = None,
+        currency: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Totals and a day- or month-level series for one rep/reseller over [start_date, end_date]"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}'; expected one of {', '.join(GRANULARITIES)}")
+        if start_date > end_date:
+            raise ValueError("start_date must not be after end_date")
+
+        F = SalesPerformanceDaily
+        if granularity == "day":
+            period_columns = [F.day]
+        else:
+            period_columns = [extract("year", F.day), extract("month", F.day)]
+        revenue = SalesPerformanceService._revenue(currency)
+        rows = db.query(*period_columns, func.sum(F.purchase_count), func.sum(revenue))\
+            .filter(
+                *SalesPerformanceService._filters(dimension, product_name, currency),
+                F.dimension_id == dimension_id,
+                F.day >= start_date,
+                F.day <= end_date
+            )\
+            .group_by(*period_columns)\
+            .order_by(*period_columns)\
+            .all()
+
+        series = []
+        for row in rows:
+            if granularity == "day":
+                entry = {"period": row[0].isoformat()}
+            else:
+                year, month = int(row[0]), int(row[1])
+                entry = {"period": f"{year:04d}-{month:02d}", "month": month}
+            entry.update({"licenses": int(row[-2] or 0), "revenue": float(row[-1] or 0)})
+            series.append(entry)
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_licenses": sum(entry["licenses"] for entry in series),
+            "total_revenue": sum(entry["revenue"] for entry in series),
+            "currency": currency or settings.BASE_CURRENCY,
+            "series": series,
+        }
+
+    @staticmethod
+    def get_ranking(
+        db: Session,
+        dimension: str,
+        start_date: date,
+        end_date: date,
+        compare: str = "previous_period",
+        product_name: Optional[str] = None,
+        currency: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Reps/resellers ranked by revenue over [start_date, end_date], each with the same figures for the
+        comparison period. Both periods are read in one statement. Revenue is in the base currency unless
+        a currency filter is given; revenue_by_currency has the original amounts.
+        """
+        if compare not in COMPARE_OPTIONS:
+            raise ValueError(f"Unknown compare '{compare}'; expected one of {', '.join(COMPARE_OPTIONS)}")
+        if start_date > end_date:
+            raise ValueError("start_date must not be after end_date")
+
+        F = SalesPerformanceDaily
+        current = and_(F.day >= start_date, F.day <= end_date)
+        previous_dates = previous_range(start_date, end_date, compare)
+        previous = and_(F.day >= previous_dates[0], F.day <= previous_dates[1]) if previous_dates else None
+
+        revenue = SalesPerformanceService._revenue(currency)
+        columns = [
+            F.dimension_id,
+            F.currency,
+            func.sum(case((current, F.purchase_count), else_=0)),
+            func.sum(case((current, revenue), else_=0.0)),
+            func.sum(case((current, F.revenue), else_=0.0)),
+        ]
+        if previous is not None:
+            columns += [
+                func.sum(case((previous, F.purchase_count), else_=0)),
+                func.sum(case((previous, revenue), else_=0.0)),
+            ]
+        rows = db.query(*columns)\
+            .filter(
+                *SalesPerformanceService._filters(dimension, product_name, currency),
+                F.dimension_id != 0,
+                or_(current, previous) if previous is not None else current
+            )\
+            .group_by(F.dimension_id, F.currency)\
+            .all()
+
+        totals: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            entry = totals.setdefault(row[0], {
+                "total_licenses": 0, "total_revenue": 0.0, "revenue_by_currency": {},
+                "previous_licenses": 0, "previous_revenue": 0.0,
+            })
+            entry["total_licenses"] += int(row[2] or 0)
+            entry["total_revenue"] += float(row[3] or 0)
+            if row[4]:
+                entry["revenue_by_currency"][row[1]] = float(row[4])
+            if previous is not None:
+                entry["previous_licenses"] += int(row[5] or 0)
+                entry["previous_revenue"] += float(row[6] or 0)
+
+        table, id_field, name_field = DIMENSION_NAMES[dimension]
+        names = {getattr(item, id_field): getattr(item, name_field) for item in ReferenceDataService.get_table(db, table)}
+        id_key, name_key = f"{dimension}_id", f"{dimension}_name"
+
+        # Entities active only in the comparison period are kept (revenue 0) so drops are visible
+        ranked = sorted(totals.items(), key=lambda item: (-item[1]["total_revenue"], item[0]))
+        items = []
+        for rank, (dimension_id, entry) in enumerate(ranked[:limit] if limit else ranked, start=1):
+            item = {id_key: dimension_id, name_key: names.get(dimension_id), "rank": rank}
+            item.update(entry)
+            if previous is not None:
+                item["revenue_change"] = item["total_revenue"] - item["previous_revenue"]
+                item["revenue_change_pct"] = percent_change(item["total_revenue"], item["previous_revenue"])
+            else:
+                del item["previous_licenses"], item["previous_revenue"]
+            items.append(item)
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "compare": compare,
+            "previous_start_date": previous_dates[0] if previous_dates else None,
+            "previous_end_date": previous_dates[1] if previous_dates else None,
+            "currency": currency or settings.BASE_CURRENCY,
+            "items": items,
+        }
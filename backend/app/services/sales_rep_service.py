@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, date
 
 from app.models.models import SalesRep, License
 from app.schemas import schemas
+from app.services.table_version_service import TableVersionService
+from app.services.sales_performance_service import SalesPerformanceService
 
 
 class SalesRepService:
@@ -21,6 +23,7 @@ class SalesRepService:
         )
         
         db.add(db_sales_rep)
+        TableVersionService.bump(db, "sales_reps")
         db.commit()
         db.refresh(db_sales_rep)
         
@@ -127,6 +130,7 @@ class SalesRepService:
         # Update the last modified date
         sales_rep.updated_at = datetime.now()
         
+        TableVersionService.bump(db, "sales_reps")
         db.commit()
         db.refresh(sales_rep)
         
@@ -151,7 +155,11 @@ class SalesRepService:
         if not sales_rep:
             return False
         
+        # Its licenses become unassigned (ON DELETE SET NULL); move their sales with them
+        SalesPerformanceService.unassign(db, "sales_rep", sales_rep_id)
+        
         db.delete(sales_rep)
+        TableVersionService.bump(db, "sales_reps", "licenses")
         db.commit()
         
         return True
@@ -193,88 +201,43 @@ class SalesRepService:
         ]
     
     @staticmethod
-    def get_sales_performance(db: Session, sales_rep_id: Optional[int] = None) -> Dict[str, Any]:
-        """Get sales performance metrics for a sales rep or all sales reps"""
-        from sqlalchemy import and_, extract, func
-        from app.models.models import PurchaseRecord
-        from datetime import datetime, timedelta
-        
+    def get_sales_performance(
+        db: Session,
+        sales_rep_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        compare: str = "none"
+    ) -> Dict[str, Any]:
+        """Get sales performance metrics for a sales rep or all sales reps over a date range (default: year to date)"""
         today = datetime.now().date()
-        year_start = datetime(today.year, 1, 1).date()
-        
-        # Base query for sales data
-        query = db.query(
-                SalesRep.sales_rep_id,
-                SalesRep.sales_rep_name,
-                func.count(License.license_id).label("total_licenses"),
-                func.sum(PurchaseRecord.amount).label("total_revenue")
-            )\
-            .join(License, License.sales_rep_id == SalesRep.sales_rep_id)\
-            .join(PurchaseRecord, PurchaseRecord.license_id == License.license_id)\
-            .filter(PurchaseRecord.purchase_date >= year_start)\
-            .group_by(SalesRep.sales_rep_id, SalesRep.sales_rep_name)
-        
-        # If sales_rep_id is provided, filter by that sales rep
-        if sales_rep_id:
-            query = query.filter(SalesRep.sales_rep_id == sales_rep_id)
-        
-        # Execute the query
-        results = query.all()
+        start_date = start_date or date(today.year, 1, 1)
+        end_date = end_date or today
         
-        # Format the results
         if sales_rep_id:
-            # Single sales rep performance
-            if not results:
-                return {
-                    "total_licenses": 0,
-                    "total_revenue": 0,
-                    "monthly_performance": []
-                }
-                
-            result = results[0]
-            
-            # Get monthly performance
-            monthly_query = db.query(
-                    func.extract('month', PurchaseRecord.purchase_date).label("month"),
-                    func.count(License.license_id).label("licenses"),
-                    func.sum(PurchaseRecord.amount).label("revenue")
-                )\
-                .join(License, License.license_id == PurchaseRecord.license_id)\
-                .filter(
-                    License.sales_rep_id == sales_rep_id,
-                    PurchaseRecord.purchase_date >= year_start
-                )\
-                .group_by(func.extract('month', PurchaseRecord.purchase_date))\
-                .order_by(func.extract('month', PurchaseRecord.purchase_date))
-            
-            monthly_data = monthly_query.all()
-            
-            return {
-                "sales_rep_id": result.sales_rep_id,
-                "sales_rep_name": result.sales_rep_name,
-                "total_licenses": result.total_licenses or 0,
-                "total_revenue": float(result.total_revenue or 0),
-                "monthly_performance": [
-                    {
-                        "month": int(month),
-                        "licenses": licenses,
-                        "revenue": float(revenue) if revenue else 0
-                    }
-                    for month, licenses, revenue in monthly_data
-                ]
-            }
-        else:
-            # All sales reps performance
+            # Single sales rep performance, by month
+            name = db.query(SalesRep.sales_rep_name).filter(SalesRep.sales_rep_id == sales_rep_id).scalar()
+            performance = SalesPerformanceService.get_series(db, "sales_rep", sales_rep_id, start_date, end_date)
             return {
-                "sales_reps": [
-                    {
-                        "sales_rep_id": result.sales_rep_id,
-                        "sales_rep_name": result.sales_rep_name,
-                        "total_licenses": result.total_licenses or 0,
-                        "total_revenue": float(result.total_revenue or 0)
-                    }
-                    for result in results
-                ],
-                "total_licenses": sum(result.total_licenses or 0 for result in results),
-                "total_revenue": sum(float(result.total_revenue or 0) for result in results)
+                "sales_rep_id": sales_rep_id,
+                "sales_rep_name": name,
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_licenses": performance["total_licenses"],
+                "total_revenue": performance["total_revenue"],
+                "currency": performance["currency"],
+                "monthly_performance": performance["series"]
             }
+        
+        # All sales reps, ranked by revenue
+        ranking = SalesPerformanceService.get_ranking(db, "sales_rep", start_date, end_date, compare=compare)
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "compare": compare,
+            "previous_start_date": ranking["previous_start_date"],
+            "previous_end_date": ranking["previous_end_date"],
+            "sales_reps": ranking["items"],
+            "total_licenses": sum(item["total_licenses"] for item in ranking["items"]),
+            "total_revenue": sum(item["total_revenue"] for item in ranking["items"]),
+            "currency": ranking["currency"]
+        }
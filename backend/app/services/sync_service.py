@@ -0,0 +1,171 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, or_, select
+from typing import Optional, Dict, Any, Iterable
+from datetime import datetime, timedelta
+import base64
+import json
+
+from app.models.models import License, Customer, SyncTombstone
+from app.models.order_models import PurchaseOrder
+from app.models.lead_models import Lead
+from app.services.license_service import LicenseService
+from app.services.customer_service import CustomerService
+from app.services.order_service import OrderService
+
+
+# Entity name -> (model, primary key column); the entity name doubles as the tombstone table name
+SYNC_ENTITIES = {
+    "licenses": (License, License.license_id),
+    "customers": (Customer, Customer.customer_id),
+    "purchase_orders": (PurchaseOrder, PurchaseOrder.order_id),
+    "leads": (Lead, Lead.lead_id),
+}
+
+# updated_at and deleted_at are stamped when a row is written, not when its transaction commits,
+# so a row can become visible after a sync already paged past its timestamp. Each pass over an
+# entity therefore starts this far before the previous pass began; the window must cover the
+# longest write transaction plus the clock skew between app servers and the database.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+TOKEN_VERSION = 1
+
+
+class SyncService:
+    """Delta sync for the SPA: rows changed since a watermark, using updated_at indexes plus tombstones"""
+
+    @staticmethod
+    def encode_token(cursors: Dict[str, Dict[str, Any]]) -> str:
+        """Encode per-entity cursors into an opaque URL-safe token"""
+        payload = json.dumps({"v": TOKEN_VERSION, "c": cursors}, separators=(",", ":"), default=str)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_token(token: str) -> Dict[str, Dict[str, Any]]:
+        """Decode a sync token, raising ValueError if it is malformed"""
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if payload.get("v") != TOKEN_VERSION:
+                raise ValueError("unsupported token version")
+
+            cursors = {}
+            for entity, cursor in payload["c"].items():
+                if entity not in SYNC_ENTITIES:
+                    continue
+                cursors[entity] = {
+                    "ts": datetime.fromisoformat(cursor["ts"]) if cursor.get("ts") else None,
+                    "pk": cursor.get("pk"),
+                    "tomb": int(cursor.get("tomb") or 0),
+                    "from": datetime.fromisoformat(cursor["from"]) if cursor.get("from") else None,
+                }
+            return cursors
+        except (ValueError, KeyError, TypeError, AttributeError, UnicodeError) as e:
+            raise ValueError(f"Invalid sync token: {e}")
+
+    @staticmethod
+    def _to_schema(entity: str, record: Any) -> Any:
+        if entity == "licenses":
+            return LicenseService._license_to_info(record)
+        if entity == "customers":
+            return CustomerService._customer_to_info(record)
+        if entity == "purchase_orders":
+            return OrderService._order_to_info(record)
+        return record
+
+    @staticmethod
+    def get_changes(
+        db: Session,
+        since: Optional[str] = None,
+        limit: int = 500,
+        entities: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get rows inserted/updated/deleted since the given token.
+
+        Without a token this is a full snapshot (paged by `limit` per entity), after which the
+        client only pulls deltas. `has_more` means at least one entity was truncated and the
+        client should call again straight away with `next_token`.
+        """
+        cursors = SyncService.decode_token(since) if since else {}
+        selected = [entity for entity in SYNC_ENTITIES if entities is None or entity in entities]
+
+        # updated_at is stamped both by the database (column defaults) and by the app servers
+        # (services set datetime.now()), so take the earlier of the two clocks
+        sync_started_at = min(db.execute(select(func.now())).scalar(), datetime.now())
+
+        result: Dict[str, Any] = {"has_more": False}
+        for entity in selected:
+            model, pk_column = SYNC_ENTITIES[entity]
+            cursor = cursors.get(entity)
+
+            if cursor is None:
+                # Initial snapshot: deletes before now are irrelevant, start tombstones at the current head
+                head = db.query(func.max(SyncTombstone.tombstone_id))\
+                    .filter(SyncTombstone.table_name == entity)\
+                    .scalar()
+                cursor = {"ts": None, "pk": None, "tomb": head or 0, "from": None}
+            # A pass pages through everything after the cursor; remember when it began
+            pass_started_at = cursor["from"] or sync_started_at
+
+            # Upserts, keyset-paged on (updated_at, pk)
+            query = db.query(model).filter(model.updated_at.isnot(None))
+            if cursor["ts"] is not None:
+                if cursor["pk"] is None:
+                    query = query.filter(model.updated_at >= cursor["ts"])
+                else:
+                    query = query.filter(or_(
+                        model.updated_at > cursor["ts"],
+                        and_(model.updated_at == cursor["ts"], pk_column > cursor["pk"])
+                    ))
+            rows = query.order_by(model.updated_at.asc(), pk_column.asc()).limit(limit + 1).all()
+            rows_truncated = len(rows) > limit
+            rows = rows[:limit]
+
+            # Deletes, paged on the tombstone id
+            tombstones = db.query(SyncTombstone.tombstone_id, SyncTombstone.record_id)\
+                .filter(
+                    SyncTombstone.table_name == entity,
+                    SyncTombstone.tombstone_id > cursor["tomb"]
+                )\
+                .order_by(SyncTombstone.tombstone_id.asc())\
+                .limit(limit + 1)\
+                .all()
+            tombstones_truncated = len(tombstones) > limit
+            tombstones = tombstones[:limit]
+
+            if rows_truncated or tombstones_truncated:
+                result["has_more"] = True
+                next_ts, next_pk = (rows[-1].updated_at, getattr(rows[-1], pk_column.key)) if rows \
+                    else (cursor["ts"], cursor["pk"])
+                next_tomb = tombstones[-1].tombstone_id if tombstones else cursor["tomb"]
+                next_cursor = {"ts": next_ts, "pk": next_pk, "tomb": next_tomb, "from": pass_started_at}
+            else:
+                # Caught up. Rows and tombstones committed late may have been stamped behind the
+                # position this pass had reached, so the next pass re-reads everything written
+                # since shortly before this one began; the client applies them idempotently.
+                floor = pass_started_at - SYNC_OVERLAP
+                if cursor["ts"] is not None and cursor["pk"] is None:
+                    floor = max(floor, cursor["ts"])
+                next_tomb = db.query(func.max(SyncTombstone.tombstone_id))\
+                    .filter(SyncTombstone.table_name == entity, SyncTombstone.deleted_at < floor)\
+                    .scalar() or 0
+                next_tomb = min(next_tomb, tombstones[-1].tombstone_id if tombstones else cursor["tomb"])
+                next_cursor = {"ts": floor, "pk": None, "tomb": next_tomb, "from": None}
+
+            result[entity] = {
+                "upserts": [SyncService._to_schema(entity, row) for row in rows],
+                # the overlap window can return a record twice; send each delete once
+                "deletes": list(dict.fromkeys(tombstone.record_id for tombstone in tombstones)),
+            }
+            cursors[entity] = next_cursor
+
+        result["next_token"] = SyncService.encode_token({
+            entity: {
+                "ts": cursor["ts"].isoformat() if cursor["ts"] else None,
+                "pk": cursor["pk"],
+                "tomb": cursor["tomb"],
+                "from": cursor["from"].isoformat() if cursor["from"] else None,
+            }
+            for entity, cursor in cursors.items()
+        })
+        return result
@@ -0,0 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Callable, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from app.models.models import TableVersion
+
+# Session.info key: tables bumped in the session's current transaction. Owned by this module:
+# other code may read it, only the listeners below clear it.
+CHANGED_TABLES_KEY = "changed_tables"
+
+# (watched tables, callback) registered through TableVersionService.on_commit
+_invalidators: List[Tuple[FrozenSet[str], Callable[[Set[str]], None]]] = []
+
+
+class TableVersionService:
+    """Per-table change counters, bumped by service write paths in the same transaction as the write"""
+
+    @staticmethod
+    def on_commit(table_names: Iterable[str], invalidate: Callable[[Set[str]], None]) -> None:
+        """
+        Call invalidate(changed tables among table_names) after each commit that bumped any of them,
+        e.g. to drop an in-process cache as soon as this worker's own write is visible
+        """
+        _invalidators.append((frozenset(table_names), invalidate))
+
+    @staticmethod
+    def bump(db: Session, *table_names: str) -> None:
+        """Increment the change version of the given tables (committed together with the caller's changes)"""
+        db.info.setdefault(CHANGED_TABLES_KEY, set()).update(table_names)
+        for table_name in table_names:
+            updated = db.query(TableVersion)\
+                .filter(TableVersion.table_name == table_name)\
+                .update({TableVersion.version: TableVersion.version + 1}, synchronize_session=False)
+            if updated:
+                continue
+            
+            # First write to this table: create the counter inside a savepoint so a concurrent
+            # insert of the same row does not abort the caller's transaction
+            try:
+                with db.begin_nested():
+                    db.add(TableVersion(table_name=table_name, version=1))
+            except IntegrityError:
+                db.query(TableVersion)\
+                    .filter(TableVersion.table_name == table_name)\
+                    .update({TableVersion.version: TableVersion.version + 1}, synchronize_session=False)
+
+    @staticmethod
+    def get_versions(db: Session, table_names: Iterable[str]) -> Dict[str, int]:
+        """Get the current change version of each table (0 for tables never written)"""
+        table_names = sorted(set(table_names))
+        rows = db.query(TableVersion.table_name, TableVersion.version)\
+            .filter(TableVersion.table_name.in_(table_names))\
+            .all()
+        
+        versions = {table_name: 0 for table_name in table_names}
+        versions.update({table_name: version for table_name, version in rows})
+        return versions
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # savepoint release (e.g. inside TableVersionService.bump), not the real commit
+    changed = session.info.pop(CHANGED_TABLES_KEY, None)
+    if not changed:
+        return
+    for table_names, invalidate in _invalidators:
+        if not table_names.isdisjoint(changed):
+            invalidate(changed & table_names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    session.info.pop(CHANGED_TABLES_KEY, None)
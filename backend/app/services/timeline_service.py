@@ -0,0 +1,202 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from typing import List, Optional, Dict, Any, Iterator, Callable
+from datetime import datetime
+import base64
+import heapq
+import json
+
+from app.models.models import License, ChangeTracking, PurchaseRecord, DeploymentRecord, ActivationEvent
+
+TOKEN_VERSION = 1
+
+
+class TimelineSource:
+    """One history table read newest-first with keyset pagination on (timestamp, id)"""
+
+    def __init__(self, name: str, model: Any, id_column: Any, ts_column: Any, to_entry: Callable[[Any], Dict[str, Any]]):
+        self.name = name
+        self.model = model
+        self.id_column = id_column
+        self.ts_column = ts_column
+        self.to_entry = to_entry
+
+    def scope_filter(self, license_ids: List[str], customer_id: Optional[int]) -> Any:
+        if self.model is ChangeTracking:
+            clauses = [and_(ChangeTracking.table_name == "licenses", ChangeTracking.record_id.in_(license_ids))] if license_ids else []
+            if customer_id is not None:
+                clauses.append(and_(ChangeTracking.table_name == "customers", ChangeTracking.record_id == str(customer_id)))
+            return or_(*clauses) if clauses else None
+        if not license_ids:
+            return None
+        return self.model.license_id.in_(license_ids)
+
+    def rows(self, db: Session, scope: Any, after: Optional[List[Any]], page_size: int) -> Iterator[Dict[str, Any]]:
+        """Yield timeline entries older than the `after` position, newest first, reading page_size rows per query"""
+        if scope is None:
+            return
+        position = (datetime.fromisoformat(after[0]), after[1]) if after else None
+        while True:
+            query = db.query(self.model).filter(scope, self.ts_column.isnot(None))
+            if position:
+                query = query.filter(or_(
+                    self.ts_column < position[0],
+                    and_(self.ts_column == position[0], self.id_column < position[1])
+                ))
+            rows = query.order_by(self.ts_column.desc(), self.id_column.desc()).limit(page_size).all()
+            for row in rows:
+                entry = self.to_entry(row)
+                entry["Source"] = self.name
+                yield entry
+            if len(rows) < page_size:
+                return
+            last = rows[-1]
+            position = (getattr(last, self.ts_column.key), getattr(last, self.id_column.key))
+
+
+def _change_entry(row: ChangeTracking) -> Dict[str, Any]:
+    return {
+        "SourceID": row.change_id,
+        "Timestamp": row.changed_at,
+        "LicenseID": row.record_id if row.table_name == "licenses" else None,
+        "Summary": f"{row.field_name}: {row.old_value} -> {row.new_value}" if row.old_value or row.new_value else row.field_name,
+        "Details": {
+            "TableName": row.table_name,
+            "FieldName": row.field_name,
+            "OldValue": row.old_value,
+            "NewValue": row.new_value,
+            "ChangedBy": row.changed_by,
+            "ChangeReason": row.change_reason,
+        },
+    }
+
+
+def _purchase_entry(row: PurchaseRecord) -> Dict[str, Any]:
+    return {
+        "SourceID": row.purchase_id,
+        "Timestamp": row.created_at,
+        "LicenseID": row.license_id,
+        "Summary": f"{row.purchase_type} purchase: {row.amount} {row.currency}",
+        "Details": {
+            "PurchaseType": row.purchase_type,
+            "PurchaseDate": row.purchase_date,
+            "OrderNumber": row.order_number,
+            "Amount": row.amount,
+            "Currency": row.currency,
+            "PaymentStatus": row.payment_status,
+            "PreviousExpiryDate": row.previous_expiry_date,
+            "NewExpiryDate": row.new_expiry_date,
+        },
+    }
+
+
+def _deployment_entry(row: DeploymentRecord) -> Dict[str, Any]:
+    return {
+        "SourceID": row.deployment_id,
+        "Timestamp": row.created_at,
+        "LicenseID": row.license_id,
+        "Summary": f"{row.deployment_type} deployment: {row.deployment_status}",
+        "Details": {
+            "DeploymentType": row.deployment_type,
+            "DeploymentDate": row.deployment_date,
+            "DeployedBy": row.deployed_by,
+            "DeploymentStatus": row.deployment_status,
+            "CompletionDate": row.completion_date,
+        },
+    }
+
+
+def _activation_entry(row: ActivationEvent) -> Dict[str, Any]:
+    return {
+        "SourceID": row.event_id,
+        "Timestamp": row.created_at,
+        "LicenseID": row.license_id,
+        "Summary": f"Activation mode: {row.from_mode} -> {row.to_mode}",
+        "Details": {
+            "FromMode": row.from_mode,
+            "ToMode": row.to_mode,
+            "ClusterID": row.cluster_id,
+            "ChangedBy": row.changed_by,
+        },
+    }
+
+
+# Every source is backed by a (scope, timestamp) index: change_tracking (table_name, record_id, changed_at),
+# purchase_records / deployment_records / activation_events (license_id, created_at)
+TIMELINE_SOURCES = {
+    "changes": TimelineSource("changes", ChangeTracking, ChangeTracking.change_id, ChangeTracking.changed_at, _change_entry),
+    "purchases": TimelineSource("purchases", PurchaseRecord, PurchaseRecord.purchase_id, PurchaseRecord.created_at, _purchase_entry),
+    "deployments": TimelineSource("deployments", DeploymentRecord, DeploymentRecord.deployment_id, DeploymentRecord.created_at, _deployment_entry),
+    "activations": TimelineSource("activations", ActivationEvent, ActivationEvent.event_id, ActivationEvent.created_at, _activation_entry),
+}
+
+
+class TimelineService:
+    """Chronological history of a license or customer merged from all history tables"""
+
+    @staticmethod
+    def encode_cursor(positions: Dict[str, List[Any]]) -> str:
+        payload = json.dumps({"v": TOKEN_VERSION, "p": positions}, separators=(",", ":"), default=str)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, List[Any]]:
+        """Decode a timeline cursor, raising ValueError if it is malformed"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if payload.get("v") != TOKEN_VERSION:
+                raise ValueError("unsupported cursor version")
+            positions = {}
+            for source, position in payload["p"].items():
+                if source in TIMELINE_SOURCES:
+                    datetime.fromisoformat(position[0])
+                    positions[source] = [position[0], int(position[1])]
+            return positions
+        except (ValueError, KeyError, TypeError, IndexError, AttributeError, UnicodeError) as e:
+            raise ValueError(f"Invalid timeline cursor: {e}")
+
+    @staticmethod
+    def get_timeline(
+        db: Session,
+        license_id: Optional[str] = None,
+        customer_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        sources: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of a license's or customer's timeline, newest first.
+
+        Each source is an indexed newest-first keyset scan; heapq.merge does a k-way merge over
+        them. A page takes at most `limit` + 1 entries (the extra one tells whether there is a
+        next page), so each source is read with one query of that size. The cursor records, per
+        source, the position of the last entry returned, so the next page resumes every scan
+        independently.
+        """
+        if customer_id is not None:
+            license_ids = [row.license_id for row in db.query(License.license_id).filter(License.customer_id == customer_id)]
+        else:
+            license_ids = [license_id]
+
+        positions = TimelineService.decode_cursor(cursor) if cursor else {}
+        selected = [TIMELINE_SOURCES[name] for name in (sources or TIMELINE_SOURCES)]
+
+        streams = [
+            source.rows(db, source.scope_filter(license_ids, customer_id), positions.get(source.name), limit + 1)
+            for source in selected
+        ]
+        merged = heapq.merge(
+            *streams,
+            key=lambda entry: (entry["Timestamp"], entry["Source"], entry["SourceID"]),
+            reverse=True
+        )
+
+        items = []
+        for entry in merged:
+            if len(items) == limit:
+                return {"Items": items, "NextCursor": TimelineService.encode_cursor(positions)}
+            items.append(entry)
+            positions[entry["Source"]] = [entry["Timestamp"].isoformat(), entry["SourceID"]]
+
+        return {"Items": items, "NextCursor": None}
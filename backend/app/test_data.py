@@ -13,6 +13,9 @@ from app.models.models import (
     Customer, SalesRep, Reseller, License, PurchaseRecord,
     FactoryEngineer, DeploymentRecord, DeploymentEngineer, ChangeTracking
 )
+from app.services.sales_performance_service import SalesPerformanceService
+from app.services.fx_service import FxService
+from app.services.customer_match_service import CustomerMatchService
 
 # 初始化 Faker，使用中文配置
 fake = Faker('zh_CN')
@@ -481,6 +484,8 @@ def main():
         
         # 创建基础数据
         customers = create_customers(db, 20)
+        # 客户直接写入，查重分块键整体重建
+        CustomerMatchService.rebuild_index(db)
         sales_reps = create_sales_reps(db, 10)
         resellers = create_resellers(db, 5)
         engineers = create_engineers(db, 8)
@@ -490,6 +495,9 @@ def main():
         
         # 创建关联记录
         create_purchase_records(db, licenses, 50)
+        # 购买记录直接写入，按现有汇率折算本位币金额后整体重建业绩日汇总表
+        FxService.recompute(db)
+        SalesPerformanceService.rebuild(db)
         create_deployment_records(db, licenses, engineers, 40)
         create_change_tracking(db, 30)
         
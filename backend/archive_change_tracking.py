@@ -0,0 +1,40 @@
+"""
+变更记录归档脚本
+将超过保留期（默认CHANGE_TRACKING_RETENTION_MONTHS个月）的change_tracking记录按月导出为gzip压缩的JSON Lines文件
+（CHANGE_TRACKING_ARCHIVE_DIR目录），再从在线表中删除；归档后的记录仍可通过 GET /change-history 查询。
+建议每月通过定时任务执行一次
+
+用法:
+    python archive_change_tracking.py [--retention-months 12] [--dry-run]
+"""
+import argparse
+from app.db.database import SessionLocal
+from app.services.change_tracking_service import ChangeTrackingService
+
+def archive(retention_months=None, dry_run=False):
+    db = SessionLocal()
+
+    try:
+        cutoff = ChangeTrackingService.retention_cutoff(retention_months)
+        print(f"归档{cutoff.isoformat()}之前的变更记录")
+
+        archived = ChangeTrackingService.archive_expired(db, retention_months=retention_months, dry_run=dry_run)
+        for month, count in archived:
+            action = "待归档" if dry_run else "已归档"
+            print(f"{month.strftime('%Y-%m')}: {action}{count}条 -> {ChangeTrackingService.archive_path(month)}")
+
+        total = sum(count for _, count in archived)
+        print(f"归档完成，共{total}条" if not dry_run else f"共{total}条待归档")
+
+    except Exception as e:
+        print(f"归档过程中发生错误: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="归档超过保留期的change_tracking记录")
+    parser.add_argument("--retention-months", type=int, default=None, help="在线表保留的月数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待归档的记录数")
+    args = parser.parse_args()
+    archive(retention_months=args.retention_months, dry_run=args.dry_run)
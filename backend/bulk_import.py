@@ -0,0 +1,44 @@
+"""
+批量导入脚本
+从BULK_IMPORT_DIR目录下的CSV/XLSX文件批量导入客户、许可证或购买记录，每BULK_IMPORT_BATCH_SIZE行提交一次；
+已存在的数据会跳过，中断后可直接重新执行。校验失败和跳过的行写入BULK_IMPORT_DIR/reports下的错误报告
+
+用法:
+    python bulk_import.py customers|licenses|purchases <路径> [--dry-run] [--encoding gbk]
+                          [--mapping 文件列名=字段名 ...]
+"""
+import argparse
+from app.db.database import SessionLocal
+from app.models.partner_models import Partner  # noqa: F401  关联的模型需先注册
+from app.models.partner_identity_models import PartnerIdentity  # noqa: F401
+from app.services.bulk_import_service import BulkImportService, IMPORTERS
+
+def bulk_import(args):
+    db = SessionLocal()
+
+    try:
+        mapping = dict(item.split("=", 1) for item in args.mapping or [])
+        result = BulkImportService.run(
+            db, args.entity, args.path, column_mapping=mapping, dry_run=args.dry_run, encoding=args.encoding
+        )
+        prefix = "试运行（未写入）" if args.dry_run else "导入完成"
+        print(f"{prefix}: 读取{result['RowsRead']}行，导入{result['Inserted']}，跳过{result['Skipped']}，失败{result['Failed']}，用时{result['Seconds']}秒")
+        if result["IgnoredColumns"]:
+            print(f"未识别的列: {', '.join(result['IgnoredColumns'])}")
+        if result["ReportPath"]:
+            print(f"错误报告: {result['ReportPath']}")
+
+    except Exception as e:
+        db.rollback()
+        print(f"导入过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从CSV/XLSX文件批量导入客户、许可证或购买记录")
+    parser.add_argument("entity", choices=list(IMPORTERS), help="导入的数据类型")
+    parser.add_argument("path", help="BULK_IMPORT_DIR下的CSV/XLSX文件")
+    parser.add_argument("--dry-run", action="store_true", help="只校验和解析引用，不写入")
+    parser.add_argument("--encoding", help="CSV文件编码，默认utf-8-sig")
+    parser.add_argument("--mapping", nargs="*", metavar="列名=字段名", help="文件列名到字段名的映射，补充内置别名")
+    bulk_import(parser.parse_args())
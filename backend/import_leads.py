@@ -0,0 +1,67 @@
+"""
+商机导入脚本
+从LEAD_IMPORT_DIR目录下的mbox文件、.eml文件目录或CSV/XLSX文件流式导入商机，每LEAD_IMPORT_CHUNK_SIZE条提交一次并记录断点；
+中断后用 --resume 从最后提交的断点继续，不会重复导入
+
+用法:
+    python import_leads.py <路径> [--source-type MBOX|EML|CSV|XLSX] [--status-id N] [--source-id N]
+                           [--sales-rep-id N] [--currency USD] [--encoding gbk]
+    python import_leads.py --resume <任务ID> [--force]
+"""
+import argparse
+from app.db.database import SessionLocal
+from app.models.models import SalesRep  # noqa: F401  商机关联的模型需先注册
+from app.models.partner_models import Partner  # noqa: F401
+from app.models.partner_identity_models import PartnerIdentity  # noqa: F401
+from app.services.lead_import_service import LeadImportService
+
+def print_progress(job):
+    progress = LeadImportService.describe(job)["progress"]
+    percent = f" ({progress:.1%})" if progress is not None else ""
+    print(f"已读取{job.processed_count}{percent}，导入{job.inserted_count}，重复{job.duplicate_count}，跳过{job.skipped_count}，解析错误{job.error_count or 0}")
+
+def import_leads(args):
+    db = SessionLocal()
+
+    try:
+        if args.resume:
+            job_id = args.resume
+        else:
+            job = LeadImportService.create_job(
+                db, args.path, source_type=args.source_type, status_id=args.status_id, source_id=args.source_id,
+                sales_rep_id=args.sales_rep_id, currency=args.currency, encoding=args.encoding, created_by="import_leads.py"
+            )
+            job_id = job.job_id
+            print(f"创建导入任务{job_id}: {job.source_type} {job.source_path}")
+
+        job = LeadImportService.run(db, job_id, force=args.force, on_chunk=print_progress)
+        if job.status == "FAILED":
+            print(f"导入失败: {job.last_error}")
+            print(f"修正后可执行 python import_leads.py --resume {job_id} 从断点继续")
+        else:
+            print_progress(job)
+            for item_error in job.item_errors or []:
+                print(f"无法解析 {item_error['position']}: {item_error['error']}")
+            print("导入完成")
+
+    except Exception as e:
+        db.rollback()
+        print(f"导入过程中发生错误: {getattr(e, 'detail', e)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从邮件归档或表格文件导入商机")
+    parser.add_argument("path", nargs="?", help="LEAD_IMPORT_DIR下的导入来源")
+    parser.add_argument("--resume", type=int, help="从断点继续的导入任务ID")
+    parser.add_argument("--force", action="store_true", help="接管状态为RUNNING的任务（原进程已终止时）")
+    parser.add_argument("--source-type", choices=["MBOX", "EML", "CSV", "XLSX"], help="默认按路径判断")
+    parser.add_argument("--status-id", type=int, help="导入商机的状态，默认第一个启用的状态")
+    parser.add_argument("--source-id", type=int, help="导入商机的来源")
+    parser.add_argument("--sales-rep-id", type=int, help="无法识别销售代表时使用")
+    parser.add_argument("--currency", help="来源未给出币种时使用")
+    parser.add_argument("--encoding", help="CSV文件编码，默认utf-8-sig")
+    args = parser.parse_args()
+    if not args.path and not args.resume:
+        parser.error("需要导入来源路径或 --resume")
+    import_leads(args)
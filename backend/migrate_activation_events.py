@@ -0,0 +1,84 @@
+"""
+激活历史迁移脚本
+创建只追加的activation_events表，将licenses.activation_history中的JSON历史记录回填为事件行，
+回填后清空该JSON列，使许可证行不再随变更次数增长（已清空的行不会重复回填，脚本可重复执行）
+"""
+import json
+from datetime import datetime
+from sqlalchemy import inspect, null
+from app.db.database import engine, SessionLocal, Base
+from app.models.models import License, ActivationEvent
+from app.services.activation_event_service import ActivationEventService
+
+BATCH_SIZE = 500
+
+def _parse_changes(history):
+    """解析旧的 {"changes": [...]} 结构，部分驱动返回的是JSON字符串"""
+    if isinstance(history, str):
+        try:
+            history = json.loads(history)
+        except ValueError:
+            return []
+    if not isinstance(history, dict):
+        return []
+    return [change for change in history.get("changes") or [] if isinstance(change, dict) and change.get("to_mode")]
+
+def _parse_timestamp(value, fallback):
+    try:
+        return datetime.fromisoformat(value) if value else fallback
+    except (ValueError, TypeError):
+        return fallback
+
+def migrate_data():
+    db = SessionLocal()
+    inspector = inspect(engine)
+
+    try:
+        if not inspector.has_table(ActivationEvent.__tablename__):
+            print("创建activation_events表")
+            Base.metadata.create_all(bind=engine, tables=[ActivationEvent.__table__])
+
+        migrated_licenses = migrated_events = 0
+        last_license_id = ""
+        while True:
+            # 按主键分页，只读取需要的列
+            rows = db.query(License.license_id, License.activation_history, License.last_activation_change)\
+                .filter(License.activation_history.isnot(None), License.license_id > last_license_id)\
+                .order_by(License.license_id.asc())\
+                .limit(BATCH_SIZE)\
+                .all()
+            if not rows:
+                break
+            last_license_id = rows[-1].license_id
+
+            events = []
+            for row in rows:
+                fallback = row.last_activation_change or datetime.now()
+                for change in _parse_changes(row.activation_history):
+                    events.append({
+                        "license_id": row.license_id,
+                        "from_mode": change.get("from_mode"),
+                        "to_mode": change["to_mode"],
+                        "cluster_id": change.get("cluster_id"),
+                        "created_at": _parse_timestamp(change.get("timestamp"), fallback)
+                    })
+
+            migrated_events += ActivationEventService.record_many(db, events)
+            db.query(License)\
+                .filter(License.license_id.in_([row.license_id for row in rows]))\
+                .update({License.activation_history: null()}, synchronize_session=False)
+            db.commit()
+
+            migrated_licenses += len(rows)
+            print(f"已迁移{migrated_licenses}个许可证，{migrated_events}条变更记录")
+
+        print(f"数据迁移完成：{migrated_licenses}个许可证，{migrated_events}条变更记录")
+
+    except Exception as e:
+        print(f"迁移过程中发生错误: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
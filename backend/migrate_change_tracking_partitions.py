@@ -0,0 +1,77 @@
+"""
+变更记录分区迁移脚本
+为change_tracking添加(table_name, record_id, changed_at)与changed_at索引；
+MySQL上将主键改为(change_id, changed_at)并按changed_at月度范围分区，过期月份由 archive_change_tracking.py 导出后直接删除分区。
+SQLite不支持分区，归档任务改为按changed_at索引分批删除
+"""
+from datetime import date
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+from app.db.database import engine, SessionLocal, Base
+from app.models.models import ChangeTracking
+from app.services.change_tracking_service import (
+    ChangeTrackingService, month_start, add_months, PARTITION_MAXVALUE
+)
+
+MONTHS_AHEAD = 3  # 预先创建的未来月份分区数
+
+def migrate_data():
+    db = SessionLocal()
+    inspector = inspect(engine)
+
+    try:
+        if not inspector.has_table(ChangeTracking.__tablename__):
+            print("创建change_tracking表")
+            Base.metadata.create_all(bind=engine, tables=[ChangeTracking.__table__])
+            inspector = inspect(engine)
+
+        # 添加索引
+        existing = [index["name"] for index in inspector.get_indexes(ChangeTracking.__tablename__)]
+        for index in ChangeTracking.__table__.indexes:
+            if index.name not in existing:
+                print(f"为change_tracking添加索引{index.name}")
+                index.create(bind=engine)
+
+        if engine.dialect.name != "mysql":
+            print(f"{engine.dialect.name}不支持表分区，归档任务将按changed_at分批删除")
+            print("数据迁移完成")
+            return
+
+        if ChangeTrackingService.is_partitioned(engine):
+            created = ChangeTrackingService.ensure_future_partitions(engine, MONTHS_AHEAD)
+            print(f"change_tracking已分区，新增分区: {created or '无'}")
+            print("数据迁移完成")
+            return
+
+        with engine.begin() as conn:
+            # 分区键必须包含在主键中且不能为空
+            updated = conn.execute(text("UPDATE change_tracking SET changed_at = CURRENT_TIMESTAMP WHERE changed_at IS NULL")).rowcount
+            if updated:
+                print(f"回填为空的changed_at: {updated}条")
+            conn.execute(text("ALTER TABLE change_tracking MODIFY changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP"))
+            conn.execute(text("ALTER TABLE change_tracking DROP PRIMARY KEY, ADD PRIMARY KEY (change_id, changed_at)"))
+
+            oldest = conn.execute(text("SELECT MIN(changed_at) FROM change_tracking")).scalar()
+            month = month_start(oldest.date() if oldest else date.today())
+            last = add_months(month_start(date.today()), MONTHS_AHEAD)
+            clauses = []
+            while month <= last:
+                clauses.append(ChangeTrackingService._partition_clause(month))
+                month = add_months(month, 1)
+            clauses.append(f"PARTITION {PARTITION_MAXVALUE} VALUES LESS THAN MAXVALUE")
+
+            print(f"按月分区change_tracking: {len(clauses)}个分区")
+            conn.execute(text(
+                f"ALTER TABLE change_tracking PARTITION BY RANGE (TO_DAYS(changed_at)) ({', '.join(clauses)})"
+            ))
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        print(f"迁移过程中发生错误: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
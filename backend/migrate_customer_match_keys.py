@@ -0,0 +1,37 @@
+"""
+客户查重迁移脚本
+创建customer_match_keys表，并由customers表重建全部分块键
+（之后由客户写入路径增量维护）
+"""
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models.models import CustomerMatchKey
+from app.models.partner_models import Order  # noqa: F401  合并客户时需改写的关联表
+from app.models.partner_identity_models import PartnerIdentity  # noqa: F401
+from app.services.customer_match_service import CustomerMatchService
+
+def migrate_data():
+    inspector = inspect(engine)
+    db = SessionLocal()
+
+    try:
+        if not inspector.has_table(CustomerMatchKey.__tablename__):
+            print(f"创建表{CustomerMatchKey.__tablename__}")
+            CustomerMatchKey.__table__.create(bind=engine)
+
+        keys = CustomerMatchService.rebuild_index(db)
+        print(f"重建客户查重分块键，共{keys}条")
+
+        result = CustomerMatchService.find_duplicates(db)
+        print(f"扫描{result['CustomersScanned']}个客户，发现{result['TotalGroups']}组疑似重复客户（可通过/customers/duplicates/scan查看并合并）")
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
@@ -0,0 +1,89 @@
+"""
+多币种金额折算迁移脚本
+创建fx_rates汇率表，为purchase_records/purchase_orders/leads添加本位币金额列、
+为sales_performance_daily添加revenue_base列，并按现有汇率回填全部本位币金额
+（之后由写入路径在写入时折算，汇率更新时由FxService重算受影响的行）
+
+用法: python migrate_fx_amounts.py [汇率CSV文件]
+CSV列: currency,rate_date,rate[,source]，rate为1单位该币种折合的本位币金额
+"""
+import csv
+import sys
+from datetime import date
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+from app.core.config import settings
+from app.db.database import engine, SessionLocal
+from app.models.models import FxRate, PurchaseRecord
+from app.models.partner_models import Partner  # noqa: F401  商机关联的模型需先注册
+from app.models.partner_identity_models import PartnerIdentity  # noqa: F401
+from app.schemas import schemas
+from app.services.fx_service import FxService
+
+# (表名, 列名, 列定义)
+NEW_COLUMNS = [
+    ("purchase_records", "amount_base", "FLOAT"),
+    ("purchase_orders", "amount_base", "FLOAT"),
+    ("leads", "estimated_value_base", "FLOAT"),
+    ("sales_performance_daily", "revenue_base", "FLOAT NOT NULL DEFAULT 0"),
+]
+
+def load_rates(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            schemas.FxRateCreate(
+                Currency=row["currency"].strip().upper(),
+                RateDate=date.fromisoformat(row["rate_date"].strip()),
+                Rate=float(row["rate"]),
+                Source=(row.get("source") or "").strip() or None
+            )
+            for row in csv.DictReader(f)
+        ]
+
+def migrate_data():
+    inspector = inspect(engine)
+    db = SessionLocal()
+
+    try:
+        if not inspector.has_table(FxRate.__tablename__):
+            print(f"创建表{FxRate.__tablename__}")
+            FxRate.__table__.create(bind=engine)
+
+        for table, column, definition in NEW_COLUMNS:
+            if column not in [c["name"] for c in inspector.get_columns(table)]:
+                print(f"为{table}添加{column}字段")
+                with engine.connect() as conn:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                    conn.commit()
+
+        existing = [index["name"] for index in inspector.get_indexes(PurchaseRecord.__tablename__)]
+        for index in PurchaseRecord.__table__.indexes:
+            if index.name not in existing:
+                print(f"为{PurchaseRecord.__tablename__}添加索引{index.name}")
+                index.create(bind=engine)
+
+        if len(sys.argv) > 1:
+            result = FxService.upsert_rates(db, load_rates(sys.argv[1]))
+            print(f"导入汇率：新增{result['Inserted']}条，更新{result['Updated']}条")
+
+        # 全量回填（业绩日汇总与商机漏斗汇总按折算前后的差额同步更新）
+        updated = FxService.recompute(db)
+        db.commit()
+        for table, count in updated.items():
+            print(f"{table}: 折算{count}行")
+
+        status = FxService.get_status(db)
+        for table, counts in status["Unconverted"].items():
+            for currency, count in counts.items():
+                print(f"警告: {table}中有{count}行{currency}金额缺少汇率，本位币金额为空")
+
+        print(f"数据迁移完成（本位币: {settings.BASE_CURRENCY}）")
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
@@ -0,0 +1,24 @@
+"""
+幂等键迁移脚本
+创建idempotency_keys表，保存携带Idempotency-Key的合作商写请求的响应（见app/api/idempotency.py）
+"""
+from sqlalchemy import inspect
+from app.db.database import engine, Base
+from app.models.models import IdempotencyKey
+
+def migrate_data():
+    inspector = inspect(engine)
+
+    try:
+        if inspector.has_table(IdempotencyKey.__tablename__):
+            print("idempotency_keys表已存在，跳过")
+        else:
+            print("创建idempotency_keys表")
+            Base.metadata.create_all(bind=engine, tables=[IdempotencyKey.__table__])
+        print("数据迁移完成")
+
+    except Exception as e:
+        print(f"迁移过程中发生错误: {e}")
+
+if __name__ == "__main__":
+    migrate_data()
@@ -0,0 +1,41 @@
+"""
+商机漏斗分析迁移脚本
+创建lead_status_transitions、lead_funnel_stats、lead_stage_durations表，
+为已有商机补一条创建流转记录（历史流转无从得知，以当前状态计），并重建全部聚合
+"""
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models.models import SalesRep  # noqa: F401  商机关联的模型需先注册
+from app.models.partner_models import Partner  # noqa: F401
+from app.models.partner_identity_models import PartnerIdentity  # noqa: F401
+from app.models.lead_models import LeadStatusTransition, LeadFunnelStat, LeadStageDuration
+from app.services.lead_analytics_service import LeadAnalyticsService
+
+ANALYTICS_MODELS = [LeadStatusTransition, LeadFunnelStat, LeadStageDuration]
+
+def migrate_data():
+    inspector = inspect(engine)
+    db = SessionLocal()
+
+    try:
+        for model in ANALYTICS_MODELS:
+            if not inspector.has_table(model.__tablename__):
+                print(f"创建表{model.__tablename__}")
+                model.__table__.create(bind=engine)
+
+        backfilled = LeadAnalyticsService.backfill_transitions(db)
+        print(f"为{backfilled}个商机补充了创建流转记录")
+
+        rows = LeadAnalyticsService.rebuild(db)
+        print(f"重建漏斗聚合，共{rows}行")
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
@@ -0,0 +1,47 @@
+"""
+商机导入迁移脚本
+创建lead_import_jobs表（已有的表添加error_count、item_errors解析错误字段），
+并为leads添加导入去重使用的contact_email、company_name索引
+"""
+from sqlalchemy import inspect, text
+from app.db.database import engine
+from app.models.models import SalesRep  # noqa: F401  商机关联的模型需先注册
+from app.models.partner_models import Partner  # noqa: F401
+from app.models.partner_identity_models import PartnerIdentity  # noqa: F401
+from app.models.lead_models import Lead, LeadImportJob
+
+IMPORT_INDEXES = ("ix_leads_contact_email", "ix_leads_company_name")
+ERROR_COLUMNS = {
+    "error_count": "INTEGER NOT NULL DEFAULT 0",
+    "item_errors": "JSON",
+}
+
+def migrate_data():
+    inspector = inspect(engine)
+
+    try:
+        if not inspector.has_table(LeadImportJob.__tablename__):
+            print(f"创建表{LeadImportJob.__tablename__}")
+            LeadImportJob.__table__.create(bind=engine)
+        else:
+            columns = [column["name"] for column in inspector.get_columns(LeadImportJob.__tablename__)]
+            for name, definition in ERROR_COLUMNS.items():
+                if name not in columns:
+                    print(f"为{LeadImportJob.__tablename__}添加字段{name}")
+                    with engine.connect() as conn:
+                        conn.execute(text(f"ALTER TABLE {LeadImportJob.__tablename__} ADD COLUMN {name} {definition}"))
+                        conn.commit()
+
+        existing = [index["name"] for index in inspector.get_indexes(Lead.__tablename__)]
+        for index in Lead.__table__.indexes:
+            if index.name in IMPORT_INDEXES and index.name not in existing:
+                print(f"为{Lead.__tablename__}添加索引{index.name}")
+                index.create(bind=engine)
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        print(f"迁移过程中发生错误: {e}")
+
+if __name__ == "__main__":
+    migrate_data()
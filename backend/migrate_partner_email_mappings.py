@@ -0,0 +1,55 @@
+"""
+合作商邮箱映射规范化迁移脚本
+将partner_email_mappings中的历史规则按normalize_pattern规范化（小写、去除首尾空白和末尾的点），
+使按邮箱查询映射（get_email_mapping_by_email）能匹配大小写不同的旧数据
+（新建映射在写入时已规范化）
+"""
+from collections import defaultdict
+from app.db.database import SessionLocal
+from app.models.partner_identity_models import PartnerEmailMapping
+from app.services.partner_identity_service import normalize_pattern
+from app.services.table_version_service import TableVersionService
+
+def normalized(email_address):
+    try:
+        return normalize_pattern(email_address)
+    except ValueError:
+        # 格式不符合规则的旧数据只做小写处理
+        return email_address.strip().lower()
+
+def migrate_data():
+    db = SessionLocal()
+
+    try:
+        groups = defaultdict(list)
+        for mapping in db.query(PartnerEmailMapping).order_by(PartnerEmailMapping.mapping_id):
+            groups[normalized(mapping.email_address)].append(mapping)
+
+        updated = 0
+        conflicts = []
+        for email_address, mappings in groups.items():
+            # 规范化后相同的多条规则只保留一条：优先已是规范形式的，否则最早创建的
+            keep = next((m for m in mappings if m.email_address == email_address), mappings[0])
+            conflicts.extend((email_address, m) for m in mappings if m is not keep)
+            if keep.email_address != email_address:
+                keep.email_address = email_address
+                updated += 1
+
+        if updated:
+            TableVersionService.bump(db, "partner_email_mappings")
+        db.commit()
+        print(f"规范化邮箱映射{updated}条")
+
+        for email_address, mapping in conflicts:
+            print(f"映射ID {mapping.mapping_id}（{mapping.email_address}，身份ID {mapping.identity_id}）与'{email_address}'重复，未修改，请手动合并或删除")
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
@@ -0,0 +1,53 @@
+"""
+合作伙伴订单关联迁移脚本
+创建partner_orders关联表，为orders添加(status, created_at)与created_at索引，
+并把此前以备注形式记录的关联（"Associated with partner ID: N"）写入关联表
+"""
+import re
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models.partner_models import Partner, Order, PartnerOrder
+from app.services.table_version_service import TableVersionService
+
+# 旧版associate_with_partner写入订单备注的关联记录
+NOTE_PATTERN = re.compile(r"Associated with partner ID: (\d+)")
+
+def migrate_data():
+    inspector = inspect(engine)
+    db = SessionLocal()
+
+    try:
+        if not inspector.has_table(PartnerOrder.__tablename__):
+            print(f"创建表{PartnerOrder.__tablename__}")
+            PartnerOrder.__table__.create(bind=engine)
+
+        existing = [index["name"] for index in inspector.get_indexes(Order.__tablename__)]
+        for index in Order.__table__.indexes:
+            if index.name not in existing:
+                print(f"为{Order.__tablename__}添加索引{index.name}")
+                index.create(bind=engine)
+
+        partner_ids = {partner_id for (partner_id,) in db.query(Partner.partner_id)}
+        linked = set(db.query(PartnerOrder.partner_id, PartnerOrder.order_id))
+        added = 0
+        for order_id, notes in db.query(Order.order_id, Order.notes).filter(Order.notes.like("%Associated with partner ID:%")):
+            for match in NOTE_PATTERN.finditer(notes):
+                key = (int(match.group(1)), order_id)
+                if key[0] in partner_ids and key not in linked:
+                    db.add(PartnerOrder(partner_id=key[0], order_id=order_id))
+                    linked.add(key)
+                    added += 1
+        TableVersionService.bump(db, "orders", "partner_orders")
+        db.commit()
+        print(f"由订单备注补充了{added}条合作伙伴关联")
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
@@ -0,0 +1,32 @@
+"""
+销售业绩日汇总迁移脚本
+创建sales_performance_daily表，并由purchase_records重建全部汇总行
+（之后由购买记录写入路径增量维护）
+"""
+from sqlalchemy import inspect
+from app.db.database import engine, SessionLocal
+from app.models.models import SalesPerformanceDaily
+from app.services.sales_performance_service import SalesPerformanceService
+
+def migrate_data():
+    inspector = inspect(engine)
+    db = SessionLocal()
+
+    try:
+        if not inspector.has_table(SalesPerformanceDaily.__tablename__):
+            print(f"创建表{SalesPerformanceDaily.__tablename__}")
+            SalesPerformanceDaily.__table__.create(bind=engine)
+
+        rows = SalesPerformanceService.rebuild(db)
+        print(f"重建业绩日汇总，共{rows}行")
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移过程中发生错误: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
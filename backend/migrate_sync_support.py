@@ -0,0 +1,57 @@
+"""
+增量同步支持迁移脚本
+为licenses/customers/purchase_orders/leads的updated_at添加索引，创建sync_tombstones表，
+并回填为空的updated_at（为空的记录不会出现在 GET /sync 的结果中）
+"""
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+from app.db.database import engine, SessionLocal, Base
+from app.models.models import License, Customer, SyncTombstone
+from app.models.order_models import PurchaseOrder
+from app.models.lead_models import Lead
+
+SYNC_MODELS = [License, Customer, PurchaseOrder, Lead]
+
+def migrate_data():
+    db = SessionLocal()
+    inspector = inspect(engine)
+
+    try:
+        # 创建墓碑表
+        if not inspector.has_table(SyncTombstone.__tablename__):
+            print("创建sync_tombstones表")
+            Base.metadata.create_all(bind=engine, tables=[SyncTombstone.__table__])
+
+        for model in SYNC_MODELS:
+            table_name = model.__tablename__
+            if not inspector.has_table(table_name):
+                print(f"表{table_name}不存在，跳过")
+                continue
+
+            # 添加updated_at索引
+            for index in model.__table__.indexes:
+                if [c.name for c in index.columns] == ["updated_at"]:
+                    existing = [i["name"] for i in inspector.get_indexes(table_name)]
+                    if index.name not in existing:
+                        print(f"为{table_name}.updated_at添加索引")
+                        index.create(bind=engine)
+
+            # 回填为空的updated_at
+            with engine.connect() as conn:
+                result = conn.execute(text(
+                    f"UPDATE {table_name} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL"
+                ))
+                conn.commit()
+                if result.rowcount:
+                    print(f"回填{table_name}.updated_at: {result.rowcount}条")
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        print(f"迁移过程中发生错误: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_data()
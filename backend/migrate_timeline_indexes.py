@@ -0,0 +1,34 @@
+"""
+时间线索引迁移脚本
+为purchase_records、deployment_records添加(license_id, created_at)索引，
+供许可证/客户时间线按时间倒序分页读取（change_tracking与activation_events的索引见各自的迁移脚本）
+"""
+from sqlalchemy import inspect
+from app.db.database import engine
+from app.models.models import PurchaseRecord, DeploymentRecord
+
+TIMELINE_MODELS = [PurchaseRecord, DeploymentRecord]
+
+def migrate_data():
+    inspector = inspect(engine)
+
+    try:
+        for model in TIMELINE_MODELS:
+            table_name = model.__tablename__
+            if not inspector.has_table(table_name):
+                print(f"表{table_name}不存在，跳过")
+                continue
+
+            existing = [index["name"] for index in inspector.get_indexes(table_name)]
+            for index in model.__table__.indexes:
+                if index.name not in existing:
+                    print(f"为{table_name}添加索引{index.name}")
+                    index.create(bind=engine)
+
+        print("数据迁移完成")
+
+    except Exception as e:
+        print(f"迁移过程中发生错误: {e}")
+
+if __name__ == "__main__":
+    migrate_data()
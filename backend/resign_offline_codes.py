@@ -0,0 +1,104 @@
+"""
+离线激活码批量重新签发脚本
+密钥轮换（设置新的LICENSE_ACTIVE_KEY_ID）后，用当前签名密钥为离线模式许可证重新签发激活码，集群ID保持不变；
+全部完成后再通过LICENSE_RETIRED_KEY_IDS下线旧密钥
+
+用法:
+    python resign_offline_codes.py [--all] [--workers 4] [--batch-size 1000] [--dry-run]
+
+默认只处理签名密钥不是当前签名密钥的激活码，--all 则全部重新签发
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app.db.database import SessionLocal
+from app.models.models import License
+from app.core.license_keyring import keyring
+from app.core.license_tools import generate_offline_licenses, offline_code_key_id
+from app.services.table_version_service import TableVersionService
+
+CHUNK_SIZE = 200  # 每个工作进程一次处理的激活码数量
+
+def _license_data(license_obj):
+    return {
+        "license_id": license_obj.license_id,
+        "customer_id": license_obj.customer_id,
+        "product_name": license_obj.product_name,
+        "license_type": license_obj.license_type,
+        "start_date": license_obj.start_date,
+        "expiry_date": license_obj.expiry_date,
+        "authorized_workspaces": license_obj.authorized_workspaces,
+        "authorized_users": license_obj.authorized_users
+    }
+
+def resign_codes(resign_all=False, workers=4, batch_size=1000, dry_run=False):
+    db = SessionLocal()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    scanned = resigned = 0
+    last_license_id = ""
+
+    try:
+        print(f"当前签名密钥编号: {keyring.active_key_id}，可验证密钥: {keyring.key_ids}")
+        while True:
+            # 按主键分页，避免一次加载全部许可证
+            licenses = db.query(License)\
+                .filter(
+                    License.activation_mode == "OFFLINE",
+                    License.cluster_id.isnot(None),
+                    License.license_id > last_license_id
+                )\
+                .order_by(License.license_id.asc())\
+                .limit(batch_size)\
+                .all()
+            if not licenses:
+                break
+            last_license_id = licenses[-1].license_id
+            scanned += len(licenses)
+
+            pending = [
+                license_obj for license_obj in licenses
+                if resign_all or not license_obj.offline_code
+                or offline_code_key_id(license_obj.offline_code) != keyring.active_key_id
+            ]
+            if not pending or dry_run:
+                resigned += len(pending)
+                continue
+
+            # 分块并行签发
+            items = [(_license_data(license_obj), license_obj.cluster_id) for license_obj in pending]
+            chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+            if executor:
+                codes = [code for chunk_codes in executor.map(generate_offline_licenses, chunks) for code in chunk_codes]
+            else:
+                codes = [code for chunk in chunks for code in generate_offline_licenses(chunk)]
+
+            now = datetime.now()
+            for license_obj, code in zip(pending, codes):
+                license_obj.offline_code = code
+                license_obj.updated_at = now
+            TableVersionService.bump(db, "licenses")
+            db.commit()
+
+            resigned += len(pending)
+            print(f"已扫描{scanned}个许可证，重新签发{resigned}个")
+
+        action = "需要重新签发" if dry_run else "重新签发完成"
+        print(f"{action}: {resigned}/{scanned}")
+
+    except Exception as e:
+        print(f"重新签发过程中发生错误: {e}")
+        db.rollback()
+    finally:
+        if executor:
+            executor.shutdown()
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="使用当前签名密钥重新签发离线激活码")
+    parser.add_argument("--all", action="store_true", help="重新签发所有离线激活码，而不仅是旧密钥签发的")
+    parser.add_argument("--workers", type=int, default=4, help="并行签发的进程数")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的许可证数量")
+    parser.add_argument("--dry-run", action="store_true", help="只统计需要重新签发的数量")
+    args = parser.parse_args()
+    resign_codes(resign_all=args.all, workers=args.workers, batch_size=args.batch_size, dry_run=args.dry_run)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+
+# Point the application at a throwaway SQLite database before anything imports app.db.database
+DATABASE_DIR = tempfile.mkdtemp(prefix="dify_db_manage_tests_")
+os.environ["DATABASE_URI"] = "sqlite:///" + os.path.join(DATABASE_DIR, "test.db")
+
+import pytest
+from sqlalchemy import event
+
+from app.db.database import Base, SessionLocal, engine
+import app.models.models  # noqa: F401
+import app.models.lead_models  # noqa: F401
+import app.models.order_models  # noqa: F401
+import app.models.partner_models  # noqa: F401
+import app.models.partner_identity_models  # noqa: F401
+import app.models.user_models  # noqa: F401
+
+
+@event.listens_for(engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # SQLite leaves foreign keys (and their ON DELETE actions) off unless asked, unlike the production databases
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+class StatementRecorder:
+    """SELECT statements sent through the engine, and the number of rows each one returns"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def clear(self):
+        self.statements.clear()
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def rows(self):
+        """Rows returned per recorded SELECT, re-run on a raw DBAPI connection (not recorded again)"""
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            counts = []
+            for statement, parameters in self.statements:
+                cursor.execute(statement, parameters)
+                counts.append(len(cursor.fetchall()))
+            return counts
+        finally:
+            conn.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+    shutil.rmtree(DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def selects():
+    recorder = StatementRecorder()
+    event.listen(engine, "before_cursor_execute", recorder)
+    try:
+        yield recorder
+    finally:
+        event.remove(engine, "before_cursor_execute", recorder)
@@ -0,0 +1,122 @@
+"""
+Bulk import (app/services/bulk_import_service.py) of small CSV files: header aliases, row validation,
+reference resolution, batch insert and the error report, plus dry runs and re-runs skipping rows
+that are already imported.
+"""
+
+import csv
+import os
+from datetime import date
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import Customer, License, SalesRep
+from app.services.bulk_import_service import BulkImportService, BulkImporter
+
+
+@pytest.fixture
+def import_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def write_csv(directory, name, rows):
+    with open(os.path.join(directory, name), "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return name
+
+
+def read_report(result):
+    with open(os.path.join(settings.BULK_IMPORT_DIR, result["ReportPath"]), encoding="utf-8-sig") as f:
+        return [(int(row["row"]), row["status"], row["message"]) for row in csv.DictReader(f)]
+
+
+def customer_names(db, prefix):
+    db.expire_all()
+    return sorted(name for (name,) in db.query(Customer.customer_name).filter(Customer.customer_name.like(f"{prefix}%")))
+
+
+CUSTOMERS = [
+    ["客户名称", "Contact Email", "region", "unused"],
+    ["Import Acme", "ops@acme.example", "APAC", "x"],
+    ["", "nobody@example.com", "EMEA", "x"],            # no name: fails validation
+    ["Import Globex", "not-an-email", "EMEA", "x"],     # bad email: fails validation
+    ["Import Initech", "", "", ""],
+    ["import acme", "", "", ""],                        # same name as data row 1 within the batch
+    ["", "", "", ""],                                   # blank line, not counted
+]
+
+
+def test_customers_are_validated_inserted_and_reported(db, import_dir):
+    path = write_csv(import_dir, "customers.csv", CUSTOMERS)
+    result = BulkImportService.run(db, "customers", path)
+
+    assert (result["RowsRead"], result["Inserted"], result["Failed"], result["Skipped"]) == (5, 2, 2, 1)
+    assert result["IgnoredColumns"] == ["unused"]
+    assert customer_names(db, "Import ") == ["Import Acme", "Import Initech"]
+    acme = db.query(Customer).filter(Customer.customer_name == "Import Acme").one()
+    assert (acme.contact_email, acme.region) == ("ops@acme.example", "APAC")
+
+    report = read_report(result)
+    assert [(row, status) for row, status, _ in report] == [(2, "FAILED"), (3, "FAILED"), (5, "SKIPPED")]
+    assert "CustomerName" in report[0][2] and "ContactEmail" in report[1][2]
+
+
+def test_dry_run_writes_nothing(db, import_dir):
+    rows = [["CustomerName"], ["Dry Run Customer A"], ["Dry Run Customer B"]]
+    result = BulkImportService.run(db, "customers", write_csv(import_dir, "dry.csv", rows), dry_run=True)
+
+    assert (result["DryRun"], result["Inserted"], result["ReportPath"]) == (True, 2, None)
+    assert customer_names(db, "Dry Run ") == []
+
+
+def test_rerun_skips_rows_already_imported(db, import_dir, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_BATCH_SIZE", 2)
+    rows = [["CustomerName"]] + [[f"Rerun Customer {i}"] for i in range(5)]
+    path = write_csv(import_dir, "rerun.csv", rows)
+    BulkImportService.run(db, "customers", write_csv(import_dir, "partial.csv", rows[:3]))
+
+    result = BulkImportService.run(db, "customers", path)
+
+    assert (result["Inserted"], result["Skipped"], result["Failed"]) == (3, 2, 0)
+    assert customer_names(db, "Rerun Customer ") == [f"Rerun Customer {i}" for i in range(5)]
+    assert BulkImportService.run(db, "customers", path)["Skipped"] == 5
+
+
+def test_licenses_resolve_references_by_name_and_email(db, import_dir):
+    customer = Customer(customer_name="Import License Customer")
+    rep = SalesRep(sales_rep_name="Import Rep", email="Import.Rep@example.com")
+    db.add_all([customer, rep])
+    db.commit()
+    rows = [
+        ["许可证号", "客户名称", "销售邮箱", "许可证类型", "开始日期", "到期日期"],
+        ["IMP-LIC-1", "import license customer", "import.rep@example.com", "ENT", "2026/1/1", "2026年12月31日"],
+        ["IMP-LIC-2", "Unknown Customer", "", "ENT", "2026-01-01", "2026-12-31"],
+        ["IMP-LIC-3", "Import License Customer", "nobody@example.com", "ENT", "2026-01-01", "2026-12-31"],
+        ["IMP-LIC-4", "Import License Customer", "", "ENT", "2026-12-31", "2026-01-01"],
+    ]
+    path = write_csv(import_dir, "licenses.csv", rows)
+
+    result = BulkImportService.run(db, "licenses", path)
+
+    assert (result["Inserted"], result["Failed"]) == (1, 3)
+    db.expire_all()
+    license = db.query(License).filter(License.license_id == "IMP-LIC-1").one()
+    assert (license.customer_id, license.sales_rep_id) == (customer.customer_id, rep.sales_rep_id)
+    assert (license.start_date, license.expiry_date) == (date(2026, 1, 1), date(2026, 12, 31))
+    assert [message for _, _, message in read_report(result)] == [
+        "Customer 'Unknown Customer' not found",
+        "Sales rep 'nobody@example.com' not found",
+        "ExpiryDate is before StartDate",
+    ]
+
+    assert BulkImportService.run(db, "licenses", path)["Skipped"] == 1
+
+
+def test_importer_must_implement_resolve_and_insert():
+    class Incomplete(BulkImporter):
+        entity = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
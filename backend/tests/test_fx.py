@@ -0,0 +1,151 @@
+"""
+FX rates (app/services/fx_service.py): the rate lookup, and FxService.upsert_rates recomputing the stored
+base amounts and adjusting the sales performance and lead funnel aggregates by the difference.
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.lead_models import Lead, LeadStatus, LeadFunnelStat
+from app.models.models import Customer, License, PurchaseRecord, SalesPerformanceDaily
+from app.schemas import schemas
+from app.services.fx_service import FxService, rate_on
+from app.services.lead_analytics_service import LeadAnalyticsService
+from app.services.sales_performance_service import SalesPerformanceService
+
+RATES = {"CHF": ([date(2026, 1, 1).toordinal(), date(2026, 2, 1).toordinal()], [8.0, 8.5])}
+
+
+def rates(day, currency="CHF"):
+    return rate_on(RATES, currency, day)
+
+
+def test_rate_in_force_is_the_latest_on_or_before_the_day():
+    assert rates(date(2026, 1, 1)) == 8.0
+    assert rates(date(2026, 1, 31)) == 8.0
+    assert rates(date(2026, 2, 1)) == 8.5
+    assert rates(date(2027, 1, 1)) == 8.5
+
+
+def test_day_before_the_first_rate_uses_the_earliest_rate():
+    assert rates(date(2025, 6, 30)) == 8.0
+
+
+def test_base_currency_is_always_one_and_unknown_currencies_have_no_rate():
+    assert rates(date(2026, 1, 1), settings.BASE_CURRENCY) == 1.0
+    assert rates(date(2026, 1, 1), "XTS") is None
+
+
+def test_base_currency_rate_is_rejected(db):
+    with pytest.raises(ValueError):
+        FxService.upsert_rates(db, [schemas.FxRateCreate(Currency=settings.BASE_CURRENCY, RateDate=date(2026, 1, 1), Rate=2)])
+
+
+def sales_rows(db):
+    db.expire_all()
+    return sorted(
+        (row.dimension, row.dimension_id, row.day, row.product_name, row.currency,
+         row.purchase_count, round(row.revenue, 2), round(row.revenue_base, 2))
+        for row in db.query(SalesPerformanceDaily)
+        if row.purchase_count or round(row.revenue, 2) or round(row.revenue_base, 2)
+    )
+
+
+def funnel_rows(db):
+    db.expire_all()
+    return sorted(
+        (row.dimension, row.dimension_key, row.status_id, row.current_count, round(row.current_value, 2))
+        for row in db.query(LeadFunnelStat)
+    )
+
+
+def make_amounts(db, currency):
+    """Purchases in currency and without a currency (the USD column default) and a lead in currency, none of
+    them converted yet; the aggregates are in sync beforehand"""
+    customer = Customer(customer_name=f"FX Customer {currency}")
+    status = LeadStatus(status_name=f"FX Open {currency}", display_order=100)
+    db.add_all([customer, status])
+    db.flush()
+    license_id = f"ENT-FX-{currency}"
+    db.add(License(
+        license_id=license_id, customer_id=customer.customer_id, product_name="Dify Enterprise", license_type="ENT",
+        order_date=date(2024, 1, 1), start_date=date(2024, 1, 1), expiry_date=date(2027, 1, 1), license_status="ACTIVE"
+    ))
+    db.flush()
+    purchases = [
+        {"license_id": license_id, "purchase_type": "NEW", "purchase_date": date(2024, 6, 1), "amount": 100.0, "currency": currency},
+        {"license_id": license_id, "purchase_type": "RENEWAL", "purchase_date": date(2025, 6, 1), "amount": 100.0, "currency": currency},
+        {"license_id": license_id, "purchase_type": "EXPANSION", "purchase_date": date(2025, 6, 1), "amount": 50.0, "currency": None},
+    ]
+    db.execute(insert(PurchaseRecord), purchases)
+    db.execute(insert(Lead), [
+        {"lead_name": "FX lead", "company_name": "FX", "contact_person": "p", "status_id": status.status_id,
+         "estimated_value": 1000.0, "currency": currency, "created_at": datetime(2025, 6, 1, 9)},
+    ])
+    db.commit()
+    SalesPerformanceService.rebuild(db)
+    LeadAnalyticsService.backfill_transitions(db)
+    LeadAnalyticsService.rebuild(db)
+    return license_id, status.status_id
+
+
+def base_amounts(db, license_id):
+    db.expire_all()
+    return [
+        row.amount_base for row in db.query(PurchaseRecord)
+        .filter(PurchaseRecord.license_id == license_id)
+        .order_by(PurchaseRecord.purchase_date, PurchaseRecord.amount.desc())
+    ]
+
+
+def test_recompute_converts_amounts_and_adjusts_aggregates_by_delta(db):
+    license_id, status_id = make_amounts(db, "SGD")
+
+    result = FxService.upsert_rates(db, [
+        schemas.FxRateCreate(Currency="SGD", RateDate=date(2025, 1, 1), Rate=5.0),
+        schemas.FxRateCreate(Currency="USD", RateDate=date(2019, 1, 1), Rate=7.0),
+    ])
+    assert result["Inserted"] == 2
+    # 2024-06-01 is before the first SGD rate and takes it; the NULL currency purchase is in USD
+    assert base_amounts(db, license_id) == [500.0, 500.0, 350.0]
+    assert [value for (value,) in db.query(Lead.estimated_value_base).filter(Lead.status_id == status_id)] == [5000.0]
+
+    incremental_sales, incremental_funnel = sales_rows(db), funnel_rows(db)
+    SalesPerformanceService.rebuild(db)
+    LeadAnalyticsService.rebuild(db)
+    assert incremental_sales == sales_rows(db)
+    assert incremental_funnel == funnel_rows(db)
+
+
+def test_later_rate_only_recomputes_from_its_day(db):
+    license_id, _ = make_amounts(db, "HKD")
+    FxService.upsert_rates(db, [schemas.FxRateCreate(Currency="HKD", RateDate=date(2025, 1, 1), Rate=5.0)])
+    FxService.upsert_rates(db, [schemas.FxRateCreate(Currency="HKD", RateDate=date(2025, 3, 1), Rate=6.0)])
+
+    assert base_amounts(db, license_id)[:2] == [500.0, 600.0]
+
+    incremental_sales = sales_rows(db)
+    SalesPerformanceService.rebuild(db)
+    assert incremental_sales == sales_rows(db)
+
+
+def test_missing_currency_is_the_column_default(db):
+    FxService.upsert_rates(db, [schemas.FxRateCreate(Currency="USD", RateDate=date(2019, 1, 1), Rate=7.0)])
+
+    purchase = PurchaseRecord(purchase_date=date(2026, 1, 1), amount=10.0, currency=None)
+    FxService.normalize(db, purchase)
+    assert purchase.amount_base == 70.0  # USD
+
+    lead = Lead(estimated_value=10.0, currency=None, created_at=datetime(2026, 1, 1))
+    FxService.normalize(db, lead)
+    assert lead.estimated_value_base == 10.0  # CNY, the base currency
+
+
+def test_rate_cache_sees_a_committed_rate_at_once(db):
+    day = date(2026, 5, 1)
+    assert FxService.rate(db, "NZD", day) is None
+    FxService.upsert_rates(db, [schemas.FxRateCreate(Currency="NZD", RateDate=day - timedelta(days=1), Rate=4.2)])
+    assert FxService.rate(db, "NZD", day) == 4.2
@@ -0,0 +1,191 @@
+"""
+Idempotency-Key handling (app/api/idempotency.py, app/services/idempotency_service.py).
+
+A small app with IdempotentRoute endpoints counts how often each one actually executes; every
+test uses its own keys, so the shared idempotency_keys table and in-process LRU need no reset.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.idempotency import IdempotentRoute, REPLAYED_HEADER
+from app.core.config import settings
+from app.services.idempotency_service import idempotency_store, CLAIMED, IN_PROGRESS
+
+PARTNER = {"X-Partner-UUID": "partner-under-test"}
+
+
+class Endpoints:
+    def __init__(self):
+        self.executions = 0
+        self.release = threading.Event()
+        self.started = threading.Event()
+        router = APIRouter(route_class=IdempotentRoute)
+
+        @router.post("/orders")
+        def create_order(payload: dict):
+            self.executions += 1
+            return {"execution": self.executions, **payload}
+
+        @router.post("/slow")
+        def slow(payload: dict):
+            self.executions += 1
+            self.started.set()
+            self.release.wait(5)
+            return {"execution": self.executions}
+
+        @router.post("/large")
+        def large(payload: dict):
+            self.executions += 1
+            return {"data": "x" * (settings.IDEMPOTENCY_MAX_RESPONSE_BYTES + 1)}
+
+        @router.post("/invalid")
+        def invalid(payload: dict):
+            self.executions += 1
+            raise HTTPException(status_code=400, detail="rejected")
+
+        self.app = FastAPI()
+        self.app.include_router(router)
+
+
+@pytest.fixture
+def endpoints():
+    return Endpoints()
+
+
+@pytest.fixture
+def client(endpoints):
+    return TestClient(endpoints.app)
+
+
+def headers(key):
+    return {**PARTNER, "Idempotency-Key": key}
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def test_retry_replays_the_stored_response(client, endpoints):
+    key = new_key()
+    first = client.post("/orders", json={"po": 1}, headers=headers(key))
+    retry = client.post("/orders", json={"po": 1}, headers=headers(key))
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json() == {"execution": 1, "po": 1}
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert endpoints.executions == 1
+
+
+def test_replay_survives_the_in_process_cache(client, endpoints):
+    key = new_key()
+    client.post("/orders", json={"po": 1}, headers=headers(key))
+    idempotency_store._responses.clear()
+
+    retry = client.post("/orders", json={"po": 1}, headers=headers(key))
+    assert retry.json() == {"execution": 1, "po": 1}
+    assert endpoints.executions == 1
+
+
+def test_reusing_a_key_for_a_different_request_is_rejected(client, endpoints):
+    key = new_key()
+    client.post("/orders", json={"po": 1}, headers=headers(key))
+
+    assert client.post("/orders", json={"po": 2}, headers=headers(key)).status_code == 422
+    assert endpoints.executions == 1
+
+
+def test_keys_are_scoped_to_the_caller(client, endpoints):
+    key = new_key()
+    client.post("/orders", json={"po": 1}, headers=headers(key))
+    other = client.post("/orders", json={"po": 1}, headers={"X-Partner-UUID": "another-partner", "Idempotency-Key": key})
+
+    assert other.status_code == 200 and REPLAYED_HEADER not in other.headers
+    assert endpoints.executions == 2
+
+
+def test_failed_request_releases_the_key(client, endpoints):
+    key = new_key()
+    assert client.post("/invalid", json={}, headers=headers(key)).status_code == 400
+    assert client.post("/invalid", json={}, headers=headers(key)).status_code == 400
+    assert endpoints.executions == 2
+
+
+def test_oversized_success_is_not_executed_again(client, endpoints):
+    key = new_key()
+    assert client.post("/large", json={}, headers=headers(key)).status_code == 200
+
+    retry = client.post("/large", json={}, headers=headers(key))
+    assert retry.status_code == 409
+    assert endpoints.executions == 1
+
+
+def test_retry_waits_for_the_request_in_flight(client, endpoints):
+    key = new_key()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(client.post, "/slow", json={}, headers=headers(key))
+        assert endpoints.started.wait(5)
+        retry = pool.submit(client.post, "/slow", json={}, headers=headers(key))
+        time.sleep(0.3)
+        endpoints.release.set()
+        first, retry = first.result(), retry.result()
+
+    assert first.json() == retry.json() == {"execution": 1}
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert endpoints.executions == 1
+
+
+def test_retry_gives_up_with_409_after_the_wait(client, endpoints, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.3)
+    key = new_key()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(client.post, "/slow", json={}, headers=headers(key))
+        assert endpoints.started.wait(5)
+        retry = client.post("/slow", json={}, headers=headers(key))
+        endpoints.release.set()
+        assert first.result().status_code == 200
+
+    assert retry.status_code == 409
+    assert retry.headers["Retry-After"] == "1"
+    assert endpoints.executions == 1
+
+
+def test_running_request_is_not_taken_over(client, endpoints, monkeypatch):
+    # The heartbeat keeps the claim fresh for longer than the lock timeout
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 0.4)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    key = new_key()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(client.post, "/slow", json={}, headers=headers(key))
+        assert endpoints.started.wait(5)
+        time.sleep(1.0)
+        retry = client.post("/slow", json={}, headers=headers(key))
+        endpoints.release.set()
+        assert first.result().status_code == 200
+
+    assert retry.status_code == 409
+    assert endpoints.executions == 1
+
+
+def test_abandoned_claim_is_taken_over(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 0.1)
+    scope, key = "test:abandoned", new_key()
+    assert idempotency_store.claim(scope, key, "f")[0] == CLAIMED
+    time.sleep(0.2)  # no heartbeat: the worker holding the key is gone
+
+    assert idempotency_store.claim(scope, key, "f")[0] == CLAIMED
+
+
+def test_concurrent_claims_of_one_key_are_exclusive():
+    scope, key = "test:concurrent", new_key()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = [future.result()[0] for future in [pool.submit(idempotency_store.claim, scope, key, "f") for _ in range(8)]]
+
+    assert outcomes.count(CLAIMED) == 1
+    assert outcomes.count(IN_PROGRESS) == 7
@@ -0,0 +1,73 @@
+"""
+Lead import (app/services/lead_import_service.py): a message or row that cannot be parsed is skipped
+and recorded on the job, while any other error fails the run so it can be fixed and resumed.
+"""
+
+import csv
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.models.lead_models import Lead, LeadStatus
+from app.services import lead_import_service
+from app.services.lead_import_service import ImportContext, LeadImportService
+
+ROWS = [
+    ["公司", "联系人", "邮箱"],
+    ["Import Lead Co A", "Alice", "alice@lead-a.example"],
+    ["Broken Co", "Bob", "bob@broken.example"],
+    ["Import Lead Co C", "Carol", "carol@lead-c.example"],
+    ["", "", ""],  # nothing to extract: skipped
+]
+
+
+@pytest.fixture
+def csv_job(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LEAD_IMPORT_DIR", str(tmp_path))
+    with open(os.path.join(tmp_path, "leads.csv"), "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(ROWS)
+    status = LeadStatus(status_name=f"Import Open {tmp_path.name}", display_order=100)
+    db.add(status)
+    db.commit()
+    return LeadImportService.create_job(db, "leads.csv", status_id=status.status_id)
+
+
+def fail_on_broken_row(error):
+    original = ImportContext.from_row
+
+    def from_row(self, row):
+        if row["公司"] == "Broken Co":
+            raise error
+        return original(self, row)
+    return from_row
+
+
+def test_unparsable_row_is_recorded_on_the_job(db, csv_job, monkeypatch):
+    monkeypatch.setattr(ImportContext, "from_row", fail_on_broken_row(UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")))
+
+    job = LeadImportService.run(db, csv_job.job_id)
+
+    assert job.status == "COMPLETED"
+    assert (job.processed_count, job.inserted_count, job.skipped_count, job.error_count) == (4, 2, 1, 1)
+    assert job.item_errors == [{"position": 2, "error": "UnicodeDecodeError: 'utf-8' codec can't decode byte 0xff in position 0: invalid start byte"}]
+    assert db.query(Lead).filter(Lead.company_name.like("Import Lead Co %")).count() == 2
+
+
+def test_recorded_errors_are_capped(db, csv_job, monkeypatch):
+    monkeypatch.setattr(ImportContext, "from_row", fail_on_broken_row(ValueError("bad row")))
+    monkeypatch.setattr(lead_import_service, "MAX_ITEM_ERRORS", 0)
+
+    job = LeadImportService.run(db, csv_job.job_id)
+
+    assert (job.status, job.error_count, job.item_errors) == ("COMPLETED", 1, None)
+
+
+def test_other_errors_fail_the_run(db, csv_job, monkeypatch):
+    monkeypatch.setattr(ImportContext, "from_row", fail_on_broken_row(KeyError("status_id")))
+
+    job = LeadImportService.run(db, csv_job.job_id)
+
+    assert job.status == "FAILED"
+    assert "status_id" in job.last_error
+    assert job.error_count == 0
@@ -0,0 +1,102 @@
+"""
+Statement and row counts of the license detail and deployment read paths (app/db/loader_options.py).
+
+One license carries 100 purchases and 50 deployments with 3 engineers each. Loading it must take
+a fixed number of SELECTs whose rows add up to the rows actually needed, not the
+purchases x deployments x engineers product a chain of joinedloads returns.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.models.models import (
+    Customer, License, PurchaseRecord, DeploymentRecord, DeploymentEngineer, FactoryEngineer
+)
+from app.services.deployment_service import DeploymentService
+from app.services.license_service import LicenseService
+
+LICENSE_ID = "ENT-LOADER-0001"
+PURCHASES = 100
+DEPLOYMENTS = 50
+ENGINEERS_PER_DEPLOYMENT = 3
+
+
+@pytest.fixture(scope="module")
+def license_with_history():
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    today = date.today()
+    customer = Customer(customer_name="Loader Test Customer")
+    engineers = [FactoryEngineer(engineer_name=f"Loader Engineer {i}", email=f"loader{i}@example.com") for i in range(ENGINEERS_PER_DEPLOYMENT)]
+    db.add_all([customer, *engineers])
+    db.flush()
+    db.add(License(
+        license_id=LICENSE_ID, customer_id=customer.customer_id, product_name="Dify Enterprise", license_type="ENT",
+        order_date=today, start_date=today, expiry_date=today + timedelta(days=365),
+        authorized_users=100, authorized_workspaces=10, license_status="ACTIVE"
+    ))
+    db.add_all([
+        PurchaseRecord(license_id=LICENSE_ID, purchase_type="RENEWAL", purchase_date=today - timedelta(days=i), amount=100)
+        for i in range(PURCHASES)
+    ])
+    deployments = [
+        DeploymentRecord(license_id=LICENSE_ID, deployment_type="INITIAL", deployment_date=today - timedelta(days=i),
+                         deployed_by="Factory", deployment_status="COMPLETED")
+        for i in range(DEPLOYMENTS)
+    ]
+    db.add_all(deployments)
+    db.flush()
+    db.add_all([
+        DeploymentEngineer(deployment_id=deployment.deployment_id, engineer_id=engineer.engineer_id, role="member")
+        for deployment in deployments for engineer in engineers
+    ])
+    db.commit()
+    db.close()
+    return LICENSE_ID
+
+
+def test_license_detail_loads_each_collection_once(db, selects, license_with_history):
+    license = LicenseService.get_license(db, license_with_history)
+
+    assert len(license.PurchaseRecords) == PURCHASES
+    assert len(license.DeploymentRecords) == DEPLOYMENTS
+    assert all(len(deployment.EngineerAssignments) == ENGINEERS_PER_DEPLOYMENT for deployment in license.DeploymentRecords)
+
+    # license (+ customer, sales rep, reseller joined), purchases, deployments, assignments (+ engineer joined)
+    assert selects.count == 4
+    assert sum(selects.rows()) == 1 + PURCHASES + DEPLOYMENTS + DEPLOYMENTS * ENGINEERS_PER_DEPLOYMENT
+
+
+def test_deployment_list_does_not_query_per_row(db, selects, license_with_history):
+    deployments = DeploymentService.get_deployment_records(db, license_id=license_with_history, limit=DEPLOYMENTS)
+
+    assert len(deployments) == DEPLOYMENTS
+    assert all(len(deployment.EngineerAssignments) == ENGINEERS_PER_DEPLOYMENT for deployment in deployments)
+
+    # deployments, then assignments (+ engineer joined) for all of them
+    assert selects.count == 2
+    assert sum(selects.rows()) == DEPLOYMENTS + DEPLOYMENTS * ENGINEERS_PER_DEPLOYMENT
+
+
+def test_deployment_records_are_served_from_the_batch_loader(db, selects, license_with_history):
+    deployments = DeploymentService.get_deployment_records(db, license_id=license_with_history, limit=DEPLOYMENTS)
+    selects.clear()
+
+    for deployment in deployments:
+        assert DeploymentService.get_deployment_record(db, deployment.DeploymentID).DeploymentID == deployment.DeploymentID
+    assert selects.count == 0
+
+
+def test_bulk_and_core_writes_clear_the_batch_loader(db, license_with_history):
+    deployments = DeploymentService.get_deployment_records(db, license_id=license_with_history, limit=DEPLOYMENTS)
+    deployment_id = deployments[0].DeploymentID
+
+    db.query(DeploymentRecord).filter(DeploymentRecord.deployment_id == deployment_id)\
+        .update({"notes": "bulk"}, synchronize_session=False)
+    assert DeploymentService.get_deployment_record(db, deployment_id).Notes == "bulk"
+
+    db.execute(update(DeploymentRecord).where(DeploymentRecord.deployment_id == deployment_id).values(notes="core"))
+    assert DeploymentService.get_deployment_record(db, deployment_id).Notes == "core"
@@ -0,0 +1,144 @@
+"""
+sales_performance_daily is maintained incrementally by every purchase write path and by the license,
+rep/reseller and FX changes that move or revalue purchases (SalesPerformanceService.record/unassign).
+
+The test runs each of those writes through its service and checks after every step that the table
+equals what SalesPerformanceService.rebuild() computes from purchase_records.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import Customer, License, PurchaseRecord, Reseller, SalesRep, SalesPerformanceDaily
+from app.schemas import schemas
+from app.services.bulk_import_service import BulkImportService
+from app.services.customer_service import CustomerService
+from app.services.fx_service import FxService
+from app.services.license_service import LicenseService
+from app.services.purchase_service import PurchaseService
+from app.services.reseller_service import ResellerService
+from app.services.sales_performance_service import SalesPerformanceService
+from app.services.sales_rep_service import SalesRepService
+
+DAY = date(2026, 3, 10)
+
+
+def daily_rows(db):
+    """The table as comparable tuples; rows netted out to zero are equivalent to absent rows"""
+    db.expire_all()
+    return sorted(
+        (row.dimension, row.dimension_id, row.day, row.product_name, row.currency,
+         row.purchase_count, round(row.revenue, 2), round(row.revenue_base, 2))
+        for row in db.query(SalesPerformanceDaily)
+        if row.purchase_count or round(row.revenue, 2) or round(row.revenue_base, 2)
+    )
+
+
+def assert_matches_rebuild(db, step):
+    incremental = daily_rows(db)
+    SalesPerformanceService.rebuild(db)
+    assert incremental == daily_rows(db), f"sales_performance_daily drifted after {step}"
+
+
+def purchase(license_id, amount, currency="USD", day=DAY, purchase_type=schemas.PurchaseTypeEnum.NEW):
+    return schemas.PurchaseRecordCreate(
+        LicenseID=license_id, PurchaseType=purchase_type, PurchaseDate=day, Amount=amount, Currency=currency
+    )
+
+
+@pytest.fixture
+def attribution(db):
+    """Two customers, two reps, a reseller and three licenses, with the table in sync beforehand"""
+    customers = [Customer(customer_name=f"Performance Customer {i}") for i in range(2)]
+    reps = [SalesRep(sales_rep_name=f"Performance Rep {i}", email=f"perf{i}@example.com") for i in range(2)]
+    reseller = Reseller(reseller_name="Performance Reseller")
+    db.add_all([*customers, *reps, reseller])
+    db.flush()
+
+    def license(suffix, customer, rep, reseller_id=None):
+        return License(
+            license_id=f"ENT-PERF-{suffix}", customer_id=customer.customer_id, sales_rep_id=rep.sales_rep_id,
+            reseller_id=reseller_id, product_name="Dify Enterprise", license_type="ENT", order_date=DAY,
+            start_date=DAY, expiry_date=DAY + timedelta(days=365), license_status="ACTIVE"
+        )
+
+    licenses = [
+        license("1", customers[0], reps[0], reseller.reseller_id),
+        license("2", customers[0], reps[1]),
+        license("3", customers[1], reps[0]),
+    ]
+    db.add_all(licenses)
+    db.commit()
+    SalesPerformanceService.rebuild(db)
+    return customers, reps, reseller, [item.license_id for item in licenses]
+
+
+def test_incremental_maintenance_matches_rebuild(db, attribution, tmp_path, monkeypatch):
+    customers, reps, reseller, (first, second, third) = attribution
+    FxService.upsert_rates(db, [
+        schemas.FxRateCreate(Currency="USD", RateDate=date(2026, 1, 1), Rate=7.0),
+        schemas.FxRateCreate(Currency="EUR", RateDate=date(2026, 1, 1), Rate=7.8),
+    ])
+
+    created = [
+        PurchaseService.create_purchase_record(db, purchase(first, 1000)),
+        PurchaseService.create_purchase_record(db, purchase(first, 500, currency="EUR")),
+        PurchaseService.create_purchase_record(db, purchase(second, 300, day=DAY + timedelta(days=1))),
+        PurchaseService.create_purchase_record(db, purchase(third, 200, currency="GBP")),  # no rate yet
+    ]
+    assert_matches_rebuild(db, "purchase create")
+
+    PurchaseService.update_purchase_record(db, created[0].purchase_id, schemas.PurchaseRecordUpdate(Amount=1200))
+    PurchaseService.update_purchase_record(
+        db, created[2].purchase_id, schemas.PurchaseRecordUpdate(PurchaseDate=DAY + timedelta(days=2), Currency="EUR")
+    )
+    assert_matches_rebuild(db, "purchase update")
+
+    PurchaseService.delete_purchase_record(db, created[1].purchase_id)
+    assert_matches_rebuild(db, "purchase delete")
+
+    LicenseService.update_license(db, first, schemas.LicenseUpdate(SalesRepID=reps[1].sales_rep_id, ProductName="Dify Premium"))
+    assert_matches_rebuild(db, "license reattribution")
+
+    LicenseService.renew_license(db, second, purchase(
+        second, 800, day=DAY + timedelta(days=30), purchase_type=schemas.PurchaseTypeEnum.RENEWAL
+    ).model_copy(update={"NewExpiryDate": DAY + timedelta(days=730)}))
+    assert_matches_rebuild(db, "license renewal")
+
+    LicenseService.batch_renew_licenses(db, schemas.LicenseBatchRenewalRequest(
+        PurchaseDate=DAY + timedelta(days=60), Currency="EUR",
+        Items=[
+            schemas.LicenseRenewalItem(LicenseID=first, NewExpiryDate=DAY + timedelta(days=800), Amount=900),
+            schemas.LicenseRenewalItem(LicenseID=third, PurchaseType=schemas.PurchaseTypeEnum.EXPANSION, Amount=150),
+        ]
+    ))
+    assert_matches_rebuild(db, "batch renewal")
+
+    monkeypatch.setattr(settings, "BULK_IMPORT_DIR", str(tmp_path))
+    (tmp_path / "purchases.csv").write_text(
+        "LicenseID,PurchaseType,PurchaseDate,Amount,Currency\n"
+        f"{third},NEW,2026-04-01,400,USD\n"
+        f"{second},EXPANSION,2026-04-02,250,GBP\n"
+    )
+    assert BulkImportService.run(db, "purchases", "purchases.csv")["Inserted"] == 2
+    assert_matches_rebuild(db, "bulk import")
+
+    FxService.upsert_rates(db, [
+        schemas.FxRateCreate(Currency="GBP", RateDate=date(2026, 1, 1), Rate=9.1),  # first GBP rate
+        schemas.FxRateCreate(Currency="EUR", RateDate=DAY + timedelta(days=2), Rate=8.0),  # from a later day
+    ])
+    assert_matches_rebuild(db, "FX recompute")
+
+    ResellerService.delete_reseller(db, reseller.reseller_id)
+    SalesRepService.delete_sales_rep(db, reps[0].sales_rep_id)
+    assert_matches_rebuild(db, "rep/reseller unassign")
+
+    LicenseService.delete_license(db, second)
+    assert_matches_rebuild(db, "license delete")
+
+    CustomerService.delete_customer(db, customers[1].customer_id)
+    assert_matches_rebuild(db, "customer delete")
+
+    assert db.query(PurchaseRecord).filter(PurchaseRecord.license_id == first).count() == 2
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { 
   Dialog,
   DialogTitle,
@@ -13,7 +13,8 @@ import {
   ListItem,
   ListItemText,
   ListItemIcon,
-  Chip
+  Chip,
+  CircularProgress
 } from '@mui/material';
 import {
   SwapHoriz as SwapHorizIcon,
@@ -22,9 +23,48 @@ import {
   Refresh as RefreshIcon
 } from '@mui/icons-material';
 import { useTheme } from '@mui/material/styles';
+import { fetchWithAuth, API_BASE_URL } from '../../utils/api';
 
-const ActivationHistoryDialog = ({ open, onClose, activationHistory, licenseId }) => {
+const PAGE_SIZE = 20;
+
+// 变更记录存放在activation_events表中，打开对话框时按时间倒序分页加载
+const ActivationHistoryDialog = ({ open, onClose, licenseId }) => {
   const theme = useTheme();
+  const [changes, setChanges] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState(null);
+
+  const loadPage = useCallback(async (cursor) => {
+    setLoading(true);
+    setError(null);
+    try {
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (cursor) {
+        params.append('cursor', cursor);
+      }
+      const response = await fetchWithAuth(
+        `${API_BASE_URL}/activation/licenses/${licenseId}/activation-events?${params.toString()}`
+      );
+      if (!response.ok) {
+        throw new Error('获取激活历史记录失败');
+      }
+      const data = await response.json();
+      const page = data.items.map((event) => ({ ...event, timestamp: event.created_at }));
+      setChanges((previous) => (cursor ? [...previous, ...page] : page));
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  }, [licenseId]);
+
+  useEffect(() => {
+    if (open && licenseId) {
+      loadPage(null);
+    }
+  }, [open, licenseId, loadPage]);
   
   const formatDate = (dateString) => {
     if (!dateString) return '未知时间';
@@ -64,15 +104,23 @@ const ActivationHistoryDialog = ({ open, onClose, activationHistory, licenseId }
         </Typography>
         <Divider sx={{ my: 1 }} />
         
-        {(!activationHistory || !activationHistory.changes || activationHistory.changes.length === 0) ? (
+        {error && (
+          <Typography variant="body2" color="error" sx={{ my: 1 }}>{error}</Typography>
+        )}
+        
+        {loading && changes.length === 0 ? (
+          <Box p={2} textAlign="center">
+            <CircularProgress size={24} />
+          </Box>
+        ) : changes.length === 0 ? (
           <Box p={2} textAlign="center">
             <Typography variant="body1">暂无激活模式变更记录</Typography>
           </Box>
         ) : (
           <List>
-            {activationHistory.changes.map((change, index) => (
+            {changes.map((change, index) => (
               <Paper 
-                key={index}
+                key={change.event_id || index}
                 elevation={1}
                 sx={{ 
                   mb: 2,
@@ -140,6 +188,14 @@ const ActivationHistoryDialog = ({ open, onClose, activationHistory, licenseId }
             ))}
           </List>
         )}
+        
+        {nextCursor && (
+          <Box textAlign="center">
+            <Button onClick={() => loadPage(nextCursor)} disabled={loading}>
+              {loading ? '加载中...' : '加载更多'}
+            </Button>
+          </Box>
+        )}
       </DialogContent>
       <DialogActions>
         <Button onClick={onClose} color="primary">
@@ -472,7 +472,6 @@ const LicenseActivationManager = ({ licenseId, isAdmin }) => {
         <ActivationHistoryDialog 
           open={historyDialogOpen}
           onClose={() => setHistoryDialogOpen(false)}
-          activationHistory={licenseInfo.activation_history}
           licenseId={licenseId}
         />
       )}
@@ -17,6 +17,7 @@ import { Alert, Button, Card, Col, Divider, Result, Row, Spin, Statistic, Table,
 import axios from 'axios';
 import React, { useEffect, useState } from 'react';
 import { getConnectionStatus, retryConnection } from '../utils/connectionCheck';
+import { subscribeToEvents } from '../utils/eventStream';
 
 const { Title } = Typography;
 
@@ -115,13 +116,26 @@ const Dashboard = () => {
     // 首次加载时获取数据
     handleRefresh();
     
-    // 设置定时刷新（如果后端连接正常）
+    // 优先使用服务端推送：有相关变更时再刷新（短时间内的多个事件合并为一次刷新）
+    let refreshTimer = null;
+    const unsubscribe = subscribeToEvents(['license', 'deployment', 'purchase_order'], () => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(handleRefresh, 1000);
+    });
+    if (unsubscribe) {
+      return () => {
+        clearTimeout(refreshTimer);
+        unsubscribe();
+      };
+    }
+
+    // 不支持推送时退回定时刷新（如果后端连接正常）
     const refreshInterval = setInterval(() => {
       if (getConnectionStatus()) {
         handleRefresh();
       }
     }, 60000); // 每分钟刷新一次
-    
+
     // 组件卸载时清除定时器
     return () => clearInterval(refreshInterval);
   }, []);
@@ -34,6 +34,7 @@ import {
 } from '@ant-design/icons';
 import moment from 'moment';
 import { fetchWithAuth, API_BASE_URL } from '../../utils/api';
+import { subscribeToEvents } from '../../utils/eventStream';
 import OrderReviewForm from './OrderReviewForm';
 // PageHeader组件不存在，使用Typography.Title代替
 
@@ -80,6 +81,12 @@ const Orders = () => {
     fetchCustomers();
   }, [currentPage, pageSize]);
   
+  // 新PO单到达或审核状态变化时由服务端推送，自动刷新列表
+  useEffect(() => {
+    const unsubscribe = subscribeToEvents(['purchase_order'], () => fetchOrders());
+    return () => unsubscribe && unsubscribe();
+  }, [currentPage, pageSize, filters]);
+  
   // 获取订单列表
   const fetchOrders = async () => {
     try {
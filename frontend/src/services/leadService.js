@@ -26,6 +26,12 @@ const getAuthHeader = () => {
   };
 };
 
+// 参考数据API：商机状态/来源、销售、经销商、工程师及枚举一次取回
+// 服务端带ETag，浏览器重新验证时未变化则返回304，不会重复下载
+export const getReferenceData = () => {
+  return axios.get(`${config.apiBaseUrl}/reference-data/`, getAuthHeader());
+};
+
 // 商机来源API
 export const createLeadSource = (sourceData) => {
   if (USE_MOCK_DATA) {
@@ -46,7 +52,7 @@ export const getLeadSources = () => {
     console.log('使用模拟数据: getLeadSources');
     return mockLeadApi.getLeadSources();
   }
-  return axios.get(`${config.apiBaseUrl}/leads/sources/`, getAuthHeader());
+  return getReferenceData().then(response => ({ ...response, data: response.data.LeadSources }));
 };
 
 export const updateLeadSource = (sourceId, sourceData) => {
@@ -86,7 +92,7 @@ export const getLeadStatuses = () => {
     console.log('使用模拟数据: getLeadStatuses');
     return mockLeadApi.getLeadStatuses();
   }
-  return axios.get(`${config.apiBaseUrl}/leads/statuses/`, getAuthHeader());
+  return getReferenceData().then(response => ({ ...response, data: response.data.LeadStatuses }));
 };
 
 export const updateLeadStatus = (statusId, statusData) => {
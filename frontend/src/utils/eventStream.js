@@ -0,0 +1,89 @@
+/**
+ * 变更事件订阅模块
+ * 通过SSE（GET /events/stream）接收后端推送的PO单、许可证、部署变更，替代定时轮询
+ */
+
+import { API_BASE_URL, post } from './api';
+
+// 后端发布的事件类型（见 backend/app/core/events.py 及各服务的 event_bus.publish 调用）
+export const KNOWN_EVENT_TYPES = {
+  purchase_order: ['purchase_order.created', 'purchase_order.approved', 'purchase_order.rejected', 'purchase_order.completed', 'purchase_order.pending'],
+  license: ['license.renewed', 'license.expired'],
+  deployment: ['deployment.completed'],
+};
+
+/**
+ * 订阅变更事件
+ * @param {string[]} eventTypes - 关注的事件类型，如 ['purchase_order.created']；也可只写实体前缀，如 'license'
+ * @param {Function} onEvent - 收到事件时的回调，参数为事件对象 { id, type, entity_id, data, timestamp }
+ * @param {Object} options - { onResync: 需要全量刷新时的回调（默认同onEvent） }
+ * @returns {Function|null} 取消订阅函数；浏览器不支持EventSource或未登录时返回null，调用方应退回轮询
+ */
+export const subscribeToEvents = (eventTypes, onEvent, options = {}) => {
+  const token = localStorage.getItem('token');
+  if (typeof window.EventSource === 'undefined' || !token) {
+    return null;
+  }
+
+  const onResync = options.onResync || (() => onEvent({ type: 'resync' }));
+  let source = null;
+  let closed = false;
+  let lastEventId = null;
+
+  const handle = (messageEvent) => {
+    lastEventId = messageEvent.lastEventId || lastEventId;
+    try {
+      onEvent(JSON.parse(messageEvent.data));
+    } catch (error) {
+      console.error('Invalid event payload:', error);
+    }
+  };
+
+  const listenedTypes = new Set();
+  eventTypes.forEach((eventType) => {
+    // 实体前缀展开为该实体的已知事件
+    const expanded = eventType.includes('.') ? [eventType] : (KNOWN_EVENT_TYPES[eventType] || []);
+    expanded.forEach((type) => listenedTypes.add(type));
+  });
+
+  const connect = async () => {
+    // EventSource无法设置请求头，URL中只携带短期有效的订阅票据，不暴露登录令牌
+    let ticket;
+    try {
+      ticket = (await post('/events/ticket')).Ticket;
+    } catch (error) {
+      console.error('Failed to get event stream ticket:', error);
+      return;
+    }
+    if (closed) {
+      return;
+    }
+
+    const params = new URLSearchParams({ ticket });
+    if (lastEventId) {
+      params.set('last_event_id', lastEventId);
+    }
+    source = new EventSource(`${API_BASE_URL}/events/stream?${params}`);
+    listenedTypes.forEach((type) => source.addEventListener(type, handle));
+    source.addEventListener('resync', (messageEvent) => {
+      lastEventId = messageEvent.lastEventId || lastEventId;
+      onResync(messageEvent);
+    });
+    // 断线后浏览器自动重连并携带Last-Event-ID；票据过期导致重连被拒（连接关闭）时重新获取票据
+    source.addEventListener('error', () => {
+      if (!closed && source.readyState === window.EventSource.CLOSED) {
+        source = null;
+        setTimeout(connect, 3000);
+      }
+    });
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    if (source) {
+      source.close();
+    }
+  };
+};